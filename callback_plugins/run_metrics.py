@@ -0,0 +1,313 @@
+"""
+Purpose: Per-run timing metrics of scheduled playbooks - wall time per task, per host and per
+         ServiceNow endpoint, with retry counts - as JSON lines and a Prometheus textfile
+Design Pattern: Aggregate callback - timings accumulate in memory from runner events and are
+                written once when the play recap is reached
+Complexity: O(1) per runner event, O(t log t + h log h) at the end of a run for t tasks and h hosts
+
+Enable it next to any stdout callback (the scheduler units keep ANSIBLE_STDOUT_CALLBACK=json):
+
+  [defaults]
+  callback_plugins = callback_plugins
+  callbacks_enabled = run_metrics
+
+Each run appends one compact JSON document to <metrics_dir>/<playbook>.jsonl:
+
+  {"playbook", "shard", "started", "finished", "duration",
+   "hosts": {"count", "failed", "unreachable", "slowest": {host: seconds}},
+   "tasks": {task: [runs, seconds, max_seconds, failed]},        (slowest top_tasks tasks)
+   "servicenow": {endpoint: {"calls", "requests", "seconds", "retries", "failed"}},
+   "retries"}
+
+and replaces <metrics_dir>/<playbook>[@<shard>].prom for the node_exporter textfile collector.
+`scheduler.py status` reads the JSON lines back for p50/p95 run durations (see
+scheduler/run_metrics.py). Retries are the extra attempts of tasks using until/retries
+(servicenow_api_retry) plus the resubmissions the servicenow_batch action reports itself.
+
+Metrics are best effort: a metrics directory that cannot be written only produces a warning.
+"""
+
+DOCUMENTATION = """
+    name: run_metrics
+    type: aggregate
+    short_description: Record per-task, per-host and per-ServiceNow-endpoint timings of a run
+    description:
+      - Appends one JSON line per playbook run and rewrites a Prometheus textfile.
+    options:
+      metrics_dir:
+        description: Directory for <playbook>.jsonl and <playbook>.prom files
+        default: ~/.ansible/metrics
+        type: path
+        env:
+          - name: ANSIBLE_RUN_METRICS_DIR
+        ini:
+          - section: callback_run_metrics
+            key: metrics_dir
+      shard:
+        description: Shard label of this run, set by the scheduler for sharded playbooks
+        default: ''
+        env:
+          - name: ANSIBLE_RUN_METRICS_SHARD
+      top_tasks:
+        description: Number of slowest tasks kept per run
+        default: 25
+        type: int
+        env:
+          - name: ANSIBLE_RUN_METRICS_TOP_TASKS
+        ini:
+          - section: callback_run_metrics
+            key: top_tasks
+      top_hosts:
+        description: Number of slowest hosts kept per run
+        default: 10
+        type: int
+        env:
+          - name: ANSIBLE_RUN_METRICS_TOP_HOSTS
+        ini:
+          - section: callback_run_metrics
+            key: top_hosts
+      max_runs:
+        description: Runs kept in the JSON lines file; older lines are dropped when it doubles
+        default: 500
+        type: int
+        env:
+          - name: ANSIBLE_RUN_METRICS_MAX_RUNS
+        ini:
+          - section: callback_run_metrics
+            key: max_runs
+    requirements:
+      - enable in configuration
+"""
+
+import fcntl
+import json
+import os
+import tempfile
+import time
+
+from ansible.plugins.callback import CallbackBase
+
+# Module or action -> ServiceNow REST endpoint it talks to; writes through the collection
+# modules may be POST, PATCH or DELETE depending on state, so they are labelled 'write'
+SERVICENOW_ENDPOINTS = {
+    'servicenow.itsm.incident': 'table/incident:write',
+    'servicenow.itsm.incident_info': 'table/incident:GET',
+    'servicenow.itsm.problem': 'table/problem:write',
+    'servicenow.itsm.problem_info': 'table/problem:GET',
+    'servicenow.itsm.change_request': 'table/change_request:write',
+    'servicenow.itsm.change_request_info': 'table/change_request:GET',
+    'servicenow.itsm.configuration_item': 'table/cmdb_ci:write',
+    'servicenow.itsm.configuration_item_info': 'table/cmdb_ci:GET',
+    'servicenow.itsm.attachment': 'attachment:write',
+    'servicenow.itsm.attachment_info': 'attachment:GET',
+    'servicenow_batch': 'v1/batch:POST',
+    'servicenow_attachments': 'attachment/file:POST',
+    'servicenow_ci_cache': 'table/cmdb_ci:GET',
+}
+
+
+def _endpoint(task):
+    action = getattr(task, 'resolved_action', None) or task.action
+    endpoint = SERVICENOW_ENDPOINTS.get(action)
+    if endpoint is None and '.' not in action:
+        endpoint = SERVICENOW_ENDPOINTS.get('servicenow.itsm.' + action)
+    return endpoint
+
+
+def _attempts(result):
+    """Attempts made by a task result and the executions they belong to, summed over loop items"""
+    items = [item for item in result.get('results') or [] if isinstance(item, dict) and 'ansible_loop_var' in item]
+    if items:
+        return sum(int(item.get('attempts') or 1) for item in items), len(items)
+    return int(result.get('attempts') or 1), 1
+
+
+def _http_requests(result):
+    """HTTP requests an action reports making itself, if it does"""
+    for key in ('summary', 'stats'):
+        section = result.get(key)
+        if isinstance(section, dict) and 'http_requests' in section:
+            return int(section['http_requests'])
+    if isinstance(result.get('results'), list) and 'uploaded' in result:
+        return len(result['results'])
+    return None
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def prometheus_lines(run):
+    """Render one run document in the Prometheus text exposition format"""
+    base = {'playbook': run['playbook']}
+    if run.get('shard'):
+        base['shard'] = run['shard']
+
+    def sample(name, value, **labels):
+        merged = dict(base, **labels)
+        rendered = ','.join('%s="%s"' % (key, _label(merged[key])) for key in sorted(merged))
+        return '%s{%s} %s' % (name, rendered, round(value, 3) if isinstance(value, float) else value)
+
+    lines = []
+
+    def metric(name, help_text, samples):
+        lines.append('# HELP %s %s' % (name, help_text))
+        lines.append('# TYPE %s gauge' % name)
+        lines.extend(samples)
+
+    metric('ansible_run_duration_seconds', 'Wall time of the last playbook run',
+           [sample('ansible_run_duration_seconds', run['duration'])])
+    metric('ansible_run_finished_timestamp_seconds', 'End of the last playbook run',
+           [sample('ansible_run_finished_timestamp_seconds', run['finished'])])
+    metric('ansible_run_hosts', 'Hosts of the last run by outcome',
+           [sample('ansible_run_hosts', run['hosts']['count'] - run['hosts']['failed'] - run['hosts']['unreachable'],
+                   status='ok'),
+            sample('ansible_run_hosts', run['hosts']['failed'], status='failed'),
+            sample('ansible_run_hosts', run['hosts']['unreachable'], status='unreachable')])
+    metric('ansible_run_retries', 'Retried attempts in the last run',
+           [sample('ansible_run_retries', run['retries'])])
+    metric('ansible_run_task_seconds', 'Summed wall time of the slowest tasks over all hosts',
+           [sample('ansible_run_task_seconds', stats[1], task=task) for task, stats in run['tasks'].items()])
+    metric('ansible_run_host_seconds', 'Summed task wall time of the slowest hosts',
+           [sample('ansible_run_host_seconds', seconds, host=host)
+            for host, seconds in run['hosts']['slowest'].items()])
+    for field, help_text in (('seconds', 'Wall time spent in ServiceNow tasks by endpoint'),
+                             ('requests', 'ServiceNow requests by endpoint'),
+                             ('retries', 'Retried ServiceNow attempts by endpoint'),
+                             ('failed', 'Failed ServiceNow tasks by endpoint')):
+        name = 'ansible_run_servicenow_%s' % field
+        metric(name, help_text, [sample(name, stats[field], endpoint=endpoint)
+                                 for endpoint, stats in sorted(run['servicenow'].items())])
+    return lines
+
+
+class CallbackModule(CallbackBase):
+    """Collect task, host and ServiceNow endpoint timings and write them at the play recap"""
+
+    CALLBACK_VERSION = 2.0
+    CALLBACK_TYPE = 'aggregate'
+    CALLBACK_NAME = 'run_metrics'
+    CALLBACK_NEEDS_ENABLED = True
+
+    def __init__(self, display=None):
+        super(CallbackModule, self).__init__(display=display)
+        self.playbook = None
+        self.started = None
+        self.clock = None
+        self.running = {}
+        self.tasks = {}
+        self.hosts = {}
+        self.servicenow = {}
+        self.retries = 0
+
+    def v2_playbook_on_start(self, playbook):
+        self.playbook = os.path.splitext(os.path.basename(playbook._file_name))[0]
+        self.started = time.time()
+        self.clock = time.monotonic()
+
+    def v2_runner_on_start(self, host, task):
+        self.running[(host.get_name(), task._uuid)] = time.monotonic()
+
+    def v2_runner_on_ok(self, result):
+        self._record(result, failed=False)
+
+    def v2_runner_on_failed(self, result, ignore_errors=False):
+        self._record(result, failed=True)
+
+    def v2_runner_on_unreachable(self, result):
+        self._record(result, failed=True)
+
+    def v2_runner_on_skipped(self, result):
+        self._record(result, failed=False)
+
+    def _record(self, result, failed):
+        host, task = result._host.get_name(), result._task
+        started = self.running.pop((host, task._uuid), None)
+        seconds = time.monotonic() - started if started is not None else 0.0
+        attempts, executions = _attempts(result._result)
+        retries = attempts - executions + int((result._result.get('summary') or {}).get('retried', 0) or 0)
+
+        stats = self.tasks.setdefault(task.get_name(), [0, 0.0, 0.0, 0])
+        stats[0] += 1
+        stats[1] += seconds
+        stats[2] = max(stats[2], seconds)
+        stats[3] += int(failed)
+        self.hosts[host] = self.hosts.get(host, 0.0) + seconds
+        self.retries += retries
+
+        endpoint = _endpoint(task)
+        if endpoint and not result._result.get('skipped'):
+            calls = self.servicenow.setdefault(
+                endpoint, dict(calls=0, requests=0, seconds=0.0, retries=0, failed=0))
+            requests = _http_requests(result._result)
+            calls['calls'] += 1
+            calls['requests'] += attempts if requests is None else requests
+            calls['seconds'] += seconds
+            calls['retries'] += retries
+            calls['failed'] += int(failed)
+
+    def build_run(self, stats):
+        """The run document written to the JSON lines file"""
+        options = dict((key, self.get_option(key)) for key in ('shard', 'top_tasks', 'top_hosts'))
+        slowest_tasks = sorted(self.tasks.items(), key=lambda item: item[1][1], reverse=True)[:options['top_tasks']]
+        slowest_hosts = sorted(self.hosts.items(), key=lambda item: item[1], reverse=True)[:options['top_hosts']]
+        hosts = set(stats.processed) | set(self.hosts)
+        return {
+            'playbook': self.playbook,
+            'shard': str(options['shard'] or ''),
+            'started': round(self.started, 3),
+            'finished': round(time.time(), 3),
+            'duration': round(time.monotonic() - self.clock, 3),
+            'hosts': {
+                'count': len(hosts),
+                'failed': len([host for host in stats.failures if host not in stats.dark]),
+                'unreachable': len(stats.dark),
+                'slowest': dict((host, round(seconds, 3)) for host, seconds in slowest_hosts),
+            },
+            'tasks': dict((name, [runs, round(seconds, 3), round(slowest, 3), failed])
+                          for name, (runs, seconds, slowest, failed) in slowest_tasks),
+            'servicenow': dict((endpoint, dict(calls, seconds=round(calls['seconds'], 3)))
+                               for endpoint, calls in self.servicenow.items()),
+            'retries': self.retries,
+        }
+
+    def v2_playbook_on_stats(self, stats):
+        if self.playbook is None:
+            return
+        run = self.build_run(stats)
+        try:
+            self._write(run)
+        except (IOError, OSError) as e:
+            self._display.warning("run_metrics: unable to write metrics for %s: %s" % (self.playbook, e))
+
+    def _write(self, run):
+        directory = os.path.expanduser(self.get_option('metrics_dir'))
+        if not os.path.isdir(directory):
+            os.makedirs(directory, 0o755)
+
+        history = os.path.join(directory, '%s.jsonl' % run['playbook'])
+        max_runs = self.get_option('max_runs')
+        with open(history + '.lock', 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                with open(history, 'a') as f:
+                    f.write(json.dumps(run, sort_keys=True, separators=(',', ':')) + '\n')
+                with open(history, 'r') as f:
+                    lines = f.readlines()
+                if max_runs > 0 and len(lines) > 2 * max_runs:
+                    self._replace(history, ''.join(lines[-max_runs:]))
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+        # Shards of one run each keep their own textfile; the collector merges the series
+        name = run['playbook'] + ('@%s' % run['shard'] if run['shard'] else '')
+        self._replace(os.path.join(directory, '%s.prom' % name), '\n'.join(prometheus_lines(run)) + '\n')
+
+    @staticmethod
+    def _replace(path, content):
+        # The textfile collector must never read a half-written file
+        handle, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.run-metrics-')
+        with os.fdopen(handle, 'w') as f:
+            f.write(content)
+        os.chmod(temp_path, 0o644)
+        os.rename(temp_path, path)
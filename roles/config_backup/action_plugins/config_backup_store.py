@@ -0,0 +1,257 @@
+"""
+Purpose: Content-addressed, deduplicated store for device configuration backups
+Design Pattern: Content-addressed blob store with a per-device version index - a backup is
+                identified by the hash of its normalised text, so an unchanged configuration
+                costs one hash comparison and no write or diff
+Complexity: O(n) to normalise and hash a configuration of n lines; diffs (O(n * m) worst case)
+            only run for devices whose hash changed
+
+Layout under the storage path:
+  objects/<aa>/<sha256>.gz   gzipped normalised configuration, shared by every device and
+                             version with the same content
+  <device>/index.json        {"version": 1, "device", "versions": [{hash, stored_at, lines, size}]}
+                             oldest first
+  <device>/running-config.txt  plain copy of the latest version, rewritten only on change
+
+Normalisation strips the configured volatile lines (banners with timestamps, NTP clock-period,
+...) and trailing whitespace before hashing, so a backup is only stored when the configuration
+itself changed.
+
+Operations:
+  store    - normalise and hash the collected configuration, store it when the hash differs
+             from the device's latest version and return the diff against it
+  diff     - unified diff between two stored versions of a device (index or hash prefix)
+  history  - stored versions of a device, newest first
+  gc       - remove blobs no device index references any more (after retention pruning)
+"""
+
+import difflib
+import gzip
+import hashlib
+import json
+import os
+import re
+import tempfile
+import time
+
+from ansible.errors import AnsibleActionFail
+from ansible.plugins.action import ActionBase
+
+INDEX_VERSION = 1
+
+
+def normalize(content, volatile_patterns):
+    """
+    Strip volatile lines and trailing whitespace from a configuration
+
+    Args:
+        content: Raw configuration text
+        volatile_patterns: Compiled regular expressions of lines to drop
+
+    Returns:
+        Normalised text ending in a single newline
+    """
+    lines = []
+    for line in content.splitlines():
+        line = line.rstrip()
+        if any(pattern.search(line) for pattern in volatile_patterns):
+            continue
+        lines.append(line)
+    while lines and not lines[-1]:
+        lines.pop()
+    while lines and not lines[0]:
+        lines.pop(0)
+    return '\n'.join(lines) + '\n'
+
+
+def content_hash(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def diff_stats(diff_lines):
+    """Added and removed line counts of a unified diff"""
+    added = len([line for line in diff_lines if line.startswith('+') and not line.startswith('+++')])
+    removed = len([line for line in diff_lines if line.startswith('-') and not line.startswith('---')])
+    return {'added': added, 'removed': removed}
+
+
+class ConfigBackupStore(object):
+    """Blob objects and per-device indexes below one storage path"""
+
+    def __init__(self, path):
+        self.path = os.path.expanduser(path)
+
+    def _write_atomic(self, path, data, mode=0o644):
+        directory = os.path.dirname(path)
+        if not os.path.isdir(directory):
+            os.makedirs(directory, 0o755)
+        handle, temp_path = tempfile.mkstemp(dir=directory, prefix='.config-backup-')
+        with os.fdopen(handle, 'wb') as f:
+            f.write(data)
+        os.chmod(temp_path, mode)
+        os.rename(temp_path, path)
+
+    def blob_path(self, digest):
+        return os.path.join(self.path, 'objects', digest[:2], digest + '.gz')
+
+    def index_path(self, device):
+        return os.path.join(self.path, device, 'index.json')
+
+    def load_index(self, device):
+        try:
+            with open(self.index_path(device), 'r') as f:
+                index = json.load(f)
+        except (IOError, OSError, ValueError):
+            return []
+        return index.get('versions', []) if index.get('version') == INDEX_VERSION else []
+
+    def save_index(self, device, versions):
+        document = {'version': INDEX_VERSION, 'device': device, 'versions': versions}
+        self._write_atomic(self.index_path(device), json.dumps(document, indent=1, sort_keys=True).encode('utf-8'))
+
+    def read_blob(self, digest):
+        try:
+            with gzip.open(self.blob_path(digest), 'rb') as f:
+                return f.read().decode('utf-8')
+        except (IOError, OSError) as e:
+            raise AnsibleActionFail("Configuration backup object %s is unreadable: %s" % (digest, e))
+
+    def write_blob(self, digest, text):
+        """Store a blob unless an identical one exists; returns True when written"""
+        path = self.blob_path(digest)
+        if os.path.exists(path):
+            return False
+        # mtime=0 keeps the compressed bytes a function of the content alone
+        self._write_atomic(path, gzip.compress(text.encode('utf-8'), mtime=0))
+        return True
+
+    def store(self, device, text, keep, latest_copy):
+        """
+        Record a normalised configuration as the device's latest version
+
+        Returns:
+            Result dictionary: changed, hash, previous_hash, versions, deduplicated, diff, diff_stats
+        """
+        versions = self.load_index(device)
+        digest = content_hash(text)
+        previous = versions[-1]['hash'] if versions else None
+        result = {'hash': digest, 'previous_hash': previous, 'changed': digest != previous,
+                  'versions': len(versions), 'deduplicated': False, 'diff': [], 'diff_stats': None}
+        if digest == previous:
+            return result
+
+        result['deduplicated'] = not self.write_blob(digest, text)
+        if previous:
+            result['diff'] = list(difflib.unified_diff(
+                self.read_blob(previous).splitlines(), text.splitlines(),
+                previous[:12], digest[:12], lineterm=''))
+            result['diff_stats'] = diff_stats(result['diff'])
+
+        versions.append({'hash': digest, 'stored_at': round(time.time(), 3),
+                         'lines': text.count('\n'), 'size': len(text)})
+        if keep > 0:
+            versions = versions[-keep:]
+        self.save_index(device, versions)
+        if latest_copy:
+            self._write_atomic(os.path.join(self.path, device, 'running-config.txt'), text.encode('utf-8'))
+        result['versions'] = len(versions)
+        return result
+
+    def resolve(self, device, versions, ref):
+        """Version of a device by list index (negative from the newest) or hash prefix of 7+ characters"""
+        ref = str(ref)
+        if len(ref) < 7:
+            if not re.match(r'^-?\d+$', ref):
+                raise AnsibleActionFail("Configuration version %s is neither an index nor a hash prefix" % ref)
+            try:
+                return versions[int(ref)]
+            except IndexError:
+                raise AnsibleActionFail("%s has no configuration version %s (%d stored)" % (device, ref, len(versions)))
+        matches = [version for version in versions if version['hash'].startswith(ref)]
+        if len(matches) != 1:
+            raise AnsibleActionFail("Hash prefix %s matches %d configuration versions of %s" % (ref, len(matches), device))
+        return matches[0]
+
+    def diff(self, device, from_ref, to_ref, context):
+        versions = self.load_index(device)
+        old = self.resolve(device, versions, from_ref)
+        new = self.resolve(device, versions, to_ref)
+        lines = [] if old['hash'] == new['hash'] else list(difflib.unified_diff(
+            self.read_blob(old['hash']).splitlines(), self.read_blob(new['hash']).splitlines(),
+            old['hash'][:12], new['hash'][:12], n=context, lineterm=''))
+        return {'from': old, 'to': new, 'diff': lines, 'diff_stats': diff_stats(lines)}
+
+    def gc(self):
+        """Remove blobs that no device index references; returns the removed hashes"""
+        referenced = set()
+        for entry in os.listdir(self.path) if os.path.isdir(self.path) else []:
+            if entry != 'objects' and os.path.isfile(self.index_path(entry)):
+                referenced.update(version['hash'] for version in self.load_index(entry))
+        removed = []
+        objects = os.path.join(self.path, 'objects')
+        for root, _, files in os.walk(objects):
+            for name in files:
+                if name.endswith('.gz') and name[:-3] not in referenced:
+                    os.remove(os.path.join(root, name))
+                    removed.append(name[:-3])
+        return sorted(removed)
+
+
+class ActionModule(ActionBase):
+    """Store, compare and list configuration backups on the control node"""
+
+    TRANSFERS_FILES = False
+    _requires_connection = False
+
+    def run(self, tmp=None, task_vars=None):
+        if task_vars is None:
+            task_vars = {}
+
+        result = super(ActionModule, self).run(tmp, task_vars)
+        del tmp
+
+        _, args = self.validate_argument_spec(argument_spec=dict(
+            operation=dict(type='str', default='store', choices=['store', 'diff', 'history', 'gc']),
+            path=dict(type='path', required=True),
+            device=dict(type='str'),
+            content=dict(type='str'),
+            volatile_patterns=dict(type='list', elements='str', default=[]),
+            keep=dict(type='int', default=0),
+            latest_copy=dict(type='bool', default=True),
+            diff_from=dict(type='str', default='-2'),
+            diff_to=dict(type='str', default='-1'),
+            context=dict(type='int', default=3),
+        ))
+
+        operation = args['operation']
+        store = ConfigBackupStore(args['path'])
+        if operation != 'gc' and not args['device']:
+            raise AnsibleActionFail("'device' is required for operation=%s" % operation)
+
+        try:
+            if operation == 'store':
+                if args['content'] is None:
+                    raise AnsibleActionFail("'content' is required for operation=store")
+                try:
+                    patterns = [re.compile(pattern) for pattern in args['volatile_patterns']]
+                except re.error as e:
+                    raise AnsibleActionFail("Invalid volatile line pattern: %s" % e)
+                result.update(store.store(args['device'], normalize(args['content'], patterns),
+                                          args['keep'], args['latest_copy']))
+
+            elif operation == 'diff':
+                result.update(store.diff(args['device'], args['diff_from'], args['diff_to'], args['context']))
+                result['changed'] = False
+
+            elif operation == 'history':
+                result['history'] = list(reversed(store.load_index(args['device'])))
+                result['changed'] = False
+
+            elif operation == 'gc':
+                result['removed'] = store.gc()
+                result['changed'] = len(result['removed']) > 0
+
+        except (IOError, OSError) as e:
+            raise AnsibleActionFail("Configuration backup store %s failed: %s" % (operation, e))
+
+        return result
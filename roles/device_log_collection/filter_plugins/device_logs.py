@@ -0,0 +1,138 @@
+"""
+Purpose: Local filtering of a device log buffer fetched once per device per run
+Design Pattern: Fetch once, filter locally - one `show logging` replaces a `show logging | include`
+                round trip per pattern and per interface
+Complexity: O(l * (p + i)) for l buffer lines, p patterns and i interfaces, with no device round trips
+"""
+
+import re
+
+from ansible.errors import AnsibleFilterError
+
+DEFAULT_LOG_PATTERNS = {
+    'config': 'CONFIG',
+    'login': 'LOGIN',
+}
+# IOS prints the buffered messages after a "Log Buffer (<n> bytes):" header line
+LOG_BUFFER_HEADER = re.compile(r'^Log Buffer \(\d+ bytes\):\s*$')
+
+
+def log_buffer_entries(output):
+    """
+    Log messages of a `show logging` output, without the logging configuration header
+
+    Args:
+        output: Raw `show logging` text
+
+    Returns:
+        Non-empty message lines in buffer order (all non-empty lines when there is no header)
+    """
+    lines = (output or '').splitlines()
+    for index, line in enumerate(lines):
+        if LOG_BUFFER_HEADER.match(line.strip()):
+            lines = lines[index + 1:]
+            break
+    return [line for line in lines if line.strip()]
+
+
+def _interface_pattern(interface):
+    # Whole-name match so GigabitEthernet1/0/1 does not also pick up GigabitEthernet1/0/10
+    return re.compile(re.escape(interface) + r'(?![\d/.:])')
+
+
+def interface_log_commands(interfaces, include_buffer=True):
+    """
+    Commands for one batched ios_command session covering every interface
+
+    Args:
+        interfaces: Interface names to collect details for
+        include_buffer: Prepend `show logging` (False when the buffer is already cached)
+
+    Returns:
+        `show logging` (once) followed by the status and switchport commands of each interface
+    """
+    if isinstance(interfaces, str):
+        interfaces = [interfaces]
+    commands = ['show logging'] if include_buffer else []
+    for interface in interfaces or []:
+        commands.append("show interface %s" % interface)
+        commands.append("show interface %s switchport" % interface)
+    return commands
+
+
+def interface_log_report(stdout, interfaces, buffer=None, last_entries=50, patterns=None):
+    """
+    Split one batched command session into per-interface diagnostic sections
+
+    Args:
+        stdout: ios_command stdout list for interface_log_commands(interfaces, buffer is None)
+        interfaces: Interface names in the order the commands were built
+        buffer: Cached `show logging` output; None when it is stdout[0]
+        last_entries: Number of most recent buffer entries to report
+        patterns: Section name -> regular expression (default CONFIG and LOGIN), applied to
+                  each buffer line as `show logging | include <pattern>` would on the device
+
+    Returns:
+        Dictionary with 'buffer' (raw output for caching), 'recent', one key per pattern, and
+        'interfaces' mapping each interface to its 'status', 'switchport' and 'logs' text
+    """
+    if isinstance(interfaces, str):
+        interfaces = [interfaces]
+    interfaces = list(interfaces or [])
+    stdout = list(stdout or [])
+    patterns = DEFAULT_LOG_PATTERNS if patterns is None else patterns
+
+    offset = 0
+    if buffer is None:
+        buffer = stdout[0] if stdout else ''
+        offset = 1
+
+    try:
+        compiled = dict((name, re.compile(pattern)) for name, pattern in patterns.items())
+    except (AttributeError, re.error) as e:
+        raise AnsibleFilterError("interface_log_report: invalid log pattern: %s" % e)
+    if 'interfaces' in compiled or 'recent' in compiled or 'buffer' in compiled:
+        raise AnsibleFilterError("interface_log_report: pattern names must not be buffer, recent or interfaces")
+
+    interface_patterns = [(name, _interface_pattern(name)) for name in interfaces]
+    matches = dict((name, []) for name in compiled)
+    interface_matches = dict((name, []) for name in interfaces)
+
+    # One pass over the buffer serves every pattern and every interface
+    entries = log_buffer_entries(buffer)
+    for line in entries:
+        for name, regex in compiled.items():
+            if regex.search(line):
+                matches[name].append(line)
+        for name, regex in interface_patterns:
+            if regex.search(line):
+                interface_matches[name].append(line)
+
+    def output(index):
+        return stdout[index] if index < len(stdout) else ''
+
+    report = {
+        'buffer': buffer,
+        'recent': '\n'.join(entries[-int(last_entries):]) if int(last_entries) > 0 else '',
+        'interfaces': {},
+    }
+    for name, lines in matches.items():
+        report[name] = '\n'.join(lines)
+    for index, name in enumerate(interfaces):
+        report['interfaces'][name] = {
+            'status': output(offset + 2 * index),
+            'switchport': output(offset + 2 * index + 1),
+            'logs': '\n'.join(interface_matches[name]),
+        }
+    return report
+
+
+class FilterModule(object):
+    """Device log collection filters"""
+
+    def filters(self):
+        return {
+            'log_buffer_entries': log_buffer_entries,
+            'interface_log_commands': interface_log_commands,
+            'interface_log_report': interface_log_report,
+        }
@@ -0,0 +1,152 @@
+"""
+Purpose: Inventory-wide connectivity pre-probe for the device_uptime role
+Design Pattern: Asynchronous fan-out - one control-node event loop probes every play host
+                concurrently behind a semaphore, instead of one connection plugin run per fork
+Complexity: O(h) probes for h hosts, wall time ~ ceil(h / concurrency) * timeout in the worst case
+
+Runs once per play (run_once) on the control node. Each host is probed by address
+(ansible_host, falling back to the inventory name) with either:
+  tcp  - a TCP connect to the management port (uptime_probe_port, ansible_port or `port`)
+  icmp - one echo request through the system `ping` binary (Linux iputils option syntax)
+
+A host is reachable when any of `attempts` probes succeeds within `timeout` seconds.
+The result maps every host to {reachable, address, port, rtt_ms, attempts, error}; the role
+compares it against the open incident cache and only sends hosts whose reachability changed
+through the full ping / fact gathering / ServiceNow path.
+"""
+
+import asyncio
+import time
+
+from ansible.errors import AnsibleActionFail
+from ansible.plugins.action import ActionBase
+
+
+async def probe_tcp(address, port, timeout):
+    """Open and immediately close a TCP connection; raise on refusal or timeout"""
+    _, writer = await asyncio.wait_for(asyncio.open_connection(address, port), timeout)
+    writer.close()
+    try:
+        await writer.wait_closed()
+    except (OSError, ConnectionError):
+        pass
+
+
+async def probe_icmp(address, timeout):
+    """Send one ICMP echo request with the system ping binary; raise when it gets no reply"""
+    process = await asyncio.create_subprocess_exec(
+        'ping', '-n', '-q', '-c', '1', '-W', str(max(1, int(round(timeout)))), address,
+        stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.DEVNULL)
+    try:
+        returncode = await asyncio.wait_for(process.wait(), timeout + 1)
+    except asyncio.TimeoutError:
+        process.kill()
+        await process.wait()
+        raise
+    if returncode != 0:
+        raise OSError('no echo reply (ping exit code %d)' % returncode)
+
+
+async def probe_host(target, method, timeout, attempts, semaphore):
+    """Probe one target up to `attempts` times and return its reachability record"""
+    record = dict(target, reachable=False, rtt_ms=None, attempts=0, error=None)
+    async with semaphore:
+        for attempt in range(1, attempts + 1):
+            record['attempts'] = attempt
+            started = time.monotonic()
+            try:
+                if method == 'icmp':
+                    await probe_icmp(target['address'], timeout)
+                else:
+                    await probe_tcp(target['address'], target['port'], timeout)
+            except asyncio.TimeoutError:
+                record['error'] = 'timed out after %ss' % timeout
+            except (OSError, ValueError) as e:
+                record['error'] = str(e) or e.__class__.__name__
+            else:
+                record.update(reachable=True, error=None,
+                              rtt_ms=round((time.monotonic() - started) * 1000, 1))
+                break
+    return record
+
+
+async def probe_all(targets, method, timeout, attempts, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    records = await asyncio.gather(*[
+        probe_host(target, method, timeout, attempts, semaphore) for target in targets])
+    return dict((target['host'], record) for target, record in zip(targets, records))
+
+
+def resolve_targets(hosts, hostvars, default_port):
+    """Map inventory hosts to probe addresses and ports from their host variables"""
+    targets = []
+    for host in hosts:
+        host_vars = hostvars.get(host, {})
+        port = host_vars.get('uptime_probe_port') or host_vars.get('ansible_port') or default_port
+        try:
+            port = int(port)
+        except (TypeError, ValueError):
+            raise AnsibleActionFail("Invalid probe port %r for host %s" % (port, host))
+        targets.append({
+            'host': host,
+            'address': str(host_vars.get('ansible_host') or host),
+            'port': port,
+        })
+    return targets
+
+
+class ActionModule(ActionBase):
+    """Probe reachability of many hosts concurrently from the control node"""
+
+    TRANSFERS_FILES = False
+    _requires_connection = False
+
+    def run(self, tmp=None, task_vars=None):
+        if task_vars is None:
+            task_vars = {}
+
+        result = super(ActionModule, self).run(tmp, task_vars)
+        del tmp
+
+        _, args = self.validate_argument_spec(argument_spec=dict(
+            hosts=dict(type='list', elements='str', required=True),
+            method=dict(type='str', default='tcp', choices=['tcp', 'icmp']),
+            port=dict(type='int', default=22),
+            timeout=dict(type='float', default=3.0),
+            attempts=dict(type='int', default=1),
+            concurrency=dict(type='int', default=256),
+        ))
+
+        if args['timeout'] <= 0:
+            raise AnsibleActionFail("timeout must be greater than 0")
+        if args['attempts'] < 1 or args['concurrency'] < 1:
+            raise AnsibleActionFail("attempts and concurrency must be at least 1")
+
+        # Resolve templated host variables (ansible_host: "{{ ... }}") before probing
+        hostvars = task_vars.get('hostvars', {})
+        resolved = {}
+        for host in args['hosts']:
+            host_vars = hostvars.get(host, {})
+            resolved[host] = dict(
+                (key, self._templar.template(host_vars[key]))
+                for key in ('ansible_host', 'ansible_port', 'uptime_probe_port') if key in host_vars)
+        targets = resolve_targets(args['hosts'], resolved, args['port'])
+
+        started = time.monotonic()
+        reachability = asyncio.run(probe_all(
+            targets, args['method'], args['timeout'], args['attempts'], args['concurrency']))
+
+        unreachable = sorted(host for host, record in reachability.items() if not record['reachable'])
+        result.update(
+            changed=False,
+            reachability=reachability,
+            unreachable_hosts=unreachable,
+            stats={
+                'hosts': len(targets),
+                'reachable': len(targets) - len(unreachable),
+                'unreachable': len(unreachable),
+                'method': args['method'],
+                'elapsed_seconds': round(time.monotonic() - started, 3),
+            },
+        )
+        return result
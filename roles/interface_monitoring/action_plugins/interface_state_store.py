@@ -0,0 +1,317 @@
+"""
+Purpose: SQLite-backed interface state store for the interface_monitoring role
+Design Pattern: Repository with batched, play-wide transactions executed on the control node
+Complexity: O(h + i) per commit where h is hosts and i is changed interfaces, one transaction per run
+
+Replaces the per-host stat/slurp/copy of interface-state.json and monitoring-info.txt with
+a single database on the control node. Runs as an action plugin, so no module is shipped
+or forked - call it once per play with run_once.
+
+Operations:
+  load     - return previous interface state for the given hosts
+  commit   - persist monitored_interfaces / interface_changes of the given hosts
+  history  - return interface transitions recorded for a host (trend queries)
+  migrate  - one-shot import of an existing <storage>/<host>/interface-state.json tree
+"""
+
+import json
+import os
+import sqlite3
+import time
+
+from ansible.errors import AnsibleActionFail
+from ansible.plugins.action import ActionBase
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS interface_state (
+    host TEXT PRIMARY KEY,
+    state TEXT NOT NULL,
+    monitoring_timestamp TEXT,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS interface_runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    host TEXT NOT NULL,
+    monitoring_timestamp TEXT,
+    recorded_at REAL NOT NULL,
+    total_interfaces INTEGER NOT NULL,
+    down_count INTEGER NOT NULL,
+    up_count INTEGER NOT NULL,
+    new_count INTEGER NOT NULL,
+    removed_count INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS interface_history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    host TEXT NOT NULL,
+    interface TEXT NOT NULL,
+    change TEXT NOT NULL,
+    previous_status TEXT,
+    status TEXT,
+    monitoring_timestamp TEXT,
+    recorded_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS interface_history_host_idx
+    ON interface_history (host, interface, recorded_at);
+CREATE INDEX IF NOT EXISTS interface_runs_host_idx
+    ON interface_runs (host, recorded_at);
+"""
+
+# interface_changes key -> change name stored in history rows
+CHANGE_TYPES = (
+    ('down_interfaces', 'down'),
+    ('up_interfaces', 'up'),
+    ('new_interfaces', 'new'),
+    ('removed_interfaces', 'removed'),
+)
+
+
+class InterfaceStateStore(object):
+    """
+    Thin wrapper around the state database
+    Every public method runs inside a single transaction
+    """
+
+    def __init__(self, db_path, busy_timeout=30):
+        """
+        Open (and create if needed) the state database
+
+        Args:
+            db_path: Path of the SQLite database file
+            busy_timeout: Seconds to wait on a locked database
+        """
+        db_dir = os.path.dirname(db_path)
+        if db_dir and not os.path.isdir(db_dir):
+            os.makedirs(db_dir, mode=0o755)
+
+        self.connection = sqlite3.connect(db_path, timeout=busy_timeout)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.executescript(SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def load(self, hosts):
+        """Return {host: interfaces} for hosts with a stored baseline"""
+        states = {}
+        if not hosts:
+            return states
+
+        cursor = self.connection.cursor()
+        # Stay well below SQLITE_MAX_VARIABLE_NUMBER on large inventories
+        for offset in range(0, len(hosts), 500):
+            chunk = hosts[offset:offset + 500]
+            placeholders = ','.join('?' * len(chunk))
+            cursor.execute(
+                'SELECT host, state FROM interface_state WHERE host IN (%s)' % placeholders,
+                chunk
+            )
+            for host, state in cursor.fetchall():
+                states[host] = json.loads(state)
+        return states
+
+    def commit(self, snapshots, history_days):
+        """
+        Persist current state, run summaries and transitions for many hosts
+
+        Args:
+            snapshots: List of dicts with host, interfaces, changes and timestamp
+            history_days: Retention for run and history rows (0 keeps everything)
+
+        Returns:
+            Number of history rows written
+        """
+        now = time.time()
+        history_rows = 0
+
+        with self.connection:
+            previous = self.load([snapshot['host'] for snapshot in snapshots])
+
+            for snapshot in snapshots:
+                host = snapshot['host']
+                interfaces = snapshot['interfaces']
+                changes = snapshot['changes']
+                timestamp = snapshot['timestamp']
+                old_interfaces = previous.get(host, {})
+
+                self.connection.execute(
+                    'INSERT OR REPLACE INTO interface_state (host, state, monitoring_timestamp, updated_at) '
+                    'VALUES (?, ?, ?, ?)',
+                    (host, json.dumps(interfaces, sort_keys=True), timestamp, now)
+                )
+
+                self.connection.execute(
+                    'INSERT INTO interface_runs (host, monitoring_timestamp, recorded_at, total_interfaces, '
+                    'down_count, up_count, new_count, removed_count) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                    (host, timestamp, now, len(interfaces),
+                     len(changes.get('down_interfaces', [])), len(changes.get('up_interfaces', [])),
+                     len(changes.get('new_interfaces', [])), len(changes.get('removed_interfaces', [])))
+                )
+
+                rows = []
+                for key, change in CHANGE_TYPES:
+                    for name in changes.get(key, []):
+                        rows.append((
+                            host, name, change,
+                            _status(old_interfaces.get(name)),
+                            _status(interfaces.get(name)),
+                            timestamp, now
+                        ))
+                if rows:
+                    self.connection.executemany(
+                        'INSERT INTO interface_history (host, interface, change, previous_status, status, '
+                        'monitoring_timestamp, recorded_at) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                        rows
+                    )
+                    history_rows += len(rows)
+
+            if history_days and history_days > 0:
+                cutoff = now - history_days * 86400
+                self.connection.execute('DELETE FROM interface_history WHERE recorded_at < ?', (cutoff,))
+                self.connection.execute('DELETE FROM interface_runs WHERE recorded_at < ?', (cutoff,))
+
+        return history_rows
+
+    def history(self, host, interface=None, since_days=None):
+        """Return transitions for a host, newest first"""
+        query = ('SELECT interface, change, previous_status, status, monitoring_timestamp, recorded_at '
+                 'FROM interface_history WHERE host = ?')
+        params = [host]
+        if interface:
+            query += ' AND interface = ?'
+            params.append(interface)
+        if since_days:
+            query += ' AND recorded_at >= ?'
+            params.append(time.time() - since_days * 86400)
+        query += ' ORDER BY recorded_at DESC, id DESC'
+
+        columns = ('interface', 'change', 'previous_status', 'status', 'monitoring_timestamp', 'recorded_at')
+        return [dict(zip(columns, row)) for row in self.connection.execute(query, params)]
+
+    def migrate(self, source_path, overwrite=False):
+        """
+        Import <source_path>/<host>/interface-state.json files
+
+        Returns:
+            Tuple of (migrated hosts, skipped hosts)
+        """
+        migrated = []
+        skipped = []
+
+        with self.connection:
+            existing = set(row[0] for row in self.connection.execute('SELECT host FROM interface_state'))
+
+            for host in sorted(os.listdir(source_path)):
+                state_file = os.path.join(source_path, host, 'interface-state.json')
+                if not os.path.isfile(state_file):
+                    continue
+                if host in existing and not overwrite:
+                    skipped.append(host)
+                    continue
+
+                with open(state_file, 'r') as f:
+                    interfaces = json.load(f)
+
+                self.connection.execute(
+                    'INSERT OR REPLACE INTO interface_state (host, state, monitoring_timestamp, updated_at) '
+                    'VALUES (?, ?, ?, ?)',
+                    (host, json.dumps(interfaces, sort_keys=True), None, os.path.getmtime(state_file))
+                )
+                migrated.append(host)
+
+        return migrated, skipped
+
+
+def _status(interface):
+    if isinstance(interface, dict):
+        return interface.get('status')
+    return None
+
+
+class ActionModule(ActionBase):
+    """Load and commit interface state for every host of the play in one transaction"""
+
+    TRANSFERS_FILES = False
+    _requires_connection = False
+
+    def run(self, tmp=None, task_vars=None):
+        if task_vars is None:
+            task_vars = {}
+
+        result = super(ActionModule, self).run(tmp, task_vars)
+        del tmp
+
+        _, args = self.validate_argument_spec(argument_spec=dict(
+            operation=dict(type='str', required=True, choices=['load', 'commit', 'history', 'migrate']),
+            db=dict(type='path', required=True),
+            hosts=dict(type='list', elements='str', default=[]),
+            host=dict(type='str'),
+            interface=dict(type='str'),
+            since_days=dict(type='int'),
+            history_days=dict(type='int', default=90),
+            source=dict(type='path'),
+            overwrite=dict(type='bool', default=False),
+        ))
+
+        operation = args['operation']
+        try:
+            store = InterfaceStateStore(args['db'])
+        except sqlite3.Error as e:
+            raise AnsibleActionFail("Unable to open interface state store %s: %s" % (args['db'], e))
+
+        try:
+            if operation == 'load':
+                result['states'] = store.load(args['hosts'])
+                result['changed'] = False
+
+            elif operation == 'commit':
+                snapshots = self._collect_snapshots(args['hosts'], task_vars)
+                result['history_rows'] = store.commit(snapshots, args['history_days'])
+                result['committed_hosts'] = [snapshot['host'] for snapshot in snapshots]
+                result['changed'] = len(snapshots) > 0
+
+            elif operation == 'history':
+                if not args['host']:
+                    raise AnsibleActionFail("'host' is required for operation=history")
+                result['history'] = store.history(args['host'], args['interface'], args['since_days'])
+                result['changed'] = False
+
+            elif operation == 'migrate':
+                if not args['source'] or not os.path.isdir(args['source']):
+                    raise AnsibleActionFail("'source' must be an existing interface monitoring storage directory")
+                migrated, skipped = store.migrate(args['source'], args['overwrite'])
+                result['migrated_hosts'] = migrated
+                result['skipped_hosts'] = skipped
+                result['changed'] = len(migrated) > 0
+
+        except sqlite3.Error as e:
+            raise AnsibleActionFail("Interface state store %s failed: %s" % (operation, e))
+        finally:
+            store.close()
+
+        return result
+
+    def _collect_snapshots(self, hosts, task_vars):
+        """Read monitored_interfaces/interface_changes from each host's variables"""
+        hostvars = task_vars.get('hostvars', {})
+        snapshots = []
+
+        for host in hosts:
+            host_vars = hostvars.get(host)
+            if host_vars is None:
+                continue
+
+            interfaces = host_vars.get('monitored_interfaces')
+            changes = host_vars.get('interface_changes')
+            # Hosts that failed before gathering (rescue path) keep their previous baseline
+            if not isinstance(interfaces, dict) or not isinstance(changes, dict):
+                continue
+
+            snapshots.append({
+                'host': host,
+                'interfaces': interfaces,
+                'changes': changes,
+                'timestamp': host_vars.get('current_timestamp'),
+            })
+
+        return snapshots
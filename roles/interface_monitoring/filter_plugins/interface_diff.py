@@ -0,0 +1,81 @@
+"""
+Purpose: Interface state differencing filter for the interface_monitoring role
+Design Pattern: Single-pass set comparison replacing per-interface set_fact loops
+Complexity: O(n + m) where n/m are the current/previous interface counts
+"""
+
+from ansible.errors import AnsibleFilterError
+
+DEFAULT_UP_STATES = ('connected', 'up', 'disabled')
+DEFAULT_DOWN_STATES = ('notconnect', 'down')
+
+
+def _status_of(interface):
+    """Return the status string of an interface record, tolerating bare strings"""
+    if isinstance(interface, dict):
+        return interface.get('status')
+    return interface
+
+
+def interface_state_diff(current, previous=None, up_states=None, down_states=None):
+    """
+    Compare current and previous interface maps in one linear pass
+
+    Args:
+        current: Mapping of interface name -> interface record (monitored_interfaces)
+        previous: Mapping from the last run, or None when no baseline exists
+        up_states: Statuses treated as operational (default: connected, up, disabled)
+        down_states: Statuses treated as failed (default: notconnect, down)
+
+    Returns:
+        Dictionary with down_interfaces, up_interfaces, new_interfaces and
+        removed_interfaces lists, ordered as the input maps are
+    """
+    changes = {
+        'down_interfaces': [],
+        'up_interfaces': [],
+        'new_interfaces': [],
+        'removed_interfaces': [],
+    }
+
+    if current is None:
+        current = {}
+    if not isinstance(current, dict):
+        raise AnsibleFilterError("interface_state_diff expects a dictionary of current interfaces")
+
+    # No baseline yet - first run only records state
+    if previous is None:
+        return changes
+    if not isinstance(previous, dict):
+        raise AnsibleFilterError("interface_state_diff expects a dictionary of previous interfaces")
+
+    up_states = frozenset(up_states if up_states is not None else DEFAULT_UP_STATES)
+    down_states = frozenset(down_states if down_states is not None else DEFAULT_DOWN_STATES)
+
+    for name, interface in current.items():
+        if name not in previous:
+            changes['new_interfaces'].append(name)
+            continue
+
+        old_status = _status_of(previous[name])
+        new_status = _status_of(interface)
+        if old_status == new_status:
+            continue
+
+        if old_status in up_states and new_status in down_states:
+            changes['down_interfaces'].append(name)
+        elif old_status in down_states and new_status in up_states:
+            changes['up_interfaces'].append(name)
+
+    changes['removed_interfaces'] = [name for name in previous if name not in current]
+
+    return changes
+
+
+class FilterModule(object):
+    """Interface monitoring filters"""
+
+    def filters(self):
+        return {
+            'interface_state_diff': interface_state_diff,
+        }
@@ -0,0 +1,221 @@
+"""
+Purpose: Flap damping and hold-down for monitoring events before they reach ServiceNow
+Design Pattern: Per-subject state machine persisted on the control node - transitions inside
+                a sliding window are coalesced, repeated ones collapse into one flapping episode
+Complexity: O(s + t) per call for s stored subjects of the host and t transitions in the window
+
+A subject is one monitored thing of one host in one scope (an interface, the device itself).
+Each call observes the current state ('up' or 'down') of the subjects that changed, or of every
+subject when the caller has no diff of its own, and returns what should be reported:
+
+  emit              {subject: state} - report this transition now (raise or close the incident)
+  held              subjects whose new state has not lasted hold_down seconds yet
+  suppressed        subjects whose transition this call was absorbed (coalesced back to the
+                    reported state, held, or inside a flapping episode)
+  flapping_started  [{subject, transitions, state}] - threshold transitions within window
+  flapping_ended    [{subject, transitions, state}] - stable for stable_after seconds; the final
+                    state is reported through `emit` in the same call when it differs
+  flapping          subjects currently flapping
+
+Store file format (JSON):
+  {"version": 1, "subjects": {"<scope>|<host>|<subject>": {
+      "state", "reported", "changed_at", "transitions": [epoch], "flapping", "flap_transitions"}}}
+
+Subjects that are back at their reported state with no transition left in the window are
+dropped, so the store only holds subjects that are changing. Writers take an exclusive lock on
+<path>.lock and replace the file atomically.
+"""
+
+import fcntl
+import json
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+
+from ansible.errors import AnsibleActionFail
+from ansible.plugins.action import ActionBase
+
+STORE_VERSION = 1
+STATES = ('up', 'down')
+
+
+class DampingStore(object):
+    """Subject records keyed by scope, host and subject, persisted as JSON"""
+
+    def __init__(self, path):
+        self.path = os.path.expanduser(path)
+        self.subjects = {}
+
+    @contextmanager
+    def locked(self):
+        """Hold the writer lock while reading, modifying and saving the store"""
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory, 0o700)
+        with open(self.path + '.lock', 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                self.load()
+                yield self
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def load(self):
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+        except (IOError, OSError, ValueError):
+            data = {}
+        self.subjects = data.get('subjects', {}) if data.get('version') == STORE_VERSION else {}
+
+    def save(self):
+        handle, temp_path = tempfile.mkstemp(dir=os.path.dirname(self.path) or '.', prefix='.event-damping-')
+        with os.fdopen(handle, 'w') as f:
+            json.dump({'version': STORE_VERSION, 'subjects': self.subjects}, f, sort_keys=True)
+        os.rename(temp_path, self.path)
+
+
+def subject_key(scope, host, subject):
+    return '%s|%s|%s' % (scope, host, subject)
+
+
+def damp(records, observations, now, window, threshold, hold_down, stable_after):
+    """
+    Apply observations to the subject records of one host and decide what to report
+
+    Args:
+        records: {subject: record} for the host and scope, updated in place
+        observations: {subject: {'state': str, 'previous': str}} - 'previous' is the reported
+                      state assumed for subjects without a record
+        now: Current epoch seconds
+        window: Sliding window in seconds for counting transitions
+        threshold: Transitions within window that start a flapping episode (0 disables)
+        hold_down: Seconds a new state must last before it is reported
+        stable_after: Seconds without transitions that end a flapping episode
+
+    Returns:
+        Decision dictionary (see module docstring)
+    """
+    decision = {
+        'emit': {},
+        'held': [],
+        'suppressed': [],
+        'flapping_started': [],
+        'flapping_ended': [],
+        'flapping': [],
+    }
+    transitioned = set()
+
+    for subject, observation in observations.items():
+        record = records.get(subject)
+        if record is None:
+            previous = observation.get('previous') or observation['state']
+            record = records[subject] = {
+                'state': previous, 'reported': previous, 'changed_at': 0,
+                'transitions': [], 'flapping': False, 'flap_transitions': 0,
+            }
+        if observation['state'] != record['state']:
+            record['state'] = observation['state']
+            record['changed_at'] = now
+            record['transitions'].append(now)
+            transitioned.add(subject)
+            if record['flapping']:
+                record['flap_transitions'] += 1
+
+    for subject in list(records):
+        record = records[subject]
+        record['transitions'] = [stamp for stamp in record['transitions'] if now - stamp < window]
+
+        if not record['flapping'] and threshold > 0 and len(record['transitions']) >= threshold:
+            record['flapping'] = True
+            record['flap_transitions'] = len(record['transitions'])
+            decision['flapping_started'].append({
+                'subject': subject, 'transitions': record['flap_transitions'], 'state': record['state']})
+
+        if record['flapping']:
+            if now - record['changed_at'] < stable_after:
+                decision['flapping'].append(subject)
+                if subject in transitioned:
+                    decision['suppressed'].append(subject)
+                continue
+            record['flapping'] = False
+            record['transitions'] = []
+            decision['flapping_ended'].append({
+                'subject': subject, 'transitions': record['flap_transitions'], 'state': record['state']})
+            record['flap_transitions'] = 0
+
+        if record['state'] != record['reported']:
+            if now - record['changed_at'] >= hold_down:
+                decision['emit'][subject] = record['state']
+                record['reported'] = record['state']
+            else:
+                decision['held'].append(subject)
+                if subject in transitioned:
+                    decision['suppressed'].append(subject)
+        elif subject in transitioned:
+            # Back at the reported state before it was reported - the transition pair coalesces
+            decision['suppressed'].append(subject)
+
+        if record['state'] == record['reported'] and not record['flapping'] and not record['transitions']:
+            del records[subject]
+
+    return decision
+
+
+class ActionModule(ActionBase):
+    """Damp one host's state transitions against the persistent damping store"""
+
+    TRANSFERS_FILES = False
+    _requires_connection = False
+
+    def run(self, tmp=None, task_vars=None):
+        if task_vars is None:
+            task_vars = {}
+
+        result = super(ActionModule, self).run(tmp, task_vars)
+        del tmp
+
+        _, args = self.validate_argument_spec(argument_spec=dict(
+            path=dict(type='path', required=True),
+            scope=dict(type='str', required=True),
+            host=dict(type='str', required=True),
+            observations=dict(type='dict', default={}),
+            window=dict(type='int', default=3600),
+            threshold=dict(type='int', default=4),
+            hold_down=dict(type='int', default=0),
+            stable_after=dict(type='int', default=1800),
+        ))
+
+        observations = {}
+        for subject, observation in args['observations'].items():
+            if not isinstance(observation, dict):
+                observation = {'state': observation}
+            if observation.get('state') not in STATES or observation.get('previous', 'up') not in STATES:
+                raise AnsibleActionFail("Observation for %s must have state (and optional previous) up or down" % subject)
+            observations[subject] = observation
+
+        prefix = subject_key(args['scope'], args['host'], '')
+        store = DampingStore(args['path'])
+        now = int(time.time())
+
+        try:
+            with store.locked():
+                records = dict((key[len(prefix):], record) for key, record in store.subjects.items()
+                               if key.startswith(prefix))
+                before = json.dumps(records, sort_keys=True)
+                decision = damp(records, observations, now, args['window'], args['threshold'],
+                                args['hold_down'], args['stable_after'])
+                changed = json.dumps(records, sort_keys=True) != before
+                if changed:
+                    for key in [key for key in store.subjects if key.startswith(prefix)]:
+                        del store.subjects[key]
+                    for subject, record in records.items():
+                        store.subjects[prefix + subject] = record
+                    store.save()
+        except (IOError, OSError) as e:
+            raise AnsibleActionFail("Unable to access event damping store %s: %s" % (args['path'], e))
+
+        result.update(decision)
+        result['changed'] = changed
+        return result
@@ -0,0 +1,148 @@
+"""
+Purpose: Collapse the failures of one run into root causes with their dependent devices
+Design Pattern: Topology walk - a failed device whose upstream devices are all down is a child
+                of their root cause; unexplained failures crowding one inventory group become
+                children of a group outage
+Complexity: O(f * u) for f failed hosts with u upstream devices each, plus O(g * m) for g
+            correlation groups of m members
+
+Inputs:
+  failed     hosts that failed this run (unreachable, monitoring failed)
+  down       devices already known to be down, e.g. with an open device_connectivity incident;
+             they explain failures below them but are not reported again
+  topology   {host: [upstream device | {device, interface}]} from the device_upstream host var
+  groups     {group: [members]} of the inventory groups that make a group outage
+  min_group_size  unexplained failed hosts of one group that make a group outage
+
+A host is explained when it has upstream devices and every one of them is down - a host with a
+working redundant uplink failed on its own. Roots are resolved through chains of explained
+devices (access -> distribution -> core); a host below several down roots is parented to the
+first in sorted order and lists the others in `roots_of`.
+
+Returns:
+  roots      {root: {host, group, failed, children}} - root is the device name, or
+             'group:<name>' for a group outage (host is then none)
+  parent_of  {child host: root}
+  roots_of   {child host: [every root it depends on]}
+"""
+
+from ansible.errors import AnsibleActionFail
+from ansible.plugins.action import ActionBase
+
+
+def upstream_devices(entries):
+    """Device names of a device_upstream list (plain names or {device, interface} links)"""
+    devices = []
+    for entry in entries or []:
+        device = entry.get('device') if isinstance(entry, dict) else entry
+        if device and device not in devices:
+            devices.append(device)
+    return devices
+
+
+def correlate(failed, down, topology, groups, min_group_size):
+    """
+    Assign every failed host to a root cause
+
+    Args:
+        failed: Hosts failing this run
+        down: Devices known to be down without being in failed
+        topology: {host: [upstream devices]}
+        groups: {group: [members]} in priority order
+        min_group_size: Unexplained failures of one group that make a group outage (0 disables)
+
+    Returns:
+        Correlation dictionary (see module docstring)
+    """
+    failed = set(failed)
+    down_set = failed | set(down)
+    resolved = {}
+
+    def roots_for(host, visiting):
+        if host in resolved:
+            return resolved[host]
+        upstream = topology.get(host) or []
+        if not upstream or host in visiting or not all(device in down_set for device in upstream):
+            roots = [host]
+        else:
+            visiting = visiting | set([host])
+            roots = sorted(set(root for device in upstream for root in roots_for(device, visiting)))
+            # A cycle back to this host means no device above it explains it
+            roots = [root for root in roots if root != host] or [host]
+        resolved[host] = roots
+        return roots
+
+    parent_of = {}
+    roots_of = {}
+    roots = {}
+
+    for host in sorted(failed):
+        host_roots = roots_for(host, frozenset())
+        if host_roots == [host]:
+            roots.setdefault(host, {'host': host, 'group': None, 'failed': True, 'children': []})
+            continue
+        parent_of[host] = host_roots[0]
+        roots_of[host] = host_roots
+        roots.setdefault(host_roots[0], {'host': host_roots[0], 'group': None,
+                                         'failed': host_roots[0] in failed, 'children': []})
+        roots[host_roots[0]]['children'].append(host)
+
+    # Unexplained failures of one group collapse into a group outage with their own children
+    if min_group_size > 0:
+        for group, members in groups.items():
+            candidates = sorted(root for root, entry in roots.items() if entry['failed'] and entry['host'] in members)
+            if len(candidates) < min_group_size:
+                continue
+            group_root = 'group:%s' % group
+            children = []
+            for root in candidates:
+                entry = roots.pop(root)
+                children.append(root)
+                children.extend(entry['children'])
+            for child in children:
+                parent_of[child] = group_root
+                roots_of[child] = [group_root]
+            roots[group_root] = {'host': None, 'group': group, 'failed': True, 'children': sorted(children)}
+
+    return {'roots': roots, 'parent_of': parent_of, 'roots_of': roots_of}
+
+
+class ActionModule(ActionBase):
+    """Correlate the failed hosts of a run against the inventory topology"""
+
+    TRANSFERS_FILES = False
+    _requires_connection = False
+
+    def run(self, tmp=None, task_vars=None):
+        if task_vars is None:
+            task_vars = {}
+
+        result = super(ActionModule, self).run(tmp, task_vars)
+        del tmp
+
+        _, args = self.validate_argument_spec(argument_spec=dict(
+            failed=dict(type='list', elements='str', required=True),
+            down=dict(type='list', elements='str', default=[]),
+            topology=dict(type='dict', default={}),
+            groups=dict(type='dict', default={}),
+            min_group_size=dict(type='int', default=3),
+        ))
+
+        topology = {}
+        for host, entries in args['topology'].items():
+            if not isinstance(entries, list):
+                raise AnsibleActionFail("device_upstream of %s must be a list of devices" % host)
+            topology[host] = upstream_devices(entries)
+
+        correlation = correlate(args['failed'], args['down'], topology,
+                                dict((group, list(members or [])) for group, members in args['groups'].items()),
+                                args['min_group_size'])
+
+        result.update(correlation)
+        result['stats'] = dict(
+            failed=len(set(args['failed'])),
+            roots=len(correlation['roots']),
+            children=len(correlation['parent_of']),
+        )
+        result['changed'] = False
+        return result
@@ -0,0 +1,148 @@
+"""
+Purpose: Render all incident/problem texts of a host in one call from templates compiled once
+Design Pattern: Compile-once renderer - each template file is located and compiled once per call
+                (bytecode cached on disk across calls and runs) and rendered for every event,
+                replacing one lookup('template') per text and event
+Complexity: O(t) template compilations for t distinct files (none on a bytecode cache hit) plus
+            O(e * t) renders for e events
+
+lookup('template') locates, reads, parses and compiles the file and deep-copies every variable
+of the host for each text it renders. This action renders the same templates with the same
+variables (task vars plus `vars` plus the item variable) through one templar whose Jinja
+environment loads the files from the role's templates directory: compiled templates are kept in
+the environment for the rest of the call, and their bytecode in `bytecode_cache` so the next
+host's call and the next run skip the Jinja compiler.
+
+Arguments:
+  texts  {group: {templates: {key: file}, items: [..], item_var: name}} - a group with items
+         renders every template once per item into texts[group][item][key]; a group without
+         items renders once into texts[group][key]
+  vars   extra variables for every render (template_vars of the lookup)
+  bytecode_cache  directory of the compiled template cache ('' disables it); defaults to
+                  jinja_bytecode in monitoring_cache_dir (ANSIBLE_MONITORING_CACHE_DIR, else
+                  ~/.ansible/cache). A directory that cannot be created, e.g. under a read-only
+                  home in a hardened unit, only disables the cache.
+
+Returns:
+  texts  rendered strings in the shape above
+  stats  {templates, renders, seconds, bytecode_cache}
+"""
+
+import os
+import re
+import time
+
+from jinja2 import FileSystemBytecodeCache
+
+from ansible.errors import AnsibleActionFail
+from ansible.plugins.action import ActionBase
+
+try:
+    from ansible.template import trust_as_template
+except ImportError:  # ansible-core < 2.19 templates every string
+    def trust_as_template(value):
+        return value
+
+
+class ActionModule(ActionBase):
+    """Render event texts of one host from compiled role templates"""
+
+    TRANSFERS_FILES = False
+    _requires_connection = False
+
+    def run(self, tmp=None, task_vars=None):
+        if task_vars is None:
+            task_vars = {}
+
+        result = super(ActionModule, self).run(tmp, task_vars)
+        del tmp
+
+        _, args = self.validate_argument_spec(argument_spec=dict(
+            texts=dict(type='dict', required=True),
+            vars=dict(type='dict', default={}),
+            bytecode_cache=dict(type='path'),
+        ))
+
+        started = time.time()
+        groups = self._validate_groups(args['texts'])
+        names = sorted(set(name for group in groups.values() for name in group['templates'].values()))
+
+        # Templates resolve like lookup('template'): role templates/ first, then the play's paths
+        paths = dict((name, os.path.normpath(self._find_needle('templates', name))) for name in names)
+        search_path = []
+        for path in paths.values():
+            if os.path.dirname(path) not in search_path:
+                search_path.append(os.path.dirname(path))
+
+        # Texts include their file by absolute path; the template directories stay searchable
+        # for includes inside the templates
+        templar = self._templar.copy_with_new_env(searchpath=search_path + ['/'])
+        # ansible-core 2.19 deprecates Templar.environment; the engine holds the same environment
+        environment = getattr(templar, '_engine', templar).environment
+        directory = self._bytecode_directory(args['bytecode_cache'], task_vars)
+        if directory:
+            environment.bytecode_cache = FileSystemBytecodeCache(directory, '%s.ansible-event-text.cache')
+
+        # One generated template per call includes every file for every item, so the only
+        # compilations are this wrapper and each file once (skipped on a bytecode cache hit)
+        render_vars = dict(task_vars)
+        render_vars.update(args['vars'])
+        wrapper = []
+        renders = 0
+        for index, (group_name, group) in enumerate(sorted(groups.items())):
+            captures = []
+            for key_index, (key, name) in enumerate(sorted(group['templates'].items())):
+                captures.append("{%% set __text_%d %%}{%% include %r %%}{%% endset %%}" % (key_index, paths[name].lstrip('/')))
+            texts = "{%s}" % ', '.join("%r: __text_%d" % (key, key_index)
+                                       for key_index, (key, _) in enumerate(sorted(group['templates'].items())))
+            if group['items'] is None:
+                wrapper.append("%s{%%- set _ = __texts.update({%r: %s}) -%%}" % (''.join(captures), group_name, texts))
+                renders += len(captures)
+            else:
+                render_vars['__event_items_%d' % index] = group['items']
+                wrapper.append(
+                    "{%%- set _ = __texts.update({%r: {}}) -%%}"
+                    "{%%- for %s in __event_items_%d -%%}%s"
+                    "{%%- set _ = __texts[%r].update({%s: %s}) -%%}"
+                    "{%%- endfor -%%}" % (group_name, group['item_var'], index, ''.join(captures),
+                                         group_name, group['item_var'], texts))
+                renders += len(captures) * len(group['items'])
+
+        templar.available_variables = render_vars
+        texts = templar.template(trust_as_template("{%- set __texts = {} -%}" + ''.join(wrapper) + "{{ __texts }}"),
+                                 escape_backslashes=False)
+
+        result['texts'] = texts
+        result['stats'] = dict(templates=len(names), renders=renders, seconds=round(time.time() - started, 4),
+                               bytecode_cache=directory)
+        result['changed'] = False
+        return result
+
+    def _bytecode_directory(self, bytecode_cache, task_vars):
+        """Writable bytecode cache directory, or None to compile without one"""
+        if bytecode_cache is None:
+            cache_dir = task_vars.get('monitoring_cache_dir')
+            cache_dir = self._templar.template(cache_dir) if cache_dir else None
+            bytecode_cache = os.path.join(
+                cache_dir or os.environ.get('ANSIBLE_MONITORING_CACHE_DIR') or '~/.ansible/cache', 'jinja_bytecode')
+        if not bytecode_cache:
+            return None
+        directory = os.path.expanduser(bytecode_cache)
+        try:
+            if not os.path.isdir(directory):
+                os.makedirs(directory, 0o700)
+        except OSError:
+            return None
+        return directory if os.access(directory, os.W_OK) else None
+
+    @staticmethod
+    def _validate_groups(texts):
+        groups = {}
+        for group_name, group in texts.items():
+            if not isinstance(group, dict) or not isinstance(group.get('templates'), dict) or not group['templates']:
+                raise AnsibleActionFail("texts.%s needs a templates mapping of text key -> template file" % group_name)
+            items = group.get('items')
+            if items is not None and (not isinstance(items, list) or not re.match(r'^[A-Za-z_][A-Za-z0-9_]*$', group.get('item_var') or '')):
+                raise AnsibleActionFail("texts.%s needs an items list and an item_var variable name" % group_name)
+            groups[group_name] = {'templates': group['templates'], 'items': items, 'item_var': group.get('item_var')}
+        return groups
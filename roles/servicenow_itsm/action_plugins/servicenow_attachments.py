@@ -0,0 +1,187 @@
+"""
+Purpose: Upload a record's attachments over one pooled keep-alive HTTP session
+Design Pattern: Bounded worker pool sharing a persistent requests.Session
+Complexity: O(n / concurrency) upload rounds for n files; memory O(concurrency * chunk) as bodies stream from disk
+
+Replaces one `uri` call per file (fresh TLS handshake and Basic auth encoding each time, file
+read fully into memory) with a single session whose connection pool is sized to the worker
+count. Files larger than compress_min_size can be gzipped on the way out (compress: true); the
+compressed copy is written to a temporary file so the upload still streams.
+
+Per-file results use the shape of the `uri` loop results previously stored in
+servicenow_attachment_results: each entry carries the `attachment` item plus `status`,
+`json` and `msg`, or `skipped` when the file does not exist.
+"""
+
+import gzip
+import os
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from ansible.errors import AnsibleActionFail
+from ansible.module_utils.basic import missing_required_lib
+from ansible.plugins.action import ActionBase
+
+try:
+    import requests
+    from requests.adapters import HTTPAdapter
+    HAS_REQUESTS = True
+except ImportError:
+    HAS_REQUESTS = False
+
+GZIP_CONTENT_TYPE = 'application/gzip'
+
+
+class AttachmentUploader(object):
+    """Streams files to /api/now/attachment/file over a shared session"""
+
+    def __init__(self, host, username, password, concurrency=4, timeout=120, validate_certs=True,
+                 compress=False, compress_min_size=1048576):
+        self.url = host.rstrip('/') + '/api/now/attachment/file'
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.compress = compress
+        self.compress_min_size = compress_min_size
+
+        self.session = requests.Session()
+        self.session.auth = (username, password)
+        self.session.verify = validate_certs
+        self.session.headers['Accept'] = 'application/json'
+        # One pool for the instance, one connection per worker
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=concurrency)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def close(self):
+        self.session.close()
+
+    def upload_all(self, table_name, table_sys_id, attachments):
+        """Upload every attachment, returning results in input order"""
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            return list(pool.map(lambda item: self.upload(table_name, table_sys_id, item), attachments))
+
+    def upload(self, table_name, table_sys_id, attachment):
+        path = attachment.get('path')
+        result = {'attachment': attachment, 'changed': False, 'failed': False}
+
+        if not path or not os.path.isfile(path):
+            result.update(skipped=True, skip_reason="File not found: %s" % path)
+            return result
+
+        file_name = attachment.get('name') or os.path.basename(path)
+        content_type = attachment.get('content_type', 'text/plain')
+        compressed_path = None
+
+        try:
+            size = os.path.getsize(path)
+            if self.compress and size >= self.compress_min_size:
+                compressed_path = _gzip_to_temp(path)
+                path = compressed_path
+                file_name += '.gz'
+                content_type = GZIP_CONTENT_TYPE
+
+            with open(path, 'rb') as body:
+                # A file object body is streamed by requests with Content-Length from fstat
+                response = self.session.post(
+                    self.url,
+                    params={'table_name': table_name, 'table_sys_id': table_sys_id, 'file_name': file_name},
+                    data=body,
+                    headers={'Content-Type': content_type},
+                    timeout=self.timeout,
+                )
+        except (requests.RequestException, IOError, OSError) as e:
+            result.update(failed=True, status=-1, msg="Attachment upload failed: %s" % e)
+            return result
+        finally:
+            if compressed_path:
+                os.unlink(compressed_path)
+
+        try:
+            body = response.json()
+        except ValueError:
+            body = {}
+
+        result.update(
+            status=response.status_code,
+            json=body,
+            file_name=file_name,
+            size_bytes=os.path.getsize(attachment['path']),
+            compressed=compressed_path is not None,
+            changed=response.status_code == 201,
+            failed=response.status_code != 201,
+        )
+        if response.status_code != 201:
+            result['msg'] = "Status code was %s and not [201]: %s" % (
+                response.status_code, body.get('error', {}).get('message', response.reason))
+        return result
+
+
+def _gzip_to_temp(path):
+    """Compress path into a temporary file without buffering it in memory"""
+    handle, compressed_path = tempfile.mkstemp(suffix='.gz')
+    try:
+        with open(path, 'rb') as source, os.fdopen(handle, 'wb') as raw, \
+                gzip.GzipFile(fileobj=raw, mode='wb', filename=os.path.basename(path)) as target:
+            shutil.copyfileobj(source, target, 1024 * 1024)
+    except (IOError, OSError):
+        os.unlink(compressed_path)
+        raise
+    return compressed_path
+
+
+class ActionModule(ActionBase):
+    """Upload all attachments of one ServiceNow record"""
+
+    TRANSFERS_FILES = False
+    _requires_connection = False
+
+    def run(self, tmp=None, task_vars=None):
+        if task_vars is None:
+            task_vars = {}
+
+        result = super(ActionModule, self).run(tmp, task_vars)
+        del tmp
+
+        _, args = self.validate_argument_spec(argument_spec=dict(
+            instance=dict(type='dict', required=True),
+            table_name=dict(type='str', required=True),
+            table_sys_id=dict(type='str', required=True),
+            attachments=dict(type='list', elements='dict', default=[]),
+            concurrency=dict(type='int', default=4),
+            compress=dict(type='bool', default=False),
+            compress_min_size=dict(type='int', default=1048576),
+            timeout=dict(type='int', default=120),
+            validate_certs=dict(type='bool', default=True),
+        ))
+
+        if not HAS_REQUESTS:
+            raise AnsibleActionFail(missing_required_lib('requests'))
+
+        instance = args['instance']
+        for key in ('host', 'username', 'password'):
+            if not instance.get(key):
+                raise AnsibleActionFail("instance.%s is required" % key)
+        if args['concurrency'] < 1:
+            raise AnsibleActionFail("concurrency must be at least 1")
+
+        results = []
+        if args['attachments']:
+            uploader = AttachmentUploader(
+                instance['host'], instance['username'], instance['password'],
+                concurrency=min(args['concurrency'], len(args['attachments'])),
+                timeout=args['timeout'],
+                validate_certs=args['validate_certs'],
+                compress=args['compress'],
+                compress_min_size=args['compress_min_size'],
+            )
+            try:
+                results = uploader.upload_all(args['table_name'], args['table_sys_id'], args['attachments'])
+            finally:
+                uploader.close()
+
+        result['results'] = results
+        result['uploaded'] = len([r for r in results if r.get('status') == 201])
+        result['failed_uploads'] = len([r for r in results if r['failed']])
+        result['changed'] = result['uploaded'] > 0
+        return result
@@ -0,0 +1,453 @@
+"""
+Purpose: Flush queued ServiceNow record operations through the Batch REST API
+Design Pattern: Unit of Work - operations queued per host during the play, submitted together
+Complexity: O(n / chunk_size) HTTP requests for n queued operations (plus one caller lookup)
+
+Each host queues operations in its servicenow_batch_queue fact (see tasks/incident.yml and
+tasks/close_incident.yml with servicenow_write_mode: batch). Run once per play; the plugin
+reads every host's queue, submits them to /api/now/v1/batch in chunks, retries throttled or
+failed sub-requests and returns per-host results keyed back to the originating operation.
+
+Updates and resolves are idempotent and are resubmitted on any retryable status. A create is
+only resubmitted when the server certainly did not process it (429/503, or listed unserviced
+in a batch response); after a 500/502/504, a failed batch call or a transport error (timeout,
+connection reset) the record may already exist, so the open record with the create's
+correlation_id is looked up first and reused if found. A transport error fails only the
+operations of that chunk; the other chunks' results are returned. Rounds after a 429/503 wait
+for the server's Retry-After (capped at MAX_RETRY_AFTER) instead of `delay`.
+
+Queued operation format:
+  id:             unique per host
+  action:         create | update | resolve
+  table:          incident (default) | problem | change_request
+  sys_id:         target record for update/resolve
+  correlation_id: used to map results back to cache entries and callers
+  fields:         record fields; caller, state, urgency and impact use the same names and
+                  values as the servicenow.itsm modules and are translated here
+  attachments:    passed through to the result for upload once the sys_id is known
+"""
+
+import base64
+import json
+import time
+from email.utils import parsedate_to_datetime
+from urllib.error import HTTPError, URLError
+from urllib.parse import quote
+
+from ansible.errors import AnsibleActionFail
+from ansible.module_utils.urls import open_url
+from ansible.plugins.action import ActionBase
+
+STATE_VALUES = {
+    'new': '1',
+    'in_progress': '2',
+    'on_hold': '3',
+    'resolved': '6',
+    'closed': '7',
+    'canceled': '8',
+}
+
+LEVEL_VALUES = {
+    'high': '1',
+    'medium': '2',
+    'low': '3',
+}
+
+ACTION_METHODS = {
+    'create': 'POST',
+    'update': 'PATCH',
+    'resolve': 'PATCH',
+}
+
+ACTION_RESULTS = {
+    'create': 'created',
+    'update': 'updated',
+    'resolve': 'resolved',
+}
+
+# Sub-request status codes worth resubmitting in the next round
+RETRYABLE_STATUS = frozenset((429, 500, 502, 503, 504))
+# Statuses that mean the request was rejected before it was processed - safe to repeat a create
+CREATE_RETRYABLE_STATUS = frozenset((429, 503))
+
+# Longest Retry-After honoured between rounds, in seconds
+MAX_RETRY_AFTER = 300
+
+# Open records (not resolved, closed or canceled) - same check as tasks/incident.yml
+OPEN_RECORD_QUERY = 'correlation_id=%s^state!=6^state!=7^state!=8'
+
+
+class ServiceNowBatchClient(object):
+    """Minimal Batch/Table API client built on ansible.module_utils.urls"""
+
+    def __init__(self, host, username, password, timeout=60, validate_certs=True):
+        self.host = host.rstrip('/')
+        self.username = username
+        self.password = password
+        self.timeout = timeout
+        self.validate_certs = validate_certs
+        self.http_requests = 0
+        self.retry_after = None
+
+    def request(self, method, path, payload=None):
+        """Send one REST request and return (status, decoded JSON body); sets retry_after"""
+        data = json.dumps(payload) if payload is not None else None
+        self.http_requests += 1
+        self.retry_after = None
+        try:
+            response = open_url(
+                self.host + path,
+                data=data,
+                method=method,
+                headers={'Content-Type': 'application/json', 'Accept': 'application/json'},
+                url_username=self.username,
+                url_password=self.password,
+                force_basic_auth=True,
+                validate_certs=self.validate_certs,
+                timeout=self.timeout,
+            )
+            body = response.read()
+            return response.getcode(), json.loads(body) if body else {}
+        except HTTPError as e:
+            self.retry_after = _retry_after(e.headers.get('Retry-After') if e.headers else None)
+            try:
+                body = json.loads(e.read())
+            except (ValueError, TypeError):
+                body = {}
+            return e.code, body
+
+    def resolve_users(self, user_names):
+        """Map user_name -> sys_id with a single sys_user query"""
+        if not user_names:
+            return {}
+        query = 'user_nameIN' + ','.join(sorted(user_names))
+        status, body = self.request(
+            'GET', '/api/now/table/sys_user?sysparm_fields=sys_id,user_name&sysparm_query=' + quote(query)
+        )
+        if status != 200:
+            return {}
+        return dict((r['user_name'], r['sys_id']) for r in body.get('result', []))
+
+    def find_open_record(self, table, correlation_id):
+        """Open record with the correlation_id (a create that may have gone through), or None"""
+        status, body = self.request(
+            'GET', '/api/now/table/%s?sysparm_limit=1&sysparm_exclude_reference_link=true&sysparm_query=%s'
+            % (table, quote(OPEN_RECORD_QUERY % correlation_id))
+        )
+        if status != 200:
+            raise IOError("correlation_id lookup returned HTTP %s" % status)
+        records = body.get('result', [])
+        return records[0] if records else None
+
+    def submit(self, requests):
+        """
+        Submit sub-requests in one batch call
+
+        Returns:
+            Tuple of (serviced {id: sub-response}, unserviced ids, HTTP status of the batch call)
+        """
+        payload = {
+            'batch_request_id': str(int(time.time() * 1000)),
+            'rest_requests': requests,
+        }
+        status, body = self.request('POST', '/api/now/v1/batch', payload)
+        if status != 200:
+            return {}, [r['id'] for r in requests], status
+
+        serviced = dict((r['id'], r) for r in body.get('serviced_requests', []))
+        unserviced = [r.get('id') if isinstance(r, dict) else r for r in body.get('unserviced_requests', [])]
+        # Requests missing from both lists are treated as unserviced
+        unserviced.extend(r['id'] for r in requests if r['id'] not in serviced and r['id'] not in unserviced)
+        return serviced, unserviced, status
+
+
+def _retry_after(value):
+    """Seconds to wait from a Retry-After value (delta seconds or HTTP date), or None"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _header(response, name):
+    """Header value of a batch sub-response ([{name, value}] list)"""
+    for header in response.get('headers') or []:
+        if str(header.get('name', '')).lower() == name.lower():
+            return header.get('value')
+    return None
+
+
+def _encode_body(fields):
+    return base64.b64encode(json.dumps(fields).encode('utf-8')).decode('ascii')
+
+
+def _decode_body(encoded):
+    if not encoded:
+        return {}
+    try:
+        return json.loads(base64.b64decode(encoded))
+    except (ValueError, TypeError):
+        return {}
+
+
+def _translate_fields(action, fields, users):
+    """Translate servicenow.itsm style fields into raw Table API values"""
+    record = {}
+    for key, value in (fields or {}).items():
+        if value is None:
+            continue
+        # Empty optional fields are simply not set on create
+        if action == 'create' and value == '':
+            continue
+        if key == 'caller':
+            record['caller_id'] = users.get(value, value)
+        elif key == 'state':
+            record['state'] = STATE_VALUES.get(str(value), str(value))
+        elif key in ('urgency', 'impact'):
+            record[key] = LEVEL_VALUES.get(str(value), str(value))
+        elif isinstance(value, bool):
+            record[key] = 'true' if value else 'false'
+        else:
+            record[key] = value
+    return record
+
+
+class ActionModule(ActionBase):
+    """Submit every host's queued ServiceNow operations through the Batch API"""
+
+    TRANSFERS_FILES = False
+    _requires_connection = False
+
+    def run(self, tmp=None, task_vars=None):
+        if task_vars is None:
+            task_vars = {}
+
+        result = super(ActionModule, self).run(tmp, task_vars)
+        del tmp
+
+        _, args = self.validate_argument_spec(argument_spec=dict(
+            instance=dict(type='dict', required=True),
+            hosts=dict(type='list', elements='str', required=True),
+            queue_var=dict(type='str', default='servicenow_batch_queue'),
+            chunk_size=dict(type='int', default=50),
+            retries=dict(type='int', default=3),
+            delay=dict(type='int', default=5),
+            timeout=dict(type='int', default=60),
+            validate_certs=dict(type='bool', default=True),
+        ))
+
+        instance = args['instance']
+        for key in ('host', 'username', 'password'):
+            if not instance.get(key):
+                raise AnsibleActionFail("instance.%s is required" % key)
+        if args['chunk_size'] < 1:
+            raise AnsibleActionFail("chunk_size must be at least 1")
+
+        client = ServiceNowBatchClient(
+            instance['host'], instance['username'], instance['password'],
+            timeout=args['timeout'], validate_certs=args['validate_certs']
+        )
+
+        operations = self._collect_operations(args['hosts'], args['queue_var'], task_vars)
+        results = dict((host, []) for host in args['hosts'])
+
+        if not operations:
+            result.update(changed=False, results=results,
+                          summary=dict(submitted=0, succeeded=0, failed=0, http_requests=0, retried=0))
+            return result
+
+        try:
+            # Nothing has been written yet, so a failure here fails the task
+            users = client.resolve_users(set(
+                op['fields']['caller'] for op in operations.values()
+                if op['action'] == 'create' and op['fields'].get('caller')
+            ))
+
+            requests = {}
+            for request_id, op in operations.items():
+                path = '/api/now/table/%s' % op['table']
+                if op['action'] != 'create':
+                    path += '/%s' % op['sys_id']
+                requests[request_id] = {
+                    'id': request_id,
+                    'method': ACTION_METHODS[op['action']],
+                    'url': path + '?sysparm_exclude_reference_link=true',
+                    'headers': [
+                        {'name': 'Content-Type', 'value': 'application/json'},
+                        {'name': 'Accept', 'value': 'application/json'},
+                    ],
+                    'body': _encode_body(_translate_fields(op['action'], op['fields'], users)),
+                }
+        except (URLError, IOError) as e:
+            raise AnsibleActionFail("ServiceNow batch submission failed: %s" % e)
+
+        # Transport errors are settled per chunk, so records already written are always reported
+        responses, errors, retried = self._submit_with_retries(client, requests, operations, args)
+
+        succeeded = 0
+        for request_id, op in operations.items():
+            response = responses.get(request_id)
+            status = response.get('status_code') if response else None
+            record = _decode_body(response.get('body')).get('result', {}) if response else {}
+            ok = status is not None and 200 <= status < 300
+
+            entry = {
+                'id': op['id'],
+                'action': ACTION_RESULTS[op['action']] if ok else 'failed',
+                'requested_action': op['action'],
+                'table': op['table'],
+                'correlation_id': op.get('correlation_id'),
+                'number': record.get('number', op.get('number', '')),
+                'sys_id': record.get('sys_id', op.get('sys_id', '')),
+                'status_code': status,
+                'succeeded': ok,
+                'ci_associated': bool(op['fields'].get('cmdb_ci')),
+                'attachments': op.get('attachments', []),
+            }
+            if not ok:
+                entry['error'] = errors.get(request_id) or _decode_body(
+                    response.get('body') if response else None).get('error', {}).get('message', 'Request not serviced')
+            else:
+                succeeded += 1
+            results[op['host']].append(entry)
+
+        result['results'] = results
+        result['summary'] = dict(
+            submitted=len(operations),
+            succeeded=succeeded,
+            failed=len(operations) - succeeded,
+            http_requests=client.http_requests,
+            retried=retried,
+        )
+        result['changed'] = succeeded > 0
+        return result
+
+    def _collect_operations(self, hosts, queue_var, task_vars):
+        """Read queued operations from each host's variables, keyed by a unique request id"""
+        hostvars = task_vars.get('hostvars', {})
+        operations = {}
+
+        for host in hosts:
+            host_vars = hostvars.get(host)
+            if host_vars is None:
+                continue
+            for index, op in enumerate(host_vars.get(queue_var) or []):
+                action = op.get('action')
+                if action not in ACTION_METHODS:
+                    raise AnsibleActionFail("Unsupported batch action '%s' queued by %s" % (action, host))
+                if action != 'create' and not op.get('sys_id'):
+                    raise AnsibleActionFail("Batch %s queued by %s has no sys_id" % (action, host))
+
+                operation = dict(op)
+                operation['host'] = host
+                operation['table'] = op.get('table') or 'incident'
+                operation['fields'] = dict(op.get('fields') or {})
+                operation.setdefault('id', index)
+                operations['%s:%d' % (host, index)] = operation
+
+        return operations
+
+    def _submit_with_retries(self, client, requests, operations, args):
+        """
+        Send requests in chunks, resubmitting throttled or unserviced ones
+
+        Creates whose outcome is unknown are looked up by correlation_id after the wait before
+        the next round (a timed-out request may still be processed); they are settled after the
+        last round too, so a record that was written is always reported.
+        """
+        responses = {}
+        errors = {}
+        pending = list(requests)
+        unsettled = []
+        retried = 0
+        wait = args['delay']
+        attempt = 0
+
+        while pending or unsettled:
+            if attempt > args['retries'] and not unsettled:
+                break
+            if attempt > 0:
+                time.sleep(wait)
+            for request_id in unsettled:
+                if self._recover_create(client, request_id, operations[request_id], responses, errors) \
+                        and attempt <= args['retries']:
+                    pending.append(request_id)
+            unsettled = []
+            if attempt > args['retries'] or not pending:
+                break
+            if attempt > 0:
+                retried += len(pending)
+
+            retry = []
+            retry_after = []
+            for offset in range(0, len(pending), args['chunk_size']):
+                chunk = [requests[request_id] for request_id in pending[offset:offset + args['chunk_size']]]
+                try:
+                    serviced, unserviced, status = client.submit(chunk)
+                    reason = "Batch request not serviced (HTTP %s)" % status
+                except (URLError, IOError) as e:
+                    # Timeout or dropped connection: the chunk may have been processed
+                    serviced, unserviced, status = {}, [r['id'] for r in chunk], None
+                    reason = "Batch request failed: %s" % e
+                if status in CREATE_RETRYABLE_STATUS:
+                    retry_after.append(client.retry_after)
+
+                uncertain = []
+                for request_id in unserviced:
+                    errors[request_id] = reason
+                    # A 200 response listing it as unserviced, or a rejected call, was never processed
+                    if status == 200 or status in CREATE_RETRYABLE_STATUS:
+                        retry.append(request_id)
+                    else:
+                        uncertain.append(request_id)
+                for request_id, response in serviced.items():
+                    responses[request_id] = response
+                    code = response.get('status_code')
+                    if code in CREATE_RETRYABLE_STATUS:
+                        retry.append(request_id)
+                        retry_after.append(_retry_after(_header(response, 'Retry-After')))
+                    elif code in RETRYABLE_STATUS:
+                        uncertain.append(request_id)
+                    else:
+                        errors.pop(request_id, None)
+                for request_id in uncertain:
+                    (unsettled if operations[request_id]['action'] == 'create' else retry).append(request_id)
+
+            pending = retry
+            attempt += 1
+            hinted = [seconds for seconds in retry_after if seconds is not None]
+            wait = min(max(hinted), MAX_RETRY_AFTER) if hinted else args['delay']
+
+        return responses, errors, retried
+
+    @staticmethod
+    def _recover_create(client, request_id, operation, responses, errors):
+        """
+        Settle a create whose outcome is unknown by looking up its correlation_id
+
+        Returns:
+            True when the create should be resubmitted (no record exists); False when the
+            existing record was taken as the result or the outcome cannot be checked
+        """
+        correlation_id = operation.get('correlation_id')
+        if not correlation_id:
+            errors[request_id] = "%s; not resubmitted, the record may exist and has no correlation_id" % (
+                errors.get(request_id) or 'HTTP %s' % (responses.get(request_id) or {}).get('status_code'))
+            return False
+        try:
+            record = client.find_open_record(operation['table'], correlation_id)
+        except (URLError, IOError) as e:
+            errors[request_id] = "Create outcome unknown and correlation_id lookup failed: %s" % e
+            return False
+        if record is None:
+            return True
+        responses[request_id] = {'id': request_id, 'status_code': 201,
+                                 'body': _encode_body({'result': record})}
+        errors.pop(request_id, None)
+        return False
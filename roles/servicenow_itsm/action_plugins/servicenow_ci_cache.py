@@ -0,0 +1,248 @@
+"""
+Purpose: Persistent control-node cache mapping device name / asset tag to cmdb_ci sys_id
+Design Pattern: Cache-aside with TTL expiry and LRU eviction, bulk warmed once per run
+Complexity: O(h) for h play hosts per warm-up plus ceil(misses / page_size) CMDB requests
+
+Operations:
+  warm  - run once per play: load the cache file, drop expired entries, fetch every missing or
+          expired key for the play hosts with paginated cmdb_ci queries and return an index
+          {"name:<host>" | "asset_tag:<tag>": sys_id} ('' = CI not found) plus hit/miss stats
+  store - write back a single key after a per-host configuration_item_info lookup
+
+Cache file format (JSON):
+  {"version": 1, "entries": {key: {"sys_id": str, "fetched_at": epoch, "last_used": epoch}}}
+
+Writers take an exclusive lock on <path>.lock and replace the file atomically, so forks
+storing misses concurrently do not lose each other's entries.
+"""
+
+import fcntl
+import json
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+from urllib.error import HTTPError, URLError
+from urllib.parse import quote
+
+from ansible.errors import AnsibleActionFail
+from ansible.module_utils.urls import open_url
+from ansible.plugins.action import ActionBase
+
+CACHE_VERSION = 1
+
+# Keys per IN clause - keeps the encoded query well under URL length limits
+QUERY_KEYS_PER_CLAUSE = 100
+
+
+class CICache(object):
+    """TTL + LRU cache of CI sys_ids persisted as JSON"""
+
+    def __init__(self, path, ttl=86400, negative_ttl=3600, max_entries=10000):
+        self.path = os.path.expanduser(path)
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.entries = {}
+        self.evicted = 0
+
+    @contextmanager
+    def locked(self):
+        """Hold the writer lock while reading, modifying and saving the cache"""
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory, 0o700)
+        with open(self.path + '.lock', 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                self.load()
+                yield self
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def load(self):
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+        except (IOError, OSError, ValueError):
+            data = {}
+        self.entries = data.get('entries', {}) if data.get('version') == CACHE_VERSION else {}
+
+    def save(self):
+        self._evict()
+        handle, temp_path = tempfile.mkstemp(dir=os.path.dirname(self.path) or '.', prefix='.ci-cache-')
+        with os.fdopen(handle, 'w') as f:
+            json.dump({'version': CACHE_VERSION, 'entries': self.entries}, f, sort_keys=True)
+        os.rename(temp_path, self.path)
+
+    def get(self, key, now):
+        """Return the cached sys_id ('' for a cached miss) or None when absent or expired"""
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        ttl = self.ttl if entry.get('sys_id') else self.negative_ttl
+        if now - entry.get('fetched_at', 0) >= ttl:
+            del self.entries[key]
+            self.evicted += 1
+            return None
+        entry['last_used'] = now
+        return entry.get('sys_id', '')
+
+    def put(self, key, sys_id, now):
+        self.entries[key] = {'sys_id': sys_id or '', 'fetched_at': now, 'last_used': now}
+
+    def _evict(self):
+        """Drop least recently used entries beyond max_entries"""
+        overflow = len(self.entries) - self.max_entries
+        if overflow <= 0:
+            return
+        for key in sorted(self.entries, key=lambda k: self.entries[k].get('last_used', 0))[:overflow]:
+            del self.entries[key]
+        self.evicted += overflow
+
+
+def cache_key(field, value):
+    return '%s:%s' % (field, value)
+
+
+class ActionModule(ActionBase):
+    """Warm or update the persistent CI cache"""
+
+    TRANSFERS_FILES = False
+    _requires_connection = False
+
+    def run(self, tmp=None, task_vars=None):
+        if task_vars is None:
+            task_vars = {}
+
+        result = super(ActionModule, self).run(tmp, task_vars)
+        del tmp
+
+        _, args = self.validate_argument_spec(argument_spec=dict(
+            operation=dict(type='str', required=True, choices=['warm', 'store']),
+            path=dict(type='path', required=True),
+            ttl=dict(type='int', default=86400),
+            negative_ttl=dict(type='int', default=3600),
+            max_entries=dict(type='int', default=10000),
+            instance=dict(type='dict'),
+            hosts=dict(type='list', elements='str', default=[]),
+            asset_tag_var=dict(type='str', default='device_asset_tag'),
+            page_size=dict(type='int', default=500),
+            validate_certs=dict(type='bool', default=True),
+            key=dict(type='str', no_log=False),
+            sys_id=dict(type='str', default=''),
+        ))
+
+        cache = CICache(args['path'], args['ttl'], args['negative_ttl'], args['max_entries'])
+
+        if args['operation'] == 'store':
+            if not args['key']:
+                raise AnsibleActionFail("key is required for operation=store")
+            with cache.locked():
+                cache.put(args['key'], args['sys_id'], int(time.time()))
+                cache.save()
+            result.update(changed=True, key=args['key'], sys_id=args['sys_id'])
+            return result
+
+        instance = args['instance'] or {}
+        for field in ('host', 'username', 'password'):
+            if not instance.get(field):
+                raise AnsibleActionFail("instance.%s is required for operation=warm" % field)
+
+        result.update(self._warm(cache, args, instance, task_vars))
+        return result
+
+    def _warm(self, cache, args, instance, task_vars):
+        hostvars = task_vars.get('hostvars', {})
+        wanted = {'name': set(), 'asset_tag': set()}
+        for host in args['hosts']:
+            wanted['name'].add(host)
+            if host not in hostvars:
+                continue
+            asset_tag = hostvars[host].get(args['asset_tag_var'])
+            if asset_tag:
+                wanted['asset_tag'].add(str(asset_tag))
+
+        now = int(time.time())
+        index = {}
+        missing = {'name': set(), 'asset_tag': set()}
+        fetch_error = None
+        http_requests = 0
+
+        with cache.locked():
+            for field, values in wanted.items():
+                for value in values:
+                    sys_id = cache.get(cache_key(field, value), now)
+                    if sys_id is None:
+                        missing[field].add(value)
+                    else:
+                        index[cache_key(field, value)] = sys_id
+            hits = len(index)
+
+            try:
+                records, http_requests = self._fetch(instance, missing, args)
+            except (HTTPError, URLError, IOError, ValueError) as e:
+                # Serve the hits we have; misses fall back to per-host lookups
+                records, fetch_error = None, "CMDB warm-up query failed: %s" % e
+
+            if records is not None:
+                found = {}
+                for record in records:
+                    for field in ('name', 'asset_tag'):
+                        if record.get(field) in missing[field]:
+                            found[cache_key(field, record[field])] = record['sys_id']
+                for field, values in missing.items():
+                    for value in values:
+                        key = cache_key(field, value)
+                        index[key] = found.get(key, '')
+                        cache.put(key, index[key], now)
+            cache.save()
+
+        missed_keys = [cache_key(field, value) for field, values in missing.items() for value in values]
+        result = dict(
+            changed=bool(missed_keys) and fetch_error is None,
+            index=index,
+            stats=dict(
+                hits=hits,
+                misses=len(missed_keys),
+                fetched=len([key for key in missed_keys if index.get(key)]),
+                evicted=cache.evicted,
+                http_requests=http_requests,
+            ),
+        )
+        if fetch_error:
+            result['fetch_error'] = fetch_error
+        return result
+
+    def _fetch(self, instance, missing, args):
+        """Query cmdb_ci for all missing keys, paginating each IN clause"""
+        records = []
+        http_requests = 0
+        host = instance['host'].rstrip('/')
+
+        for field in ('name', 'asset_tag'):
+            values = sorted(missing[field])
+            for start in range(0, len(values), QUERY_KEYS_PER_CLAUSE):
+                query = '%sIN%s' % (field, ','.join(values[start:start + QUERY_KEYS_PER_CLAUSE]))
+                offset = 0
+                while True:
+                    url = '%s/api/now/table/cmdb_ci?sysparm_fields=sys_id,name,asset_tag&sysparm_query=%s' \
+                          '&sysparm_limit=%d&sysparm_offset=%d' % (host, quote(query), args['page_size'], offset)
+                    response = open_url(
+                        url,
+                        method='GET',
+                        headers={'Accept': 'application/json'},
+                        url_username=instance['username'],
+                        url_password=instance['password'],
+                        force_basic_auth=True,
+                        validate_certs=args['validate_certs'],
+                        timeout=60,
+                    )
+                    http_requests += 1
+                    page = json.loads(response.read()).get('result', [])
+                    records.extend(page)
+                    if len(page) < args['page_size']:
+                        break
+                    offset += args['page_size']
+
+        return records, http_requests
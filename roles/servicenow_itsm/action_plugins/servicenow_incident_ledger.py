@@ -0,0 +1,211 @@
+"""
+Purpose: Persistent control-node ledger of the open incidents this automation believes exist
+Design Pattern: Last-known-state store keyed by correlation_id with periodic reconciliation -
+                steady-state runs read it instead of querying ServiceNow
+Complexity: O(c) for c ledger entries per load or reconcile, O(k) for k recorded transitions
+
+Operations:
+  load      - return the ledger index {correlation_id: [records]} and whether it is fresh
+              (reconciled less than reconcile_interval seconds ago)
+  reconcile - replace the ledger with a full open-incident index queried from ServiceNow
+              (tasks/prefetch_incidents.yml) and restart the reconcile interval
+  record    - merge the run's transitions, i.e. every play host's servicenow_incident_cache_overlay
+              (a correlation_id mapped to [] was closed, otherwise opened or updated)
+  expire    - mark the ledger stale so the next run reconciles (tasks/expire_ledger.yml, after
+              incident writes of a caller that does not record them)
+
+Ledger file format (JSON):
+  {"version": 1, "reconciled_at": epoch, "updated_at": epoch,
+   "incidents": {correlation_id: [{"sys_id", "number", "correlation_id", "state", "u_occurrence_count"}]}}
+
+A record without sys_id (a batch create that was never flushed, or failed) cannot be trusted,
+so recording one expires the ledger and the next run reconciles against ServiceNow.
+Writers take an exclusive lock on <path>.lock and replace the file atomically; record only
+touches the correlation IDs it was given, so concurrent playbooks do not lose each other's
+transitions.
+"""
+
+import fcntl
+import json
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+
+from ansible.errors import AnsibleActionFail
+from ansible.plugins.action import ActionBase
+
+LEDGER_VERSION = 1
+
+# Record fields kept in the ledger - what incident.yml / close_incident.yml read from the run cache
+RECORD_FIELDS = ('sys_id', 'number', 'correlation_id', 'state', 'u_occurrence_count')
+
+# Table API incident state values -> the names servicenow.itsm.incident_info returns
+INCIDENT_STATES = {'1': 'new', '2': 'in_progress', '3': 'on_hold', '6': 'resolved', '7': 'closed', '8': 'canceled'}
+
+
+def slim_record(record):
+    slim = dict((field, str(record.get(field) or '')) for field in RECORD_FIELDS)
+    slim['state'] = INCIDENT_STATES.get(slim['state'], slim['state'])
+    return slim
+
+
+class IncidentLedger(object):
+    """Open incidents by correlation_id persisted as JSON"""
+
+    def __init__(self, path):
+        self.path = os.path.expanduser(path)
+        self.incidents = {}
+        self.reconciled_at = 0
+        self.updated_at = 0
+
+    @contextmanager
+    def locked(self):
+        """Hold the writer lock while reading, modifying and saving the ledger"""
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory, 0o700)
+        with open(self.path + '.lock', 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                self.load()
+                yield self
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def load(self):
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+        except (IOError, OSError, ValueError):
+            data = {}
+        if data.get('version') != LEDGER_VERSION:
+            data = {}
+        self.incidents = data.get('incidents', {})
+        self.reconciled_at = data.get('reconciled_at', 0)
+        self.updated_at = data.get('updated_at', 0)
+
+    def save(self):
+        handle, temp_path = tempfile.mkstemp(dir=os.path.dirname(self.path) or '.', prefix='.incident-ledger-')
+        with os.fdopen(handle, 'w') as f:
+            json.dump({
+                'version': LEDGER_VERSION,
+                'reconciled_at': self.reconciled_at,
+                'updated_at': self.updated_at,
+                'incidents': self.incidents,
+            }, f, sort_keys=True)
+        os.rename(temp_path, self.path)
+
+    def is_fresh(self, now, reconcile_interval):
+        return self.reconciled_at > 0 and now - self.reconciled_at < reconcile_interval
+
+    def expire(self):
+        """Force the next load to reconcile; return whether the ledger was fresh"""
+        if not self.reconciled_at:
+            return False
+        self.reconciled_at = 0
+        return True
+
+    def reconcile(self, index, now):
+        self.incidents = dict(
+            (correlation_id, [slim_record(record) for record in records])
+            for correlation_id, records in index.items() if correlation_id and records)
+        self.reconciled_at = now
+        self.updated_at = now
+
+    def record(self, overlay, now):
+        """Apply one host's run cache overlay; return (transitions, untrusted records)"""
+        transitions = 0
+        untrusted = 0
+        for correlation_id, records in overlay.items():
+            records = [slim_record(record) for record in records or []]
+            untrusted += len([record for record in records if not record['sys_id']])
+            if records:
+                if self.incidents.get(correlation_id) != records:
+                    self.incidents[correlation_id] = records
+                    transitions += 1
+            elif self.incidents.pop(correlation_id, None) is not None:
+                transitions += 1
+        if transitions:
+            self.updated_at = now
+        if untrusted:
+            self.reconciled_at = 0
+        return transitions, untrusted
+
+
+class ActionModule(ActionBase):
+    """Load, reconcile or record the persistent open incident ledger"""
+
+    TRANSFERS_FILES = False
+    _requires_connection = False
+
+    def run(self, tmp=None, task_vars=None):
+        if task_vars is None:
+            task_vars = {}
+
+        result = super(ActionModule, self).run(tmp, task_vars)
+        del tmp
+
+        _, args = self.validate_argument_spec(argument_spec=dict(
+            operation=dict(type='str', required=True, choices=['load', 'reconcile', 'record', 'expire']),
+            path=dict(type='path', required=True),
+            reconcile_interval=dict(type='int', default=900),
+            incidents=dict(type='dict'),
+            hosts=dict(type='list', elements='str', default=[]),
+            overlay_var=dict(type='str', default='servicenow_incident_cache_overlay'),
+        ))
+
+        ledger = IncidentLedger(args['path'])
+        now = int(time.time())
+        operation = args['operation']
+
+        try:
+            if operation == 'load':
+                ledger.load()
+                result.update(
+                    changed=False,
+                    fresh=ledger.is_fresh(now, args['reconcile_interval']),
+                    incidents=ledger.incidents,
+                    age=now - ledger.reconciled_at if ledger.reconciled_at else None,
+                )
+
+            elif operation == 'reconcile':
+                if args['incidents'] is None:
+                    raise AnsibleActionFail("incidents is required for operation=reconcile")
+                with ledger.locked():
+                    drift = sorted(set(ledger.incidents) ^ set(
+                        correlation_id for correlation_id, records in args['incidents'].items() if records))
+                    ledger.reconcile(args['incidents'], now)
+                    ledger.save()
+                result.update(changed=True, drift=drift, incidents=len(ledger.incidents))
+
+            elif operation == 'record':
+                hostvars = task_vars.get('hostvars', {})
+                transitions = 0
+                untrusted = 0
+                with ledger.locked():
+                    for host in args['hosts']:
+                        if host not in hostvars:
+                            continue
+                        overlay = self._templar.template(hostvars[host].get(args['overlay_var'], {}))
+                        host_transitions, host_untrusted = ledger.record(overlay or {}, now)
+                        transitions += host_transitions
+                        untrusted += host_untrusted
+                    if transitions or untrusted:
+                        ledger.save()
+                result.update(changed=transitions > 0, transitions=transitions,
+                              untrusted=untrusted, incidents=len(ledger.incidents))
+
+            elif operation == 'expire':
+                expired = False
+                if os.path.exists(ledger.path):
+                    with ledger.locked():
+                        expired = ledger.expire()
+                        if expired:
+                            ledger.save()
+                result.update(changed=expired)
+
+        except (IOError, OSError) as e:
+            raise AnsibleActionFail("Unable to access incident ledger %s: %s" % (args['path'], e))
+
+        return result
@@ -0,0 +1,390 @@
+#!/usr/bin/env python3
+"""
+Purpose: Adaptive per-host polling cadence - stability scores from run history decide which
+         hosts each cycle of a scheduled playbook polls
+Design Pattern: Tiered sampling over a persisted per-host score store; normal and slow hosts
+                are spread over their cycles by stable hash, like shard assignment
+Complexity: O(h + c) per cycle for h hosts and c history records changed since the last cycle
+            (only interface state files modified since then are read)
+
+A playbook with `adaptive` in its schedule configuration treats every cron fire time as one
+cycle. Before each cycle the control-node history written by the monitoring roles is read:
+
+  interface state    <storage>/<host>/interface-state.json (json backend; a rewritten file with
+                     different statuses is one transition) or the interface_history table of
+                     the SQLite backend (every recorded transition counts)
+  incident ledger    open incidents by correlation_id (servicenow_incident_ledger); incidents
+                     opened or closed since the last cycle count as transitions
+  event damping      transitions of damped subjects (event_damping) since the last cycle
+
+Each host's score decays by half every half_life seconds and grows by the transitions seen.
+Hosts with an open incident, a flapping subject or a score of at least fast_score are fast and
+polled every cycle; hosts without a transition for quiet_after seconds are slow and polled every
+slow_every cycles; the rest are normal and polled every normal_every cycles. At most max_fast
+(fraction of the hosts) are fast - the lowest scores beyond that are polled as normal. Every
+full_sweep_every cycles, and on the first cycle, every host is polled.
+
+Scores live in <log_path>/cadence/<service>.json (<service>@<shard>.json for systemd shard
+instances, which each score their own hosts).
+"""
+
+import hashlib
+import json
+import math
+import os
+import sqlite3
+import tempfile
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Sequence
+
+from scheduler_factory import ScheduledPlaybook, monitoring_cache_dir
+from sharding import resolve_hosts, shard_index
+
+STORE_VERSION = 1
+TIERS = ('fast', 'normal', 'slow')
+
+# Paths match the role defaults (interface_monitoring, servicenow_itsm); the ledger and damping
+# store live in monitoring_cache_dir
+DEFAULT_SOURCES = {
+    'interface_state_path': '/var/lib/ansible/interface-monitoring',
+    'interface_state_db': '/var/lib/ansible/interface-monitoring/interface-state.db',
+    'incident_ledger': 'servicenow_incident_ledger.json',
+    'event_damping': 'event_damping.json',
+}
+CACHE_SOURCES = ('incident_ledger', 'event_damping')
+
+DEFAULT_CADENCE = {
+    'normal_every': 2,
+    'slow_every': 6,
+    'full_sweep_every': 24,
+    'fast_score': 2.0,
+    'quiet_after': 86400,
+    'half_life': 86400,
+    'max_fast': 0.25,
+}
+
+
+def cadence_config(playbook: ScheduledPlaybook) -> Optional[Dict]:
+    """
+    Effective adaptive cadence settings of a playbook
+
+    Returns:
+        None when the playbook polls every host on every run (no `adaptive`, or enabled: false),
+        otherwise the defaults overlaid with the playbook's settings and sources
+    """
+    adaptive = playbook.adaptive
+    if not adaptive:
+        return None
+    if adaptive is True:
+        adaptive = {}
+    if not adaptive.get('enabled', True):
+        return None
+    config = dict(DEFAULT_CADENCE)
+    config.update((key, value) for key, value in adaptive.items() if key not in ('enabled', 'sources'))
+    sources = dict(DEFAULT_SOURCES)
+    for key in CACHE_SOURCES:
+        sources[key] = os.path.join(monitoring_cache_dir(), sources[key])
+    config['sources'] = dict(sources, **(adaptive.get('sources') or {}))
+    return config
+
+
+def _fingerprint(interfaces: Dict) -> str:
+    statuses = {name: record.get('status') if isinstance(record, dict) else record
+                for name, record in (interfaces or {}).items()}
+    return hashlib.sha256(json.dumps(statuses, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+
+def interface_state_changes(storage_path: str, hosts: Iterable[str], since: float,
+                            fingerprints: Dict[str, Optional[str]]) -> Dict[str, int]:
+    """
+    Hosts whose interface-state.json statuses changed since the last cycle (json backend)
+
+    Args:
+        storage_path: interface_monitoring_storage_path
+        hosts: Hosts to check
+        since: Epoch of the last cycle; older files are not read
+        fingerprints: Last status fingerprint per host, updated in place
+
+    Returns:
+        {host: 1} for every host whose statuses differ from its stored fingerprint
+    """
+    changes = {}
+    for host in hosts:
+        path = os.path.join(os.path.expanduser(storage_path), host, 'interface-state.json')
+        try:
+            if os.stat(path).st_mtime <= since and fingerprints.get(host):
+                continue
+            with open(path) as f:
+                fingerprint = _fingerprint(json.load(f))
+        except (OSError, ValueError, AttributeError):
+            continue
+        if fingerprints.get(host) not in (None, fingerprint):
+            changes[host] = 1
+        fingerprints[host] = fingerprint
+    return changes
+
+
+def interface_history_counts(db_path: str, since: float) -> Dict[str, int]:
+    """Interface transitions per host recorded after since (SQLite backend)"""
+    path = os.path.expanduser(db_path)
+    if not os.path.exists(path):
+        return {}
+    connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        rows = connection.execute('SELECT host, COUNT(*) FROM interface_history WHERE recorded_at > ? '
+                                  'GROUP BY host', (since,)).fetchall()
+    except sqlite3.Error:
+        return {}
+    finally:
+        connection.close()
+    return dict(rows)
+
+
+def host_of(correlation_id: str, hosts: Dict[str, str]) -> Optional[str]:
+    """
+    Host a correlation ID belongs to ('<prefix>_<host>' or '<prefix>_<host>_<subject>')
+
+    Args:
+        hosts: Lookup of host name and sanitized host name (non-alphanumerics as '_') -> host
+    """
+    positions = [index for index, character in enumerate(correlation_id) if character == '_']
+    for start in positions:
+        rest = correlation_id[start + 1:]
+        if rest in hosts:
+            return hosts[rest]
+        for end in positions:
+            if end > start and correlation_id[start + 1:end] in hosts:
+                return hosts[correlation_id[start + 1:end]]
+    return None
+
+
+def _host_lookup(hosts: Iterable[str]) -> Dict[str, str]:
+    lookup = {}
+    for host in hosts:
+        lookup[''.join(c if c.isalnum() else '_' for c in host)] = host
+        lookup[host] = host
+    return lookup
+
+
+def open_incidents(ledger_path: str, hosts: Iterable[str]) -> Dict[str, List[str]]:
+    """Correlation IDs of the open incidents in the ledger, by host"""
+    try:
+        with open(os.path.expanduser(ledger_path)) as f:
+            incidents = json.load(f).get('incidents', {})
+    except (OSError, ValueError, AttributeError):
+        return {}
+    lookup = _host_lookup(hosts)
+    by_host: Dict[str, List[str]] = {}
+    for correlation_id, records in incidents.items():
+        host = host_of(correlation_id, lookup) if records else None
+        if host:
+            by_host.setdefault(host, []).append(correlation_id)
+    return {host: sorted(ids) for host, ids in by_host.items()}
+
+
+def damping_activity(damping_path: str, hosts: Iterable[str], since: float) -> Dict[str, Dict]:
+    """
+    Damped subjects' activity by host
+
+    Returns:
+        {host: {'transitions': transitions after since, 'flapping': any subject flapping}}
+    """
+    try:
+        with open(os.path.expanduser(damping_path)) as f:
+            subjects = json.load(f).get('subjects', {})
+    except (OSError, ValueError, AttributeError):
+        return {}
+    known = set(hosts)
+    activity: Dict[str, Dict] = {}
+    for key, record in subjects.items():
+        parts = key.split('|', 2)
+        if len(parts) != 3 or parts[1] not in known:
+            continue
+        entry = activity.setdefault(parts[1], {'transitions': 0, 'flapping': False})
+        entry['transitions'] += len([stamp for stamp in record.get('transitions', []) if stamp > since])
+        entry['flapping'] = entry['flapping'] or bool(record.get('flapping'))
+    return activity
+
+
+@dataclass
+class CycleSelection:
+    """Hosts one cycle polls and the tiers they were drawn from"""
+    cycle: int
+    full_sweep: bool
+    hosts: List[str]
+    tiers: Dict[str, List[str]] = field(default_factory=dict)
+    demoted: int = 0
+
+    def summary(self) -> Dict:
+        return {'cycle': self.cycle, 'full_sweep': self.full_sweep, 'polled': len(self.hosts),
+                'tiers': {tier: len(hosts) for tier, hosts in self.tiers.items()}, 'demoted': self.demoted}
+
+
+class CadencePlanner:
+    """
+    Scores host stability from the monitoring history and picks the hosts each cycle polls
+    One store per playbook (or systemd shard instance) under <log_path>/cadence
+    """
+
+    def __init__(self, log_path: str, inventory_file: Optional[str] = None,
+                 clock: Callable[[], float] = time.time):
+        """
+        Initialize the planner
+
+        Args:
+            log_path: Scheduler log directory (stores go to <log_path>/cadence)
+            inventory_file: Inventory resolved when select() is not given the hosts
+            clock: Wall clock returning epoch seconds
+        """
+        self.directory = Path(log_path) / 'cadence'
+        self.inventory_file = inventory_file
+        self.clock = clock
+
+    def store_path(self, label: str) -> Path:
+        return self.directory / f"{label}.json"
+
+    def load(self, label: str) -> Dict:
+        try:
+            with open(self.store_path(label)) as f:
+                store = json.load(f)
+            if store.get('version') == STORE_VERSION:
+                return store
+        except (OSError, ValueError, AttributeError):
+            pass
+        return {'version': STORE_VERSION, 'cycle': 0, 'observed_at': 0.0, 'hosts': {}}
+
+    def save(self, label: str, store: Dict):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        handle, temporary = tempfile.mkstemp(dir=str(self.directory), prefix=f".{label}.")
+        with os.fdopen(handle, 'w') as f:
+            json.dump(store, f, separators=(',', ':'), sort_keys=True)
+        os.replace(temporary, self.store_path(label))
+
+    def observe(self, store: Dict, hosts: Sequence[str], config: Dict, now: float) -> Dict[str, bool]:
+        """
+        Fold the history since the last cycle into the host scores of a store
+
+        Returns:
+            {host: True} for hosts pinned to the fast tier (open incident or flapping subject)
+        """
+        sources = config['sources']
+        since = store['observed_at']
+        records = {host: store['hosts'].get(host) or {'score': 0.0, 'first_seen': now, 'last_change': None,
+                                                      'observed_at': now, 'fingerprint': None, 'open': []}
+                   for host in hosts}
+
+        fingerprints = {host: record['fingerprint'] for host, record in records.items()}
+        transitions = dict.fromkeys(hosts, 0)
+        sources_seen = [interface_state_changes(sources['interface_state_path'], hosts, since, fingerprints),
+                        # The first cycle seeds the scores with the last quiet_after seconds of history
+                        interface_history_counts(sources['interface_state_db'], since or now - config['quiet_after'])]
+        for counts in sources_seen:
+            for host, count in counts.items():
+                if host in transitions:
+                    transitions[host] += count
+
+        pinned = {}
+        incidents = open_incidents(sources['incident_ledger'], hosts)
+        for host, record in records.items():
+            current = incidents.get(host, [])
+            if since:
+                transitions[host] += len(set(current).symmetric_difference(record['open']))
+            record['open'] = current
+            pinned[host] = bool(current)
+        for host, activity in damping_activity(sources['event_damping'], hosts, since).items():
+            transitions[host] += activity['transitions']
+            pinned[host] = pinned[host] or activity['flapping']
+
+        for host, record in records.items():
+            elapsed = max(0.0, now - record['observed_at'])
+            record['score'] = round(record['score'] * math.pow(0.5, elapsed / config['half_life'])
+                                    + transitions[host], 4)
+            record['observed_at'] = now
+            record['fingerprint'] = fingerprints.get(host)
+            if transitions[host]:
+                record['last_change'] = now
+        store['hosts'] = records
+        store['observed_at'] = now
+        return pinned
+
+    def tiers(self, store: Dict, pinned: Dict[str, bool], config: Dict, now: float):
+        """
+        Assign every scored host to a tier, capping the fast tier at max_fast of the hosts
+
+        Returns:
+            ({tier: sorted hosts}, number of fast hosts demoted to normal by the cap)
+        """
+        tiers = {tier: [] for tier in TIERS}
+        for host, record in store['hosts'].items():
+            quiet_since = record['last_change'] or record['first_seen']
+            if pinned.get(host) or record['score'] >= config['fast_score']:
+                tiers['fast'].append(host)
+            elif now - quiet_since >= config['quiet_after']:
+                tiers['slow'].append(host)
+            else:
+                tiers['normal'].append(host)
+
+        limit = max(1, int(config['max_fast'] * len(store['hosts'])))
+        demoted = 0
+        if len(tiers['fast']) > limit:
+            ranked = sorted(tiers['fast'], key=lambda host: (pinned.get(host, False),
+                                                             store['hosts'][host]['score']), reverse=True)
+            tiers['fast'], overflow = ranked[:limit], ranked[limit:]
+            tiers['normal'].extend(overflow)
+            demoted = len(overflow)
+        return {tier: sorted(hosts) for tier, hosts in tiers.items()}, demoted
+
+    def select(self, playbook: ScheduledPlaybook, hosts: Optional[Sequence[str]] = None,
+               label: Optional[str] = None) -> Optional[CycleSelection]:
+        """
+        Score the hosts, pick this cycle's hosts and advance the playbook's cycle
+
+        Args:
+            playbook: Scheduled playbook
+            hosts: Hosts of the run (defaults to the playbook's inventory groups)
+            label: Store name (defaults to the playbook's service name)
+
+        Returns:
+            None for playbooks without adaptive cadence, otherwise the cycle's selection
+        """
+        config = cadence_config(playbook)
+        if config is None:
+            return None
+        if hosts is None:
+            hosts = resolve_hosts(self.inventory_file, playbook.inventory_groups)
+        label = label or playbook.systemd_service_name
+        now = self.clock()
+
+        store = self.load(label)
+        pinned = self.observe(store, sorted(set(hosts)), config, now)
+        tiers, demoted = self.tiers(store, pinned, config, now)
+        cycle = store['cycle']
+        full_sweep = cycle % config['full_sweep_every'] == 0
+
+        if full_sweep:
+            polled = sorted(store['hosts'])
+        else:
+            polled = list(tiers['fast'])
+            for tier, every in (('normal', config['normal_every']), ('slow', config['slow_every'])):
+                polled += [host for host in tiers[tier] if shard_index(host, every) == cycle % every]
+            polled.sort()
+
+        selection = CycleSelection(cycle, full_sweep, polled, tiers, demoted)
+        store['cycle'] = cycle + 1
+        store['last'] = dict(selection.summary(), at=now)
+        self.save(label, store)
+        return selection
+
+    def last_cycles(self, playbook: ScheduledPlaybook) -> Dict[str, Dict]:
+        """Summary of the latest cycle per store of a playbook (the service and its shard instances)"""
+        labels = [playbook.systemd_service_name]
+        labels += [f"{playbook.systemd_service_name}@{shard}" for shard in range(playbook.shards)]
+        cycles = {}
+        for label in labels:
+            if self.store_path(label).exists():
+                last = self.load(label).get('last')
+                if last:
+                    cycles[label] = last
+        return cycles
@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+"""
+Purpose: Cron expression compiler for systemd OnCalendar generation and fire time planning
+Design Pattern: Parser producing an immutable expression object with multiple back ends
+Complexity: O(f) to parse f field terms; O(d + n) to find n fire times across d scanned days
+
+Supports the standard five-field format (minute hour day-of-month month day-of-week) with
+`*`, ranges (`1-5`), lists (`1,15,30`), steps (`*/15`, `8-18/2`, `5/10`), month and weekday
+names (`jan`, `mon-fri`), weekday 7 as Sunday and the @hourly/@daily/@weekly/@monthly/@yearly
+macros. Day-of-month and day-of-week follow Vixie cron: when both are restricted (neither
+starts with `*`) a day matches if either field matches, otherwise both must match.
+"""
+
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from itertools import islice
+from typing import FrozenSet, Iterator, List, Optional, Tuple
+
+MACROS = {
+    '@yearly': '0 0 1 1 *',
+    '@annually': '0 0 1 1 *',
+    '@monthly': '0 0 1 * *',
+    '@weekly': '0 0 * * 0',
+    '@daily': '0 0 * * *',
+    '@midnight': '0 0 * * *',
+    '@hourly': '0 * * * *',
+}
+
+MONTH_NAMES = {name: index for index, name in enumerate(
+    ['jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec'], start=1)}
+WEEKDAY_NAMES = {name: index for index, name in enumerate(
+    ['sun', 'mon', 'tue', 'wed', 'thu', 'fri', 'sat'])}
+
+# systemd weekday names in systemd order (Monday first), indexed by cron weekday number
+SYSTEMD_WEEKDAYS = ['Sun', 'Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat']
+SYSTEMD_WEEKDAY_ORDER = [1, 2, 3, 4, 5, 6, 0]
+
+# Longest gap between fire times of a satisfiable expression (Feb 29 across a skipped leap year)
+MAX_SCAN_DAYS = 366 * 8
+
+
+class CronError(ValueError):
+    """Raised for cron expressions that cannot be parsed"""
+
+
+@dataclass(frozen=True)
+class CronField:
+    """One parsed cron field"""
+    name: str
+    values: FrozenSet[int]
+    restricted: bool  # False when the field text starts with '*'
+
+
+def _parse_value(text: str, field: str, names: Optional[dict]) -> int:
+    if names and text.lower() in names:
+        return names[text.lower()]
+    if not text.isdigit():
+        raise CronError(f"Invalid {field} value '{text}'")
+    return int(text)
+
+
+def _parse_field(text: str, field: str, minimum: int, maximum: int,
+                 names: Optional[dict] = None) -> CronField:
+    """
+    Parse one cron field into the set of values it selects
+
+    Args:
+        text: Field text, e.g. "*/15" or "mon-fri"
+        field: Field name for error messages
+        minimum: Lowest allowed value
+        maximum: Highest allowed value
+        names: Optional name -> value mapping (months, weekdays)
+
+    Returns:
+        CronField with the selected values
+    """
+    values = set()
+
+    for term in text.split(','):
+        if not term:
+            raise CronError(f"Empty list item in {field} field '{text}'")
+
+        base, has_step, step_text = term.partition('/')
+        step = 1
+        if has_step:
+            if not step_text.isdigit() or int(step_text) == 0:
+                raise CronError(f"Invalid step '{step_text}' in {field} field '{text}'")
+            step = int(step_text)
+
+        if base == '*':
+            start, end = minimum, maximum
+        elif '-' in base:
+            low, _, high = base.partition('-')
+            start = _parse_value(low, field, names)
+            end = _parse_value(high, field, names)
+        else:
+            start = _parse_value(base, field, names)
+            # "5/10" means every 10 starting at 5
+            end = maximum if has_step else start
+
+        if not minimum <= start <= maximum or not minimum <= end <= maximum:
+            raise CronError(f"{field} value out of range {minimum}-{maximum} in '{text}'")
+        if start > end:
+            raise CronError(f"Descending range '{base}' in {field} field")
+
+        values.update(range(start, end + 1, step))
+
+    return CronField(field, frozenset(values), restricted=not text.startswith('*'))
+
+
+def _encode_systemd(values: FrozenSet[int], minimum: int, maximum: int) -> str:
+    """
+    Encode a value set as a systemd calendar component
+
+    Uses '*' for the full range, 'start/step' for progressions that run to the end of the
+    range, and otherwise a list of single values and 'a..b' runs.
+    """
+    ordered = sorted(values)
+    if ordered == list(range(minimum, maximum + 1)):
+        return '*'
+
+    if len(ordered) > 2:
+        step = ordered[1] - ordered[0]
+        if step > 1 and ordered == list(range(ordered[0], maximum + 1, step)):
+            return f"{ordered[0]:02d}/{step}"
+
+    parts = []
+    run_start = previous = ordered[0]
+    for value in ordered[1:] + [None]:
+        if value is not None and value == previous + 1:
+            previous = value
+            continue
+        if previous - run_start >= 2:
+            parts.append(f"{run_start:02d}..{previous:02d}")
+        else:
+            parts.extend(f"{v:02d}" for v in range(run_start, previous + 1))
+        if value is not None:
+            run_start = previous = value
+    return ','.join(parts)
+
+
+def _encode_weekdays(weekdays: FrozenSet[int]) -> str:
+    """Encode cron weekday numbers as systemd weekday names, e.g. 'Mon..Fri' or 'Mon,Wed'"""
+    positions = [index for index, weekday in enumerate(SYSTEMD_WEEKDAY_ORDER) if weekday in weekdays]
+
+    parts = []
+    run_start = previous = positions[0]
+    for position in positions[1:] + [None]:
+        if position is not None and position == previous + 1:
+            previous = position
+            continue
+        names = [SYSTEMD_WEEKDAYS[SYSTEMD_WEEKDAY_ORDER[p]] for p in range(run_start, previous + 1)]
+        parts.append(f"{names[0]}..{names[-1]}" if len(names) > 2 else ','.join(names))
+        if position is not None:
+            run_start = previous = position
+    return ','.join(parts)
+
+
+class CronExpression:
+    """
+    Parsed five-field cron expression
+    Compiles to systemd OnCalendar expressions and enumerates fire times
+    """
+
+    def __init__(self, expression: str):
+        """
+        Parse a cron expression
+
+        Args:
+            expression: Cron schedule, e.g. "*/15 * * * *", "0 2 * * mon-fri" or "@daily"
+
+        Raises:
+            CronError: If the expression is malformed
+        """
+        self.expression = expression.strip()
+        text = MACROS.get(self.expression.lower(), self.expression)
+
+        fields = text.split()
+        if len(fields) != 5:
+            raise CronError(f"Expected 5 fields in cron expression '{expression}', got {len(fields)}")
+
+        self.minute = _parse_field(fields[0], 'minute', 0, 59)
+        self.hour = _parse_field(fields[1], 'hour', 0, 23)
+        self.day = _parse_field(fields[2], 'day-of-month', 1, 31)
+        self.month = _parse_field(fields[3], 'month', 1, 12, MONTH_NAMES)
+        weekday = _parse_field(fields[4], 'day-of-week', 0, 7, WEEKDAY_NAMES)
+        # 7 is an alias for Sunday
+        self.weekday = CronField(weekday.name, frozenset(v % 7 for v in weekday.values), weekday.restricted)
+
+        self._minutes: Tuple[int, ...] = tuple(sorted(self.minute.values))
+        self._hours: Tuple[int, ...] = tuple(sorted(self.hour.values))
+
+    def __repr__(self) -> str:
+        return f"CronExpression({self.expression!r})"
+
+    @property
+    def day_or_weekday(self) -> bool:
+        """True when both day fields are restricted and a day matches if either does"""
+        return self.day.restricted and self.weekday.restricted
+
+    def matches_day(self, day: date) -> bool:
+        """Check whether the expression fires on any minute of the given day"""
+        if day.month not in self.month.values:
+            return False
+        day_match = day.day in self.day.values
+        weekday_match = (day.weekday() + 1) % 7 in self.weekday.values
+        if self.day_or_weekday:
+            return day_match or weekday_match
+        return day_match and weekday_match
+
+    def matches(self, when: datetime) -> bool:
+        """Check whether the expression fires at the given minute"""
+        return (when.minute in self.minute.values
+                and when.hour in self.hour.values
+                and self.matches_day(when.date()))
+
+    def iter_fire_times(self, start: datetime) -> Iterator[datetime]:
+        """
+        Yield fire times strictly after start in ascending order
+
+        Args:
+            start: Reference time (naive or aware; tzinfo is carried through)
+
+        Stops after MAX_SCAN_DAYS days without a match (e.g. "0 0 30 2 *")
+        """
+        start = start.replace(second=0, microsecond=0)
+        day = start.date()
+        idle_days = 0
+
+        while idle_days < MAX_SCAN_DAYS:
+            if self.matches_day(day):
+                idle_days = 0
+                for hour in self._hours:
+                    if day == start.date() and hour < start.hour:
+                        continue
+                    for minute in self._minutes:
+                        candidate = start.replace(year=day.year, month=day.month, day=day.day,
+                                                  hour=hour, minute=minute)
+                        if candidate > start:
+                            yield candidate
+            else:
+                idle_days += 1
+            day += timedelta(days=1)
+
+    def next_fire_times(self, start: datetime, count: int = 1) -> List[datetime]:
+        """
+        Compute the next fire times strictly after start
+
+        Args:
+            start: Reference time (naive or aware; tzinfo is carried through)
+            count: Number of fire times to return
+
+        Returns:
+            Up to count datetimes in ascending order; fewer only if the expression cannot
+            fire again (e.g. "0 0 30 2 *")
+        """
+        return list(islice(self.iter_fire_times(start), count))
+
+    def fire_times_between(self, start: datetime, end: datetime) -> List[datetime]:
+        """Fire times in the half-open interval (start, end]"""
+        fire_times = []
+        for fire_time in self.iter_fire_times(start):
+            if fire_time > end:
+                break
+            fire_times.append(fire_time)
+        return fire_times
+
+    @property
+    def wraps_hourly(self) -> bool:
+        """True when the schedule fires every hour of every day, so minutes can wrap past :59"""
+        return (len(self.hour.values) == 24 and len(self.day.values) == 31
+                and len(self.month.values) == 12 and len(self.weekday.values) == 7)
+
+    def max_offset_seconds(self) -> int:
+        """Largest start offset to_oncalendar can express by shifting minutes and seconds"""
+        if self.wraps_hourly:
+            return 3599
+        return (59 - self._minutes[-1]) * 60 + 59
+
+    def to_oncalendar(self, offset_seconds: int = 0) -> List[str]:
+        """
+        Compile to systemd OnCalendar expressions
+
+        Args:
+            offset_seconds: Delay every fire time by this many seconds (0 to max_offset_seconds())
+
+        Returns:
+            One expression, or two when day-of-month and day-of-week are OR-ed (systemd
+            combines weekday and date with AND, so each side gets its own OnCalendar= line)
+
+        Raises:
+            CronError: If the offset would move fire times into another hour
+        """
+        if not 0 <= offset_seconds <= self.max_offset_seconds():
+            raise CronError(f"Offset {offset_seconds}s out of range 0-{self.max_offset_seconds()}s "
+                            f"for '{self.expression}'")
+        shift, seconds = divmod(offset_seconds, 60)
+        minutes = frozenset((minute + shift) % 60 for minute in self.minute.values)
+
+        time_part = (f"{_encode_systemd(self.hour.values, 0, 23)}:"
+                     f"{_encode_systemd(minutes, 0, 59)}:{seconds:02d}")
+        month = _encode_systemd(self.month.values, 1, 12)
+        days = _encode_systemd(self.day.values, 1, 31)
+
+        def calendar(weekdays: Optional[str], day_part: str) -> str:
+            prefix = f"{weekdays} " if weekdays else ''
+            return f"{prefix}*-{month}-{day_part} {time_part}"
+
+        weekdays = None
+        if len(self.weekday.values) < 7:
+            weekdays = _encode_weekdays(self.weekday.values)
+
+        if self.day_or_weekday:
+            return [calendar(None, days), calendar(weekdays, '*')]
+        return [calendar(weekdays, days)]
+
+
+def cron_to_oncalendar(expression: str) -> List[str]:
+    """Convenience wrapper: compile a cron expression to systemd OnCalendar expressions"""
+    return CronExpression(expression).to_oncalendar()
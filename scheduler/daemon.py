@@ -0,0 +1,596 @@
+#!/usr/bin/env python3
+"""
+Purpose: Resident scheduler that runs playbooks from a warm, pre-parsed Ansible executor
+Design Pattern: Prefork worker - one parent pays import/inventory/vault cost, each run is a fork
+Complexity: O(p) per scheduling tick for p playbooks; O(h) inventory and vault warm-up once
+            per inventory change for h hosts instead of once per run
+
+The systemd oneshot units start a fresh ansible-playbook for every run, repeating Python and
+collection imports, inventory parsing and vault decryption each time. The daemon does that
+work once in the parent (CLI option parsing, plugin loader, DataLoader with vault secrets,
+InventoryManager, VariableManager and every host's inventory variables), then forks a child
+per run that hands the warm objects straight to PlaybookExecutor. Forking keeps runs isolated:
+a run cannot leak state into the next one, and a hung run is killed with its process group.
+
+A playbook is never started while its previous run is still active, or while a unit or event
+run holds its run lock (the fire time is skipped and logged), and a run is terminated once it
+exceeds the playbook's timeout. Playbooks with an adaptive cadence are limited to the hosts the
+cadence planner picks for the cycle (cadence.py).
+
+The warm path relies on PlaybookCLI internals (CLI.run for option parsing, _play_prereqs) that
+are not a public API. It is used on the ansible-core versions in WARM_ANSIBLE_CORE; on any other
+version, or if those internals fail, each run is a cold ansible-playbook subprocess instead.
+"""
+
+import logging
+import os
+import signal
+import subprocess
+import sys
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence
+
+from cadence import CadencePlanner
+from cron import CronExpression
+from run_lock import acquire_run_lock
+from scheduler_factory import CACHE_DIR_ENV, ScheduledPlaybook, monitoring_cache_dir, playbook_command
+from sharding import resolve_hosts, split_hosts
+
+# Seconds between SIGTERM and SIGKILL for a run that exceeded its timeout
+KILL_GRACE = 10
+# Upper bound on a single sleep; time.sleep resumes after a signal handler, so this bounds
+# how long SIGTERM/SIGHUP wait to be acted on
+MAX_SLEEP = 5.0
+
+# ansible-core minor versions (inclusive) whose PlaybookCLI internals the warm executor uses
+WARM_ANSIBLE_CORE = ((2, 14), (2, 19))
+
+# Ansible's CLI context, plugin loader and vault secrets are process-wide and can only be
+# initialised once; the DataLoader created then is shared by every later prepare()
+_ansible_loader = None
+
+# Same environment the oneshot units set (see templates/systemd_service.j2)
+ANSIBLE_ENVIRONMENT = {
+    'ANSIBLE_HOST_KEY_CHECKING': 'False',
+    'ANSIBLE_STDOUT_CALLBACK': 'json',
+}
+
+
+class ForkedRun:
+    """Handle for one forked playbook run (poll/terminate/kill like subprocess.Popen)"""
+
+    def __init__(self, pid: int):
+        self.pid = pid
+        self.returncode: Optional[int] = None
+
+    def poll(self) -> Optional[int]:
+        if self.returncode is None:
+            pid, status = os.waitpid(self.pid, os.WNOHANG)
+            if pid:
+                self.returncode = os.waitstatus_to_exitcode(status)
+        return self.returncode
+
+    def _signal_group(self, signum: int):
+        try:
+            os.killpg(self.pid, signum)
+        except ProcessLookupError:
+            pass
+
+    def terminate(self):
+        self._signal_group(signal.SIGTERM)
+
+    def kill(self):
+        self._signal_group(signal.SIGKILL)
+
+
+class SpawnedRun(ForkedRun):
+    """Handle for a cold ansible-playbook subprocess leading its own process group"""
+
+    def __init__(self, process: subprocess.Popen):
+        super().__init__(process.pid)
+        self.process = process
+
+    def poll(self) -> Optional[int]:
+        self.returncode = self.process.poll()
+        return self.returncode
+
+
+def warm_executor_supported() -> bool:
+    """Whether the installed ansible-core is one the warm executor was written against"""
+    try:
+        from ansible.cli.playbook import PlaybookCLI
+        from ansible.release import __version__
+    except ImportError:
+        return False
+    try:
+        version = tuple(int(part) for part in __version__.split('.')[:2])
+    except ValueError:
+        return False
+    return (WARM_ANSIBLE_CORE[0] <= version <= WARM_ANSIBLE_CORE[1]
+            and callable(getattr(PlaybookCLI, '_play_prereqs', None)))
+
+
+class ShardedRun:
+    """Handle for the forked shards of one run; finished once every shard has exited"""
+
+    def __init__(self, runs: Sequence[ForkedRun]):
+        self.runs = list(runs)
+        self.pid = ','.join(str(run.pid) for run in self.runs)
+
+    def poll(self) -> Optional[int]:
+        codes = [run.poll() for run in self.runs]
+        if any(code is None for code in codes):
+            return None
+        return next((code for code in codes if code != 0), 0)
+
+    def terminate(self):
+        for run in self.runs:
+            run.terminate()
+
+    def kill(self):
+        for run in self.runs:
+            run.kill()
+
+
+class WarmAnsibleExecutor:
+    """
+    Keeps Ansible imported and the inventory, vault secrets and host variables loaded
+    Launches each playbook run in a forked child that reuses the warm objects
+    """
+
+    def __init__(self, project_path: str, inventory_file: str, log_path: str,
+                 vault_password_file: Optional[str] = None):
+        """
+        Initialize the executor (nothing is loaded until prepare())
+
+        Args:
+            project_path: Ansible project directory (ansible.cfg is read from here)
+            inventory_file: Inventory path, relative to the project unless absolute
+            log_path: Directory for per-playbook stdout/stderr logs
+            vault_password_file: Optional vault password file
+        """
+        self.project_path = Path(project_path)
+        self.inventory_file = str(self.project_path / inventory_file)
+        self.log_path = Path(log_path)
+        self.vault_password_file = vault_password_file
+        self.logger = logging.getLogger(__name__)
+
+        self._loader = None
+        self._inventory = None
+        self._variable_manager = None
+        self._inventory_stamp = None
+        self.cold = False
+
+    def _inventory_mtime(self) -> float:
+        """Latest modification time of the inventory source (file or directory tree)"""
+        source = Path(self.inventory_file)
+        if not source.exists():
+            return 0.0
+        if source.is_file():
+            return source.stat().st_mtime
+        return max((p.stat().st_mtime for p in source.rglob('*')), default=source.stat().st_mtime)
+
+    def prepare(self, playbooks: Sequence[ScheduledPlaybook]):
+        """
+        Import Ansible and load CLI options, plugins, inventory, vault and host variables
+
+        The CLI options, plugin loader and vault secrets are set up on the first call only;
+        later calls (inventory changes, SIGHUP) rebuild the inventory and variables. A changed
+        vault password therefore needs a daemon restart. Outside WARM_ANSIBLE_CORE, or when the
+        CLI internals fail, the executor switches to cold ansible-playbook runs for good.
+
+        Args:
+            playbooks: Playbooks that will be launched (their directories join the plugin path)
+        """
+        global _ansible_loader
+
+        os.chdir(self.project_path)
+        for key, value in ANSIBLE_ENVIRONMENT.items():
+            os.environ.setdefault(key, value)
+        os.environ.setdefault('ANSIBLE_RUN_METRICS_DIR', str(self.log_path / 'metrics'))
+        os.environ.setdefault(CACHE_DIR_ENV, monitoring_cache_dir())
+
+        if self.cold:
+            return
+        if _ansible_loader is None and not warm_executor_supported():
+            self._use_cold_runs("unsupported ansible-core version")
+            return
+
+        from ansible.cli import CLI
+        from ansible.cli.playbook import PlaybookCLI
+        from ansible.inventory.manager import InventoryManager
+        from ansible.plugins.loader import add_all_plugin_dirs
+        from ansible.utils.collection_loader import AnsibleCollectionConfig
+        from ansible.vars.manager import VariableManager
+
+        started = time.monotonic()
+        stamp = self._inventory_mtime()
+
+        if _ansible_loader is None:
+            args = ['ansible-playbook', '-i', self.inventory_file]
+            if self.vault_password_file:
+                args += ['--vault-password-file', self.vault_password_file]
+            args += [playbook.path for playbook in playbooks]
+
+            cli = PlaybookCLI(args)
+            try:
+                # Option parsing and plugin loader initialisation, without running anything
+                CLI.run(cli)
+                _ansible_loader, self._inventory, self._variable_manager = cli._play_prereqs()
+            except (AttributeError, TypeError, ValueError) as e:
+                self._use_cold_runs(f"PlaybookCLI internals changed ({e})")
+                return
+        else:
+            self._inventory = InventoryManager(loader=_ansible_loader, sources=[self.inventory_file])
+            self._variable_manager = VariableManager(loader=_ansible_loader, inventory=self._inventory,
+                                                     version_info=CLI.version_info(gitinfo=False))
+        self._loader = _ansible_loader
+
+        playbook_dirs = sorted({os.path.dirname(os.path.abspath(playbook.path)) for playbook in playbooks})
+        for playbook_dir in playbook_dirs:
+            add_all_plugin_dirs(playbook_dir)
+        AnsibleCollectionConfig.playbook_paths = playbook_dirs
+        # Decrypts vaulted group_vars/host_vars once; the loader keeps the results cached
+        hosts = self._inventory.get_hosts()
+        for host in hosts:
+            self._variable_manager.get_vars(host=host)
+        self._inventory_stamp = stamp
+
+        self.logger.info(f"Warm executor ready: {len(hosts)} hosts loaded in "
+                         f"{time.monotonic() - started:.2f}s")
+
+    def _use_cold_runs(self, reason: str):
+        self.cold = True
+        self.logger.warning(f"Warm executor disabled: {reason}; every run starts a cold ansible-playbook "
+                            f"(warm runs need ansible-core {WARM_ANSIBLE_CORE[0][0]}.{WARM_ANSIBLE_CORE[0][1]}"
+                            f" to {WARM_ANSIBLE_CORE[1][0]}.{WARM_ANSIBLE_CORE[1][1]})")
+
+    def refresh_if_changed(self, playbooks: Sequence[ScheduledPlaybook]):
+        """Reload inventory and variables when the inventory source changed on disk"""
+        if self.cold:
+            return
+        if self._inventory is None or self._inventory_mtime() != self._inventory_stamp:
+            self.logger.info(f"Inventory {self.inventory_file} changed, reloading")
+            self.prepare(playbooks)
+
+    def launch(self, playbook: ScheduledPlaybook, hosts: Optional[Sequence[str]] = None):
+        """
+        Fork a child per shard that runs the playbook with the warm objects
+
+        Args:
+            playbook: Playbook to run
+            hosts: Limit the run to these hosts (adaptive cadence); None runs every host
+
+        Returns:
+            ForkedRun handle, or ShardedRun when the playbook has shards > 1; each child leads
+            its own process group so Ansible workers are terminated with it. None when a unit
+            or event run holds the playbook's run lock; nothing was started then.
+        """
+        if self._inventory is None and not self.cold:
+            raise RuntimeError("prepare() must be called before launch()")
+
+        self.log_path.mkdir(parents=True, exist_ok=True)
+        if playbook.shards > 1 and hosts is None:
+            if self.cold:
+                hosts = resolve_hosts(self.inventory_file, playbook.inventory_groups)
+            else:
+                hosts = set()
+                for group in playbook.inventory_groups:
+                    hosts.update(host.name for host in self._inventory.get_hosts(pattern=group))
+
+        # Taken before forking so the run's timeout only counts once it can actually start;
+        # the children inherit the lock and the parent's copy is closed right away
+        lock = acquire_run_lock(str(self.log_path), playbook, shared=playbook.shards > 1, wait=False)
+        if lock is None:
+            return None
+        # playbook_args can only be parsed by a fresh ansible-playbook
+        start = self._spawn if self.cold or playbook.playbook_args else self._fork
+        try:
+            if playbook.shards == 1:
+                return start(playbook, playbook.systemd_service_name, hosts, lock)
+            return ShardedRun([
+                start(playbook, f"{playbook.systemd_service_name}@{shard}", limit, lock)
+                for shard, limit in enumerate(split_hosts(sorted(hosts), playbook.shards)) if limit
+            ])
+        finally:
+            os.close(lock)
+
+    def _spawn(self, playbook: ScheduledPlaybook, log_name: str, limit: Optional[Sequence[str]],
+               lock: int) -> SpawnedRun:
+        """Start one cold ansible-playbook run, optionally limited to the given hosts"""
+        command = playbook_command(playbook, self.inventory_file)
+        if self.vault_password_file:
+            command += ['--vault-password-file', self.vault_password_file]
+        env = dict(os.environ)
+        if limit is not None:
+            limit_file = self.log_path / f"{log_name}.limit"
+            limit_file.write_text('\n'.join(limit) + '\n')
+            command += ['--limit', f"@{limit_file}"]
+            env['ANSIBLE_RUN_METRICS_SHARD'] = log_name.partition('@')[2]
+        with open(self.log_path / f"{log_name}.log", 'a') as stdout, \
+                open(self.log_path / f"{log_name}.error.log", 'a') as stderr:
+            return SpawnedRun(subprocess.Popen(
+                command, cwd=str(self.project_path), env=env, stdin=subprocess.DEVNULL,
+                stdout=stdout, stderr=stderr, pass_fds=(lock,), start_new_session=True,
+            ))
+
+    def _fork(self, playbook: ScheduledPlaybook, log_name: str, limit: Optional[Sequence[str]],
+              lock: int) -> ForkedRun:
+        """Fork one child running the playbook, optionally limited to the given hosts"""
+        stdout_path = self.log_path / f"{log_name}.log"
+        stderr_path = self.log_path / f"{log_name}.error.log"
+
+        sys.stdout.flush()
+        sys.stderr.flush()
+        pid = os.fork()
+        if pid:
+            try:
+                # Also set from the parent so terminate() cannot race the child's setpgid
+                os.setpgid(pid, pid)
+            except OSError:
+                pass
+            return ForkedRun(pid)
+
+        # Child: never return into the parent's scheduling loop
+        exit_code = 250
+        try:
+            os.setpgid(0, 0)
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            signal.signal(signal.SIGHUP, signal.SIG_DFL)
+
+            stdin = os.open(os.devnull, os.O_RDONLY)
+            stdout = os.open(stdout_path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+            stderr = os.open(stderr_path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+            os.dup2(stdin, 0)
+            os.dup2(stdout, 1)
+            os.dup2(stderr, 2)
+            # Display writes through sys.stdout/sys.stderr, which may not wrap fds 1 and 2
+            sys.stdout = open(1, 'w', buffering=1, closefd=False)
+            sys.stderr = open(2, 'w', buffering=1, closefd=False)
+
+            from ansible import context
+            from ansible.executor.playbook_executor import PlaybookExecutor
+            from ansible.utils.context_objects import CLIArgs
+
+            # The run lock taken by launch() stays held until this child and its workers exit
+            # Same connection timeout as the --timeout of playbook_command, for this child only
+            context.CLIARGS = CLIArgs(dict(context.CLIARGS, timeout=playbook.timeout))
+            if limit is not None:
+                self._inventory.subset(list(limit))
+                # Plugin options are read when the child loads its callbacks
+                os.environ['ANSIBLE_RUN_METRICS_SHARD'] = log_name.partition('@')[2]
+            executor = PlaybookExecutor(playbooks=[playbook.path], inventory=self._inventory,
+                                        variable_manager=self._variable_manager, loader=self._loader,
+                                        passwords={})
+            exit_code = executor.run()
+        except BaseException as e:
+            try:
+                os.write(2, f"Scheduled run of {playbook.name} failed: {e}\n".encode())
+            except OSError:
+                pass
+        finally:
+            try:
+                sys.stdout.flush()
+                sys.stderr.flush()
+            finally:
+                os._exit(exit_code if isinstance(exit_code, int) else 250)
+
+
+@dataclass
+class ActiveRun:
+    """A run in progress"""
+    handle: object
+    started: float
+    deadline: float
+    killed_at: Optional[float] = None
+
+
+@dataclass
+class PlaybookState:
+    """Scheduling state for one playbook"""
+    playbook: ScheduledPlaybook
+    expression: CronExpression
+    offset: int
+    next_due: float = 0.0
+    active: Optional[ActiveRun] = None
+    runs: int = 0
+    skipped: int = 0
+    idle: int = 0
+    timeouts: int = 0
+    last_exit: Optional[int] = None
+    last_duration: Optional[float] = None
+
+
+class SchedulerDaemon:
+    """
+    Triggers scheduled playbooks on their cron schedules from one resident process
+    Enforces one active run per playbook and the playbook's timeout
+    """
+
+    def __init__(self, playbooks: Sequence[ScheduledPlaybook], executor,
+                 offsets: Optional[Dict[str, int]] = None,
+                 clock: Callable[[], float] = time.time,
+                 cadence: Optional[CadencePlanner] = None):
+        """
+        Initialize the daemon
+
+        Args:
+            playbooks: Validated scheduled playbooks
+            executor: Object with prepare(playbooks), refresh_if_changed(playbooks) and
+                      launch(playbook[, hosts]) -> handle with poll()/terminate()/kill(),
+                      or None when the playbook's run lock is held elsewhere
+            offsets: Planner start offsets in seconds per playbook name (see planner.py)
+            clock: Wall clock returning epoch seconds
+            cadence: Picks the hosts of adaptive playbooks' cycles (see cadence.py)
+        """
+        self.executor = executor
+        self.clock = clock
+        self.cadence = cadence
+        self.logger = logging.getLogger(__name__)
+        self._stopping = False
+        self._reload_requested = False
+        self.states: Dict[str, PlaybookState] = {}
+        self.load_playbooks(playbooks, offsets or {})
+
+    def load_playbooks(self, playbooks: Sequence[ScheduledPlaybook], offsets: Dict[str, int]):
+        """Replace the schedule; runs already in progress are kept"""
+        now = self.clock()
+        states = {}
+        for playbook in playbooks:
+            previous = self.states.get(playbook.name)
+            state = PlaybookState(playbook, CronExpression(playbook.schedule), offsets.get(playbook.name, 0))
+            if previous:
+                state.active = previous.active
+                state.runs, state.skipped, state.timeouts = previous.runs, previous.skipped, previous.timeouts
+                state.idle = previous.idle
+                state.last_exit = previous.last_exit
+            state.next_due = self._next_due(state, now)
+            states[playbook.name] = state
+        self.states = states
+
+    def _next_due(self, state: PlaybookState, after: float) -> float:
+        """Next fire time (epoch seconds) strictly after the given time, offset applied"""
+        reference = datetime.fromtimestamp(after) - timedelta(seconds=state.offset)
+        fire_times = state.expression.next_fire_times(reference, 1)
+        if not fire_times:
+            return float('inf')
+        return (fire_times[0] + timedelta(seconds=state.offset)).timestamp()
+
+    def _reap(self, state: PlaybookState, now: float):
+        """Collect a finished run, or terminate/kill one that exceeded its timeout"""
+        run = state.active
+        returncode = run.handle.poll()
+        if returncode is not None:
+            state.active = None
+            state.last_exit = returncode
+            state.last_duration = now - run.started
+            level = logging.INFO if returncode == 0 else logging.WARNING
+            self.logger.log(level, f"{state.playbook.name} finished with exit code {returncode} "
+                                   f"after {now - run.started:.1f}s")
+            return
+
+        if run.killed_at is None and now >= run.deadline:
+            self.logger.error(f"{state.playbook.name} exceeded its {state.playbook.timeout}s timeout, terminating")
+            run.handle.terminate()
+            run.killed_at = now
+            state.timeouts += 1
+        elif run.killed_at is not None and now >= run.killed_at + KILL_GRACE:
+            run.handle.kill()
+
+    def _cycle_hosts(self, playbook: ScheduledPlaybook) -> Optional[List[str]]:
+        """Hosts an adaptive playbook's cycle polls; None runs every host"""
+        if self.cadence is None:
+            return None
+        try:
+            selection = self.cadence.select(playbook)
+        except Exception as e:
+            # Unreadable history or inventory must not cost a cycle
+            self.logger.warning(f"Adaptive cadence of {playbook.name} failed, polling every host: {e}")
+            return None
+        if selection is None or selection.full_sweep:
+            if selection:
+                self.logger.info(f"{playbook.name} cycle {selection.cycle}: full sweep of "
+                                 f"{len(selection.hosts)} hosts")
+            return None
+        tiers = ', '.join(f"{len(hosts)} {tier}" for tier, hosts in selection.tiers.items())
+        self.logger.info(f"{playbook.name} cycle {selection.cycle}: polling {len(selection.hosts)} hosts ({tiers})")
+        return selection.hosts
+
+    def tick(self) -> float:
+        """
+        Reap finished runs, enforce timeouts and launch due playbooks
+
+        Returns:
+            Seconds until the next scheduled fire time or timeout check
+        """
+        now = self.clock()
+        wake = now + MAX_SLEEP
+
+        due = []
+        for state in self.states.values():
+            if state.active:
+                self._reap(state, now)
+            if now >= state.next_due:
+                due.append(state)
+
+        if due:
+            self.executor.refresh_if_changed([state.playbook for state in self.states.values()])
+
+        for state in due:
+            if state.active:
+                state.skipped += 1
+                self.logger.warning(f"Skipping {state.playbook.name} run: previous run (pid "
+                                    f"{getattr(state.active.handle, 'pid', '?')}) still active")
+            else:
+                hosts = self._cycle_hosts(state.playbook)
+                if hosts == []:
+                    state.idle += 1
+                else:
+                    handle = (self.executor.launch(state.playbook) if hosts is None
+                              else self.executor.launch(state.playbook, hosts))
+                    if handle is None:
+                        state.skipped += 1
+                        self.logger.warning(f"Skipping {state.playbook.name} run: another run holds its run lock")
+                    else:
+                        state.active = ActiveRun(handle, now, now + state.playbook.timeout)
+                        state.runs += 1
+                        self.logger.info(f"Started {state.playbook.name} (pid {getattr(handle, 'pid', '?')})")
+            state.next_due = self._next_due(state, now)
+
+        for state in self.states.values():
+            wake = min(wake, state.next_due)
+            if state.active:
+                # Poll running jobs at least once a second; wake for the timeout too
+                wake = min(wake, now + 1.0, state.active.deadline)
+        return max(0.0, wake - now)
+
+    def request_stop(self, *_):
+        self._stopping = True
+
+    def request_reload(self, *_):
+        self._reload_requested = True
+
+    def shutdown(self, grace: float = KILL_GRACE):
+        """Terminate active runs and wait up to grace seconds before killing them"""
+        active = [state for state in self.states.values() if state.active]
+        for state in active:
+            self.logger.info(f"Stopping {state.playbook.name} (pid {getattr(state.active.handle, 'pid', '?')})")
+            state.active.handle.terminate()
+        deadline = time.monotonic() + grace
+        while active and time.monotonic() < deadline:
+            active = [state for state in active if state.active.handle.poll() is None]
+            time.sleep(0.2)
+        for state in active:
+            state.active.handle.kill()
+            state.active.handle.poll()
+
+    def run_forever(self, reload: Optional[Callable[[], None]] = None):
+        """
+        Main loop until SIGTERM/SIGINT
+
+        Args:
+            reload: Called on SIGHUP to rediscover playbooks (then call load_playbooks)
+        """
+        signal.signal(signal.SIGTERM, self.request_stop)
+        signal.signal(signal.SIGINT, self.request_stop)
+        signal.signal(signal.SIGHUP, self.request_reload)
+
+        self.executor.prepare([state.playbook for state in self.states.values()])
+        for state in sorted(self.states.values(), key=lambda s: s.next_due):
+            self.logger.info(f"{state.playbook.name}: next run "
+                             f"{datetime.fromtimestamp(state.next_due):%Y-%m-%d %H:%M:%S}")
+
+        try:
+            while not self._stopping:
+                if self._reload_requested:
+                    self._reload_requested = False
+                    if reload:
+                        reload()
+                    self.executor.prepare([state.playbook for state in self.states.values()])
+                time.sleep(self.tick())
+        finally:
+            self.shutdown()
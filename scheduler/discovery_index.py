@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Purpose: Persistent index of parsed playbook and role defaults files for scheduler discovery
+Design Pattern: Content-addressed memoisation - (mtime, size) fast path, sha256 confirmation
+Complexity: O(f) stat calls per discovery for f indexed files; only changed files are read
+            and YAML-parsed
+
+Each indexed file is stored by absolute path with its mtime_ns, size, sha256 and the data
+extracted from it. A file whose mtime and size are unchanged is trusted without being read;
+otherwise it is read and hashed, and only re-parsed if the hash differs (a touch or a checkout
+that rewrites identical content costs a hash, not a parse). Callers keep derived results in
+the entry together with the hashes of the files they depended on (see
+SchedulerFactory._parse_playbook_config), so a changed role defaults file invalidates exactly
+the playbooks that inherited from it.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Optional
+
+import yaml
+
+# libyaml's loader is several times faster than the pure-Python one when PyYAML was built with it
+SafeLoader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+INDEX_VERSION = 1
+# Files modified this recently may change again within the same mtime tick without the size
+# changing; their mtime is not trusted on the next lookup (git's "racy clean" problem)
+RACY_WINDOW_NS = 2 * 10**9
+DEFAULT_INDEX_PATH = Path.home() / '.cache' / 'ansible-monitoring-scheduler' / 'discovery.json'
+INDEX_PATH_ENV = 'ANSIBLE_SCHEDULER_INDEX'
+
+
+def load_yaml(stream) -> Any:
+    """yaml.safe_load using the C loader when available"""
+    return yaml.load(stream, Loader=SafeLoader)
+
+
+class DiscoveryIndex:
+    """
+    Persistent mapping of file path -> fingerprint and extracted data
+    Saved atomically as JSON; a missing, corrupt or older-version index is simply rebuilt
+    """
+
+    def __init__(self, path: Optional[str]):
+        """
+        Args:
+            path: Index file location; None or '' keeps the index in memory only
+        """
+        self.path = Path(path) if path else None
+        self.entries: Dict[str, Dict] = {}
+        self.stats: Counter = Counter()
+        self.dirty = False
+        self.logger = logging.getLogger(__name__)
+        self._load()
+
+    def _load(self):
+        if not self.path or not self.path.exists():
+            return
+        try:
+            with open(self.path, 'r') as f:
+                document = json.load(f)
+            if document.get('version') == INDEX_VERSION:
+                self.entries = document.get('entries', {})
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"Ignoring unreadable discovery index {self.path}: {e}")
+
+    def save(self):
+        """Write the index if anything changed (atomic rename, never a partial file)"""
+        if not self.path or not self.dirty:
+            return
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=str(self.path.parent), prefix='.discovery-')
+            with os.fdopen(fd, 'w') as f:
+                json.dump({'version': INDEX_VERSION, 'entries': self.entries}, f)
+            os.replace(tmp_path, self.path)
+            self.dirty = False
+        except OSError as e:
+            self.logger.warning(f"Could not save discovery index {self.path}: {e}")
+
+    def entry(self, path: Path, parse: Optional[Callable[[bytes], Any]] = None) -> Optional[Dict]:
+        """
+        Current index entry for a file, re-parsing it only if its content changed
+
+        Args:
+            path: File to look up
+            parse: Extracts the data to cache from the file content (required the first time
+                   a file is seen and whenever its content changes)
+
+        Returns:
+            Entry dict with 'sha256' and 'data' (callers may add derived keys, which are
+            dropped when the content changes), or None if the file does not exist
+        """
+        key = str(Path(path).resolve())
+        try:
+            st = os.stat(key)
+        except OSError:
+            if self.entries.pop(key, None) is not None:
+                self.dirty = True
+            return None
+
+        entry = self.entries.get(key)
+        if entry and entry['mtime_ns'] == st.st_mtime_ns and entry['size'] == st.st_size:
+            self.stats['unchanged'] += 1
+            return entry
+
+        with open(key, 'rb') as f:
+            content = f.read()
+        digest = hashlib.sha256(content).hexdigest()
+        self.dirty = True
+        mtime_ns = 0 if time.time_ns() - st.st_mtime_ns < RACY_WINDOW_NS else st.st_mtime_ns
+
+        if entry and entry['sha256'] == digest:
+            self.stats['rehashed'] += 1
+            entry.update(mtime_ns=mtime_ns, size=st.st_size)
+            return entry
+
+        if parse is None:
+            raise ValueError(f"No parser given for new or changed file {key}")
+        self.stats['parsed'] += 1
+        entry = {'mtime_ns': mtime_ns, 'size': st.st_size, 'sha256': digest, 'data': parse(content)}
+        self.entries[key] = entry
+        return entry
+
+    def prune(self, directory: Path, keep: Iterable[Path]):
+        """Drop entries under a directory that are not in keep (deleted files)"""
+        prefix = str(Path(directory).resolve()) + os.sep
+        keep_keys = {str(Path(path).resolve()) for path in keep}
+        for key in [k for k in self.entries if k.startswith(prefix) and k not in keep_keys]:
+            del self.entries[key]
+            self.dirty = True
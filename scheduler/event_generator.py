@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Purpose: Local traffic generator for the event listener - Cisco-style syslog messages and
+         SNMPv1/v2c linkDown/linkUp/coldStart traps sent over UDP or TCP
+Design Pattern: Message builders plus thin socket senders; the builders are shared with the
+                scheduler tests
+Complexity: O(n) for n messages
+
+Usage:
+  python3 event_generator.py link --host core-sw-01 --interface GigabitEthernet1/0/1 --state down
+  python3 event_generator.py link --host 10.1.1.1 --interface Gi1/0/1 --state down --trap --version 1
+  python3 event_generator.py storm --hosts core-sw-01,access-sw-01 --count 200 --rate 100
+  python3 event_generator.py restart --host access-sw-02 --tcp
+"""
+
+import argparse
+import ipaddress
+import random
+import socket
+import time
+from datetime import datetime
+from typing import List, Optional, Sequence, Tuple
+
+from event_listener import (GENERIC_TRAPS, IF_INDEX, IF_NAME, INTEGER, IP_ADDRESS, NULL, OBJECT_IDENTIFIER,
+                            OCTET_STRING, SEQUENCE, SNMP_TRAP_ADDRESS, SNMP_TRAP_OID, TIMETICKS,
+                            TRAP_V1_PDU, TRAP_V2_PDU)
+
+TRAP_OIDS = {'down': '1.3.6.1.6.3.1.1.5.3', 'up': '1.3.6.1.6.3.1.1.5.4',
+             'restart': '1.3.6.1.6.3.1.1.5.1'}
+SYS_UPTIME = '1.3.6.1.2.1.1.3.0'
+
+
+def _tlv(tag: int, value: bytes) -> bytes:
+    length = len(value)
+    if length < 0x80:
+        return bytes([tag, length]) + value
+    encoded = length.to_bytes((length.bit_length() + 7) // 8, 'big')
+    return bytes([tag, 0x80 | len(encoded)]) + encoded + value
+
+
+def _integer(tag: int, value: int) -> bytes:
+    size = max(1, (value.bit_length() + 8) // 8)
+    return _tlv(tag, value.to_bytes(size, 'big', signed=True))
+
+
+def _oid(oid: str) -> bytes:
+    parts = [int(part) for part in oid.split('.')]
+    encoded = bytearray([parts[0] * 40 + parts[1]])
+    for part in parts[2:]:
+        chunk = [part & 0x7F]
+        part >>= 7
+        while part:
+            chunk.append(0x80 | (part & 0x7F))
+            part >>= 7
+        encoded.extend(reversed(chunk))
+    return _tlv(OBJECT_IDENTIFIER, bytes(encoded))
+
+
+def _value(value) -> bytes:
+    if isinstance(value, tuple):      # (tag, raw) for typed values
+        tag, raw = value
+        if tag == IP_ADDRESS:
+            return _tlv(IP_ADDRESS, ipaddress.IPv4Address(raw).packed)
+        if tag == OBJECT_IDENTIFIER:
+            return _oid(raw)
+        return _integer(tag, raw)
+    if isinstance(value, int):
+        return _integer(INTEGER, value)
+    if value is None:
+        return _tlv(NULL, b'')
+    return _tlv(OCTET_STRING, str(value).encode('utf-8'))
+
+
+def _varbinds(varbinds: Sequence[Tuple[str, object]]) -> bytes:
+    return _tlv(SEQUENCE, b''.join(_tlv(SEQUENCE, _oid(oid) + _value(value)) for oid, value in varbinds))
+
+
+def trap(state: str, interface: Optional[str] = None, if_index: int = 1, community: str = 'public',
+         version: str = '2c', agent: Optional[str] = None, uptime: int = 0) -> bytes:
+    """
+    SNMP trap for an interface state change (down/up) or a device restart
+
+    Args:
+        state: down, up or restart
+        interface: ifName sent with link traps
+        if_index: Interface index of the ifIndex/ifName varbinds
+        community: Community string
+        version: '1' or '2c'
+        agent: Device address (v1 agent-addr, v2c snmpTrapAddress) - lets traps sent from
+               localhost stand in for a device
+        uptime: sysUpTime in hundredths of a second
+    """
+    varbinds = []
+    if state in ('down', 'up'):
+        varbinds += [(IF_INDEX + str(if_index), if_index)]
+        if interface:
+            varbinds += [(IF_NAME + str(if_index), interface)]
+
+    if version == '1':
+        generic = next(number for number, oid in GENERIC_TRAPS.items() if oid == TRAP_OIDS[state])
+        pdu = _tlv(TRAP_V1_PDU, _oid('1.3.6.1.4.1.9') + _value((IP_ADDRESS, agent or '0.0.0.0'))
+                   + _integer(INTEGER, generic) + _integer(INTEGER, 0) + _integer(TIMETICKS, uptime)
+                   + _varbinds(varbinds))
+        version_number = 0
+    else:
+        header = [(SYS_UPTIME, (TIMETICKS, uptime)), (SNMP_TRAP_OID, (OBJECT_IDENTIFIER, TRAP_OIDS[state]))]
+        if agent:
+            header.append((SNMP_TRAP_ADDRESS, (IP_ADDRESS, agent)))
+        pdu = _tlv(TRAP_V2_PDU, _integer(INTEGER, random.randint(1, 2 ** 31 - 1)) + _integer(INTEGER, 0)
+                   + _integer(INTEGER, 0) + _varbinds(header + varbinds))
+        version_number = 1
+    return _tlv(SEQUENCE, _integer(INTEGER, version_number) + _value(community) + pdu)
+
+
+def syslog(state: str, hostname: str, interface: Optional[str] = None, sequence: int = 1,
+           lineprotocol: bool = False) -> bytes:
+    """Cisco IOS syslog message (RFC 3164 header with the hostname) for a link change or restart"""
+    now = datetime.now()
+    stamp = f"{now:%b} {now.day:2d} {now:%H:%M:%S}"
+    if state == 'restart':
+        body = '%SYS-5-RESTART: System restarted --'
+        pri = 189
+    elif lineprotocol:
+        body = f"%LINEPROTO-5-UPDOWN: Line protocol on Interface {interface}, changed state to {state}"
+        pri = 189
+    else:
+        body = f"%LINK-3-UPDOWN: Interface {interface}, changed state to {state}"
+        pri = 187
+    return f"<{pri}>{stamp} {hostname} {sequence}: {body}".encode('utf-8')
+
+
+def send_udp(messages: Sequence[bytes], target: str, port: int, rate: float = 0.0):
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        for message in messages:
+            sock.sendto(message, (target, port))
+            if rate > 0:
+                time.sleep(1.0 / rate)
+
+
+def send_tcp(messages: Sequence[bytes], target: str, port: int, rate: float = 0.0):
+    """One connection, RFC 6587 octet-counted framing"""
+    with socket.create_connection((target, port)) as sock:
+        for message in messages:
+            sock.sendall(str(len(message)).encode() + b' ' + message)
+            if rate > 0:
+                time.sleep(1.0 / rate)
+
+
+def storm(hosts: Sequence[str], count: int, interfaces: int = 48, seed: Optional[int] = None) -> List[Tuple[str, str, str]]:
+    """(host, interface, state) link events of a flapping storm across the given hosts"""
+    generator = random.Random(seed)
+    return [(generator.choice(hosts), f"GigabitEthernet1/0/{generator.randint(1, interfaces)}",
+             generator.choice(('down', 'up'))) for _ in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Send test syslog messages and SNMP traps to the event listener")
+    parser.add_argument('--target', default='127.0.0.1')
+    parser.add_argument('--syslog-port', type=int, default=5514)
+    parser.add_argument('--trap-port', type=int, default=1162)
+    parser.add_argument('--trap', action='store_true', help="Send SNMP traps instead of syslog")
+    parser.add_argument('--version', choices=['1', '2c'], default='2c', help="SNMP version of traps")
+    parser.add_argument('--community', default='public')
+    parser.add_argument('--tcp', action='store_true', help="Send syslog over TCP")
+    parser.add_argument('--rate', type=float, default=0.0, help="Messages per second (0: as fast as possible)")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    link = subparsers.add_parser('link', help="One interface state change")
+    link.add_argument('--host', required=True, help="Hostname (syslog) or device address (traps)")
+    link.add_argument('--interface', default='GigabitEthernet1/0/1')
+    link.add_argument('--state', choices=['down', 'up'], default='down')
+    restart = subparsers.add_parser('restart', help="One device restart")
+    restart.add_argument('--host', required=True)
+    flood = subparsers.add_parser('storm', help="Random link changes across hosts")
+    flood.add_argument('--hosts', required=True, help="Comma-separated hostnames or addresses")
+    flood.add_argument('--count', type=int, default=100)
+    flood.add_argument('--seed', type=int)
+    args = parser.parse_args()
+
+    if args.command == 'link':
+        events = [(args.host, args.interface, args.state)]
+    elif args.command == 'restart':
+        events = [(args.host, None, 'restart')]
+    else:
+        events = storm(args.hosts.split(','), args.count, seed=args.seed)
+
+    if args.trap:
+        messages = [trap(state, interface, int(interface.rsplit('/', 1)[-1]) if interface else 1,
+                         args.community, args.version, agent=host) for host, interface, state in events]
+        send_udp(messages, args.target, args.trap_port, args.rate)
+    else:
+        messages = [syslog(state, host, interface, sequence)
+                    for sequence, (host, interface, state) in enumerate(events, 1)]
+        (send_tcp if args.tcp else send_udp)(messages, args.target, args.syslog_port, args.rate)
+    print(f"Sent {len(messages)} {'traps' if args.trap else 'syslog messages'} to {args.target}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,671 @@
+#!/usr/bin/env python3
+"""
+Purpose: Event-driven trigger mode - listen for device syslog and SNMP traps and run the
+         monitoring playbooks limited to the hosts that reported something
+Design Pattern: Reactor (asyncio UDP/TCP endpoints) feeding a per-host debouncer; debounced
+                hosts of a playbook are launched as one --limit run, at most one run per playbook
+Complexity: O(1) per received message (plus O(v) BER decoding for v varbinds of a trap);
+            O(p + h) per tick for p playbooks with h pending hosts
+
+The timers poll every device on a fixed schedule, so a link going down is noticed up to one
+interval late and most runs only confirm that nothing changed. The listener reacts to what the
+devices announce themselves:
+
+  syslog     UDP and TCP (newline or octet-counted framing), RFC 3164/5424 headers with Cisco
+             %FACILITY-SEVERITY-MNEMONIC messages: LINK-UPDOWN / LINEPROTO-UPDOWN are interface
+             events, SYS-RESTART / SNMP-COLDSTART device events
+  SNMP traps v1 and v2c linkDown/linkUp (interface events) and coldStart/warmStart (device
+             events); decoded with a minimal BER reader, no SNMP library needed. Informs are
+             not acknowledged.
+
+A message is attributed to an inventory host by the hostname it carries (syslog header, trap
+sysName is not sent so traps use agent-addr / snmpTrapAddress) or else its source address
+matched against ansible_host. Events of hosts outside the target playbook's inventory groups
+are counted and dropped.
+
+Debouncing is per host: a host is ready once it has been quiet for `quiet` seconds, or
+`max_delay` seconds after its first pending event so a flapping port cannot postpone the run
+forever. All ready hosts of a playbook start one run (`--limit @file`); hosts that become ready
+while that playbook runs wait for the next one. The periodic timers (or `sweep_interval` here)
+remain the safety net for lost datagrams and devices that do not log.
+
+Every launch takes the playbook's run lock (run_lock.py) without waiting: while a timer, daemon
+or shard run of the playbook holds it, ready hosts stay pending and sweeps are postponed.
+"""
+
+import asyncio
+import ipaddress
+import json
+import logging
+import os
+import re
+import signal
+import subprocess
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+import yaml
+
+from discovery_index import load_yaml
+from run_lock import acquire_run_lock
+from scheduler_factory import CACHE_DIR_ENV, ScheduledPlaybook, monitoring_cache_dir, playbook_command
+from sharding import resolve_hosts
+
+# Event kinds and the playbook option that handles them
+INTERFACE_EVENT = 'interface'
+DEVICE_EVENT = 'device'
+
+# SNMPv2-MIB / IF-MIB object identifiers
+SNMP_TRAP_OID = '1.3.6.1.6.3.1.1.4.1.0'
+SNMP_TRAP_ADDRESS = '1.3.6.1.6.3.18.1.3.0'
+TRAP_EVENTS = {
+    '1.3.6.1.6.3.1.1.5.1': (DEVICE_EVENT, 'restart'),    # coldStart
+    '1.3.6.1.6.3.1.1.5.2': (DEVICE_EVENT, 'restart'),    # warmStart
+    '1.3.6.1.6.3.1.1.5.3': (INTERFACE_EVENT, 'down'),    # linkDown
+    '1.3.6.1.6.3.1.1.5.4': (INTERFACE_EVENT, 'up'),      # linkUp
+}
+# SNMPv1 generic-trap numbers of the same notifications
+GENERIC_TRAPS = {0: '1.3.6.1.6.3.1.1.5.1', 1: '1.3.6.1.6.3.1.1.5.2',
+                 2: '1.3.6.1.6.3.1.1.5.3', 3: '1.3.6.1.6.3.1.1.5.4'}
+IF_DESCR = '1.3.6.1.2.1.2.2.1.2.'
+IF_NAME = '1.3.6.1.2.1.31.1.1.1.1.'
+IF_INDEX = '1.3.6.1.2.1.2.2.1.1.'
+
+# BER tags
+SEQUENCE, INTEGER, OCTET_STRING, NULL, OBJECT_IDENTIFIER = 0x30, 0x02, 0x04, 0x05, 0x06
+IP_ADDRESS, TIMETICKS = 0x40, 0x43
+TRAP_V1_PDU, TRAP_V2_PDU = 0xA4, 0xA7
+
+SYSLOG_PRI = re.compile(r'^<(\d{1,3})>')
+SYSLOG_5424 = re.compile(r'^1 \S+ (\S+) ')
+SYSLOG_3164 = re.compile(r'^(?:\d+: )?\*?[A-Z][a-z]{2} +\d{1,2} \d\d:\d\d:\d\d(?:\.\d+)?(?: [A-Z]{3,4})?:? (\S+?):? ')
+SYSLOG_CISCO_ORIGIN = re.compile(r'^(?:\d+: )?([A-Za-z][\w.-]*): ')
+CISCO_MNEMONIC = re.compile(r'%(?P<facility>[A-Z0-9_]+)-(?:\d)-(?P<mnemonic>[A-Z0-9_]+):\s*(?P<text>.*)')
+LINK_STATE = re.compile(r'Interface (?P<interface>[^,\s]+), changed state to (?P<state>administratively down|down|up)')
+DEVICE_MNEMONICS = {('SYS', 'RESTART'), ('SNMP', 'COLDSTART'), ('SNMP', 'WARMSTART')}
+# Syslog over TCP: RFC 6587 octet counting ("<length> <message>") or one message per line
+OCTET_COUNT = re.compile(rb'^(\d{1,6}) ')
+# Longest TCP syslog frame; a connection sending a longer one is dropped, so it cannot grow the
+# receive buffer without bound
+MAX_SYSLOG_FRAME = 64 * 1024
+
+
+@dataclass(frozen=True)
+class DeviceEvent:
+    """One interface or device notification received from the network"""
+    kind: str
+    state: str
+    source: str
+    origin: str
+    hostname: Optional[str] = None
+    interface: Optional[str] = None
+
+
+class BERError(ValueError):
+    """Raised for datagrams that are not a well-formed SNMP message"""
+
+
+def _read_tlv(data: bytes, offset: int) -> Tuple[int, bytes, int]:
+    """Tag, value and next offset of the BER element at offset"""
+    if offset + 2 > len(data):
+        raise BERError("truncated element")
+    tag = data[offset]
+    length = data[offset + 1]
+    offset += 2
+    if length & 0x80:
+        count = length & 0x7F
+        if count == 0 or count > 4 or offset + count > len(data):
+            raise BERError("unsupported length encoding")
+        length = int.from_bytes(data[offset:offset + count], 'big')
+        offset += count
+    if offset + length > len(data):
+        raise BERError("truncated element")
+    return tag, data[offset:offset + length], offset + length
+
+
+def _children(data: bytes) -> List[Tuple[int, bytes]]:
+    elements, offset = [], 0
+    while offset < len(data):
+        tag, value, offset = _read_tlv(data, offset)
+        elements.append((tag, value))
+    return elements
+
+
+def _decode_oid(value: bytes) -> str:
+    if not value:
+        raise BERError("empty object identifier")
+    parts = list(divmod(value[0], 40)) if value[0] < 80 else [2, value[0] - 80]
+    number = 0
+    for byte in value[1:]:
+        number = (number << 7) | (byte & 0x7F)
+        if not byte & 0x80:
+            parts.append(number)
+            number = 0
+    return '.'.join(str(part) for part in parts)
+
+
+def _decode_value(tag: int, value: bytes):
+    if tag == OBJECT_IDENTIFIER:
+        return _decode_oid(value)
+    if tag == IP_ADDRESS and len(value) == 4:
+        return str(ipaddress.IPv4Address(value))
+    if tag == OCTET_STRING:
+        return value.decode('utf-8', 'replace')
+    if tag in (INTEGER, TIMETICKS, 0x41, 0x42, 0x46):
+        return int.from_bytes(value, 'big', signed=tag == INTEGER) if value else 0
+    return None
+
+
+def decode_trap(data: bytes, source: str, communities: Optional[Set[str]] = None) -> Optional[DeviceEvent]:
+    """
+    Decode an SNMPv1 or SNMPv2c trap into a device event
+
+    Args:
+        data: UDP payload
+        source: Sender address
+        communities: Accepted community strings (None accepts any)
+
+    Returns:
+        DeviceEvent for linkDown/linkUp/coldStart/warmStart traps, None for other notifications
+
+    Raises:
+        BERError: If the datagram is not an SNMP message
+    """
+    tag, message, _ = _read_tlv(data, 0)
+    elements = _children(message) if tag == SEQUENCE else []
+    if len(elements) != 3 or elements[0][0] != INTEGER or elements[1][0] != OCTET_STRING:
+        raise BERError("not an SNMP message")
+    community = elements[1][1].decode('utf-8', 'replace')
+    if communities is not None and community not in communities:
+        return None
+
+    pdu_tag, pdu = elements[2]
+    fields = _children(pdu)
+    agent = None
+    if pdu_tag == TRAP_V1_PDU and len(fields) == 6:
+        generic = _decode_value(INTEGER, fields[2][1])
+        trap_oid = GENERIC_TRAPS.get(generic)
+        agent = _decode_value(*fields[1])
+        varbinds = fields[5][1]
+    elif pdu_tag == TRAP_V2_PDU and len(fields) == 4:
+        trap_oid = None
+        varbinds = fields[3][1]
+    else:
+        return None
+
+    values = {}
+    for varbind_tag, varbind in _children(varbinds):
+        pair = _children(varbind) if varbind_tag == SEQUENCE else []
+        if len(pair) == 2 and pair[0][0] == OBJECT_IDENTIFIER:
+            values[_decode_oid(pair[0][1])] = _decode_value(*pair[1])
+    trap_oid = values.get(SNMP_TRAP_OID, trap_oid)
+    if trap_oid not in TRAP_EVENTS:
+        return None
+
+    kind, state = TRAP_EVENTS[trap_oid]
+    interface = next((value for oid, value in sorted(values.items()) if oid.startswith(IF_NAME)), None) \
+        or next((value for oid, value in sorted(values.items()) if oid.startswith(IF_DESCR)), None)
+    if interface is None and kind == INTERFACE_EVENT:
+        interface = next((str(value) for oid, value in values.items() if oid.startswith(IF_INDEX)), None)
+    agent = values.get(SNMP_TRAP_ADDRESS, agent)
+    if agent in (None, '0.0.0.0'):
+        agent = source
+    return DeviceEvent(kind, state, agent, 'trap', interface=interface)
+
+
+def parse_syslog(message: str, source: str) -> Optional[DeviceEvent]:
+    """
+    Parse one syslog message into a device event
+
+    Returns:
+        DeviceEvent for link and restart messages, None for anything else
+    """
+    message = message.strip()
+    match = SYSLOG_PRI.match(message)
+    body = message[match.end():] if match else message
+    mnemonic = CISCO_MNEMONIC.search(body)
+    if not mnemonic:
+        return None
+
+    hostname = None
+    header = SYSLOG_5424.match(body) or SYSLOG_3164.match(body) or SYSLOG_CISCO_ORIGIN.match(body)
+    if header and header.start(1) < mnemonic.start() and not header.group(1).startswith('%'):
+        hostname = header.group(1)
+    if hostname == '-':
+        hostname = None
+
+    key = (mnemonic.group('facility'), mnemonic.group('mnemonic'))
+    if key in (('LINK', 'UPDOWN'), ('LINEPROTO', 'UPDOWN')):
+        link = LINK_STATE.search(mnemonic.group('text'))
+        if not link:
+            return None
+        state = 'up' if link.group('state') == 'up' else 'down'
+        return DeviceEvent(INTERFACE_EVENT, state, source, 'syslog', hostname, link.group('interface'))
+    if key in DEVICE_MNEMONICS:
+        return DeviceEvent(DEVICE_EVENT, 'restart', source, 'syslog', hostname)
+    return None
+
+
+def load_host_addresses(inventory_file: str) -> Dict[str, str]:
+    """
+    ansible_host address -> inventory host name
+
+    Static YAML inventories are read directly; anything else is resolved with
+    `ansible-inventory --list`. Hosts without ansible_host map their own name.
+    """
+    addresses: Dict[str, str] = {}
+    try:
+        with open(inventory_file, 'r') as f:
+            inventory = load_yaml(f)
+    except (OSError, yaml.YAMLError):
+        inventory = None
+
+    if isinstance(inventory, dict):
+        def walk(group):
+            if not isinstance(group, dict):
+                return
+            for host, host_vars in (group.get('hosts') or {}).items():
+                address = (host_vars or {}).get('ansible_host') if isinstance(host_vars, dict) else None
+                addresses.setdefault(str(address or host), host)
+            for child in (group.get('children') or {}).values():
+                walk(child)
+
+        for group in inventory.values():
+            walk(group)
+        return addresses
+
+    try:
+        output = subprocess.run(['ansible-inventory', '-i', inventory_file, '--list'], capture_output=True,
+                                text=True, check=True, stdin=subprocess.DEVNULL).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return addresses
+    for host, host_vars in json.loads(output).get('_meta', {}).get('hostvars', {}).items():
+        addresses.setdefault(str(host_vars.get('ansible_host') or host), host)
+    return addresses
+
+
+class HostResolver:
+    """Attributes events to inventory hosts by reported hostname, then by address"""
+
+    def __init__(self, addresses: Dict[str, str]):
+        self.addresses = dict(addresses)
+        self.hosts = set(addresses.values())
+        self._by_name = {host.lower(): host for host in self.hosts}
+
+    def resolve(self, event: DeviceEvent) -> Optional[str]:
+        if event.hostname:
+            name = event.hostname.lower()
+            host = self._by_name.get(name) or self._by_name.get(name.split('.')[0])
+            if host:
+                return host
+        return self.addresses.get(event.source)
+
+
+@dataclass
+class PendingHost:
+    first: float
+    last: float
+    events: int = 1
+
+
+class EventDebouncer:
+    """
+    Per-host debounce of events into batches per playbook
+    A host is ready after `quiet` seconds without events or `max_delay` after its first event
+    """
+
+    def __init__(self, quiet: float, max_delay: float):
+        self.quiet = quiet
+        self.max_delay = max(quiet, max_delay)
+        self.pending: Dict[str, Dict[str, PendingHost]] = {}
+
+    def add(self, playbook: str, host: str, now: float):
+        hosts = self.pending.setdefault(playbook, {})
+        if host in hosts:
+            hosts[host].last = now
+            hosts[host].events += 1
+        else:
+            hosts[host] = PendingHost(now, now)
+
+    def _due(self, entry: PendingHost) -> float:
+        return min(entry.last + self.quiet, entry.first + self.max_delay)
+
+    def ready(self, playbook: str, now: float) -> List[str]:
+        """Remove and return the playbook's hosts whose debounce has expired"""
+        hosts = self.pending.get(playbook, {})
+        ready = sorted(host for host, entry in hosts.items() if now >= self._due(entry))
+        for host in ready:
+            del hosts[host]
+        return ready
+
+    def discard(self, playbook: str):
+        """Drop every pending host of a playbook (a full run covers them)"""
+        self.pending.pop(playbook, None)
+
+    def next_due(self) -> Optional[float]:
+        return min((self._due(entry) for hosts in self.pending.values() for entry in hosts.values()),
+                   default=None)
+
+
+class PlaybookLauncher:
+    """Starts ansible-playbook limited to a host list (or unlimited for a sweep)"""
+
+    def __init__(self, project_path: str, inventory_file: str, log_path: str,
+                 command: Sequence[str] = ('ansible-playbook',)):
+        self.project_path = Path(project_path)
+        self.inventory_file = str(self.project_path / inventory_file)
+        self.log_path = Path(log_path)
+        self.command = list(command)
+
+    def launch(self, playbook: ScheduledPlaybook, hosts: Optional[Sequence[str]]):
+        """
+        Start a run; hosts None runs the playbook's full inventory
+
+        Returns:
+            subprocess.Popen handle (poll/terminate/kill), or None while another run of the
+            playbook holds its run lock
+        """
+        lock = acquire_run_lock(str(self.log_path), playbook, wait=False)
+        if lock is None:
+            return None
+        try:
+            return self._start(playbook, hosts, lock)
+        finally:
+            # The child holds the lock until it exits
+            os.close(lock)
+
+    def _start(self, playbook: ScheduledPlaybook, hosts: Optional[Sequence[str]], lock: int):
+        events_dir = self.log_path / 'events'
+        events_dir.mkdir(parents=True, exist_ok=True)
+        command = playbook_command(playbook, self.inventory_file, self.command)
+        if hosts is not None:
+            limit_file = events_dir / f"{playbook.systemd_service_name}.limit"
+            limit_file.write_text('\n'.join(hosts) + '\n')
+            command += ['--limit', f"@{limit_file}"]
+        env = dict(os.environ, ANSIBLE_STDOUT_CALLBACK='json', ANSIBLE_HOST_KEY_CHECKING='False',
+                   ANSIBLE_RUN_METRICS_SHARD='event' if hosts is not None else 'sweep')
+        env.setdefault('ANSIBLE_RUN_METRICS_DIR', str(self.log_path / 'metrics'))
+        env.setdefault(CACHE_DIR_ENV, monitoring_cache_dir())
+        with open(events_dir / f"{playbook.systemd_service_name}.log", 'a') as stdout:
+            return subprocess.Popen(command, cwd=str(self.project_path), env=env, stdin=subprocess.DEVNULL,
+                                    stdout=stdout, stderr=subprocess.STDOUT, pass_fds=(lock,))
+
+
+@dataclass
+class TriggerState:
+    """Run state of one event-triggered playbook"""
+    playbook: ScheduledPlaybook
+    targets: Set[str]
+    active: Optional[object] = None
+    started: float = 0.0
+    killed_at: Optional[float] = None
+    next_sweep: float = float('inf')
+    runs: int = 0
+    sweeps: int = 0
+    hosts_run: int = 0
+    locked: int = 0
+
+
+@dataclass
+class ListenerStats:
+    received: int = 0
+    events: int = 0
+    unparsed: int = 0
+    unknown_host: int = 0
+    untargeted: int = 0
+    oversized: int = 0
+    by_kind: Dict[str, int] = field(default_factory=dict)
+
+
+class _SyslogDatagram(asyncio.DatagramProtocol):
+    def __init__(self, listener: 'EventListener'):
+        self.listener = listener
+
+    def datagram_received(self, data, addr):
+        self.listener.ingest_syslog(data, addr[0])
+
+
+class _TrapDatagram(asyncio.DatagramProtocol):
+    def __init__(self, listener: 'EventListener'):
+        self.listener = listener
+
+    def datagram_received(self, data, addr):
+        self.listener.ingest_trap(data, addr[0])
+
+
+class EventListener:
+    """
+    Receives syslog and traps, debounces them per host and launches targeted playbook runs
+    """
+
+    def __init__(self, triggers: Dict[str, ScheduledPlaybook], resolver: HostResolver,
+                 launcher, targets: Dict[str, Set[str]], quiet: float = 5.0, max_delay: float = 30.0,
+                 sweep_interval: float = 0.0, communities: Optional[Set[str]] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        Initialize the listener
+
+        Args:
+            triggers: Event kind (interface/device) -> playbook run for it
+            resolver: Maps events to inventory hosts
+            launcher: Object with launch(playbook, hosts or None) -> handle with poll()/terminate()/kill()
+            targets: Playbook name -> hosts of its inventory groups
+            quiet: Seconds a host must be quiet before its run starts
+            max_delay: Upper bound on the wait after a host's first event
+            sweep_interval: Seconds between full runs of each playbook (0 leaves sweeps to the timers)
+            communities: Accepted SNMP communities (None accepts any)
+            clock: Monotonic clock
+        """
+        self.triggers = triggers
+        self.resolver = resolver
+        self.launcher = launcher
+        self.communities = communities
+        self.clock = clock
+        self.debouncer = EventDebouncer(quiet, max_delay)
+        self.sweep_interval = sweep_interval
+        self.stats = ListenerStats()
+        self.logger = logging.getLogger(__name__)
+        now = clock()
+        self.states: Dict[str, TriggerState] = {}
+        for playbook in triggers.values():
+            if playbook.name not in self.states:
+                self.states[playbook.name] = TriggerState(
+                    playbook, set(targets.get(playbook.name, ())),
+                    next_sweep=now + sweep_interval if sweep_interval > 0 else float('inf'))
+
+    def ingest_syslog(self, data: bytes, source: str):
+        self.stats.received += 1
+        self.handle(parse_syslog(data.decode('utf-8', 'replace'), source))
+
+    def ingest_trap(self, data: bytes, source: str):
+        self.stats.received += 1
+        try:
+            event = decode_trap(data, source, self.communities)
+        except BERError as e:
+            self.logger.debug(f"Ignoring malformed trap from {source}: {e}")
+            event = None
+        self.handle(event)
+
+    def handle(self, event: Optional[DeviceEvent]):
+        """Queue the event's host for the playbook of its kind"""
+        if event is None or event.kind not in self.triggers:
+            self.stats.unparsed += 1
+            return
+        host = self.resolver.resolve(event)
+        if host is None:
+            self.stats.unknown_host += 1
+            self.logger.debug(f"No inventory host for {event.origin} event from {event.source}")
+            return
+        playbook = self.triggers[event.kind]
+        if host not in self.states[playbook.name].targets:
+            self.stats.untargeted += 1
+            return
+        self.stats.events += 1
+        self.stats.by_kind[event.kind] = self.stats.by_kind.get(event.kind, 0) + 1
+        self.debouncer.add(playbook.name, host, self.clock())
+        self.logger.info(f"{event.origin} {event.kind} {event.state} on {host}"
+                         f"{' ' + event.interface if event.interface else ''} -> {playbook.name}")
+
+    def _reap(self, state: TriggerState, now: float):
+        returncode = state.active.poll()
+        if returncode is not None:
+            self.logger.info(f"{state.playbook.name} event run finished with exit code {returncode} "
+                             f"after {now - state.started:.1f}s")
+            state.active = None
+            state.killed_at = None
+        elif state.killed_at is None and now >= state.started + state.playbook.timeout:
+            self.logger.error(f"{state.playbook.name} event run exceeded its {state.playbook.timeout}s timeout, terminating")
+            state.active.terminate()
+            state.killed_at = now
+        elif state.killed_at is not None and now >= state.killed_at + 10:
+            state.active.kill()
+
+    def tick(self) -> float:
+        """
+        Reap runs and launch ready hosts and due sweeps
+
+        Returns:
+            Seconds until the next debounce expiry, sweep or poll of an active run
+        """
+        now = self.clock()
+        wake = now + 5.0
+        for name, state in self.states.items():
+            if state.active:
+                self._reap(state, now)
+            if state.active:
+                wake = min(wake, now + 1.0)
+                continue
+
+            if now >= state.next_sweep:
+                state.active = self.launcher.launch(state.playbook, None)
+                if state.active is None:
+                    # Another run of the playbook holds its lock; sweep once it is released
+                    state.locked += 1
+                    wake = min(wake, now + 1.0)
+                    continue
+                # The full run covers every pending host of this playbook
+                self.debouncer.discard(name)
+                state.started = now
+                state.sweeps += 1
+                state.next_sweep = now + self.sweep_interval
+                self.logger.info(f"Started {name} safety sweep")
+                continue
+
+            hosts = self.debouncer.ready(name, now)
+            if hosts:
+                state.active = self.launcher.launch(state.playbook, hosts)
+                if state.active is None:
+                    # Another run of the playbook holds its lock; the hosts wait for the next tick
+                    for host in hosts:
+                        self.debouncer.add(name, host, now)
+                    state.locked += 1
+                    wake = min(wake, now + 1.0)
+                    continue
+                state.started = now
+                state.runs += 1
+                state.hosts_run += len(hosts)
+                self.logger.info(f"Started {name} for {len(hosts)} hosts: {', '.join(hosts[:10])}"
+                                 f"{' ...' if len(hosts) > 10 else ''}")
+            wake = min(wake, state.next_sweep)
+
+        due = self.debouncer.next_due()
+        if due is not None:
+            wake = min(wake, due)
+        return max(0.05, wake - now)
+
+    async def _serve_tcp(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        source = (writer.get_extra_info('peername') or ('',))[0]
+        buffer = b''
+        try:
+            while True:
+                chunk = await reader.read(65536)
+                if not chunk:
+                    break
+                buffer += chunk
+                while buffer:
+                    counted = OCTET_COUNT.match(buffer)
+                    if counted:
+                        if int(counted.group(1)) > MAX_SYSLOG_FRAME:
+                            break
+                        end = counted.end() + int(counted.group(1))
+                        if len(buffer) < end:
+                            break
+                        message, buffer = buffer[counted.end():end], buffer[end:]
+                    elif b'\n' in buffer[:MAX_SYSLOG_FRAME + 1]:
+                        message, buffer = buffer.split(b'\n', 1)
+                    else:
+                        break
+                    if message.strip():
+                        self.ingest_syslog(message, source)
+                # Whatever is left is an incomplete frame; past the cap it can never be valid
+                counted = OCTET_COUNT.match(buffer)
+                if (int(counted.group(1)) if counted else len(buffer)) > MAX_SYSLOG_FRAME:
+                    self.stats.oversized += 1
+                    self.logger.warning(f"Dropping TCP syslog connection from {source}: frame longer "
+                                        f"than {MAX_SYSLOG_FRAME} bytes")
+                    buffer = b''
+                    break
+            if buffer.strip():
+                self.ingest_syslog(buffer, source)
+        finally:
+            writer.close()
+
+    async def start(self, bind: str = '0.0.0.0', syslog_port: Optional[int] = 514,
+                    tcp_syslog_port: Optional[int] = 514, trap_port: Optional[int] = 162) -> Dict[str, int]:
+        """
+        Open the endpoints (None skips one, 0 picks a free port)
+
+        Returns:
+            Endpoint name -> bound port
+        """
+        loop = asyncio.get_running_loop()
+        self._servers = []
+        ports = {}
+        if syslog_port is not None:
+            transport, _ = await loop.create_datagram_endpoint(lambda: _SyslogDatagram(self), local_addr=(bind, syslog_port))
+            self._servers.append(transport)
+            ports['syslog_udp'] = transport.get_extra_info('sockname')[1]
+        if tcp_syslog_port is not None:
+            server = await asyncio.start_server(self._serve_tcp, bind, tcp_syslog_port)
+            self._servers.append(server)
+            ports['syslog_tcp'] = server.sockets[0].getsockname()[1]
+        if trap_port is not None:
+            transport, _ = await loop.create_datagram_endpoint(lambda: _TrapDatagram(self), local_addr=(bind, trap_port))
+            self._servers.append(transport)
+            ports['snmp_trap'] = transport.get_extra_info('sockname')[1]
+        for name, port in ports.items():
+            self.logger.info(f"Listening for {name.replace('_', ' ')} on {bind}:{port}")
+        return ports
+
+    async def run(self, stop: asyncio.Event):
+        """Tick until stop is set, then close the endpoints (active runs are left to finish)"""
+        try:
+            while not stop.is_set():
+                try:
+                    await asyncio.wait_for(stop.wait(), timeout=self.tick())
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            for server in getattr(self, '_servers', []):
+                server.close()
+            self.logger.info(f"Listener stopped: {self.stats.received} messages, {self.stats.events} events, "
+                             f"{sum(state.runs for state in self.states.values())} targeted runs, "
+                             f"{sum(state.locked for state in self.states.values())} launches deferred "
+                             f"by another run of the playbook")
+
+    async def serve_forever(self, bind: str, syslog_port: Optional[int], tcp_syslog_port: Optional[int],
+                            trap_port: Optional[int]):
+        """Run until SIGTERM/SIGINT"""
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(signum, stop.set)
+        await self.start(bind, syslog_port, tcp_syslog_port, trap_port)
+        await self.run(stop)
+
+
+def build_targets(inventory_file: str, playbooks: Sequence[ScheduledPlaybook]) -> Dict[str, Set[str]]:
+    """Playbook name -> hosts of its inventory groups"""
+    return {playbook.name: set(resolve_hosts(inventory_file, playbook.inventory_groups)) for playbook in playbooks}
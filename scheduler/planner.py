@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+Purpose: Load-aware placement of scheduled playbook runs across their cycle
+Design Pattern: Greedy bin smoothing over a bucketed concurrency timeline
+Complexity: O(p * c * f * r) for p playbooks, c candidate offsets, f fire times per horizon
+            and r buckets per run; O(h) to load an inventory of h hosts
+
+Every timer used to start on the exact minute its cron expression names, so "*/5", "*/10"
+and "0 2" playbooks all launched together at :00 and each ran against up to `forks` hosts at
+once. The planner estimates how many forks each playbook occupies (hosts in its inventory
+groups, capped by ansible.cfg forks) for how long (expected_runtime, else timeout), then
+places the heaviest playbooks first at the start offset that keeps the projected peak of
+concurrent forks lowest. Offsets are whole seconds added to every fire time and are compiled
+into the OnCalendar expression, so placement is deterministic across hosts and reinstalls.
+
+The timeline covers one day, or a week when a schedule depends on the weekday, so every
+schedule's load is on it. Day-of-month and month schedules fall on a different weekday each
+month; they are projected as daily runs at their times of day, which over-counts their load
+rather than planning them as none.
+"""
+
+import configparser
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+import yaml
+
+from cron import CronExpression
+from discovery_index import load_yaml
+from scheduler_factory import ScheduledPlaybook
+
+# Fixed reference start (a Monday) so plans do not depend on when they are computed
+PLAN_EPOCH = datetime(2024, 1, 1)
+
+DEFAULT_FORKS = 5  # Ansible's built-in default when ansible.cfg does not set forks
+DEFAULT_HORIZON = 24 * 3600
+WEEK_HORIZON = 7 * DEFAULT_HORIZON
+DEFAULT_RESOLUTION = 10
+OFFSET_STEP = 30
+MAX_RANDOMIZED_DELAY = 30
+
+
+@dataclass
+class PlannedSchedule:
+    """Placement chosen for one scheduled playbook"""
+    playbook: ScheduledPlaybook
+    hosts: Optional[int]  # None when the inventory groups could not be resolved
+    forks: int
+    runtime: int
+    interval: int
+    offset: int
+    randomized_delay: int
+
+    @property
+    def calendars(self) -> List[str]:
+        return CronExpression(self.playbook.schedule).to_oncalendar(self.offset)
+
+
+def projected_expression(schedule: str) -> CronExpression:
+    """Expression whose fire times stand in for a schedule on the planning timeline"""
+    expression = CronExpression(schedule)
+    if len(expression.day.values) == 31 and len(expression.month.values) == 12:
+        return expression
+    minutes = ','.join(str(minute) for minute in sorted(expression.minute.values))
+    hours = ','.join(str(hour) for hour in sorted(expression.hour.values))
+    return CronExpression(f"{minutes} {hours} * * *")
+
+
+def planning_horizon(playbooks: List[ScheduledPlaybook]) -> int:
+    """Seconds of schedule that hold every fire time pattern: a week if any depends on the weekday"""
+    if any(len(projected_expression(playbook.schedule).weekday.values) < 7 for playbook in playbooks):
+        return WEEK_HORIZON
+    return DEFAULT_HORIZON
+
+
+def load_inventory_groups(inventory_file: str) -> Dict[str, Set[str]]:
+    """
+    Resolve every group of a YAML inventory to the set of hosts it contains
+
+    Args:
+        inventory_file: Path to a YAML inventory (hosts/children/vars layout)
+
+    Returns:
+        Mapping of group name -> host names including hosts of nested children;
+        empty when the file is missing or not a YAML inventory
+    """
+    try:
+        with open(inventory_file, 'r') as f:
+            inventory = load_yaml(f)
+    except (OSError, yaml.YAMLError):
+        return {}
+    if not isinstance(inventory, dict):
+        return {}
+
+    direct_hosts: Dict[str, Set[str]] = {}
+    children: Dict[str, Set[str]] = {}
+
+    def walk(name: str, group: Optional[Dict]):
+        direct_hosts.setdefault(name, set())
+        children.setdefault(name, set())
+        if not isinstance(group, dict):
+            return
+        direct_hosts[name].update((group.get('hosts') or {}).keys())
+        for child_name, child in (group.get('children') or {}).items():
+            children[name].add(child_name)
+            walk(child_name, child)
+
+    for name, group in inventory.items():
+        walk(name, group)
+
+    resolved: Dict[str, Set[str]] = {}
+
+    def resolve(name: str, seen: Set[str]) -> Set[str]:
+        if name in resolved:
+            return resolved[name]
+        hosts = set(direct_hosts.get(name, ()))
+        for child in children.get(name, ()):
+            if child not in seen:
+                hosts |= resolve(child, seen | {child})
+        resolved[name] = hosts
+        return hosts
+
+    for name in direct_hosts:
+        resolve(name, {name})
+    resolved['all'] = set().union(*direct_hosts.values()) if direct_hosts else set()
+    return resolved
+
+
+def load_forks(project_path: str) -> int:
+    """Read forks from the project's ansible.cfg, falling back to Ansible's default"""
+    config = configparser.ConfigParser(inline_comment_prefixes=('#', ';'))
+    config.read(Path(project_path) / 'ansible.cfg')
+    try:
+        return max(1, config.getint('defaults', 'forks', fallback=DEFAULT_FORKS))
+    except ValueError:
+        return DEFAULT_FORKS
+
+
+class SchedulePlanner:
+    """
+    Assigns start offsets and RandomizedDelaySec values to scheduled playbooks
+    Projects concurrent Ansible forks over a fixed horizon, bucketed at a fixed resolution
+    """
+
+    def __init__(self, playbooks: List[ScheduledPlaybook], groups: Dict[str, Set[str]],
+                 forks: int = DEFAULT_FORKS, horizon: Optional[int] = None,
+                 resolution: int = DEFAULT_RESOLUTION):
+        """
+        Initialize the planner
+
+        Args:
+            playbooks: Validated scheduled playbooks to place
+            groups: Inventory group -> hosts mapping (see load_inventory_groups)
+            forks: Ansible forks limit; caps the hosts a single run (or shard) works on at once
+            horizon: Seconds of schedule to project (the timeline wraps around); defaults to
+                     planning_horizon, which create-timers and the daemon always use
+            resolution: Seconds per timeline bucket
+        """
+        horizon = horizon or planning_horizon(playbooks)
+        if horizon % resolution:
+            raise ValueError("horizon must be a multiple of resolution")
+        self.playbooks = sorted(playbooks, key=lambda p: p.name)
+        self.groups = groups
+        self.forks = forks
+        self.horizon = horizon
+        self.resolution = resolution
+        self.buckets = horizon // resolution
+        self._fire_seconds: Dict[str, List[int]] = {}
+
+    def _fire_times(self, playbook: ScheduledPlaybook) -> List[int]:
+        """Fire times within the horizon as seconds since PLAN_EPOCH"""
+        if playbook.name not in self._fire_seconds:
+            expression = projected_expression(playbook.schedule)
+            fire_times = expression.fire_times_between(
+                PLAN_EPOCH - timedelta(minutes=1), PLAN_EPOCH + timedelta(seconds=self.horizon - 1))
+            self._fire_seconds[playbook.name] = [int((t - PLAN_EPOCH).total_seconds()) for t in fire_times]
+        return self._fire_seconds[playbook.name]
+
+    def _interval(self, fire_seconds: List[int]) -> int:
+        """Shortest gap between consecutive fire times, wrapping around the horizon"""
+        if not fire_seconds:
+            return self.horizon
+        gaps = [b - a for a, b in zip(fire_seconds, fire_seconds[1:])]
+        gaps.append(fire_seconds[0] + self.horizon - fire_seconds[-1])
+        return min(gaps)
+
+    def _host_count(self, playbook: ScheduledPlaybook) -> Optional[int]:
+        if not all(group in self.groups for group in playbook.inventory_groups):
+            return None
+        return len(set().union(*(self.groups[group] for group in playbook.inventory_groups)))
+
+    def _runtime(self, playbook: ScheduledPlaybook) -> int:
+        return int(playbook.schedule_config.get('expected_runtime', playbook.timeout))
+
+    def _occupied(self, fire_seconds: List[int], offset: int, duration: int) -> Set[int]:
+        """
+        Bucket indexes covered by runs starting at each fire time plus offset
+
+        A set, because systemd never starts a service that is still running: runs of one
+        playbook that would overlap only extend its occupancy, they do not stack.
+        """
+        span = max(1, -(-duration // self.resolution))
+        occupied = set()
+        for start in fire_seconds:
+            first = (start + offset) // self.resolution
+            occupied.update((first + i) % self.buckets for i in range(span))
+        return occupied
+
+    def _entry(self, playbook: ScheduledPlaybook, offset: int, randomized_delay: int) -> PlannedSchedule:
+        hosts = self._host_count(playbook)
+        return PlannedSchedule(
+            playbook=playbook,
+            hosts=hosts,
+            # Each shard is a separate ansible-playbook with its own forks
+            forks=self.forks * playbook.shards if hosts is None else max(1, min(hosts, self.forks * playbook.shards)),
+            runtime=self._runtime(playbook),
+            interval=self._interval(self._fire_times(playbook)),
+            offset=offset,
+            randomized_delay=randomized_delay,
+        )
+
+    def baseline(self, randomized_delay: int = MAX_RANDOMIZED_DELAY) -> List[PlannedSchedule]:
+        """Unplanned placement: every playbook at offset 0 with the same random delay"""
+        return [self._entry(playbook, 0, randomized_delay) for playbook in self.playbooks]
+
+    def plan(self) -> List[PlannedSchedule]:
+        """
+        Place every playbook, heaviest first, at the offset with the lowest projected peak
+
+        Candidates are OFFSET_STEP apart, shorter than the playbook's interval and within what
+        OnCalendar can express (see CronExpression.max_offset_seconds). Ties are broken by the
+        smallest sum of load under the run, then the earliest offset.
+
+        Returns:
+            PlannedSchedule entries in playbook name order
+        """
+        timeline = [0] * self.buckets
+        entries = {playbook.name: self._entry(playbook, 0, 0) for playbook in self.playbooks}
+
+        def weight(entry: PlannedSchedule) -> int:
+            return entry.forks * entry.runtime * len(self._fire_times(entry.playbook))
+
+        for entry in sorted(entries.values(), key=lambda e: (-weight(e), e.playbook.name)):
+            fire_seconds = self._fire_times(entry.playbook)
+            # Jitter never pushes a run into the next one's slot
+            entry.randomized_delay = min(MAX_RANDOMIZED_DELAY, max(0, entry.interval - entry.runtime) // 2)
+            duration = entry.runtime + entry.randomized_delay
+            limit = min(entry.interval, CronExpression(entry.playbook.schedule).max_offset_seconds() + 1)
+
+            best = None
+            for offset in range(0, limit, OFFSET_STEP):
+                occupied = self._occupied(fire_seconds, offset, duration)
+                if not occupied:
+                    score = (0, 0, offset)
+                else:
+                    score = (max(timeline[b] for b in occupied) + entry.forks,
+                             sum(timeline[b] for b in occupied), offset)
+                if best is None or score < best[0]:
+                    best = (score, offset, occupied)
+
+            entry.offset = best[1]
+            for bucket in best[2]:
+                timeline[bucket] += entry.forks
+
+        return [entries[playbook.name] for playbook in self.playbooks]
+
+    def timeline(self, entries: List[PlannedSchedule]) -> List[int]:
+        """Projected concurrent forks per bucket, counting each run's full random-delay window"""
+        timeline = [0] * self.buckets
+        for entry in entries:
+            duration = entry.runtime + entry.randomized_delay
+            for bucket in self._occupied(self._fire_times(entry.playbook), entry.offset, duration):
+                timeline[bucket] += entry.forks
+        return timeline
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Purpose: Per-playbook run lock shared by the systemd units, the daemon and the event listener
+Design Pattern: Advisory flock(2) on <log_path>/<service>.lock, held by the process running the
+                playbook (and inherited by its ansible-playbook child)
+Complexity: O(1) per acquisition
+
+Two runs of the same playbook on the same hosts race each other's duplicate checks and open
+duplicate incidents. Every way a playbook is started takes this lock first:
+
+  units     /usr/bin/flock <lock> ansible-playbook ... (plain timers), or `scheduler.py run`
+            (adaptive and sharded timers), which waits for the lock like flock(1)
+  daemon    tries the lock before forking and skips the fire time while any other run holds it
+  listener  tries the lock and skips the launch while any other run holds it
+
+Shards of one run hold it shared, so they run side by side but never next to an unsharded run,
+an event run or a sweep. The lock lives in the log directory because every unit can write there
+(ReadWritePaths) and the daemon and listener use the same --log-path.
+"""
+
+import fcntl
+import os
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, Optional
+
+from scheduler_factory import ScheduledPlaybook
+
+
+def run_lock_path(log_path: str, playbook: ScheduledPlaybook) -> Path:
+    """Lock file of a playbook; the unit template writes the same path"""
+    return Path(log_path) / f"{playbook.systemd_service_name}.lock"
+
+
+def acquire_run_lock(log_path: str, playbook: ScheduledPlaybook, shared: bool = False,
+                     wait: bool = True) -> Optional[int]:
+    """
+    Take the playbook's run lock
+
+    Args:
+        log_path: Scheduler log directory
+        playbook: Playbook about to run
+        shared: Shared lock (one shard of a sharded run) instead of exclusive
+        wait: Block until the lock is free; otherwise return None while it is held
+
+    Returns:
+        File descriptor holding the lock (released when it and every inherited copy are
+        closed), or None when wait is False and another run holds the lock
+    """
+    path = run_lock_path(log_path, playbook)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd = os.open(str(path), os.O_RDWR | os.O_CREAT, 0o644)
+    operation = (fcntl.LOCK_SH if shared else fcntl.LOCK_EX) | (0 if wait else fcntl.LOCK_NB)
+    try:
+        fcntl.flock(fd, operation)
+    except BlockingIOError:
+        os.close(fd)
+        return None
+    except BaseException:
+        os.close(fd)
+        raise
+    return fd
+
+
+@contextmanager
+def run_lock_held(log_path: str, playbook: ScheduledPlaybook, shared: bool = False) -> Iterator[None]:
+    """Wait for the playbook's run lock and hold it for the block"""
+    fd = acquire_run_lock(log_path, playbook, shared)
+    try:
+        yield
+    finally:
+        os.close(fd)
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Purpose: Summarise the per-run metrics the run_metrics callback plugin records
+Design Pattern: Read model - the callback appends one JSON line per run, this module reduces the
+                most recent runs of a playbook to percentiles for `status`
+Complexity: O(n log n) for the n runs read from a playbook's JSON lines file
+
+The callback (callback_plugins/run_metrics.py) writes <log_path>/metrics/<playbook>.jsonl when
+the units run with ANSIBLE_RUN_METRICS_DIR pointing there. Sharded playbooks record one line per
+shard run, so their percentiles describe shard durations - the wall time of one worker.
+"""
+
+import json
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+
+def metrics_dir(log_path: str) -> Path:
+    """Directory the scheduler points the run_metrics callback at"""
+    return Path(log_path) / 'metrics'
+
+
+def load_runs(directory: Path, playbook: str, limit: Optional[int] = None) -> List[Dict]:
+    """
+    Read the recorded runs of a playbook, oldest first
+
+    Args:
+        directory: Metrics directory
+        playbook: Playbook name (file stem)
+        limit: Keep only the most recent runs
+
+    Returns:
+        Run documents; unreadable lines (e.g. a run killed mid-write) are skipped
+    """
+    runs = []
+    try:
+        with open(Path(directory) / f"{playbook}.jsonl") as f:
+            for line in f:
+                try:
+                    run = json.loads(line)
+                except ValueError:
+                    continue
+                if isinstance(run, dict) and isinstance(run.get('duration'), (int, float)):
+                    runs.append(run)
+    except OSError:
+        return []
+    return runs[-limit:] if limit else runs
+
+
+def percentile(values: Sequence[float], fraction: float) -> Optional[float]:
+    """Linearly interpolated percentile (fraction 0..1) of the values, None when empty"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def summarize_runs(runs: List[Dict]) -> Optional[Dict]:
+    """
+    Reduce recorded runs to the figures `status` prints
+
+    Returns:
+        None without runs, otherwise runs, p50/p95/max duration, ServiceNow time p50/p95,
+        retries and runs with failed hosts over the window, and the last run's slowest
+        tasks and ServiceNow endpoints
+    """
+    if not runs:
+        return None
+    durations = [run['duration'] for run in runs]
+    servicenow = [sum(endpoint.get('seconds', 0) for endpoint in run.get('servicenow', {}).values())
+                  for run in runs]
+    last = runs[-1]
+    return {
+        'runs': len(runs),
+        'duration_p50': round(percentile(durations, 0.5), 3),
+        'duration_p95': round(percentile(durations, 0.95), 3),
+        'duration_max': max(durations),
+        'servicenow_p50': round(percentile(servicenow, 0.5), 3),
+        'servicenow_p95': round(percentile(servicenow, 0.95), 3),
+        'retries': sum(run.get('retries', 0) for run in runs),
+        'failed_runs': len([run for run in runs if run.get('hosts', {}).get('failed')
+                            or run.get('hosts', {}).get('unreachable')]),
+        'last_finished': last.get('finished'),
+        'slowest_tasks': [
+            {'task': task, 'seconds': stats[1]}
+            for task, stats in sorted(last.get('tasks', {}).items(), key=lambda item: item[1][1], reverse=True)[:3]
+        ],
+        'slowest_endpoints': [
+            dict(stats, endpoint=endpoint)
+            for endpoint, stats in sorted(last.get('servicenow', {}).items(),
+                                          key=lambda item: item[1].get('seconds', 0), reverse=True)[:3]
+        ],
+    }
@@ -8,15 +8,29 @@ Complexity: O(n) for role processing, O(1) for service management operations
 import os
 import sys
 import argparse
+import asyncio
 import json
+import shlex
 import subprocess
+from datetime import datetime, timedelta
 from pathlib import Path
 from typing import List, Dict, Optional
 from jinja2 import Environment, FileSystemLoader
 import logging
 
-# Import our factory
-from monitoring_role_factory import MonitoringRoleFactory, MonitoringRole
+# Import our factory and cron compiler
+from scheduler_factory import CACHE_DIRECTORY, SchedulerFactory, ScheduledPlaybook, playbook_command
+from cron import CronExpression
+from planner import SchedulePlanner, PlannedSchedule, load_inventory_groups, load_forks
+from run_lock import run_lock_path
+from run_metrics import load_runs, metrics_dir, summarize_runs
+from cadence import CadencePlanner, cadence_config
+from daemon import SchedulerDaemon, WarmAnsibleExecutor
+from event_listener import (DEVICE_EVENT, INTERFACE_EVENT, EventListener, HostResolver, PlaybookLauncher,
+                            build_targets, load_host_addresses)
+from sharding import ShardRunner, merge_shard_results
+from systemd_status import SystemctlError, query_status, show_units
+from unit_sync import MANAGED_MARKER, SyncPlan, apply_sync, plan_sync
 
 class SystemdServiceManager:
     """
@@ -36,6 +50,7 @@ class SystemdServiceManager:
         self.log_path = Path(log_path)
         self.systemd_path = Path("/etc/systemd/system")
         self.template_path = Path(__file__).parent / "templates"
+        self.systemctl = "systemctl"
         
         # Setup Jinja2 environment
         self.jinja_env = Environment(
@@ -46,7 +61,7 @@ class SystemdServiceManager:
         
         self.logger = logging.getLogger(__name__)
     
-    def _cron_to_systemd_calendar(self, cron_schedule: str) -> str:
+    def _cron_to_systemd_calendar(self, cron_schedule: str) -> List[str]:
         """
         Convert cron schedule to systemd calendar format
         
@@ -54,32 +69,22 @@ class SystemdServiceManager:
             cron_schedule: Cron format schedule (e.g., "*/5 * * * *")
             
         Returns:
-            Systemd calendar format
-        """
-        # Basic conversion for common patterns
-        # This is a simplified implementation - could be expanded
-        if cron_schedule == "*/5 * * * *":
-            return "*:0/5"  # Every 5 minutes
-        elif cron_schedule == "*/10 * * * *":
-            return "*:0/10"  # Every 10 minutes
-        elif cron_schedule == "*/1 * * * *":
-            return "*:*"  # Every minute
-        elif cron_schedule == "0 * * * *":
-            return "hourly"
-        elif cron_schedule == "0 0 * * *":
-            return "daily"
-        else:
-            # Default fallback - could be enhanced with more sophisticated parsing
-            self.logger.warning(f"Unknown cron format: {cron_schedule}, using hourly")
-            return "hourly"
-    
-    def generate_service_files(self, role: MonitoringRole, inventory_file: str) -> Dict[str, str]:
-        """
-        Generate systemd service and timer files for a monitoring role
+            Systemd OnCalendar expressions (two when day-of-month and day-of-week are OR-ed)
+            
+        Raises:
+            CronError: If the schedule is not a valid cron expression
+        """
+        return CronExpression(cron_schedule).to_oncalendar()
+    
+    def generate_service_files(self, role: ScheduledPlaybook, inventory_file: str,
+                               placement: Optional[PlannedSchedule] = None) -> Dict[str, str]:
+        """
+        Generate systemd service and timer files for a scheduled playbook
         
         Args:
-            role: MonitoringRole object
+            role: ScheduledPlaybook object
             inventory_file: Path to Ansible inventory file
+            placement: Planner offset and random delay; unplanned timers fire on the cron minute
             
         Returns:
             Dictionary with 'service' and 'timer' file contents
@@ -89,12 +94,25 @@ class SystemdServiceManager:
             'role': role,
             'ansible_project_path': str(self.project_path),
             'inventory_file': inventory_file,
-            'playbook_file': f"run_{role.name}.yml",  # Convention: run_<role_name>.yml
+            'playbook_file': role.path,
+            'playbook_arguments': shlex.join(playbook_command(role, inventory_file, command=())),
             'log_path': str(self.log_path),
-            'systemd_calendar_format': self._cron_to_systemd_calendar(role.schedule),
+            'cache_directory': CACHE_DIRECTORY,
+            'lock_file': str(run_lock_path(str(self.log_path), role)),
+            'systemd_calendar_formats': self._cron_to_systemd_calendar(role.schedule),
+            'shards': role.shards,
+            'adaptive': cadence_config(role) is not None,
+            'scheduler_script': str(Path(__file__).resolve()),
             'randomized_delay': 30,  # Prevent thundering herd
-            'accuracy_sec': 10
+            'accuracy_sec': 10,
+            'managed_marker': MANAGED_MARKER
         }
+        if placement:
+            template_vars.update({
+                'systemd_calendar_formats': placement.calendars,
+                'randomized_delay': placement.randomized_delay,
+                'fixed_random_delay': True  # Same jitter on every activation keeps the plan stable
+            })
         
         # Render service file
         service_template = self.jinja_env.get_template('systemd_service.j2')
@@ -109,54 +127,94 @@ class SystemdServiceManager:
             'timer': timer_content
         }
     
-    def install_service(self, role: MonitoringRole, inventory_file: str, dry_run: bool = False) -> bool:
+    def unit_files(self, role: ScheduledPlaybook, inventory_file: str,
+                   placement: Optional[PlannedSchedule] = None) -> Dict[str, str]:
+        """
+        Rendered unit files of a scheduled playbook keyed by file name
+        
+        Sharded playbooks use template units (<service>@.service / <service>@.timer)
+        """
+        files = self.generate_service_files(role, inventory_file, placement)
+        unit_name = f"{role.systemd_service_name}@" if role.shards > 1 else role.systemd_service_name
+        return {
+            f"{unit_name}.service": files['service'],
+            f"{unit_name}.timer": files['timer']
+        }
+    
+    @staticmethod
+    def timer_names(role: ScheduledPlaybook) -> List[str]:
+        """Timer units to enable for a playbook (one instance per shard when sharded)"""
+        return [f"{name}.timer" for name in SystemdServiceManager.unit_names(role)]
+    
+    def running_timers(self, timers: List[str]) -> set:
+        """Timers that are already enabled and active (one systemctl query; empty if unavailable)"""
+        try:
+            blocks = show_units(timers, ('Id', 'ActiveState', 'UnitFileState'), self.systemctl)
+        except SystemctlError as e:
+            self.logger.warning(f"Could not query timer state, enabling all timers: {e}")
+            return set()
+        return {timer for timer, block in zip(timers, blocks)
+                if block.get('ActiveState') == 'active' and block.get('UnitFileState') == 'enabled'}
+    
+    def sync_units(self, entries: List[tuple], inventory_file: str, dry_run: bool = False,
+                   show_diff: bool = False, prune: bool = True) -> Optional[SyncPlan]:
+        """
+        Install the units of many playbooks, touching only what changed
+        
+        Args:
+            entries: (ScheduledPlaybook, PlannedSchedule or None) pairs
+            inventory_file: Path to Ansible inventory file
+            dry_run: Only report the plan
+            show_diff: Print a unified diff of every changed unit file
+            prune: Remove scheduler-managed units of playbooks not in entries
+            
+        Returns:
+            The applied (or, for dry runs, planned) sync plan; None if applying it failed
+        """
+        desired: Dict[str, str] = {}
+        timers: List[str] = []
+        for role, placement in entries:
+            desired.update(self.unit_files(role, inventory_file, placement))
+            timers.extend(self.timer_names(role))
+        
+        plan = plan_sync(desired, timers, self.systemd_path, self.running_timers(timers), prune)
+        
+        if show_diff:
+            for change in plan.changed:
+                print(change.diff(), end='')
+        for line in plan.describe():
+            self.logger.info(f"{'DRY RUN: Would ' if dry_run else ''}{line}")
+        if plan.empty:
+            self.logger.info("All units are up to date")
+        if dry_run:
+            return plan
+        
+        try:
+            if plan.changed:
+                self.log_path.mkdir(parents=True, exist_ok=True)
+            calls = apply_sync(plan, self.systemctl)
+        except (OSError, subprocess.CalledProcessError) as e:
+            self.logger.error(f"Failed to sync systemd units: {e}")
+            return None
+        self.logger.info(f"✅ Synced {len(plan.changed)} unit files with {calls} systemctl calls")
+        return plan
+    
+    def install_service(self, role: ScheduledPlaybook, inventory_file: str, dry_run: bool = False,
+                        placement: Optional[PlannedSchedule] = None) -> bool:
         """
         Install systemd service and timer files
         
         Args:
-            role: MonitoringRole object
+            role: ScheduledPlaybook object
             inventory_file: Path to Ansible inventory file
             dry_run: If True, only show what would be done
+            placement: Planner offset and random delay for the timer
             
         Returns:
             True if successful, False otherwise
         """
         try:
-            # Generate service files
-            files = self.generate_service_files(role, inventory_file)
-            
-            service_name = role.systemd_service_name
-            service_file = self.systemd_path / f"{service_name}.service"
-            timer_file = self.systemd_path / f"{service_name}.timer"
-            
-            if dry_run:
-                self.logger.info(f"DRY RUN: Would create {service_file}")
-                self.logger.info(f"DRY RUN: Would create {timer_file}")
-                return True
-            
-            # Ensure log directory exists
-            self.log_path.mkdir(parents=True, exist_ok=True)
-            
-            # Write service file
-            with open(service_file, 'w') as f:
-                f.write(files['service'])
-            self.logger.info(f"Created service file: {service_file}")
-            
-            # Write timer file
-            with open(timer_file, 'w') as f:
-                f.write(files['timer'])
-            self.logger.info(f"Created timer file: {timer_file}")
-            
-            # Reload systemd daemon
-            subprocess.run(['systemctl', 'daemon-reload'], check=True)
-            
-            # Enable and start timer
-            subprocess.run(['systemctl', 'enable', f"{service_name}.timer"], check=True)
-            subprocess.run(['systemctl', 'start', f"{service_name}.timer"], check=True)
-            
-            self.logger.info(f"✅ Installed and started timer: {service_name}")
-            return True
-            
+            return self.sync_units([(role, placement)], inventory_file, dry_run, prune=False) is not None
         except Exception as e:
             self.logger.error(f"Failed to install service for {role.name}: {e}")
             return False
@@ -171,33 +229,31 @@ class SystemdServiceManager:
         Returns:
             Dictionary containing status information
         """
-        try:
-            # Get service status
-            result = subprocess.run(
-                ['systemctl', 'status', f"{service_name}.service", '--no-pager'],
-                capture_output=True,
-                text=True
-            )
-            
-            # Get timer status
-            timer_result = subprocess.run(
-                ['systemctl', 'status', f"{service_name}.timer", '--no-pager'],
-                capture_output=True,
-                text=True
-            )
+        return self.get_services_status({service_name: [service_name]})[service_name]
+    
+    def get_services_status(self, services: Dict[str, List[str]]) -> Dict[str, Dict]:
+        """
+        Get status information for many services with one systemctl query
+        
+        Args:
+            services: Key -> systemd unit base names (one per shard instance for sharded playbooks)
             
-            return {
-                'service_active': result.returncode == 0,
-                'service_output': result.stdout,
-                'timer_active': timer_result.returncode == 0,
-                'timer_output': timer_result.stdout
-            }
-        except Exception as e:
-            return {
-                'error': str(e),
-                'service_active': False,
-                'timer_active': False
-            }
+        Returns:
+            Key -> status dictionary (last run, exit code, next run, duration, memory peak);
+            every entry carries 'error' if systemctl could not be queried
+        """
+        try:
+            return query_status(services, self.systemctl)
+        except SystemctlError as e:
+            return {key: {'error': str(e), 'service_active': False, 'timer_active': False}
+                    for key in services}
+    
+    @staticmethod
+    def unit_names(role: ScheduledPlaybook) -> List[str]:
+        """systemd unit base names of a playbook (template instances when sharded)"""
+        if role.shards > 1:
+            return [f"{role.systemd_service_name}@{shard}" for shard in range(role.shards)]
+        return [role.systemd_service_name]
 
 class MonitoringScheduler:
     """
@@ -213,7 +269,7 @@ class MonitoringScheduler:
             project_path: Path to Ansible project directory
         """
         self.project_path = Path(project_path)
-        self.factory = MonitoringRoleFactory(str(self.project_path / "roles"))
+        self.factory = SchedulerFactory(str(self.project_path / "playbooks"), str(self.project_path / "roles"))
         self.service_manager = SystemdServiceManager(str(self.project_path))
         
         self.logger = self._setup_logging()
@@ -226,17 +282,19 @@ class MonitoringScheduler:
         )
         return logging.getLogger(__name__)
     
-    def discover_roles(self) -> List[MonitoringRole]:
-        """Discover all monitoring roles"""
-        return self.factory.discover_monitoring_roles()
+    def discover_roles(self) -> List[ScheduledPlaybook]:
+        """Discover all schedulable playbooks"""
+        return self.factory.discover_schedulable_playbooks()
     
-    def create_timers(self, inventory_file: str = "examples/inventory.yml", dry_run: bool = False):
+    def create_timers(self, inventory_file: str = "examples/inventory.yml", dry_run: bool = False,
+                      show_diff: bool = False):
         """
         Create systemd timers for all discovered monitoring roles
         
         Args:
             inventory_file: Path to Ansible inventory file
             dry_run: If True, only show what would be done
+            show_diff: Print a unified diff of every unit file that changes
         """
         roles = self.discover_roles()
         
@@ -246,31 +304,272 @@ class MonitoringScheduler:
         
         self.logger.info(f"Creating timers for {len(roles)} roles")
         
-        success_count = 0
+        valid_roles = []
         for role in roles:
-            self.logger.info(f"Processing role: {role.name}")
-            
             # Validate role configuration
-            errors = self.factory.validate_role(role)
+            errors = self.factory.validate_playbook(role)
             if errors:
                 self.logger.error(f"Role {role.name} has validation errors: {', '.join(errors)}")
                 continue
-            
-            # Install systemd service
-            if self.service_manager.install_service(role, inventory_file, dry_run):
-                success_count += 1
+            valid_roles.append(role)
         
+        # Stagger timers so playbooks do not all start on the same minute
+        placements = {entry.playbook.name: entry
+                      for entry in self.build_planner(valid_roles, inventory_file).plan()}
+        
+        entries = []
+        for role in valid_roles:
+            placement = placements[role.name]
+            self.logger.info(f"Processing role: {role.name} (offset {placement.offset}s, "
+                             f"random delay {placement.randomized_delay}s)")
+            entries.append((role, placement))
+        
+        # Render everything first, then write only what changed and reload systemd once.
+        # Stale units are only pruned when every role validated, so a typo in one playbook
+        # does not uninstall its timer.
+        plan = self.service_manager.sync_units(entries, inventory_file, dry_run, show_diff,
+                                               prune=len(valid_roles) == len(roles))
+        
+        success_count = len(valid_roles) if plan is not None else 0
         self.logger.info(f"Successfully processed {success_count}/{len(roles)} roles")
     
-    def show_status(self):
-        """Show status of all monitoring services"""
+    def build_planner(self, roles: List[ScheduledPlaybook], inventory_file: str,
+                      resolution: int = 10) -> SchedulePlanner:
+        """
+        Create a schedule planner sized from the inventory and ansible.cfg forks
+        
+        Offsets depend on the horizon, so every caller plans over the same one
+        (planner.planning_horizon: a day, or a week when a schedule depends on the weekday).
+        
+        Args:
+            roles: Validated scheduled playbooks
+            inventory_file: Inventory path, relative to the project unless absolute
+            resolution: Seconds per timeline bucket
+        """
+        inventory_path = self.project_path / inventory_file
+        groups = load_inventory_groups(str(inventory_path))
+        if not groups:
+            self.logger.warning(f"Could not read inventory {inventory_path}; assuming every playbook uses all forks")
+        return SchedulePlanner(roles, groups, forks=load_forks(str(self.project_path)),
+                               resolution=resolution)
+    
+    def show_plan(self, inventory_file: str, horizon_hours: int = 24, resolution_minutes: int = 30):
+        """
+        Show planned timer offsets and the projected concurrency timeline
+        
+        Args:
+            inventory_file: Ansible inventory file used to size each playbook
+            horizon_hours: Hours of timeline to print; offsets are planned as for create-timers
+            resolution_minutes: Minutes per timeline row (peak within the window)
+        """
+        roles = [role for role in self.discover_roles() if not self.factory.validate_playbook(role)]
+        planner = self.build_planner(roles, inventory_file)
+        baseline = planner.baseline()
+        plan = planner.plan()
+        
+        print(f"\nSchedule Plan ({len(plan)} playbooks, {planner.forks} forks, "
+              f"planned over {planner.horizon // 3600}h):")
+        print("=" * 60)
+        for entry in plan:
+            hosts = '?' if entry.hosts is None else entry.hosts
+            print(f"\n🗓️  {entry.playbook.name} ({entry.playbook.schedule})")
+            print(f"   Hosts: {hosts}  Forks: {entry.forks}  Runtime: {entry.runtime}s")
+            print(f"   Offset: +{entry.offset}s  RandomizedDelaySec: {entry.randomized_delay}")
+            for calendar in entry.calendars:
+                print(f"   OnCalendar={calendar}")
+        
+        before = planner.timeline(baseline)
+        after = planner.timeline(plan)
+        per_row = max(1, resolution_minutes * 60 // planner.resolution)
+        # The timeline repeats every planner.horizon, so longer views wrap around it
+        rows = max(1, horizon_hours * 3600 // planner.resolution)
+        
+        print(f"\nProjected concurrent forks (peak per {resolution_minutes} min): "
+              f"before {max(before, default=0)}, after {max(after, default=0)}")
+        print(f"{'window':>8}  {'before':>6}  {'after':>6}")
+        for row in range(0, rows, per_row):
+            window = [bucket % planner.buckets for bucket in range(row, min(row + per_row, rows))]
+            peak_before = max(before[bucket] for bucket in window)
+            peak_after = max(after[bucket] for bucket in window)
+            start = timedelta(seconds=row * planner.resolution)
+            label = f"{start.days}d{start.seconds // 3600:02d}:{start.seconds // 60 % 60:02d}" if start.days \
+                else f"{start.seconds // 3600:02d}:{start.seconds // 60 % 60:02d}"
+            print(f"{label:>8}  {peak_before:>6}  {peak_after:>6}  {'#' * peak_after}")
+    
+    def run_daemon(self, inventory_file: str, log_path: str = "/var/log/ansible-monitoring",
+                   vault_password_file: Optional[str] = None):
+        """
+        Run scheduled playbooks from one resident process instead of systemd oneshot units
+        
+        Args:
+            inventory_file: Ansible inventory file
+            log_path: Directory for per-playbook logs
+            vault_password_file: Optional vault password file
+        """
+        def schedulable() -> List[ScheduledPlaybook]:
+            roles = []
+            for role in self.discover_roles():
+                errors = self.factory.validate_playbook(role)
+                if errors:
+                    self.logger.error(f"Role {role.name} has validation errors: {', '.join(errors)}")
+                    continue
+                roles.append(role)
+            return roles
+        
+        def offsets(roles: List[ScheduledPlaybook]) -> Dict[str, int]:
+            # Same staggering as create-timers so switching modes keeps the load profile
+            return {entry.playbook.name: entry.offset
+                    for entry in self.build_planner(roles, inventory_file).plan()}
+        
+        roles = schedulable()
+        if not roles:
+            self.logger.warning("No monitoring roles discovered")
+            return
+        
+        executor = WarmAnsibleExecutor(str(self.project_path), inventory_file, log_path, vault_password_file)
+        cadence = CadencePlanner(log_path, str(self.project_path / inventory_file))
+        daemon = SchedulerDaemon(roles, executor, offsets(roles), cadence=cadence)
+        
+        def reload():
+            self.logger.info("Reloading scheduled playbooks")
+            reloaded = schedulable()
+            daemon.load_playbooks(reloaded, offsets(reloaded))
+        
+        self.logger.info(f"Scheduler daemon running {len(roles)} playbooks (pid {os.getpid()})")
+        daemon.run_forever(reload)
+    
+    def run_listener(self, inventory_file: str, log_path: str = "/var/log/ansible-monitoring",
+                     bind: str = '0.0.0.0', syslog_port: Optional[int] = 514, tcp_syslog_port: Optional[int] = 514,
+                     trap_port: Optional[int] = 162, interface_playbook: Optional[str] = 'interface_monitoring',
+                     device_playbook: Optional[str] = 'connectivity_monitoring', quiet: float = 5.0,
+                     max_delay: float = 30.0, sweep_interval: float = 0.0,
+                     communities: Optional[List[str]] = None) -> int:
+        """
+        Run playbooks limited to the hosts that report link or restart events
+        
+        Args:
+            inventory_file: Ansible inventory file (hosts are matched by name and ansible_host)
+            log_path: Directory for event run logs and limit files (<log_path>/events)
+            bind: Listen address
+            syslog_port / tcp_syslog_port / trap_port: Ports to listen on (None disables one)
+            interface_playbook: Playbook run for interface events (None ignores them)
+            device_playbook: Playbook run for device restart events (None ignores them)
+            quiet: Seconds without events before a host's run starts
+            max_delay: Longest wait after a host's first event
+            sweep_interval: Seconds between full runs (0 keeps the timers/daemon as the sweep)
+            communities: Accepted SNMP communities (None accepts any)
+            
+        Returns:
+            Exit code: 2 when a trigger playbook is unknown
+        """
+        triggers = {}
+        for kind, name in ((INTERFACE_EVENT, interface_playbook), (DEVICE_EVENT, device_playbook)):
+            if name:
+                role = self._find_role(name)
+                if role is None:
+                    return 2
+                triggers[kind] = role
+        if not triggers:
+            self.logger.error("No trigger playbooks configured")
+            return 2
+        
+        inventory_path = str(self.project_path / inventory_file)
+        playbooks = list({role.name: role for role in triggers.values()}.values())
+        listener = EventListener(
+            triggers, HostResolver(load_host_addresses(inventory_path)),
+            PlaybookLauncher(str(self.project_path), inventory_file, log_path),
+            build_targets(inventory_path, playbooks), quiet, max_delay, sweep_interval,
+            set(communities) if communities else None)
+        for kind, role in triggers.items():
+            self.logger.info(f"{kind} events trigger {role.name} "
+                             f"({len(listener.states[role.name].targets)} hosts)")
+        asyncio.run(listener.serve_forever(bind, syslog_port, tcp_syslog_port, trap_port))
+        return 0
+    
+    def _find_role(self, name: str) -> Optional[ScheduledPlaybook]:
+        for role in self.discover_roles():
+            if name in (role.name, role.systemd_service_name):
+                return role
+        self.logger.error(f"No scheduled playbook named {name}")
+        return None
+    
+    def run_sharded(self, name: str, inventory_file: str, log_path: str = "/var/log/ansible-monitoring",
+                    shards: Optional[int] = None, shard: Optional[int] = None, full: bool = False) -> int:
+        """
+        Run a scheduled playbook split into shards
+        
+        Playbooks with an adaptive cadence only run the hosts due this cycle (cadence.py).
+        
+        Args:
+            name: Playbook name or systemd service name
+            inventory_file: Ansible inventory file
+            log_path: Directory for shard results and the merged summary
+            shards: Shard count override (defaults to the playbook's shards setting)
+            shard: Run only this shard (used by the name@shard systemd instances)
+            full: Poll every host, ignoring (and not advancing) an adaptive cadence
+            
+        Returns:
+            Exit code: 0 when every shard succeeded, otherwise the first failing shard's code
+        """
+        role = self._find_role(name)
+        if role is None:
+            return 2
+        
+        runner = ShardRunner(str(self.project_path), inventory_file, log_path)
+        cadence = None if full else CadencePlanner(log_path, str(self.project_path / inventory_file))
+        results = runner.run(role, shards, shard, cadence)
+        if shard is not None and shards is None:
+            # Other shards run in their own instances; merge the latest result of each
+            results = runner.load_results(role)
+        
+        summary = merge_shard_results(results)
+        with open(runner.results_dir(role) / 'summary.json', 'w') as f:
+            json.dump(summary, f, indent=2)
+        
+        print(json.dumps(summary, indent=2))
+        return summary['rc']
+    
+    def show_shard_summary(self, name: str, log_path: str = "/var/log/ansible-monitoring"):
+        """Merge and print the latest recorded result of every shard of a playbook"""
+        role = self._find_role(name)
+        if role is None:
+            return
+        results = ShardRunner(str(self.project_path), "", log_path).load_results(role)
+        if not results:
+            print(f"No shard results recorded for {role.name}")
+            return
+        print(json.dumps(merge_shard_results(results), indent=2))
+    
+    def show_status(self, json_output: bool = False, log_path: Optional[str] = None, window: int = 100):
+        """
+        Show status of all monitoring services
+        
+        Args:
+            json_output: Print one JSON document instead of the text report
+            log_path: Log directory whose metrics/ holds the run_metrics callback output
+                      (defaults to the service manager's log path)
+            window: Number of most recent recorded runs the duration percentiles cover
+        """
         roles = self.discover_roles()
+        statuses = self.service_manager.get_services_status(
+            {role.name: self.service_manager.unit_names(role) for role in roles})
+        directory = metrics_dir(log_path or str(self.service_manager.log_path))
+        metrics = {role.name: summarize_runs(load_runs(directory, role.name, window)) for role in roles}
+        planner = CadencePlanner(log_path or str(self.service_manager.log_path))
+        cadence = {role.name: planner.last_cycles(role) for role in roles if cadence_config(role)}
+        
+        if json_output:
+            document = [dict(name=role.name, service=role.systemd_service_name, schedule=role.schedule,
+                             metrics=metrics[role.name], cadence=cadence.get(role.name),
+                             **statuses[role.name]) for role in roles]
+            print(json.dumps(document, indent=2, default=lambda value: value.isoformat()))
+            return
         
         print(f"\nMonitoring Services Status ({len(roles)} roles):")
         print("=" * 60)
         
         for role in roles:
-            status = self.service_manager.get_service_status(role.systemd_service_name)
+            status = statuses[role.name]
             
             service_status = "🟢 ACTIVE" if status.get('service_active') else "🔴 INACTIVE"
             timer_status = "🟢 ACTIVE" if status.get('timer_active') else "🔴 INACTIVE"
@@ -283,11 +582,61 @@ class MonitoringScheduler:
             
             if status.get('error'):
                 print(f"   ❌ Error: {status['error']}")
+                continue
+            if status.get('last_run'):
+                exit_code = status['last_exit_code']
+                outcome = "running" if exit_code is None else f"exit {exit_code}"
+                print(f"   Last run: {status['last_run']:%Y-%m-%d %H:%M:%S} ({outcome})")
+            if status.get('duration') is not None:
+                print(f"   Duration: {status['duration']:.1f}s")
+            if status.get('memory_peak') is not None:
+                print(f"   Memory peak: {status['memory_peak'] / 1048576:.1f} MiB")
+            if status.get('next_run'):
+                print(f"   Next run: {status['next_run']:%Y-%m-%d %H:%M:%S}")
+            summary = metrics[role.name]
+            if summary:
+                print(f"   Run time (last {summary['runs']} runs): p50 {summary['duration_p50']:.1f}s, "
+                      f"p95 {summary['duration_p95']:.1f}s, max {summary['duration_max']:.1f}s")
+                print(f"   ServiceNow time: p50 {summary['servicenow_p50']:.1f}s, "
+                      f"p95 {summary['servicenow_p95']:.1f}s, {summary['retries']} retries")
+                if summary['slowest_tasks']:
+                    slowest = ', '.join(f"{entry['task']} {entry['seconds']:.1f}s"
+                                        for entry in summary['slowest_tasks'])
+                    print(f"   Slowest tasks (last run): {slowest}")
+            for label, cycle in sorted(cadence.get(role.name, {}).items()):
+                tiers = ', '.join(f"{count} {tier}" for tier, count in cycle['tiers'].items())
+                sweep = ", full sweep" if cycle['full_sweep'] else ""
+                print(f"   Cadence ({label}): cycle {cycle['cycle']} polled {cycle['polled']} hosts "
+                      f"({tiers}{sweep})")
+    
+    def show_next_runs(self, count: int = 5):
+        """
+        Show the next fire times of every scheduled playbook
+        
+        Args:
+            count: Number of fire times to list per playbook
+        """
+        roles = self.discover_roles()
+        now = datetime.now()
+        
+        print(f"\nUpcoming Runs ({len(roles)} playbooks):")
+        print("=" * 60)
+        
+        for role in roles:
+            print(f"\n📅 {role.name} ({role.schedule})")
+            errors = self.factory.validate_playbook(role)
+            if errors:
+                print(f"   ❌ Error: {', '.join(errors)}")
+                continue
+            for calendar in self.service_manager._cron_to_systemd_calendar(role.schedule):
+                print(f"   OnCalendar={calendar}")
+            for fire_time in CronExpression(role.schedule).next_fire_times(now, count):
+                print(f"   {fire_time:%a %Y-%m-%d %H:%M}")
     
     def show_summary(self):
         """Show summary of discovered roles"""
         roles = self.discover_roles()
-        summary = self.factory.get_role_summary(roles)
+        summary = self.factory.get_playbook_summary(roles)
         
         print("\nMonitoring Roles Summary:")
         print("=" * 40)
@@ -310,13 +659,90 @@ def main():
                              help="Ansible inventory file")
     create_parser.add_argument('--dry-run', action='store_true',
                              help="Show what would be done without making changes")
+    create_parser.add_argument('--diff', action='store_true',
+                             help="Show a unified diff of every unit file that changes")
     
     # Status command
     status_parser = subparsers.add_parser('status', help='Show service status')
+    status_parser.add_argument('--json', action='store_true',
+                             help="Print status as JSON")
+    status_parser.add_argument('--log-path', default="/var/log/ansible-monitoring",
+                             help="Directory whose metrics/ holds per-run timing metrics")
+    status_parser.add_argument('--window', type=int, default=100,
+                             help="Recorded runs covered by the run time percentiles")
     
     # Summary command
     summary_parser = subparsers.add_parser('summary', help='Show roles summary')
     
+    # Plan command
+    plan_parser = subparsers.add_parser('plan', help='Show staggered timer offsets and projected load')
+    plan_parser.add_argument('--inventory', default="examples/inventory.yml",
+                           help="Ansible inventory file used to size playbooks")
+    plan_parser.add_argument('--horizon', type=int, default=24,
+                           help="Hours of projected timeline to print (offsets do not depend on it)")
+    plan_parser.add_argument('--resolution', type=int, default=30,
+                           help="Minutes per timeline row")
+    
+    # Daemon command
+    daemon_parser = subparsers.add_parser('daemon', help='Run playbooks on schedule from a resident warm executor')
+    daemon_parser.add_argument('--inventory', default="examples/inventory.yml",
+                             help="Ansible inventory file")
+    daemon_parser.add_argument('--log-path', default="/var/log/ansible-monitoring",
+                             help="Directory for per-playbook logs")
+    daemon_parser.add_argument('--vault-password-file',
+                             help="Vault password file (decrypted once at startup)")
+    
+    # Event listener command
+    listen_parser = subparsers.add_parser('listen', help='Run playbooks for hosts that send link/restart syslog or SNMP traps')
+    listen_parser.add_argument('--inventory', default="examples/inventory.yml",
+                             help="Ansible inventory file")
+    listen_parser.add_argument('--log-path', default="/var/log/ansible-monitoring",
+                             help="Directory for event run logs")
+    listen_parser.add_argument('--bind', default='0.0.0.0', help="Listen address")
+    listen_parser.add_argument('--syslog-port', type=int, default=514,
+                             help="UDP syslog port (0 disables)")
+    listen_parser.add_argument('--tcp-syslog-port', type=int, default=514,
+                             help="TCP syslog port (0 disables)")
+    listen_parser.add_argument('--trap-port', type=int, default=162,
+                             help="SNMP trap port (0 disables)")
+    listen_parser.add_argument('--interface-playbook', default='interface_monitoring',
+                             help="Playbook run for link up/down events ('' ignores them)")
+    listen_parser.add_argument('--device-playbook', default='connectivity_monitoring',
+                             help="Playbook run for device restart events ('' ignores them)")
+    listen_parser.add_argument('--quiet', type=float, default=5.0,
+                             help="Seconds a host must be quiet before its run starts")
+    listen_parser.add_argument('--max-delay', type=float, default=30.0,
+                             help="Longest wait after a host's first event")
+    listen_parser.add_argument('--sweep-interval', type=float, default=0.0,
+                             help="Seconds between full runs (0: the timers/daemon keep sweeping)")
+    listen_parser.add_argument('--community', action='append',
+                             help="Accepted SNMP community (repeatable; default accepts any)")
+    
+    # Sharded run command
+    run_parser = subparsers.add_parser('run', help='Run a playbook now, split into shards')
+    run_parser.add_argument('playbook', help="Playbook or systemd service name")
+    run_parser.add_argument('--inventory', default="examples/inventory.yml",
+                          help="Ansible inventory file")
+    run_parser.add_argument('--log-path', default="/var/log/ansible-monitoring",
+                          help="Directory for shard results")
+    run_parser.add_argument('--shards', type=int,
+                          help="Shard count (defaults to the playbook's shards setting)")
+    run_parser.add_argument('--shard', type=int,
+                          help="Run only this shard (systemd template instance)")
+    run_parser.add_argument('--full', action='store_true',
+                          help="Poll every host even if the playbook has an adaptive cadence")
+    
+    # Shard summary command
+    shard_summary_parser = subparsers.add_parser('shard-summary', help='Merge the latest shard results of a playbook')
+    shard_summary_parser.add_argument('playbook', help="Playbook or systemd service name")
+    shard_summary_parser.add_argument('--log-path', default="/var/log/ansible-monitoring",
+                                    help="Directory for shard results")
+    
+    # Next runs command
+    next_parser = subparsers.add_parser('next', help='Show upcoming fire times')
+    next_parser.add_argument('--count', type=int, default=5,
+                           help="Number of fire times per playbook")
+    
     args = parser.parse_args()
     
     if not args.command:
@@ -332,13 +758,35 @@ def main():
             print(f"  - {role.name}: {role.systemd_service_name}")
     
     elif args.command == 'create-timers':
-        scheduler.create_timers(args.inventory, args.dry_run)
+        scheduler.create_timers(args.inventory, args.dry_run, args.diff)
     
     elif args.command == 'status':
-        scheduler.show_status()
+        scheduler.show_status(args.json, args.log_path, args.window)
     
     elif args.command == 'summary':
         scheduler.show_summary()
+    
+    elif args.command == 'plan':
+        scheduler.show_plan(args.inventory, args.horizon, args.resolution)
+    
+    elif args.command == 'daemon':
+        scheduler.run_daemon(args.inventory, args.log_path, args.vault_password_file)
+    
+    elif args.command == 'listen':
+        sys.exit(scheduler.run_listener(args.inventory, args.log_path, args.bind, args.syslog_port or None,
+                                        args.tcp_syslog_port or None, args.trap_port or None,
+                                        args.interface_playbook or None, args.device_playbook or None,
+                                        args.quiet, args.max_delay, args.sweep_interval, args.community))
+    
+    elif args.command == 'run':
+        sys.exit(scheduler.run_sharded(args.playbook, args.inventory, args.log_path, args.shards, args.shard,
+                                        args.full))
+    
+    elif args.command == 'shard-summary':
+        scheduler.show_shard_summary(args.playbook, args.log_path)
+    
+    elif args.command == 'next':
+        scheduler.show_next_runs(args.count)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
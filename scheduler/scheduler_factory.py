@@ -2,17 +2,33 @@
 """
 Purpose: Ansible ServiceNow Scheduler Factory
 Design Pattern: Factory Pattern with Playbook Discovery and Scheduling
-Complexity: O(n) for playbook discovery, O(1) for service generation per playbook
+Complexity: O(n) stat calls for playbook discovery (only changed files are parsed, see
+            discovery_index.py), O(1) for service generation per playbook
 """
 
 import os
+import shlex
 import yaml
 import json
 import logging
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Sequence
 from dataclasses import dataclass
 from pathlib import Path
 
+from cron import CronExpression, CronError
+from discovery_index import DiscoveryIndex, DEFAULT_INDEX_PATH, INDEX_PATH_ENV, load_yaml
+
+# Writable state of the roles (CI cache, incident ledger, damping store, template bytecode).
+# Units get it from systemd's CacheDirectory=; the role defaults read it as monitoring_cache_dir
+CACHE_DIR_ENV = 'ANSIBLE_MONITORING_CACHE_DIR'
+CACHE_DIRECTORY = 'ansible-monitoring'  # CacheDirectory= name, relative to /var/cache
+DEFAULT_CACHE_DIR = os.path.join('/var/cache', CACHE_DIRECTORY)
+
+
+def monitoring_cache_dir() -> str:
+    """Cache directory the playbooks write to (environment, else the units' CacheDirectory)"""
+    return os.environ.get(CACHE_DIR_ENV) or DEFAULT_CACHE_DIR
+
 @dataclass
 class ScheduledPlaybook:
     """
@@ -32,6 +48,39 @@ class ScheduledPlaybook:
     @property
     def is_enabled(self) -> bool:
         return self.enabled and self.schedule_config.get('enabled', False)
+    
+    @property
+    def shards(self) -> int:
+        """Number of --limit workers a run is split into (see sharding.py)"""
+        return self.schedule_config.get('shards', 1)
+    
+    @property
+    def adaptive(self):
+        """Adaptive per-host cadence settings: True, a mapping or None (see cadence.py)"""
+        return self.schedule_config.get('adaptive')
+    
+    @property
+    def playbook_args(self) -> str:
+        """Extra ansible-playbook arguments from the schedule configuration"""
+        return self.schedule_config.get('playbook_args') or ''
+
+
+def playbook_command(playbook: ScheduledPlaybook, inventory_file: str,
+                     command: Sequence[str] = ('ansible-playbook',)) -> List[str]:
+    """
+    ansible-playbook argument list for a run of the playbook
+    
+    The unit template, shard workers, event runs and the daemon's cold runs all start
+    playbooks with this, so a run gets the same playbook_args and --timeout however it was
+    triggered. Callers append --limit.
+    
+    Args:
+        playbook: Playbook to run
+        inventory_file: Inventory path as the run's working directory sees it
+        command: ansible-playbook command prefix
+    """
+    return (list(command) + ['-i', inventory_file, playbook.path] + shlex.split(playbook.playbook_args)
+            + ['--timeout', str(playbook.timeout)])
 
 class SchedulerFactory:
     """
@@ -40,18 +89,23 @@ class SchedulerFactory:
     """
     
     def __init__(self, playbooks_path: str = "/home/gmorris/ansible-servicenow/playbooks",
-                 roles_path: str = "/home/gmorris/ansible-servicenow/roles"):
+                 roles_path: str = "/home/gmorris/ansible-servicenow/roles",
+                 index_path: Optional[str] = None):
         """
         Initialize the factory with playbooks and roles directory paths
         
         Args:
             playbooks_path: Path to Ansible playbooks directory
             roles_path: Path to Ansible roles directory (for inheritance)
+            index_path: Persistent discovery index; defaults to $ANSIBLE_SCHEDULER_INDEX or
+                        ~/.cache/ansible-monitoring-scheduler/discovery.json, '' disables it
         """
         self.playbooks_path = Path(playbooks_path)
         self.roles_path = Path(roles_path)
         self.logger = self._setup_logging()
-        self.role_defaults_cache = {}
+        if index_path is None:
+            index_path = os.environ.get(INDEX_PATH_ENV, str(DEFAULT_INDEX_PATH))
+        self.index = DiscoveryIndex(index_path)
         
     def _setup_logging(self) -> logging.Logger:
         """Setup logging configuration for the factory"""
@@ -84,34 +138,32 @@ class SchedulerFactory:
             
         return systemd_name
     
-    def _get_role_defaults(self, role_name: str) -> Dict:
+    def _role_defaults_entry(self, role_name: str) -> Optional[Dict]:
         """
-        Get role defaults for inheritance, with caching
+        Index entry holding a role's default_schedule_config
         
         Args:
             role_name: Name of the role to get defaults for
             
         Returns:
-            Dictionary of role defaults, empty if not found
+            Entry with 'sha256' and 'data' (the role's default_schedule_config, empty if
+            unset or unreadable), None if the role has no defaults file
         """
-        if role_name in self.role_defaults_cache:
-            return self.role_defaults_cache[role_name]
-            
         defaults_file = self.roles_path / role_name / "defaults" / "main.yml"
-        defaults = {}
         
-        if defaults_file.exists():
+        def parse(content: bytes) -> Dict:
             try:
-                with open(defaults_file, 'r') as f:
-                    defaults = yaml.safe_load(f) or {}
-                    self.logger.debug(f"Loaded defaults for role {role_name}")
+                defaults = load_yaml(content) or {}
+                self.logger.debug(f"Loaded defaults for role {role_name}")
+                return defaults.get('default_schedule_config') or {}
             except Exception as e:
                 self.logger.warning(f"Failed to load defaults for role {role_name}: {e}")
-        else:
+                return {}
+        
+        entry = self.index.entry(defaults_file, parse)
+        if entry is None:
             self.logger.debug(f"No defaults file found for role {role_name}")
-            
-        self.role_defaults_cache[role_name] = defaults
-        return defaults
+        return entry
     
     def discover_schedulable_playbooks(self) -> List[ScheduledPlaybook]:
         """
@@ -128,7 +180,9 @@ class SchedulerFactory:
             
         self.logger.info(f"Scanning playbooks directory: {self.playbooks_path}")
         
-        for playbook_file in self.playbooks_path.glob("*.yml"):
+        self.index.stats.clear()
+        playbook_files = sorted(self.playbooks_path.glob("*.yml"))
+        for playbook_file in playbook_files:
             playbook_name = playbook_file.stem
             
             scheduled_playbook = self._parse_playbook_config(playbook_name, str(playbook_file))
@@ -137,14 +191,61 @@ class SchedulerFactory:
                 self.logger.info(f"✅ Discovered schedulable playbook: {playbook_name}")
             else:
                 self.logger.debug(f"Playbook {playbook_name} not configured for scheduling")
-                
-        self.logger.info(f"Discovery complete. Found {len(discovered_playbooks)} schedulable playbooks")
+        
+        self.index.prune(self.playbooks_path, playbook_files)
+        self.index.save()
+        
+        stats = self.index.stats
+        self.logger.info(f"Discovery complete. Found {len(discovered_playbooks)} schedulable playbooks "
+                         f"(parsed {stats['parsed']} files, re-resolved {stats['resolved']}, "
+                         f"{stats['unchanged']} unchanged)")
         return discovered_playbooks
     
+    def _extract_play(self, playbook_path: str, content: bytes) -> Dict:
+        """
+        Extract what discovery needs from a playbook's first play
+        
+        Returns:
+            {'schedule': playbook_schedule vars, 'hosts': play hosts, 'roles': include_role
+            names in task order}; {'valid': False} if the file is not a playbook, or
+            {'error': message} if it cannot be parsed
+        """
+        try:
+            playbook_content = load_yaml(content)
+        except yaml.YAMLError as e:
+            return {'error': f"Failed to parse YAML in {playbook_path}: {e}"}
+        
+        if not playbook_content or not isinstance(playbook_content, list):
+            return {'valid': False}
+        
+        # Get the first play (assuming single-play playbooks)
+        first_play = playbook_content[0]
+        roles = []
+        for task in first_play.get('tasks', []) or []:
+            # Check for include_role tasks
+            include_role = task.get('include_role', {})
+            if isinstance(include_role, dict):
+                role_name = include_role.get('name')
+            elif isinstance(include_role, str):
+                role_name = include_role
+            else:
+                continue
+            if role_name:
+                roles.append(role_name)
+        
+        return {
+            'schedule': (first_play.get('vars', {}) or {}).get('playbook_schedule', {}),
+            'hosts': first_play.get('hosts', 'all'),
+            'roles': roles,
+        }
+    
     def _parse_playbook_config(self, playbook_name: str, playbook_path: str) -> Optional[ScheduledPlaybook]:
         """
         Parse playbook to extract scheduling configuration with role inheritance
         
+        The playbook is only re-parsed when its content changed, and the inherited schedule
+        is only re-resolved when the playbook or one of the role defaults it consulted changed.
+        
         Args:
             playbook_name: Name of the playbook (without .yml)
             playbook_path: Full path to playbook file
@@ -153,19 +254,28 @@ class SchedulerFactory:
             ScheduledPlaybook object if valid scheduling config found, None otherwise
         """
         try:
-            with open(playbook_path, 'r') as f:
-                playbook_content = yaml.safe_load(f)
-                
-            if not playbook_content or not isinstance(playbook_content, list):
+            entry = self.index.entry(Path(playbook_path), lambda content: self._extract_play(playbook_path, content))
+            if entry is None:
+                return None
+            play = entry['data']
+            if 'error' in play:
+                self.logger.error(play['error'])
+                return None
+            if not play.get('valid', True):
                 return None
-                
-            # Get the first play (assuming single-play playbooks)
-            first_play = playbook_content[0]
-            playbook_schedule = first_play.get('vars', {}).get('playbook_schedule', {})
+            
+            playbook_schedule = play['schedule']
             
             # If no playbook-level scheduling, check for role inheritance
             if not playbook_schedule:
-                playbook_schedule = self._inherit_from_roles(first_play)
+                resolved = entry.get('resolved')
+                if not resolved or any(self._role_fingerprint(role) != sha
+                                       for role, sha in resolved['deps'].items()):
+                    resolved = self._inherit_from_roles(play['roles'])
+                    entry['resolved'] = resolved
+                    self.index.dirty = True
+                    self.index.stats['resolved'] += 1
+                playbook_schedule = resolved['config']
                 
             # Skip if no scheduling configuration found
             if not playbook_schedule or not playbook_schedule.get('enabled', False):
@@ -178,57 +288,110 @@ class SchedulerFactory:
                 schedule_config=playbook_schedule,
                 description=playbook_schedule.get('description', f'{playbook_name} execution'),
                 schedule=playbook_schedule.get('schedule', '*/10 * * * *'),
-                inventory_groups=playbook_schedule.get('inventory_groups', [first_play.get('hosts', 'all')]),
+                inventory_groups=playbook_schedule.get('inventory_groups', [play['hosts']]),
                 systemd_service_name=self._derive_systemd_name(playbook_name),
                 timeout=playbook_schedule.get('timeout', 300),
                 enabled=playbook_schedule.get('enabled', False)
             )
             
-        except yaml.YAMLError as e:
-            self.logger.error(f"Failed to parse YAML in {playbook_path}: {e}")
-            return None
         except Exception as e:
             self.logger.error(f"Error parsing playbook config for {playbook_name}: {e}")
             return None
     
-    def _inherit_from_roles(self, play: Dict) -> Dict:
+    def _role_fingerprint(self, role_name: str) -> Optional[str]:
+        entry = self._role_defaults_entry(role_name)
+        return entry['sha256'] if entry else None
+    
+    def _inherit_from_roles(self, role_names: List[str]) -> Dict:
         """
         Inherit scheduling configuration from roles used in the play
         
         Args:
-            play: Ansible play dictionary
+            role_names: Roles included by the play, in task order
             
         Returns:
-            Inherited scheduling configuration, empty if none found
+            {'config': inherited scheduling configuration (empty if none found),
+             'deps': {role: defaults sha256 or None} for every role consulted}
         """
-        tasks = play.get('tasks', [])
+        deps = {}
+        for role_name in role_names:
+            entry = self._role_defaults_entry(role_name)
+            deps[role_name] = entry['sha256'] if entry else None
+            schedule_config = entry['data'] if entry else {}
+            
+            if schedule_config:
+                self.logger.info(f"Inheriting schedule from role {role_name}")
+                return {'deps': deps, 'config': {
+                    'enabled': True,
+                    'schedule': schedule_config.get('schedule', '*/10 * * * *'),
+                    'description': f"Inherited from {role_name}: {schedule_config.get('description', 'monitoring')}",
+                    'inventory_groups': schedule_config.get('inventory_groups', ['all']),
+                    'timeout': schedule_config.get('timeout', 300),
+                    'inherited_from_role': role_name
+                }}
         
-        for task in tasks:
-            # Check for include_role tasks
-            include_role = task.get('include_role', {})
-            if isinstance(include_role, dict):
-                role_name = include_role.get('name')
-            elif isinstance(include_role, str):
-                role_name = include_role
-            else:
-                continue
-                
-            if role_name:
-                role_defaults = self._get_role_defaults(role_name)
-                schedule_config = role_defaults.get('default_schedule_config', {})
-                
-                if schedule_config:
-                    self.logger.info(f"Inheriting schedule from role {role_name}")
-                    return {
-                        'enabled': True,
-                        'schedule': schedule_config.get('schedule', '*/10 * * * *'),
-                        'description': f"Inherited from {role_name}: {schedule_config.get('description', 'monitoring')}",
-                        'inventory_groups': schedule_config.get('inventory_groups', ['all']),
-                        'timeout': schedule_config.get('timeout', 300),
-                        'inherited_from_role': role_name
-                    }
+        return {'deps': deps, 'config': {}}
+    
+    def validate_playbook(self, playbook: ScheduledPlaybook) -> List[str]:
+        """
+        Validate a discovered playbook's scheduling configuration
+        
+        Args:
+            playbook: ScheduledPlaybook to validate
+            
+        Returns:
+            List of validation error messages, empty if valid
+        """
+        errors = []
+        
+        try:
+            CronExpression(playbook.schedule)
+        except CronError as e:
+            errors.append(f"invalid schedule: {e}")
+            
+        if not playbook.inventory_groups:
+            errors.append("no inventory_groups configured")
+            
+        if not isinstance(playbook.timeout, int) or playbook.timeout <= 0:
+            errors.append(f"invalid timeout: {playbook.timeout}")
+            
+        if not isinstance(playbook.shards, int) or isinstance(playbook.shards, bool) or playbook.shards < 1:
+            errors.append(f"invalid shards: {playbook.shards}")
+            
+        errors.extend(self._validate_adaptive(playbook.adaptive))
+            
+        return errors
+    
+    @staticmethod
+    def _validate_adaptive(adaptive) -> List[str]:
+        """Validation errors of an adaptive cadence setting (None and booleans are valid)"""
+        if adaptive is None or isinstance(adaptive, bool):
+            return []
+        if not isinstance(adaptive, dict):
+            return [f"invalid adaptive: {adaptive}"]
+        
+        # cadence.py imports this module
+        from cadence import DEFAULT_CADENCE
         
-        return {}
+        errors = []
+        cycles = []
+        for key in ('normal_every', 'slow_every', 'full_sweep_every'):
+            value = adaptive.get(key, DEFAULT_CADENCE[key])
+            if not isinstance(value, int) or isinstance(value, bool) or value < 1:
+                errors.append(f"invalid adaptive.{key}: {value}")
+            cycles.append(value)
+        if not errors and cycles != sorted(cycles):
+            errors.append("adaptive cadence must satisfy normal_every <= slow_every <= full_sweep_every")
+        for key in ('fast_score', 'quiet_after', 'half_life'):
+            value = adaptive.get(key)
+            if value is not None and (not isinstance(value, (int, float)) or isinstance(value, bool) or value <= 0):
+                errors.append(f"invalid adaptive.{key}: {value}")
+        max_fast = adaptive.get('max_fast')
+        if max_fast is not None and (not isinstance(max_fast, (int, float)) or not 0 < max_fast <= 1):
+            errors.append(f"invalid adaptive.max_fast: {max_fast}")
+        if not isinstance(adaptive.get('sources') or {}, dict):
+            errors.append("adaptive.sources must be a mapping")
+        return errors
     
     def get_playbook_summary(self, playbooks: List[ScheduledPlaybook]) -> Dict:
         """
@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+Purpose: Split a scheduled playbook's hosts into shards and merge the per-shard results
+Design Pattern: Rendezvous hashing for stable shard assignment; scatter/gather worker runs
+Complexity: O(h * n) to assign h hosts to n shards; O(h) to merge shard results
+
+A playbook with `shards: N` in its schedule configuration runs as N ansible-playbook workers,
+each limited (--limit @file) to the hosts whose highest rendezvous score belongs to that
+shard. Assignment depends only on the host name and N, so every worker and every control
+node computes the same split without coordination, and changing N moves only about 1/N of
+the hosts (per-host state such as interface history stays mostly on the same worker).
+
+Workers run with the json stdout callback; each shard's play stats are written to
+<log_path>/shards/<service>/shard-<i>.json and merged into one run summary. The run holds the
+playbook's run lock (run_lock.py) while its workers run.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import subprocess
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+from planner import load_inventory_groups
+from run_lock import run_lock_held
+from scheduler_factory import CACHE_DIR_ENV, ScheduledPlaybook, monitoring_cache_dir, playbook_command
+
+STAT_KEYS = ('ok', 'changed', 'failures', 'unreachable', 'skipped', 'rescued', 'ignored')
+
+
+def _score(host: str, shard: int) -> int:
+    digest = hashlib.sha256(f"{shard}:{host}".encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big')
+
+
+def shard_index(host: str, shards: int) -> int:
+    """Shard that owns a host: the shard with the highest rendezvous score"""
+    return max(range(shards), key=lambda shard: _score(host, shard))
+
+
+def split_hosts(hosts: Sequence[str], shards: int) -> List[List[str]]:
+    """
+    Assign hosts to shards
+
+    Returns:
+        One sorted host list per shard (some may be empty for small inventories)
+    """
+    assignment: List[List[str]] = [[] for _ in range(shards)]
+    for host in sorted(set(hosts)):
+        assignment[shard_index(host, shards)].append(host)
+    return assignment
+
+
+def resolve_hosts(inventory_file: str, groups: Sequence[str]) -> List[str]:
+    """
+    Hosts in the union of the given inventory groups
+
+    Static YAML inventories are read directly; anything else (INI, dynamic inventory
+    scripts and plugins) is resolved with `ansible-inventory --list`.
+    """
+    resolved = load_inventory_groups(inventory_file)
+    if not resolved:
+        output = subprocess.run(['ansible-inventory', '-i', inventory_file, '--list'],
+                                capture_output=True, text=True, check=True, stdin=subprocess.DEVNULL).stdout
+        resolved = _groups_from_inventory_json(json.loads(output))
+
+    hosts = set()
+    for group in groups:
+        hosts |= resolved.get(group, set())
+    return sorted(hosts)
+
+
+def _groups_from_inventory_json(inventory: Dict) -> Dict[str, set]:
+    """Group -> hosts mapping (children included) from `ansible-inventory --list` output"""
+    resolved: Dict[str, set] = {}
+
+    def resolve(name: str, seen: frozenset) -> set:
+        if name not in resolved:
+            group = inventory.get(name) or {}
+            hosts = set(group.get('hosts', []))
+            for child in group.get('children', []):
+                if child not in seen:
+                    hosts |= resolve(child, seen | {child})
+            resolved[name] = hosts
+        return resolved[name]
+
+    for name in inventory:
+        if name != '_meta':
+            resolve(name, frozenset([name]))
+    return resolved
+
+
+def parse_json_callback(output: str) -> Dict[str, Dict[str, int]]:
+    """Per-host play stats from the json stdout callback (empty if the output has none)"""
+    start = output.find('{')
+    if start < 0:
+        return {}
+    try:
+        document = json.loads(output[start:])
+    except ValueError:
+        return {}
+    return {host: {key: stats.get(key, 0) for key in STAT_KEYS}
+            for host, stats in document.get('stats', {}).items()}
+
+
+def merge_shard_results(results: Sequence[Dict]) -> Dict:
+    """
+    Merge shard result documents into one run summary
+
+    Args:
+        results: Shard results as written by ShardRunner (shard, hosts, rc, duration, stats)
+
+    Returns:
+        Summary with totals across shards, failed/unreachable hosts, the worst exit code and
+        the run's wall time (the slowest shard)
+    """
+    totals = {key: 0 for key in STAT_KEYS}
+    stats: Dict[str, Dict[str, int]] = {}
+    for result in results:
+        for host, host_stats in result.get('stats', {}).items():
+            stats[host] = host_stats
+            for key in STAT_KEYS:
+                totals[key] += host_stats.get(key, 0)
+
+    exit_codes = [result['rc'] for result in results]
+    return {
+        'playbook': results[0]['playbook'] if results else None,
+        'shards': len(results),
+        'hosts': sum(len(result['hosts']) for result in results),
+        'rc': next((rc for rc in exit_codes if rc != 0), 0),
+        'duration': max((result['duration'] for result in results), default=0.0),
+        'totals': totals,
+        'failed_hosts': sorted(host for host, s in stats.items() if s.get('failures')),
+        'unreachable_hosts': sorted(host for host, s in stats.items() if s.get('unreachable')),
+        'per_shard': [{key: result[key] for key in ('shard', 'hosts', 'rc', 'duration', 'started')}
+                      for result in sorted(results, key=lambda r: r['shard'])],
+    }
+
+
+class ShardRunner:
+    """
+    Runs one scheduled playbook as sharded ansible-playbook workers
+    Local mode starts every shard at once; systemd instance mode runs a single shard
+    """
+
+    def __init__(self, project_path: str, inventory_file: str, log_path: str,
+                 command: Sequence[str] = ('ansible-playbook',)):
+        """
+        Initialize the runner
+
+        Args:
+            project_path: Ansible project directory (workers run from here)
+            inventory_file: Inventory path, relative to the project unless absolute
+            log_path: Directory for shard result files and merged summaries
+            command: ansible-playbook command prefix
+        """
+        self.project_path = Path(project_path)
+        self.inventory_file = str(self.project_path / inventory_file)
+        self.log_path = Path(log_path)
+        self.command = list(command)
+
+    def results_dir(self, playbook: ScheduledPlaybook) -> Path:
+        return self.log_path / 'shards' / playbook.systemd_service_name
+
+    def _start(self, playbook: ScheduledPlaybook, hosts: List[str], work_dir: str, shard: int):
+        limit_file = os.path.join(work_dir, f"shard-{shard}.limit")
+        with open(limit_file, 'w') as f:
+            f.write('\n'.join(hosts) + '\n')
+        env = dict(os.environ, ANSIBLE_STDOUT_CALLBACK='json', ANSIBLE_HOST_KEY_CHECKING='False',
+                   ANSIBLE_RUN_METRICS_SHARD=str(shard))
+        env.setdefault('ANSIBLE_RUN_METRICS_DIR', str(self.log_path / 'metrics'))
+        env.setdefault(CACHE_DIR_ENV, monitoring_cache_dir())
+        # Output goes to files, not pipes, so a chatty shard never blocks while others are awaited
+        with open(os.path.join(work_dir, f"shard-{shard}.out"), 'w') as stdout, \
+                open(os.path.join(work_dir, f"shard-{shard}.err"), 'w') as stderr:
+            return subprocess.Popen(
+                playbook_command(playbook, self.inventory_file, self.command) + ['--limit', f"@{limit_file}"],
+                cwd=str(self.project_path), env=env, stdin=subprocess.DEVNULL, stdout=stdout, stderr=stderr,
+            )
+
+    def run(self, playbook: ScheduledPlaybook, shards: Optional[int] = None,
+            only_shard: Optional[int] = None, cadence=None) -> List[Dict]:
+        """
+        Run the playbook's shards and record each shard's result
+
+        Args:
+            playbook: Playbook to run
+            shards: Shard count (defaults to the playbook's shards setting)
+            only_shard: Run just this shard (systemd template instance mode)
+            cadence: CadencePlanner limiting adaptive playbooks to the hosts due this cycle;
+                     a single shard instance keeps its own cycle (cadence.py)
+
+        Returns:
+            Shard result documents, also written to results_dir(playbook)
+        """
+        shards = shards or playbook.shards
+        hosts = resolve_hosts(self.inventory_file, playbook.inventory_groups)
+        assignment = split_hosts(hosts, shards)
+        selected = [only_shard] if only_shard is not None else list(range(shards))
+        if any(not 0 <= shard < shards for shard in selected):
+            raise ValueError(f"shard must be between 0 and {shards - 1}")
+
+        selection = None
+        if cadence is not None:
+            try:
+                if only_shard is None:
+                    selection = cadence.select(playbook, hosts)
+                else:
+                    selection = cadence.select(playbook, assignment[only_shard],
+                                               f"{playbook.systemd_service_name}@{only_shard}")
+            except Exception as e:
+                # Unreadable history or an unwritable store must not cost a cycle
+                logging.getLogger(__name__).warning(
+                    f"Adaptive cadence of {playbook.name} failed, polling every host: {e}")
+            if selection is not None:
+                due = set(selection.hosts)
+                assignment = [[host for host in shard_hosts if host in due] for shard_hosts in assignment]
+
+        results_dir = self.results_dir(playbook)
+        results_dir.mkdir(parents=True, exist_ok=True)
+
+        results = []
+        # A shard instance shares the lock with its sibling instances; a whole run takes it alone
+        with run_lock_held(str(self.log_path), playbook, shared=only_shard is not None), \
+                tempfile.TemporaryDirectory(prefix='ansible-shards-') as work_dir:
+            started = {}
+            processes = {}
+            for shard in selected:
+                started[shard] = time.time()
+                if assignment[shard]:
+                    processes[shard] = self._start(playbook, assignment[shard], work_dir, shard)
+
+            deadline = time.monotonic() + playbook.timeout
+            for shard in selected:
+                stdout, stderr, rc = '', '', 0
+                process = processes.get(shard)
+                if process:
+                    try:
+                        rc = process.wait(timeout=max(0.0, deadline - time.monotonic()))
+                    except subprocess.TimeoutExpired:
+                        process.kill()
+                        process.wait()
+                        rc = -9
+                    with open(os.path.join(work_dir, f"shard-{shard}.out")) as f:
+                        stdout = f.read()
+                    with open(os.path.join(work_dir, f"shard-{shard}.err")) as f:
+                        stderr = f.read()
+                    if rc == -9:
+                        stderr += f"\nShard {shard} exceeded the {playbook.timeout}s timeout and was killed\n"
+
+                result = {
+                    'playbook': playbook.name,
+                    'shard': shard,
+                    'shards': shards,
+                    'hosts': assignment[shard],
+                    'rc': rc,
+                    'started': datetime.fromtimestamp(started[shard]).isoformat(timespec='seconds'),
+                    'duration': round(time.time() - started[shard], 3),
+                    'stats': parse_json_callback(stdout),
+                    'stderr_tail': stderr[-2000:],
+                }
+                if selection is not None:
+                    result['cadence'] = selection.summary()
+                with open(results_dir / f"shard-{shard}.json", 'w') as f:
+                    json.dump(result, f, indent=2)
+                results.append(result)
+        return results
+
+    def load_results(self, playbook: ScheduledPlaybook) -> List[Dict]:
+        """Latest recorded result of every shard (for systemd instances that ran separately)"""
+        results = []
+        for shard in range(playbook.shards):
+            path = self.results_dir(playbook) / f"shard-{shard}.json"
+            if path.exists():
+                with open(path) as f:
+                    results.append(json.load(f))
+        return results
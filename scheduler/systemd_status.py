@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Purpose: Structured status of every monitoring unit from a single systemctl query
+Design Pattern: Batch query - one `systemctl show` for all units, parsed into per-role records
+Complexity: O(1) processes and O(u * p) parsing for u units and p properties
+
+`systemctl status` was forked twice per role and its text thrown away except for the exit
+code. `systemctl show` accepts any number of units and a property list, and prints one
+KEY=VALUE block per unit in argument order, so the status of the whole fleet of timers costs
+one fork. Timestamps are requested as Unix epochs (--timestamp=unix, systemd >= 248); older
+systemd versions fall back to the default human-readable format.
+"""
+
+import subprocess
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence
+
+SERVICE_PROPERTIES = (
+    'Id', 'LoadState', 'ActiveState', 'SubState', 'Result',
+    'ExecMainStartTimestamp', 'ExecMainExitTimestamp', 'ExecMainStatus', 'ExecMainCode',
+    'MemoryPeak',
+)
+TIMER_PROPERTIES = (
+    'Id', 'LoadState', 'ActiveState', 'SubState', 'UnitFileState',
+    'NextElapseUSecRealtime', 'LastTriggerUSec',
+)
+UNSET_VALUES = ('', 'n/a', '[not set]', '0', 'infinity', '18446744073709551615')
+# ExecMainCode values (siginfo si_code): the process exited rather than being killed
+CLD_EXITED = '1'
+
+
+class SystemctlError(Exception):
+    """Raised when systemctl show cannot be run or fails"""
+
+
+def parse_show_output(output: str) -> List[Dict[str, str]]:
+    """
+    Split `systemctl show` output into one property dict per unit
+
+    Units are separated by blank lines; every unit prints each requested property (empty
+    values included), so the blocks line up with the units passed on the command line.
+    """
+    blocks: List[Dict[str, str]] = []
+    current: Dict[str, str] = {}
+    for line in output.splitlines():
+        if not line.strip():
+            if current:
+                blocks.append(current)
+                current = {}
+            continue
+        key, _, value = line.partition('=')
+        current[key] = value
+    if current:
+        blocks.append(current)
+    return blocks
+
+
+def parse_timestamp(value: Optional[str]) -> Optional[datetime]:
+    """Timestamp property as a naive local datetime ('@<epoch>' or 'Mon 2024-01-01 00:00:00 UTC')"""
+    if not value or value in UNSET_VALUES:
+        return None
+    if value.startswith('@'):
+        return datetime.fromtimestamp(float(value[1:]))
+    try:
+        # Drop the weekday and time zone; systemd prints local time by default
+        return datetime.strptime(' '.join(value.split()[1:3]), '%Y-%m-%d %H:%M:%S')
+    except ValueError:
+        return None
+
+
+def parse_int(value: Optional[str]) -> Optional[int]:
+    """Numeric property, None when systemd reports it as unset"""
+    if not value or value in UNSET_VALUES[1:]:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        return None
+
+
+def unit_status(service: Dict[str, str], timer: Dict[str, str]) -> Dict:
+    """
+    Structured status of one service/timer pair
+
+    Returns:
+        Dict with active flags, last run start, exit code, duration, memory peak and the
+        timer's next elapse (None where systemd has no value yet)
+    """
+    started = parse_timestamp(service.get('ExecMainStartTimestamp'))
+    exited = parse_timestamp(service.get('ExecMainExitTimestamp'))
+    finished = exited is not None and started is not None and exited >= started
+    exit_code = parse_int(service.get('ExecMainStatus')) or 0 if finished else None
+    if exit_code and service.get('ExecMainCode') != CLD_EXITED:
+        exit_code = -exit_code  # Killed by a signal, reported like subprocess does
+    return {
+        'service_active': service.get('ActiveState') in ('active', 'activating'),
+        'service_state': service.get('SubState'),
+        'service_loaded': service.get('LoadState') == 'loaded',
+        'timer_active': timer.get('ActiveState') == 'active',
+        'timer_enabled': timer.get('UnitFileState') == 'enabled',
+        'last_run': started,
+        'last_exit_code': exit_code,
+        'result': service.get('Result') or None,
+        'duration': (exited - started).total_seconds() if finished else None,
+        'memory_peak': parse_int(service.get('MemoryPeak')),
+        'next_run': parse_timestamp(timer.get('NextElapseUSecRealtime')),
+        'last_trigger': parse_timestamp(timer.get('LastTriggerUSec')),
+    }
+
+
+def merge_unit_status(statuses: Sequence[Dict]) -> Dict:
+    """Combine the per-shard instances of one playbook into a single status record"""
+    if len(statuses) == 1:
+        return statuses[0]
+    exit_codes = [s['last_exit_code'] for s in statuses if s['last_exit_code'] is not None]
+    durations = [s['duration'] for s in statuses if s['duration'] is not None]
+    memory = [s['memory_peak'] for s in statuses if s['memory_peak'] is not None]
+    last_runs = [s['last_run'] for s in statuses if s['last_run'] is not None]
+    next_runs = [s['next_run'] for s in statuses if s['next_run'] is not None]
+    triggers = [s['last_trigger'] for s in statuses if s['last_trigger'] is not None]
+    return {
+        'service_active': any(s['service_active'] for s in statuses),
+        'service_state': ','.join(sorted({s['service_state'] or '' for s in statuses})),
+        'service_loaded': all(s['service_loaded'] for s in statuses),
+        'timer_active': all(s['timer_active'] for s in statuses),
+        'timer_enabled': all(s['timer_enabled'] for s in statuses),
+        'last_run': max(last_runs, default=None),
+        'last_exit_code': next((code for code in exit_codes if code != 0), 0) if exit_codes else None,
+        'result': next((s['result'] for s in statuses if s['result'] not in (None, 'success')),
+                       statuses[0]['result']),
+        'duration': max(durations, default=None),
+        'memory_peak': max(memory, default=None),
+        'next_run': min(next_runs, default=None),
+        'last_trigger': max(triggers, default=None),
+        'instances': len(statuses),
+    }
+
+
+def show_units(units: Sequence[str], properties: Sequence[str], systemctl: str = 'systemctl') -> List[Dict[str, str]]:
+    """
+    Run one `systemctl show` for all units
+
+    Returns:
+        One property dict per unit, in the order given
+
+    Raises:
+        SystemctlError: systemctl is missing or the query failed
+    """
+    if not units:
+        return []
+    base = [systemctl, 'show', '--no-pager', f"--property={','.join(properties)}"]
+    try:
+        result = subprocess.run(base[:2] + ['--timestamp=unix'] + base[2:] + list(units),
+                                capture_output=True, text=True, stdin=subprocess.DEVNULL)
+        if result.returncode != 0 and '--timestamp' in result.stderr:
+            result = subprocess.run(base + list(units), capture_output=True, text=True,
+                                    stdin=subprocess.DEVNULL)
+    except OSError as e:
+        raise SystemctlError(f"cannot run {systemctl}: {e}")
+    if result.returncode != 0:
+        raise SystemctlError(result.stderr.strip() or f"{systemctl} show exited with {result.returncode}")
+
+    blocks = parse_show_output(result.stdout)
+    if len(blocks) != len(units):
+        raise SystemctlError(f"expected {len(units)} units from systemctl show, got {len(blocks)}")
+    return blocks
+
+
+def query_status(services: Dict[str, Sequence[str]], systemctl: str = 'systemctl') -> Dict[str, Dict]:
+    """
+    Status of many playbooks' units with a single systemctl process
+
+    Args:
+        services: Playbook key -> unit base names (one, or one per shard instance)
+        systemctl: systemctl executable
+
+    Returns:
+        Playbook key -> merged status record (see unit_status)
+    """
+    names = [name for unit_names in services.values() for name in unit_names]
+    # Service and timer properties differ, but systemctl show takes one property list
+    properties = sorted(set(SERVICE_PROPERTIES) | set(TIMER_PROPERTIES))
+    units = [f"{name}.service" for name in names] + [f"{name}.timer" for name in names]
+    blocks = show_units(units, properties, systemctl)
+    by_unit = dict(zip(units, blocks))
+
+    return {
+        key: merge_unit_status([unit_status(by_unit[f"{name}.service"], by_unit[f"{name}.timer"])
+                                for name in unit_names])
+        for key, unit_names in services.items()
+    }
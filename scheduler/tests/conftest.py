@@ -0,0 +1,17 @@
+"""
+Purpose: Make the scheduler scripts importable from the scheduler tests and isolate their state
+Design Pattern: pytest conftest path setup (scheduler/ is a script directory, not a package)
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+@pytest.fixture(autouse=True)
+def isolated_discovery_index(tmp_path, monkeypatch):
+    """Keep SchedulerFactory's persistent discovery index out of the user's home directory"""
+    monkeypatch.setenv('ANSIBLE_SCHEDULER_INDEX', str(tmp_path / 'discovery-index.json'))
@@ -0,0 +1,274 @@
+"""
+Purpose: Tests for the adaptive per-host polling cadence
+Design Pattern: History sources written to tmp_path with a fake clock; daemon and shard runner
+                integration with fake launches
+"""
+
+import json
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+from cadence import CadencePlanner, cadence_config, host_of
+from daemon import SchedulerDaemon
+from scheduler import SystemdServiceManager
+from scheduler_factory import SchedulerFactory
+from sharding import ShardRunner, shard_index
+from test_daemon import FakeClock, FakeRun
+from test_scheduler import make_playbook
+
+PROJECT_PATH = Path(__file__).resolve().parents[2]
+
+HOSTS = [f"sw-{index:02d}" for index in range(20)]
+DAY = 86400
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_adaptive(tmp_path, **settings):
+    sources = {
+        'interface_state_path': str(tmp_path / 'state'),
+        'interface_state_db': str(tmp_path / 'state' / 'interface-state.db'),
+        'incident_ledger': str(tmp_path / 'ledger.json'),
+        'event_damping': str(tmp_path / 'damping.json'),
+    }
+    adaptive = dict(settings, sources=sources)
+    return make_playbook('*/5 * * * *', schedule_config={'enabled': True, 'adaptive': adaptive})
+
+
+def write_state(tmp_path, host, statuses):
+    path = tmp_path / 'state' / host / 'interface-state.json'
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps({name: {'status': status} for name, status in statuses.items()}))
+
+
+def write_ledger(tmp_path, correlation_ids):
+    incidents = {cid: [{'sys_id': 'x', 'number': 'INC1', 'correlation_id': cid}] for cid in correlation_ids}
+    (tmp_path / 'ledger.json').write_text(json.dumps({'version': 1, 'incidents': incidents}))
+
+
+def run_cycles(planner, playbook, count, step=300):
+    selections = []
+    for _ in range(count):
+        selections.append(planner.select(playbook, HOSTS))
+        planner.clock.now += step
+    return selections
+
+
+def test_cadence_config_defaults_and_opt_out(monkeypatch):
+    monkeypatch.setenv('ANSIBLE_MONITORING_CACHE_DIR', '/srv/monitoring-cache')
+    assert cadence_config(make_playbook('*/5 * * * *')) is None
+    enabled = make_playbook('*/5 * * * *', schedule_config={'enabled': True, 'adaptive': True})
+    disabled = make_playbook('*/5 * * * *', schedule_config={'enabled': True, 'adaptive': {'enabled': False}})
+
+    assert cadence_config(enabled)['slow_every'] == 6
+    assert cadence_config(enabled)['sources']['incident_ledger'] == '/srv/monitoring-cache/servicenow_incident_ledger.json'
+    assert cadence_config(disabled) is None
+
+
+def test_adaptive_setting_is_validated():
+    factory = SchedulerFactory(str(PROJECT_PATH / 'playbooks'), str(PROJECT_PATH / 'roles'))
+
+    def errors(adaptive):
+        return factory.validate_playbook(make_playbook('*/5 * * * *', schedule_config={'adaptive': adaptive}))
+
+    assert errors(True) == []
+    assert errors({'normal_every': 3, 'slow_every': 12, 'max_fast': 0.1}) == []
+    assert errors({'normal_every': 0}) == ['invalid adaptive.normal_every: 0']
+    assert errors({'slow_every': 30}) == [
+        'adaptive cadence must satisfy normal_every <= slow_every <= full_sweep_every']
+    assert errors({'max_fast': 1.5, 'half_life': -1}) == ['invalid adaptive.half_life: -1',
+                                                          'invalid adaptive.max_fast: 1.5']
+
+
+def test_first_cycle_sweeps_then_quiet_hosts_are_spread_over_cycles(tmp_path):
+    planner = CadencePlanner(str(tmp_path / 'logs'), clock=Clock())
+    playbook = make_adaptive(tmp_path, full_sweep_every=8)
+
+    selections = run_cycles(planner, playbook, 9)
+
+    assert selections[0].full_sweep and selections[0].hosts == HOSTS
+    assert selections[8].full_sweep and selections[8].hosts == HOSTS
+    # Every host is normal (no history yet): each is polled in exactly one of two cycles
+    assert selections[1].tiers['normal'] == HOSTS
+    assert sorted(selections[1].hosts + selections[2].hosts) == HOSTS
+    assert selections[3].hosts == selections[1].hosts
+    assert selections[1].hosts == [host for host in HOSTS if shard_index(host, 2) == 1]
+
+
+def test_changing_hosts_poll_fast_and_quiet_hosts_slow(tmp_path):
+    clock = Clock()
+    planner = CadencePlanner(str(tmp_path / 'logs'), clock=clock)
+    playbook = make_adaptive(tmp_path, quiet_after=DAY, half_life=DAY, fast_score=1.5)
+    for host in HOSTS:
+        write_state(tmp_path, host, {'Gi1/0/1': 'connected'})
+    planner.select(playbook, HOSTS)
+
+    # sw-03 flaps twice; everything else stays quiet for a day
+    for status in ('notconnect', 'connected'):
+        clock.now += 300
+        write_state(tmp_path, 'sw-03', {'Gi1/0/1': status})
+        selection = planner.select(playbook, HOSTS)
+    assert selection.tiers['fast'] == ['sw-03']
+    assert 'sw-03' in selection.hosts
+
+    clock.now += DAY - 600  # a day after the first cycle
+    selection = planner.select(playbook, HOSTS)
+    assert selection.tiers['slow'] == [host for host in HOSTS if host != 'sw-03']
+    # Score decayed below fast_score, but the last change is less than quiet_after ago
+    assert selection.tiers['normal'] == ['sw-03']
+
+    clock.now += 300
+    cycles = [planner.select(playbook, HOSTS) for _ in range(6)]
+    polled = [host for selection in cycles for host in selection.hosts if host != 'sw-03']
+    assert sorted(polled) == sorted(host for host in HOSTS if host != 'sw-03')
+
+
+def test_open_incidents_pin_hosts_fast_and_closures_count(tmp_path):
+    clock = Clock()
+    planner = CadencePlanner(str(tmp_path / 'logs'), clock=clock)
+    playbook = make_adaptive(tmp_path)
+    write_ledger(tmp_path, ['device_connectivity_sw-05', 'interface_down_sw-07_GigabitEthernet1_0_1'])
+    planner.select(playbook, HOSTS)
+
+    clock.now += 300
+    write_ledger(tmp_path, ['device_connectivity_sw-05'])
+    selection = planner.select(playbook, HOSTS)
+    store = planner.load(playbook.systemd_service_name)
+
+    assert selection.tiers['fast'] == ['sw-05']
+    assert store['hosts']['sw-07']['score'] == pytest.approx(1.0, abs=0.01)
+    assert store['hosts']['sw-05']['open'] == ['device_connectivity_sw-05']
+
+
+def test_damping_and_sqlite_history_feed_the_scores(tmp_path):
+    clock = Clock()
+    planner = CadencePlanner(str(tmp_path / 'logs'), clock=clock)
+    playbook = make_adaptive(tmp_path)
+    (tmp_path / 'state').mkdir()
+    db = sqlite3.connect(str(tmp_path / 'state' / 'interface-state.db'))
+    db.execute('CREATE TABLE interface_history (host TEXT, interface TEXT, change TEXT, recorded_at REAL)')
+    db.executemany('INSERT INTO interface_history VALUES (?, ?, ?, ?)',
+                   [('sw-01', 'Gi1/0/1', change, clock.now - 600) for change in ('down', 'up', 'down')])
+    db.commit()
+    db.close()
+    (tmp_path / 'damping.json').write_text(json.dumps({'version': 1, 'subjects': {
+        'interface|sw-02|Gi1/0/2': {'transitions': [clock.now - 60], 'flapping': True},
+        'interface|sw-09|Gi1/0/2': {'transitions': [clock.now - 60], 'flapping': False}}}))
+
+    selection = planner.select(playbook, HOSTS)
+
+    assert selection.tiers['fast'] == ['sw-01', 'sw-02']
+    assert planner.load(playbook.systemd_service_name)['hosts']['sw-09']['score'] == 1.0
+
+
+def test_fast_tier_is_capped_keeping_pinned_and_highest_scores(tmp_path):
+    planner = CadencePlanner(str(tmp_path / 'logs'), clock=Clock())
+    playbook = make_adaptive(tmp_path, max_fast=0.1)  # 2 of 20 hosts
+    write_ledger(tmp_path, ['device_connectivity_sw-10'])
+    (tmp_path / 'damping.json').write_text(json.dumps({'version': 1, 'subjects': {
+        f"interface|{host}|Gi1/0/1": {'transitions': [1] * count}
+        for host, count in (('sw-01', 2), ('sw-02', 5), ('sw-03', 3))}}))
+
+    selection = planner.select(playbook, HOSTS)
+
+    assert selection.tiers['fast'] == ['sw-02', 'sw-10']
+    assert selection.demoted == 2
+    assert {'sw-01', 'sw-03'} <= set(selection.tiers['normal'])
+
+
+def test_host_of_matches_correlation_id_formats():
+    lookup = {'core-sw-01': 'core-sw-01', 'core_sw_01': 'core-sw-01', 'r1': 'r1'}
+
+    assert host_of('device_connectivity_core-sw-01', lookup) == 'core-sw-01'
+    assert host_of('interface_down_core-sw-01_GigabitEthernet1_0_1', lookup) == 'core-sw-01'
+    assert host_of('flapping_interface_core_sw_01_Gi1_0_1', lookup) == 'core-sw-01'
+    assert host_of('group_outage_site_0001', lookup) is None
+
+
+class FakeExecutor:
+    def __init__(self):
+        self.launched = []
+
+    def prepare(self, playbooks):
+        pass
+
+    def refresh_if_changed(self, playbooks):
+        pass
+
+    def launch(self, playbook, hosts=None):
+        run = FakeRun(len(self.launched) + 1000)
+        run.returncode = 0
+        self.launched.append((playbook.name, hosts))
+        return run
+
+
+class FakeSelection:
+    def __init__(self, cycle, hosts, full_sweep=False):
+        self.cycle, self.hosts, self.full_sweep = cycle, hosts, full_sweep
+        self.tiers = {'fast': hosts, 'normal': [], 'slow': []}
+
+
+class FakePlanner:
+    def __init__(self, selections):
+        self.selections = list(selections)
+
+    def select(self, playbook):
+        selection = self.selections.pop(0)
+        if isinstance(selection, Exception):
+            raise selection
+        return selection
+
+
+def test_daemon_limits_adaptive_cycles_and_skips_empty_ones():
+    from datetime import datetime
+
+    clock = FakeClock(datetime(2024, 1, 1, 0, 4, 59))
+    executor = FakeExecutor()
+    planner = FakePlanner([FakeSelection(0, HOSTS, full_sweep=True), FakeSelection(1, ['sw-03']),
+                           FakeSelection(2, []), OSError('ledger unreadable')])
+    daemon = SchedulerDaemon([make_playbook('*/5 * * * *', name='poll')], executor, clock=clock, cadence=planner)
+
+    for _ in range(4):
+        clock.advance(300)
+        daemon.tick()
+        daemon.tick()  # reap
+
+    assert executor.launched == [('poll', None), ('poll', ['sw-03']), ('poll', None)]
+    assert daemon.states['poll'].idle == 1
+    assert daemon.states['poll'].runs == 3
+
+
+def test_shard_instance_keeps_its_own_cycle(tmp_path):
+    (tmp_path / 'hosts.yml').write_text(
+        "all:\n  children:\n    network_devices:\n      hosts:\n"
+        + ''.join(f"        {host}:\n" for host in HOSTS))
+    playbook = make_adaptive(tmp_path)
+    playbook.schedule_config['shards'] = 2
+    runner = ShardRunner(str(tmp_path), 'hosts.yml', str(tmp_path / 'logs'), command=['true'])
+    planner = CadencePlanner(str(tmp_path / 'logs'), clock=Clock())
+
+    first = runner.run(playbook, only_shard=1, cadence=planner)[0]
+    second = runner.run(playbook, only_shard=1, cadence=planner)[0]
+
+    shard_hosts = [host for host in HOSTS if shard_index(host, 2) == 1]
+    assert first['hosts'] == shard_hosts and first['cadence']['full_sweep']
+    assert second['hosts'] == [host for host in shard_hosts if shard_index(host, 2) == 1]
+    assert second['cadence']['tiers'] == {'fast': 0, 'normal': len(shard_hosts), 'slow': 0}
+    assert set(planner.last_cycles(playbook)) == {'test-playbook-monitor@1'}
+
+
+def test_adaptive_playbook_units_run_through_the_scheduler():
+    manager = SystemdServiceManager(str(PROJECT_PATH))
+    files = manager.generate_service_files(
+        make_playbook('*/5 * * * *', schedule_config={'enabled': True, 'adaptive': True}), 'inventory/hosts.yml')
+
+    assert 'run test_playbook' in files['service']
+    assert '/usr/bin/ansible-playbook' not in files['service']
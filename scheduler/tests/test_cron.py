@@ -0,0 +1,264 @@
+"""
+Purpose: Unit and property tests for the cron compiler (scheduler/cron.py)
+Design Pattern: Seeded random expression generation checked against reference implementations
+Complexity: O(c * w) for c generated cases and a w-minute brute-force window
+
+References:
+  - a brute-force minute scanner with its own field expansion (always runs)
+  - croniter (pinned in scheduler/requirements-test.txt), on the expressions it reads like Vixie cron
+  - systemd-analyze calendar, when available, to check the emitted OnCalendar expressions
+"""
+
+import random
+import re
+import shutil
+import subprocess
+from datetime import datetime, timedelta
+
+import pytest
+
+from cron import CronError, CronExpression, cron_to_oncalendar
+
+SEED = 20260101
+CASES = 150
+WINDOW = timedelta(days=7)
+
+FIELD_RANGES = [(0, 59), (0, 23), (1, 31), (1, 12)]
+WEEKDAY_NAMES = ['sun', 'mon', 'tue', 'wed', 'thu', 'fri', 'sat']
+
+
+# ----------------------------------------------------------------------
+# Reference implementation - deliberately naive
+# ----------------------------------------------------------------------
+def reference_expand(text, minimum, maximum, names=None):
+    names = names or {}
+    selected = set()
+    for term in text.split(','):
+        step, stepped = 1, '/' in term
+        if stepped:
+            term, step = term.split('/')
+            step = int(step)
+        if term == '*':
+            bounds = (minimum, maximum)
+        elif '-' in term:
+            low, high = term.split('-')
+            bounds = (int(names.get(low, low)), int(names.get(high, high)))
+        else:
+            value = int(names.get(term, term))
+            bounds = (value, maximum if stepped else value)
+        value = bounds[0]
+        while value <= bounds[1]:
+            selected.add(value)
+            value += step
+    return selected
+
+
+def reference_matches(expression, when):
+    fields = expression.split()
+    minute, hour, day, month = [
+        reference_expand(text, low, high) for text, (low, high) in zip(fields, FIELD_RANGES)
+    ]
+    # Weekday 7 is Sunday, so steps run up to 7 before folding
+    weekday = reference_expand(fields[4], 0, 7, {name: index for index, name in enumerate(WEEKDAY_NAMES)})
+    weekday = {value % 7 for value in weekday}
+    cron_weekday = int(when.strftime('%w'))
+    if fields[2][0] != '*' and fields[4][0] != '*':
+        day_ok = when.day in day or cron_weekday in weekday
+    else:
+        day_ok = when.day in day and cron_weekday in weekday
+    return when.minute in minute and when.hour in hour and when.month in month and day_ok
+
+
+def reference_fire_times(expression, start, end):
+    when = start.replace(second=0, microsecond=0) + timedelta(minutes=1)
+    fires = []
+    while when <= end:
+        if reference_matches(expression, when):
+            fires.append(when)
+        when += timedelta(minutes=1)
+    return fires
+
+
+# ----------------------------------------------------------------------
+# Expression generator
+# ----------------------------------------------------------------------
+def random_term(rng, minimum, maximum, names=None):
+    kind = rng.choice(['value', 'range', 'range_step', 'star_step', 'start_step'])
+    low = rng.randint(minimum, maximum)
+    high = rng.randint(low, maximum)
+    step = rng.randint(2, max(2, (maximum - minimum) // 2))
+
+    def show(value):
+        return names[value] if names and rng.random() < 0.5 else str(value)
+
+    if kind == 'value':
+        return show(low)
+    if kind == 'range':
+        return f"{show(low)}-{show(high)}"
+    if kind == 'range_step':
+        return f"{low}-{high}/{step}"
+    if kind == 'star_step':
+        return f"*/{step}"
+    return f"{low}/{step}"
+
+
+def random_field(rng, minimum, maximum, star_probability, names=None):
+    if rng.random() < star_probability:
+        return '*'
+    terms = [random_term(rng, minimum, maximum, names) for _ in range(rng.randint(1, 3))]
+    # A star step must stand alone to keep Vixie's "starts with *" rule unambiguous
+    if any(term.startswith('*') for term in terms):
+        return next(term for term in terms if term.startswith('*'))
+    return ','.join(terms)
+
+
+def random_expression(rng):
+    return ' '.join([
+        random_field(rng, 0, 59, 0.2),
+        random_field(rng, 0, 23, 0.5),
+        random_field(rng, 1, 31, 0.6),
+        random_field(rng, 1, 12, 0.85),
+        random_field(rng, 0, 6, 0.6, WEEKDAY_NAMES),
+    ])
+
+
+def random_start(rng):
+    return datetime(2026, 1, 1) + timedelta(minutes=rng.randint(0, 60 * 24 * 365 * 3))
+
+
+def generated_cases(count=CASES, seed=SEED, accept=None):
+    rng = random.Random(seed)
+    cases = []
+    while len(cases) < count:
+        expression, start = random_expression(rng), random_start(rng)
+        if accept is None or accept(expression):
+            cases.append((expression, start))
+    return cases
+
+
+def croniter_compatible(expression):
+    """
+    Whether croniter 6.x reads the expression like Vixie cron
+
+    croniter ORs day fields that start with */N (Vixie ANDs them as unrestricted), and reads
+    start steps (59/7) and single-value ranges (20-20, sat-6) differently
+    """
+    fields = expression.split()
+    if fields[2].startswith('*/') or fields[4].startswith('*/'):
+        return False
+    weekdays = {name: str(index) for index, name in enumerate(WEEKDAY_NAMES)}
+    for term in ','.join(fields).split(','):
+        bounds = term.split('/')[0].split('-')
+        if re.match(r'^\w+/\d+$', term):
+            return False
+        if len(bounds) == 2 and weekdays.get(bounds[0], bounds[0]) == weekdays.get(bounds[1], bounds[1]):
+            return False
+    return True
+
+
+# ----------------------------------------------------------------------
+# Unit tests
+# ----------------------------------------------------------------------
+@pytest.mark.parametrize('expression, expected', [
+    ('*/5 * * * *', ['*-*-* *:00/5:00']),
+    ('*/10 * * * *', ['*-*-* *:00/10:00']),
+    ('*/15 * * * *', ['*-*-* *:00/15:00']),
+    ('*/1 * * * *', ['*-*-* *:*:00']),
+    ('0 * * * *', ['*-*-* *:00:00']),
+    ('0 0 * * *', ['*-*-* 00:00:00']),
+    ('0 2 * * *', ['*-*-* 02:00:00']),
+    ('0 */6 * * *', ['*-*-* 00/6:00:00']),
+    ('30 8-17 * * mon-fri', ['Mon..Fri *-*-* 08..17:30:00']),
+    ('0 0 * * 0,6', ['Sat,Sun *-*-* 00:00:00']),
+    ('0 0 * * 7', ['Sun *-*-* 00:00:00']),
+    ('0 3 1 jan,jul *', ['*-01,07-01 03:00:00']),
+    ('0 12 1,15 * fri', ['*-*-01,15 12:00:00', 'Fri *-*-* 12:00:00']),
+    ('@daily', ['*-*-* 00:00:00']),
+    ('@weekly', ['Sun *-*-* 00:00:00']),
+    ('@yearly', ['*-01-01 00:00:00']),
+])
+def test_oncalendar_compilation(expression, expected):
+    assert cron_to_oncalendar(expression) == expected
+
+
+@pytest.mark.parametrize('expression', [
+    '* * * *',
+    '* * * * * *',
+    '60 * * * *',
+    '* 24 * * *',
+    '* * 0 * *',
+    '* * * 13 *',
+    '* * * * 8',
+    '*/0 * * * *',
+    '5-1 * * * *',
+    '1,,2 * * * *',
+    'a * * * *',
+    '* * * foo *',
+])
+def test_invalid_expressions_raise(expression):
+    with pytest.raises(CronError):
+        CronExpression(expression)
+
+
+def test_next_fire_times_are_strictly_after_start():
+    expression = CronExpression('*/15 * * * *')
+    assert expression.next_fire_times(datetime(2026, 3, 1, 10, 15, 30), 3) == [
+        datetime(2026, 3, 1, 10, 30),
+        datetime(2026, 3, 1, 10, 45),
+        datetime(2026, 3, 1, 11, 0),
+    ]
+
+
+def test_day_of_month_or_day_of_week():
+    # 1st of the month OR any Monday
+    expression = CronExpression('0 9 1 * mon')
+    assert expression.next_fire_times(datetime(2026, 1, 1), 3) == [
+        datetime(2026, 1, 1, 9, 0),
+        datetime(2026, 1, 5, 9, 0),
+        datetime(2026, 1, 12, 9, 0),
+    ]
+
+
+def test_leap_day_and_impossible_dates():
+    assert CronExpression('0 0 29 2 *').next_fire_times(datetime(2026, 1, 1), 2) == [
+        datetime(2028, 2, 29), datetime(2032, 2, 29)
+    ]
+    assert CronExpression('0 0 30 2 *').next_fire_times(datetime(2026, 1, 1), 1) == []
+
+
+# ----------------------------------------------------------------------
+# Property tests
+# ----------------------------------------------------------------------
+@pytest.mark.parametrize('expression, start', generated_cases())
+def test_fire_times_match_brute_force_reference(expression, start):
+    end = start + WINDOW
+    expected = reference_fire_times(expression, start, end)
+    actual = [fire for fire in CronExpression(expression).next_fire_times(start, len(expected) + 1)
+              if fire <= end]
+    assert actual == expected
+
+
+@pytest.mark.parametrize('expression, start', generated_cases(seed=SEED + 1, accept=croniter_compatible))
+def test_fire_times_match_croniter(expression, start):
+    croniter = pytest.importorskip('croniter').croniter
+    iterator = croniter(expression, start)
+    expected = [iterator.get_next(datetime) for _ in range(20)]
+    assert CronExpression(expression).next_fire_times(start, 20) == expected
+
+
+def _systemd_fire_times(calendars, start, count):
+    output = subprocess.run(
+        ['systemd-analyze', 'calendar', f'--iterations={count}',
+         f"--base-time={start:%Y-%m-%d %H:%M:%S}"] + calendars,
+        capture_output=True, text=True, check=True, env={'TZ': 'UTC', 'SYSTEMD_COLORS': '0'},
+    ).stdout
+    fires = {datetime.strptime(match, '%Y-%m-%d %H:%M:%S')
+             for match in re.findall(r'(?:Next elapse|Iter\. #\d+): \w+ (\S+ \S+)', output)}
+    return sorted(fire for fire in fires if fire > start)[:count]
+
+
+@pytest.mark.skipif(shutil.which('systemd-analyze') is None, reason="systemd-analyze not available")
+@pytest.mark.parametrize('expression, start', generated_cases(count=60, seed=SEED + 2))
+def test_oncalendar_matches_fire_times(expression, start):
+    compiled = CronExpression(expression)
+    assert _systemd_fire_times(compiled.to_oncalendar(), start, 10) == compiled.next_fire_times(start, 10)
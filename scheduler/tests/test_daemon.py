@@ -0,0 +1,256 @@
+"""
+Purpose: Tests for the resident scheduler daemon and its warm Ansible executor
+Design Pattern: Fake clock and executor for scheduling rules; one real forked localhost run
+"""
+
+import os
+import time
+from datetime import datetime
+
+import pytest
+
+import daemon as daemon_module
+from daemon import SchedulerDaemon, WarmAnsibleExecutor
+from run_lock import acquire_run_lock
+from test_scheduler import make_playbook
+
+
+class FakeClock:
+    def __init__(self, start):
+        self.now = start.timestamp()
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+class FakeRun:
+    def __init__(self, pid):
+        self.pid = pid
+        self.returncode = None
+        self.signals = []
+
+    def poll(self):
+        return self.returncode
+
+    def terminate(self):
+        self.signals.append('TERM')
+
+    def kill(self):
+        self.signals.append('KILL')
+
+
+class FakeExecutor:
+    def __init__(self):
+        self.launched = []
+        self.refreshes = 0
+        self.locked = set()
+
+    def prepare(self, playbooks):
+        pass
+
+    def refresh_if_changed(self, playbooks):
+        self.refreshes += 1
+
+    def launch(self, playbook):
+        if playbook.name in self.locked:
+            return None
+        run = FakeRun(len(self.launched) + 1000)
+        self.launched.append((playbook.name, run))
+        return run
+
+
+def make_daemon(playbooks, offsets=None, start=datetime(2024, 1, 1, 0, 0, 30)):
+    clock = FakeClock(start)
+    executor = FakeExecutor()
+    return SchedulerDaemon(playbooks, executor, offsets, clock=clock), executor, clock
+
+
+def test_launches_on_schedule_with_offset():
+    daemon, executor, clock = make_daemon(
+        [make_playbook('*/5 * * * *', name='fast')], offsets={'fast': 90})
+
+    # 00:00:30 -> first due at 00:01:30 (00:00 plus 90s offset)
+    assert daemon.tick() == pytest.approx(5.0)  # Capped by MAX_SLEEP
+    assert daemon.states['fast'].next_due == datetime(2024, 1, 1, 0, 1, 30).timestamp()
+    assert executor.launched == []
+
+    clock.now = daemon.states['fast'].next_due
+    daemon.tick()
+    assert [name for name, _ in executor.launched] == ['fast']
+    assert daemon.states['fast'].next_due == datetime(2024, 1, 1, 0, 6, 30).timestamp()
+
+
+def test_overlapping_run_is_skipped_until_previous_finishes():
+    daemon, executor, clock = make_daemon([make_playbook('* * * * *', name='slow', timeout=600)])
+
+    clock.now = daemon.states['slow'].next_due
+    daemon.tick()
+    first_run = executor.launched[0][1]
+
+    clock.now = daemon.states['slow'].next_due
+    daemon.tick()
+    assert len(executor.launched) == 1
+    assert daemon.states['slow'].skipped == 1
+
+    first_run.returncode = 0
+    clock.now = daemon.states['slow'].next_due
+    daemon.tick()
+    assert len(executor.launched) == 2
+    assert daemon.states['slow'].last_exit == 0
+
+
+def test_fire_time_is_skipped_while_run_lock_is_held_elsewhere():
+    daemon, executor, clock = make_daemon([make_playbook('* * * * *', name='shared', timeout=120)])
+    executor.locked.add('shared')
+
+    clock.now = daemon.states['shared'].next_due
+    daemon.tick()
+    assert executor.launched == []
+    assert daemon.states['shared'].active is None
+    assert daemon.states['shared'].skipped == 1
+
+    # The timeout counts from the launch that got the lock, not from the skipped fire time
+    executor.locked.clear()
+    clock.now = daemon.states['shared'].next_due
+    daemon.tick()
+    assert daemon.states['shared'].active.deadline == clock.now + 120
+    assert daemon.states['shared'].runs == 1
+
+
+def test_run_exceeding_timeout_is_terminated_then_killed():
+    daemon, executor, clock = make_daemon([make_playbook('0 * * * *', name='hung', timeout=120)])
+
+    clock.now = daemon.states['hung'].next_due
+    daemon.tick()
+    run = executor.launched[0][1]
+
+    clock.advance(119)
+    daemon.tick()
+    assert run.signals == []
+
+    clock.advance(1)
+    daemon.tick()
+    assert run.signals == ['TERM']
+    assert daemon.states['hung'].timeouts == 1
+
+    clock.advance(10)
+    daemon.tick()
+    assert run.signals == ['TERM', 'KILL']
+
+    run.returncode = -9
+    clock.advance(1)
+    daemon.tick()
+    assert daemon.states['hung'].active is None
+    assert daemon.states['hung'].last_exit == -9
+
+
+def test_reload_keeps_active_runs_and_counters():
+    playbook = make_playbook('* * * * *', name='steady')
+    daemon, executor, clock = make_daemon([playbook])
+
+    clock.now = daemon.states['steady'].next_due
+    daemon.tick()
+    daemon.load_playbooks([playbook], {'steady': 30})
+
+    assert daemon.states['steady'].active is not None
+    assert daemon.states['steady'].runs == 1
+    assert daemon.states['steady'].offset == 30
+
+
+def localhost_project(tmp_path, monkeypatch, marker):
+    pytest.importorskip('ansible')
+    monkeypatch.chdir(tmp_path)
+    # prepare() sets the unit environment; keep it scoped to this test
+    monkeypatch.setenv('ANSIBLE_HOST_KEY_CHECKING', 'False')
+    monkeypatch.setenv('ANSIBLE_STDOUT_CALLBACK', 'json')
+
+    (tmp_path / 'hosts.yml').write_text(
+        f"all:\n  hosts:\n    localhost:\n      ansible_connection: local\n      marker: {marker}\n")
+    playbook_path = tmp_path / 'check.yml'
+    playbook_path.write_text(
+        "- hosts: localhost\n  gather_facts: false\n  tasks:\n"
+        "    - debug:\n        msg: \"marker={{ marker }}\"\n")
+    return make_playbook('* * * * *', name='check', path=str(playbook_path),
+                         systemd_service_name='check-monitor')
+
+
+def wait_for(run, tmp_path):
+    deadline = time.monotonic() + 60
+    while run.poll() is None and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert run.returncode == 0, (tmp_path / 'logs' / 'check-monitor.error.log').read_text()
+
+
+def test_warm_executor_runs_forked_playbook(tmp_path, monkeypatch):
+    playbook = localhost_project(tmp_path, monkeypatch, 'warm')
+
+    executor = WarmAnsibleExecutor(str(tmp_path), 'hosts.yml', str(tmp_path / 'logs'))
+    executor.prepare([playbook])
+    if executor.cold:
+        pytest.skip("warm executor not supported on the installed ansible-core")
+
+    def run_once():
+        wait_for(executor.launch(playbook), tmp_path)
+
+    # The same warm objects serve repeated runs
+    run_once()
+    run_once()
+
+    # An inventory change is picked up by a reload in the same process
+    (tmp_path / 'hosts.yml').write_text(
+        "all:\n  hosts:\n    localhost:\n      ansible_connection: local\n      marker: reloaded\n")
+    os.utime(tmp_path / 'hosts.yml', (time.time() + 5, time.time() + 5))
+    executor.refresh_if_changed([playbook])
+    run_once()
+
+    log = (tmp_path / 'logs' / 'check-monitor.log').read_text()
+    assert log.count('marker=warm') == 2
+    assert log.count('marker=reloaded') == 1
+
+
+def test_executor_skips_launch_while_run_lock_is_held(tmp_path, monkeypatch):
+    playbook = localhost_project(tmp_path, monkeypatch, 'locked')
+    executor = WarmAnsibleExecutor(str(tmp_path), 'hosts.yml', str(tmp_path / 'logs'))
+    executor.prepare([playbook])
+
+    lock = acquire_run_lock(str(tmp_path / 'logs'), playbook)
+    try:
+        assert executor.launch(playbook) is None
+    finally:
+        os.close(lock)
+
+    run = executor.launch(playbook)
+    # The child holds the lock for its whole run, not the daemon
+    assert acquire_run_lock(str(tmp_path / 'logs'), playbook, wait=False) is None
+    wait_for(run, tmp_path)
+    os.close(acquire_run_lock(str(tmp_path / 'logs'), playbook, wait=False))
+
+
+def test_unsupported_ansible_core_falls_back_to_cold_runs(tmp_path, monkeypatch):
+    playbook = localhost_project(tmp_path, monkeypatch, 'cold')
+    monkeypatch.setattr(daemon_module, '_ansible_loader', None)
+    monkeypatch.setattr(daemon_module, 'warm_executor_supported', lambda: False)
+
+    executor = WarmAnsibleExecutor(str(tmp_path), 'hosts.yml', str(tmp_path / 'logs'))
+    executor.prepare([playbook])
+    assert executor.cold
+
+    wait_for(executor.launch(playbook), tmp_path)
+    assert 'marker=cold' in (tmp_path / 'logs' / 'check-monitor.log').read_text()
+
+
+
+def test_playbook_args_start_a_cold_run(tmp_path, monkeypatch):
+    playbook = localhost_project(tmp_path, monkeypatch, 'inventory')
+    playbook.schedule_config['playbook_args'] = '-e marker=override'
+    executor = WarmAnsibleExecutor(str(tmp_path), 'hosts.yml', str(tmp_path / 'logs'))
+    executor.prepare([playbook])
+
+    # Warm children cannot take extra CLI arguments, so this run is an ansible-playbook process
+    run = executor.launch(playbook)
+    assert isinstance(run, daemon_module.SpawnedRun)
+    wait_for(run, tmp_path)
+    assert 'marker=override' in (tmp_path / 'logs' / 'check-monitor.log').read_text()
@@ -0,0 +1,138 @@
+"""
+Purpose: Tests for incremental, index-backed playbook discovery
+Design Pattern: Temporary project tree; parse counts observed through the index statistics
+"""
+
+import os
+import time
+from pathlib import Path
+
+import discovery_index
+from scheduler_factory import SchedulerFactory
+
+PROJECT_PATH = Path(__file__).resolve().parents[2]
+
+
+def write(path, text, age=60):
+    """Write a file with an mtime in the past so the racy-mtime guard does not apply"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text)
+    stamp = time.time() - age
+    os.utime(path, (stamp, stamp))
+
+
+def role_defaults(schedule):
+    return f"default_schedule_config:\n  schedule: \"{schedule}\"\n  description: checks\n"
+
+
+def inheriting_playbook(role):
+    return f"- hosts: all\n  tasks:\n    - include_role:\n        name: {role}\n"
+
+
+def make_project(root):
+    write(root / 'roles' / 'alpha' / 'defaults' / 'main.yml', role_defaults('*/5 * * * *'))
+    write(root / 'roles' / 'beta' / 'defaults' / 'main.yml', role_defaults('0 * * * *'))
+    write(root / 'playbooks' / 'uses_alpha.yml', inheriting_playbook('alpha'))
+    write(root / 'playbooks' / 'uses_beta.yml', inheriting_playbook('beta'))
+    write(root / 'playbooks' / 'own_schedule.yml',
+          "- hosts: routers\n  vars:\n    playbook_schedule:\n      enabled: true\n"
+          "      schedule: '0 2 * * *'\n      inventory_groups: [routers]\n")
+    write(root / 'playbooks' / 'not_scheduled.yml', "- hosts: all\n  tasks: []\n")
+
+
+def discover(root, index_path):
+    factory = SchedulerFactory(str(root / 'playbooks'), str(root / 'roles'), str(index_path))
+    playbooks = {p.name: p.schedule for p in factory.discover_schedulable_playbooks()}
+    return playbooks, factory.index.stats
+
+
+def test_second_discovery_parses_nothing(tmp_path):
+    make_project(tmp_path)
+    index_path = tmp_path / 'index.json'
+
+    first, stats = discover(tmp_path, index_path)
+    assert first == {'uses_alpha': '*/5 * * * *', 'uses_beta': '0 * * * *', 'own_schedule': '0 2 * * *'}
+    assert stats['parsed'] == 6  # 4 playbooks + 2 role defaults
+
+    second, stats = discover(tmp_path, index_path)
+    assert second == first
+    assert stats['parsed'] == 0 and stats['resolved'] == 0
+
+
+def test_role_change_invalidates_only_inheriting_playbooks(tmp_path):
+    make_project(tmp_path)
+    index_path = tmp_path / 'index.json'
+    discover(tmp_path, index_path)
+
+    write(tmp_path / 'roles' / 'alpha' / 'defaults' / 'main.yml', role_defaults('*/2 * * * *'))
+    playbooks, stats = discover(tmp_path, index_path)
+
+    assert playbooks['uses_alpha'] == '*/2 * * * *'
+    assert playbooks['uses_beta'] == '0 * * * *'
+    assert stats['parsed'] == 1      # Only the role defaults file; no playbook was re-read
+    assert stats['resolved'] == 1    # Only uses_alpha re-resolved its inherited schedule
+
+
+def test_touch_without_content_change_is_rehashed_not_parsed(tmp_path):
+    make_project(tmp_path)
+    index_path = tmp_path / 'index.json'
+    discover(tmp_path, index_path)
+
+    path = tmp_path / 'playbooks' / 'own_schedule.yml'
+    write(path, path.read_text(), age=30)
+    _, stats = discover(tmp_path, index_path)
+
+    assert stats['rehashed'] == 1
+    assert stats['parsed'] == 0
+
+
+def test_changed_and_deleted_playbooks(tmp_path):
+    make_project(tmp_path)
+    index_path = tmp_path / 'index.json'
+    discover(tmp_path, index_path)
+
+    write(tmp_path / 'playbooks' / 'uses_beta.yml', inheriting_playbook('alpha'))
+    (tmp_path / 'playbooks' / 'own_schedule.yml').unlink()
+    playbooks, stats = discover(tmp_path, index_path)
+
+    assert playbooks == {'uses_alpha': '*/5 * * * *', 'uses_beta': '*/5 * * * *'}
+    assert stats['parsed'] == 1
+    assert not any(key.endswith('own_schedule.yml') for key in
+                   SchedulerFactory(str(tmp_path / 'playbooks'), str(tmp_path / 'roles'),
+                                    str(index_path)).index.entries)
+
+
+def test_recently_modified_file_is_rechecked(tmp_path):
+    make_project(tmp_path)
+    index_path = tmp_path / 'index.json'
+    path = tmp_path / 'playbooks' / 'own_schedule.yml'
+    path.write_text(path.read_text())  # mtime is now
+    discover(tmp_path, index_path)
+
+    # Same size, same mtime tick: only the racy-mtime guard notices the edit
+    stat = path.stat()
+    path.write_text(path.read_text().replace("'0 2 * * *'", "'0 3 * * *'"))
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    playbooks, _ = discover(tmp_path, index_path)
+
+    assert playbooks['own_schedule'] == '0 3 * * *'
+
+
+def test_corrupt_index_is_rebuilt(tmp_path):
+    make_project(tmp_path)
+    index_path = tmp_path / 'index.json'
+    index_path.write_text('{not json')
+
+    playbooks, stats = discover(tmp_path, index_path)
+    assert len(playbooks) == 3
+    assert stats['parsed'] == 6
+
+
+def test_repository_discovery_matches_without_index(tmp_path):
+    indexed = SchedulerFactory(str(PROJECT_PATH / 'playbooks'), str(PROJECT_PATH / 'roles'),
+                               str(tmp_path / 'index.json')).discover_schedulable_playbooks()
+    plain = SchedulerFactory(str(PROJECT_PATH / 'playbooks'), str(PROJECT_PATH / 'roles'),
+                             '').discover_schedulable_playbooks()
+
+    assert indexed == plain
+    assert discovery_index.SafeLoader.__name__ in ('CSafeLoader', 'SafeLoader')
@@ -0,0 +1,332 @@
+"""
+Purpose: Tests for the event-driven trigger listener and its local traffic generator
+Design Pattern: Parser round trips through event_generator, fake clock and launcher for the
+                debounce rules, one asyncio run over real UDP/TCP sockets on localhost
+"""
+
+import asyncio
+import os
+import time
+
+import pytest
+
+import event_generator
+from event_listener import (DEVICE_EVENT, INTERFACE_EVENT, BERError, DeviceEvent, EventDebouncer,
+                            MAX_SYSLOG_FRAME, EventListener, HostResolver, PlaybookLauncher, decode_trap,
+                            load_host_addresses, parse_syslog)
+from run_lock import acquire_run_lock
+from test_scheduler import make_playbook
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeRun:
+    def __init__(self, returncode=None):
+        self.returncode = returncode
+        self.signals = []
+
+    def poll(self):
+        return self.returncode
+
+    def terminate(self):
+        self.signals.append('TERM')
+
+    def kill(self):
+        self.signals.append('KILL')
+
+
+class FakeLauncher:
+    def __init__(self, returncode=None):
+        self.launched = []
+        self.returncode = returncode
+        self.locked = set()
+
+    def launch(self, playbook, hosts):
+        if playbook.name in self.locked:
+            return None
+        run = FakeRun(self.returncode)
+        self.launched.append((playbook.name, None if hosts is None else list(hosts), run))
+        return run
+
+
+ADDRESSES = {'10.1.1.1': 'core-sw-01', '10.1.2.1': 'access-sw-01', '10.1.2.2': 'access-sw-02'}
+
+
+def make_listener(clock=None, sweep_interval=0.0, returncode=None, **overrides):
+    interface = make_playbook('*/15 * * * *', name='interface_monitoring', timeout=120)
+    device = make_playbook('*/5 * * * *', name='connectivity_monitoring')
+    launcher = FakeLauncher(returncode)
+    options = dict(quiet=5.0, max_delay=30.0, sweep_interval=sweep_interval, clock=clock or FakeClock())
+    options.update(overrides)
+    listener = EventListener({INTERFACE_EVENT: interface, DEVICE_EVENT: device}, HostResolver(ADDRESSES), launcher,
+                             {'interface_monitoring': set(ADDRESSES.values()),
+                              'connectivity_monitoring': {'core-sw-01', 'access-sw-01'}}, **options)
+    return listener, launcher
+
+
+@pytest.mark.parametrize('message, hostname, interface, state', [
+    ('<187>Oct 17 10:00:00 core-sw-01 12: %LINK-3-UPDOWN: Interface GigabitEthernet1/0/1, changed state to down',
+     'core-sw-01', 'GigabitEthernet1/0/1', 'down'),
+    ('<189>52: *Mar  1 00:01:02.123: %LINEPROTO-5-UPDOWN: Line protocol on Interface Gi1/0/2, changed state to up',
+     None, 'Gi1/0/2', 'up'),
+    ('<189>53: access-sw-01: *Mar  1 00:01:03: %LINK-5-CHANGED: Interface Gi1/0/3, changed state to administratively down',
+     None, None, None),
+    ('<189>1 2024-01-01T00:00:00Z access-sw-02.example.com - - - - %LINK-3-UPDOWN: Interface Te1/1, changed state to administratively down',
+     'access-sw-02.example.com', 'Te1/1', 'down'),
+])
+def test_parse_syslog_link_messages(message, hostname, interface, state):
+    event = parse_syslog(message, '192.0.2.1')
+
+    if state is None:
+        assert event is None
+        return
+    assert event == DeviceEvent(INTERFACE_EVENT, state, '192.0.2.1', 'syslog', hostname, interface)
+
+
+def test_parse_syslog_restart_and_noise():
+    restart = parse_syslog(event_generator.syslog('restart', 'access-sw-01').decode(), '192.0.2.9')
+
+    assert (restart.kind, restart.state, restart.hostname) == (DEVICE_EVENT, 'restart', 'access-sw-01')
+    assert parse_syslog('<190>Oct 17 10:00:00 sw1 5: %SYS-5-CONFIG_I: Configured from console', '192.0.2.9') is None
+    assert parse_syslog('not a syslog message', '192.0.2.9') is None
+
+
+@pytest.mark.parametrize('version', ['1', '2c'])
+def test_decode_generated_link_traps(version):
+    data = event_generator.trap('down', 'GigabitEthernet1/0/7', 7, version=version, agent='10.1.2.1')
+
+    event = decode_trap(data, '127.0.0.1')
+    assert event == DeviceEvent(INTERFACE_EVENT, 'down', '10.1.2.1', 'trap', interface='GigabitEthernet1/0/7')
+    restart = decode_trap(event_generator.trap('restart', version=version), '10.1.1.1')
+    assert (restart.kind, restart.state, restart.source) == (DEVICE_EVENT, 'restart', '10.1.1.1')
+
+
+def test_decode_trap_filters_community_and_rejects_garbage():
+    data = event_generator.trap('up', 'Gi1/0/1', community='private')
+
+    assert decode_trap(data, '10.1.1.1', {'public'}) is None
+    assert decode_trap(data, '10.1.1.1', {'private'}).state == 'up'
+    with pytest.raises(BERError):
+        decode_trap(b'\x30\x05\x02\x01', '10.1.1.1')
+
+
+def test_resolver_prefers_reported_hostname_then_address():
+    resolver = HostResolver(ADDRESSES)
+
+    assert resolver.resolve(DeviceEvent(INTERFACE_EVENT, 'down', '127.0.0.1', 'syslog', 'ACCESS-SW-02.example.com')) == 'access-sw-02'
+    assert resolver.resolve(DeviceEvent(INTERFACE_EVENT, 'down', '10.1.1.1', 'trap')) == 'core-sw-01'
+    assert resolver.resolve(DeviceEvent(INTERFACE_EVENT, 'down', '10.9.9.9', 'syslog', 'unknown-sw')) is None
+
+
+def test_load_host_addresses_from_yaml_inventory(tmp_path):
+    inventory = tmp_path / 'hosts.yml'
+    inventory.write_text("all:\n  children:\n    switches:\n      hosts:\n"
+                         "        sw-01:\n          ansible_host: 10.0.0.1\n        sw-02:\n")
+
+    assert load_host_addresses(str(inventory)) == {'10.0.0.1': 'sw-01', 'sw-02': 'sw-02'}
+
+
+def test_debouncer_waits_for_quiet_but_not_beyond_max_delay():
+    debouncer = EventDebouncer(quiet=5, max_delay=12)
+    debouncer.add('pb', 'flapping', 0)
+    debouncer.add('pb', 'single', 1)
+
+    assert debouncer.ready('pb', 4) == []
+    for now in (4, 8, 11):
+        debouncer.add('pb', 'flapping', now)
+    assert debouncer.ready('pb', 6) == ['single']
+    assert debouncer.next_due() == 12
+    assert debouncer.ready('pb', 12) == ['flapping']
+    assert debouncer.next_due() is None
+
+
+def test_events_launch_one_limited_run_per_playbook():
+    clock = FakeClock()
+    listener, launcher = make_listener(clock)
+
+    for host, interface, state in event_generator.storm(['core-sw-01', 'access-sw-01'], 20, seed=1):
+        listener.ingest_syslog(event_generator.syslog(state, host, interface), '127.0.0.1')
+    listener.ingest_trap(event_generator.trap('restart', agent='10.1.2.1'), '127.0.0.1')
+    listener.ingest_trap(event_generator.trap('restart', agent='10.1.2.2'), '127.0.0.1')  # not a target
+    listener.ingest_syslog(b'<190>Oct 17 10:00:00 sw9 1: %LINK-3-UPDOWN: Interface Gi1/0/1, changed state to down', '10.9.9.9')
+
+    assert listener.tick() == pytest.approx(5.0)
+    assert launcher.launched == []
+
+    clock.now += 5
+    listener.tick()
+    assert sorted((name, hosts) for name, hosts, _ in launcher.launched) == [
+        ('connectivity_monitoring', ['access-sw-01']),
+        ('interface_monitoring', ['access-sw-01', 'core-sw-01'])]
+    assert listener.stats.events == 21
+    assert listener.stats.untargeted == 1
+    assert listener.stats.unknown_host == 1
+
+
+def test_hosts_ready_during_a_run_wait_for_it_to_finish():
+    clock = FakeClock()
+    listener, launcher = make_listener(clock)
+
+    listener.ingest_syslog(event_generator.syslog('down', 'core-sw-01', 'Gi1/0/1'), '127.0.0.1')
+    clock.now += 5
+    listener.tick()
+    first_run = launcher.launched[0][2]
+
+    listener.ingest_syslog(event_generator.syslog('up', 'core-sw-01', 'Gi1/0/1'), '127.0.0.1')
+    listener.ingest_syslog(event_generator.syslog('down', 'access-sw-02', 'Gi1/0/9'), '127.0.0.1')
+    clock.now += 10
+    listener.tick()
+    assert len(launcher.launched) == 1
+
+    first_run.returncode = 0
+    listener.tick()
+    assert launcher.launched[1][1] == ['access-sw-02', 'core-sw-01']
+    assert listener.states['interface_monitoring'].hosts_run == 3
+
+
+def test_event_run_exceeding_timeout_is_terminated_then_killed():
+    clock = FakeClock()
+    listener, launcher = make_listener(clock)
+    listener.ingest_syslog(event_generator.syslog('down', 'core-sw-01', 'Gi1/0/1'), '127.0.0.1')
+    clock.now += 5
+    listener.tick()
+    run = launcher.launched[0][2]
+
+    clock.now += 120
+    listener.tick()
+    assert run.signals == ['TERM']
+    clock.now += 10
+    listener.tick()
+    assert run.signals == ['TERM', 'KILL']
+
+
+def test_sweep_runs_full_inventory_and_absorbs_pending_hosts():
+    clock = FakeClock()
+    listener, launcher = make_listener(clock, sweep_interval=600)
+
+    clock.now += 598
+    listener.ingest_syslog(event_generator.syslog('down', 'core-sw-01', 'Gi1/0/1'), '127.0.0.1')
+    clock.now += 2
+    listener.tick()
+
+    assert sorted((name, hosts) for name, hosts, _ in launcher.launched) == [
+        ('connectivity_monitoring', None), ('interface_monitoring', None)]
+    assert listener.debouncer.next_due() is None
+    assert listener.states['interface_monitoring'].next_sweep == clock.now + 600
+
+
+def test_launch_waits_while_another_run_holds_the_playbook_lock():
+    clock = FakeClock()
+    listener, launcher = make_listener(clock, sweep_interval=600)
+    launcher.locked = {'interface_monitoring', 'connectivity_monitoring'}
+
+    listener.ingest_syslog(event_generator.syslog('down', 'core-sw-01', 'Gi1/0/1'), '127.0.0.1')
+    clock.now += 5
+    listener.tick()
+    assert launcher.launched == []
+    assert listener.states['interface_monitoring'].locked == 1
+
+    launcher.locked = {'connectivity_monitoring'}
+    clock.now += 5
+    listener.tick()
+    assert [(name, hosts) for name, hosts, _ in launcher.launched] == [('interface_monitoring', ['core-sw-01'])]
+
+    # A sweep blocked by the lock is not skipped, it starts once the lock is free
+    clock.now += 600
+    listener.tick()
+    launcher.launched[0][2].returncode = 0
+    launcher.locked = set()
+    listener.tick()
+    assert ('connectivity_monitoring', None) in [(name, hosts) for name, hosts, _ in launcher.launched]
+
+
+def test_listener_receives_generated_traffic_over_sockets():
+    # Runs finish at once, so hosts whose datagrams arrive a tick later get their own run
+    listener, launcher = make_listener(clock=time.monotonic, returncode=0, quiet=0.2, max_delay=1.0)
+
+    async def scenario():
+        ports = await listener.start('127.0.0.1', 0, 0, 0)
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, event_generator.send_udp,
+                                   [event_generator.syslog('down', 'core-sw-01', 'Gi1/0/1')], '127.0.0.1', ports['syslog_udp'])
+        await loop.run_in_executor(None, event_generator.send_tcp,
+                                   [event_generator.syslog('up', 'access-sw-02', 'Gi1/0/2'),
+                                    event_generator.syslog('restart', 'access-sw-01')], '127.0.0.1', ports['syslog_tcp'])
+        await loop.run_in_executor(None, event_generator.send_udp,
+                                   [event_generator.trap('down', 'Gi1/0/3', 3, agent='10.1.2.1')], '127.0.0.1', ports['snmp_trap'])
+        stop = asyncio.Event()
+        loop.call_later(1.5, stop.set)
+        await listener.run(stop)
+
+    asyncio.run(scenario())
+
+    launched = {}
+    for name, hosts, _ in launcher.launched:
+        launched.setdefault(name, set()).update(hosts)
+    assert listener.stats.received == 4
+    assert launched == {'connectivity_monitoring': {'access-sw-01'},
+                        'interface_monitoring': {'access-sw-01', 'access-sw-02', 'core-sw-01'}}
+
+
+def test_launcher_limits_run_to_debounced_hosts(tmp_path):
+    playbook = make_playbook('* * * * *', name='check', path='check.yml', systemd_service_name='check-monitor',
+                             timeout=120, schedule_config={'enabled': True, 'playbook_args': '-e source=event'})
+    launcher = PlaybookLauncher(str(tmp_path), 'hosts.yml', str(tmp_path / 'logs'), command=['echo'])
+
+    run = launcher.launch(playbook, ['sw-01', 'sw-02'])
+    assert run.wait(timeout=10) == 0
+
+    limit_file = tmp_path / 'logs' / 'events' / 'check-monitor.limit'
+    assert limit_file.read_text() == 'sw-01\nsw-02\n'
+    assert (tmp_path / 'logs' / 'events' / 'check-monitor.log').read_text().split() == [
+        '-i', str(tmp_path / 'hosts.yml'), 'check.yml', '-e', 'source=event', '--timeout', '120',
+        '--limit', f"@{limit_file}"]
+
+
+def test_launcher_skips_while_locked_and_holds_the_lock_for_its_run(tmp_path):
+    playbook = make_playbook('* * * * *', name='check', path='check.yml', systemd_service_name='check-monitor')
+    log_path = str(tmp_path / 'logs')
+    launcher = PlaybookLauncher(str(tmp_path), 'hosts.yml', log_path, command=['sh', '-c', 'sleep 0.5', 'sh'])
+
+    timer_run = acquire_run_lock(log_path, playbook)
+    assert launcher.launch(playbook, ['sw-01']) is None
+    os.close(timer_run)
+
+    run = launcher.launch(playbook, ['sw-01'])
+    assert acquire_run_lock(log_path, playbook, wait=False) is None
+    assert run.wait(timeout=10) == 0
+    lock = acquire_run_lock(log_path, playbook, wait=False)
+    assert lock is not None
+    os.close(lock)
+
+
+@pytest.mark.parametrize('oversized', [
+    b'x' * (MAX_SYSLOG_FRAME + 1),                 # No newline within the cap
+    f"{MAX_SYSLOG_FRAME + 1} ".encode(),          # Octet count beyond the cap
+], ids=['unterminated', 'octet-counted'])
+def test_tcp_syslog_drops_connection_with_oversized_frame(oversized):
+    listener, _ = make_listener(clock=time.monotonic)
+    valid = event_generator.syslog('down', 'core-sw-01', 'Gi1/0/1')
+
+    async def scenario():
+        ports = await listener.start('127.0.0.1', None, 0, None)
+        reader, writer = await asyncio.open_connection('127.0.0.1', ports['syslog_tcp'])
+        writer.write(valid + b"\n" + oversized)
+        await writer.drain()
+        # The listener closes the connection instead of buffering the frame
+        closed = await asyncio.wait_for(reader.read(), timeout=5)
+        writer.close()
+        stop = asyncio.Event()
+        stop.set()
+        await listener.run(stop)
+        return closed
+
+    assert asyncio.run(scenario()) == b''
+    assert listener.stats.received == 1
+    assert listener.stats.oversized == 1
@@ -0,0 +1,160 @@
+"""
+Purpose: Tests for the load-aware schedule planner
+Design Pattern: Synthetic playbooks with known weights; offsets checked against cron fire times
+"""
+
+import re
+from pathlib import Path
+
+import pytest
+
+from cron import CronExpression, CronError
+from planner import SchedulePlanner, load_inventory_groups, load_forks, planning_horizon
+from scheduler import MonitoringScheduler, SystemdServiceManager
+from test_scheduler import make_playbook
+
+PROJECT_PATH = Path(__file__).resolve().parents[2]
+
+GROUPS = {
+    'core': {'core-1', 'core-2', 'core-3', 'core-4'},
+    'edge': {'edge-1', 'edge-2'},
+    'all': {'core-1', 'core-2', 'core-3', 'core-4', 'edge-1', 'edge-2'},
+}
+
+
+def playbook(name, schedule, groups, runtime):
+    return make_playbook(schedule, name=name, inventory_groups=groups,
+                         systemd_service_name=f"{name}-monitor",
+                         schedule_config={'enabled': True, 'schedule': schedule,
+                                          'expected_runtime': runtime})
+
+
+def sample_playbooks():
+    return [
+        playbook('poll_fast', '*/5 * * * *', ['core'], 60),
+        playbook('poll_slow', '*/15 * * * *', ['all'], 120),
+        playbook('backup', '0 2 * * *', ['all'], 600),
+        playbook('edge_check', '*/10 * * * *', ['edge'], 90),
+    ]
+
+
+def test_inventory_groups_resolve_nested_children():
+    groups = load_inventory_groups(str(PROJECT_PATH / 'inventory' / 'hosts.yml'))
+
+    assert groups['network_devices'] == {'core-sw-01', 'core-sw-02', 'access-sw-01',
+                                         'access-sw-02', 'edge-rtr-01', 'edge-rtr-02'}
+    assert groups['routers'] == {'edge-rtr-01', 'edge-rtr-02'}
+    assert 'external-rtr-01' in groups['all']
+    assert load_inventory_groups(str(PROJECT_PATH / 'missing.yml')) == {}
+
+
+def test_forks_read_from_ansible_cfg(tmp_path):
+    assert load_forks(str(PROJECT_PATH)) == 10
+    assert load_forks(str(tmp_path)) == 5
+
+
+def test_plan_lowers_projected_peak():
+    planner = SchedulePlanner(sample_playbooks(), GROUPS, forks=5)
+    before = max(planner.timeline(planner.baseline()))
+    after = max(planner.timeline(planner.plan()))
+
+    assert after < before
+
+
+def test_plan_is_deterministic_and_input_order_independent():
+    first = SchedulePlanner(sample_playbooks(), GROUPS, forks=5).plan()
+    second = SchedulePlanner(list(reversed(sample_playbooks())), GROUPS, forks=5).plan()
+
+    assert [(e.playbook.name, e.offset, e.randomized_delay) for e in first] == \
+           [(e.playbook.name, e.offset, e.randomized_delay) for e in second]
+
+
+def test_plan_weights_and_delays():
+    entries = {e.playbook.name: e for e in SchedulePlanner(sample_playbooks(), GROUPS, forks=5).plan()}
+
+    assert entries['poll_fast'].hosts == 4 and entries['poll_fast'].forks == 4
+    assert entries['poll_slow'].hosts == 6 and entries['poll_slow'].forks == 5  # capped by forks
+    assert entries['poll_fast'].interval == 300
+    # Random delay stays within the slack between runs
+    for entry in entries.values():
+        assert entry.randomized_delay <= max(0, entry.interval - entry.runtime) // 2
+        assert 0 <= entry.offset < entry.interval
+
+
+def test_unknown_groups_assume_all_forks():
+    entry = SchedulePlanner([playbook('x', '*/5 * * * *', ['nowhere'], 60)], {}, forks=7).plan()[0]
+
+    assert entry.hosts is None
+    assert entry.forks == 7
+
+
+@pytest.mark.parametrize('schedule,offset', [
+    ('*/10 * * * *', 335),
+    ('50 * * * *', 900),     # Wraps into the next hour
+    ('0 2 * * mon-fri', 150),
+    ('30 6 1 * mon', 90),
+])
+def test_offset_calendars_shift_every_fire_time(schedule, offset):
+    expression = CronExpression(schedule)
+    shift, seconds = divmod(offset, 60)
+    minutes = ','.join(str((m + shift) % 60) for m in sorted(expression.minute.values))
+    shifted = CronExpression(' '.join([minutes] + schedule.split()[1:]))
+
+    # Same calendar as the cron expression with every minute shifted, plus the seconds
+    assert expression.to_oncalendar(offset) == [
+        calendar[:-2] + f"{seconds:02d}" for calendar in shifted.to_oncalendar()]
+
+
+def test_offset_beyond_hour_is_rejected():
+    with pytest.raises(CronError):
+        CronExpression('50 2 * * *').to_oncalendar(11 * 60)
+    assert CronExpression('50 2 * * *').max_offset_seconds() == 9 * 60 + 59
+    assert CronExpression('*/5 * * * *').max_offset_seconds() == 3599
+
+
+def test_planned_timer_renders_offset_and_fixed_delay():
+    entry = SchedulePlanner([playbook('poll', '*/10 * * * *', ['core'], 60)], GROUPS, forks=5).plan()[0]
+    entry.offset = 90
+    manager = SystemdServiceManager(str(PROJECT_PATH))
+    timer = manager.generate_service_files(entry.playbook, 'inventory/hosts.yml', entry)['timer']
+
+    assert 'OnCalendar=*-*-* *:01/10:30' in timer
+    assert f"RandomizedDelaySec={entry.randomized_delay}" in timer
+    assert 'FixedRandomDelay=true' in timer
+
+    unplanned = manager.generate_service_files(entry.playbook, 'inventory/hosts.yml')['timer']
+    assert 'FixedRandomDelay' not in unplanned
+
+
+def test_horizon_covers_weekly_schedules_and_projects_monthly_ones():
+    daily = sample_playbooks()
+    weekly = playbook('weekly', '0 3 * * sun', ['all'], 600)
+    monthly = playbook('monthly', '15 4 15 * *', ['all'], 600)
+
+    assert planning_horizon(daily) == 24 * 3600
+    assert planning_horizon(daily + [monthly]) == 24 * 3600
+    assert planning_horizon(daily + [weekly]) == 7 * 24 * 3600
+
+    planner = SchedulePlanner(daily + [weekly, monthly], GROUPS, forks=5)
+    entries = {e.playbook.name: e for e in planner.plan()}
+    timeline = planner.timeline([entries['weekly']])
+    # Sunday 03:00 of the planning week (PLAN_EPOCH is a Monday) carries the weekly run
+    assert timeline[(6 * 24 + 3) * 3600 // planner.resolution + entries['weekly'].offset // planner.resolution] > 0
+    # A day-of-month schedule is planned as load on every day, not as none
+    assert sum(1 for load in planner.timeline([entries['monthly']]) if load) \
+        == 7 * -(-(600 + entries['monthly'].randomized_delay) // planner.resolution)
+
+
+def test_plan_offsets_do_not_depend_on_printed_horizon(capsys):
+    scheduler = MonitoringScheduler(str(PROJECT_PATH))
+    roles = [role for role in scheduler.discover_roles() if not scheduler.factory.validate_playbook(role)]
+    installed = {e.playbook.name: e.offset for e in scheduler.build_planner(roles, 'examples/inventory.yml').plan()}
+
+    for horizon in (2, 24, 48):
+        scheduler.show_plan('examples/inventory.yml', horizon_hours=horizon, resolution_minutes=60)
+        output = capsys.readouterr().out
+        for name, offset in installed.items():
+            assert f"{name} (" in output
+            assert output.split(f"{name} (", 1)[1].split('Offset: ', 1)[1].startswith(f"+{offset}s")
+        # One row per hour, wrapping around the planned day for longer views
+        assert len(re.findall(r'^\s+(?:\dd)?\d\d:00\s', output, re.MULTILINE)) == horizon
@@ -0,0 +1,41 @@
+"""
+Purpose: Tests for the per-playbook run lock shared by units, daemon, shard runner and listener
+Design Pattern: Real flock(2) locks on files under tmp_path, tried from the same process
+"""
+
+import os
+
+from run_lock import acquire_run_lock, run_lock_held, run_lock_path
+from test_scheduler import make_playbook
+
+
+def test_exclusive_lock_excludes_every_other_run(tmp_path):
+    playbook = make_playbook('*/5 * * * *')
+    lock = acquire_run_lock(str(tmp_path), playbook)
+
+    assert run_lock_path(str(tmp_path), playbook) == tmp_path / 'test-playbook-monitor.lock'
+    assert acquire_run_lock(str(tmp_path), playbook, wait=False) is None
+    assert acquire_run_lock(str(tmp_path), playbook, shared=True, wait=False) is None
+    other = acquire_run_lock(str(tmp_path), make_playbook('*/5 * * * *', systemd_service_name='other-monitor'),
+                             wait=False)
+    assert other is not None
+
+    os.close(lock)
+    os.close(other)
+    lock = acquire_run_lock(str(tmp_path), playbook, wait=False)
+    assert lock is not None
+    os.close(lock)
+
+
+def test_shards_share_the_lock_but_exclude_whole_runs(tmp_path):
+    playbook = make_playbook('*/5 * * * *')
+
+    with run_lock_held(str(tmp_path), playbook, shared=True):
+        sibling = acquire_run_lock(str(tmp_path), playbook, shared=True, wait=False)
+        assert sibling is not None
+        assert acquire_run_lock(str(tmp_path), playbook, wait=False) is None
+        os.close(sibling)
+
+    lock = acquire_run_lock(str(tmp_path), playbook, wait=False)
+    assert lock is not None
+    os.close(lock)
@@ -0,0 +1,159 @@
+"""
+Purpose: Tests for per-run timing metrics (run_metrics callback plugin and status summary)
+Design Pattern: Percentile and summary properties, plus real localhost runs through the callback
+"""
+
+import importlib.util
+import json
+import shutil
+from pathlib import Path
+
+import pytest
+
+from run_metrics import load_runs, metrics_dir, percentile, summarize_runs
+from scheduler import MonitoringScheduler
+from sharding import ShardRunner
+from test_scheduler import make_playbook
+
+PROJECT_PATH = Path(__file__).resolve().parents[2]
+CALLBACK_PATH = PROJECT_PATH / 'callback_plugins'
+
+
+def load_callback():
+    pytest.importorskip('ansible')
+    spec = importlib.util.spec_from_file_location('run_metrics_callback', CALLBACK_PATH / 'run_metrics.py')
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def make_run(duration, servicenow=0.0, retries=0, failed=0, tasks=None):
+    return {
+        'playbook': 'sweep', 'shard': '', 'started': 1700000000.0, 'finished': 1700000000.0 + duration,
+        'duration': duration, 'retries': retries,
+        'hosts': {'count': 4, 'failed': failed, 'unreachable': 0, 'slowest': {'sw-01': duration}},
+        'tasks': tasks or {'Gather interfaces': [4, duration, duration / 2, 0]},
+        'servicenow': {'table/incident:GET': {'calls': 1, 'requests': 1, 'seconds': servicenow,
+                                              'retries': retries, 'failed': 0}},
+    }
+
+
+def test_percentile_interpolates_between_ranks():
+    values = [float(value) for value in range(1, 101)]
+
+    assert percentile(values, 0.5) == pytest.approx(50.5)
+    assert percentile(values, 0.95) == pytest.approx(95.05)
+    assert percentile([7.0], 0.95) == 7.0
+    assert percentile([], 0.5) is None
+
+
+def test_summary_reports_percentiles_and_last_run_hot_spots():
+    runs = [make_run(float(duration), servicenow=duration / 10) for duration in range(10, 110, 10)]
+    runs[-1] = make_run(100.0, servicenow=10.0, retries=2, failed=1, tasks={
+        'Gather interfaces': [4, 60.0, 20.0, 0], 'Create incident': [1, 30.0, 30.0, 0], 'Log': [4, 0.1, 0.1, 0],
+        'Record state': [4, 5.0, 2.0, 0]})
+
+    summary = summarize_runs(runs)
+
+    assert summary['runs'] == 10
+    assert summary['duration_p50'] == 55.0
+    assert summary['duration_p95'] == 95.5
+    assert summary['duration_max'] == 100.0
+    assert summary['servicenow_p95'] == pytest.approx(9.55)
+    assert summary['retries'] == 2 and summary['failed_runs'] == 1
+    assert [entry['task'] for entry in summary['slowest_tasks']] == ['Gather interfaces', 'Create incident', 'Record state']
+    assert summary['slowest_endpoints'][0]['endpoint'] == 'table/incident:GET'
+    assert summarize_runs([]) is None
+
+
+def test_load_runs_skips_torn_lines_and_keeps_the_most_recent(tmp_path):
+    lines = [json.dumps(make_run(float(duration))) for duration in range(1, 6)]
+    (tmp_path / 'sweep.jsonl').write_text('\n'.join(lines[:3] + ['{"playbook": "sweep", "dur'] + lines[3:]) + '\n')
+
+    assert [run['duration'] for run in load_runs(tmp_path, 'sweep')] == [1.0, 2.0, 3.0, 4.0, 5.0]
+    assert [run['duration'] for run in load_runs(tmp_path, 'sweep', limit=2)] == [4.0, 5.0]
+    assert load_runs(tmp_path, 'missing') == []
+
+
+def test_status_json_includes_run_metrics(tmp_path, capsys):
+    scheduler = MonitoringScheduler(str(PROJECT_PATH))
+    scheduler.service_manager.systemctl = str(tmp_path / 'no-such-systemctl')
+    roles = scheduler.discover_roles()
+    directory = metrics_dir(str(tmp_path))
+    directory.mkdir()
+    (directory / f"{roles[0].name}.jsonl").write_text(
+        ''.join(json.dumps(make_run(float(duration))) + '\n' for duration in (10, 20, 30)))
+
+    scheduler.show_status(json_output=True, log_path=str(tmp_path), window=2)
+    document = json.loads(capsys.readouterr().out)
+
+    assert document[0]['metrics']['runs'] == 2
+    assert document[0]['metrics']['duration_p50'] == 25.0
+    assert all(entry['metrics'] is None for entry in document[1:])
+
+
+def test_callback_maps_servicenow_actions_and_counts_retries():
+    callback = load_callback()
+
+    class Task:
+        def __init__(self, action, resolved_action=None):
+            self.action, self.resolved_action = action, resolved_action
+
+    assert callback._endpoint(Task('incident_info', 'servicenow.itsm.incident_info')) == 'table/incident:GET'
+    assert callback._endpoint(Task('incident')) == 'table/incident:write'
+    assert callback._endpoint(Task('servicenow_batch')) == 'v1/batch:POST'
+    assert callback._endpoint(Task('ansible.builtin.debug')) is None
+    assert callback._attempts({'attempts': 3}) == (3, 1)
+    assert callback._attempts({'results': [{'ansible_loop_var': 'item', 'attempts': 2},
+                                           {'ansible_loop_var': 'item'}]}) == (3, 2)
+    # servicenow_attachments returns a results list of uploads, not loop items
+    assert callback._attempts({'results': [{'status': 201}], 'uploaded': 1}) == (1, 1)
+    assert callback._http_requests({'summary': {'http_requests': 4}}) == 4
+    assert callback._http_requests({'results': [{}, {}], 'uploaded': 2}) == 2
+
+
+def test_prometheus_textfile_escapes_labels():
+    callback = load_callback()
+    run = make_run(12.5, tasks={'Say "hi"': [1, 0.25, 0.25, 0]})
+    run['shard'] = '1'
+
+    lines = callback.prometheus_lines(run)
+
+    assert 'ansible_run_duration_seconds{playbook="sweep",shard="1"} 12.5' in lines
+    assert 'ansible_run_task_seconds{playbook="sweep",shard="1",task="Say \\"hi\\""} 0.25' in lines
+    assert 'ansible_run_hosts{playbook="sweep",shard="1",status="ok"} 4' in lines
+    assert '# TYPE ansible_run_servicenow_seconds gauge' in lines
+
+
+@pytest.mark.skipif(shutil.which('ansible-playbook') is None, reason="ansible-playbook not installed")
+def test_sharded_run_records_metrics_per_shard(tmp_path, monkeypatch):
+    monkeypatch.setenv('ANSIBLE_CALLBACK_PLUGINS', str(CALLBACK_PATH))
+    monkeypatch.setenv('ANSIBLE_CALLBACKS_ENABLED', 'run_metrics')
+    monkeypatch.delenv('ANSIBLE_RUN_METRICS_DIR', raising=False)
+    (tmp_path / 'hosts.yml').write_text(
+        "all:\n  children:\n    fleet:\n      hosts:\n" +
+        ''.join(f"        node{i}:\n          ansible_connection: local\n" for i in range(4)))
+    playbook_path = tmp_path / 'sweep.yml'
+    playbook_path.write_text(
+        "- hosts: fleet\n  gather_facts: false\n  tasks:\n"
+        "    - name: Succeed on the second attempt\n"
+        "      shell: echo x >> {{ playbook_dir }}/{{ inventory_hostname }}.attempts && "
+        "test $(wc -l < {{ playbook_dir }}/{{ inventory_hostname }}.attempts) -ge 2\n"
+        "      register: attempt\n      until: attempt.rc == 0\n      retries: 2\n      delay: 0\n"
+        "    - debug:\n        msg: \"{{ inventory_hostname }}\"\n")
+    playbook = make_playbook('*/5 * * * *', name='sweep', path=str(playbook_path), inventory_groups=['fleet'],
+                             systemd_service_name='sweep-monitor',
+                             schedule_config={'enabled': True, 'shards': 2})
+
+    results = ShardRunner(str(tmp_path), 'hosts.yml', str(tmp_path / 'logs')).run(playbook)
+    directory = metrics_dir(str(tmp_path / 'logs'))
+    runs = load_runs(directory, 'sweep')
+
+    assert [result['rc'] for result in results] == [0, 0]
+    assert sorted(run['shard'] for run in runs) == ['0', '1']
+    assert sum(run['hosts']['count'] for run in runs) == 4
+    assert sum(run['retries'] for run in runs) == 4
+    assert all(run['tasks']['Succeed on the second attempt'][0] == run['hosts']['count'] for run in runs)
+    assert sorted(path.name for path in directory.glob('*.prom')) == ['sweep@0.prom', 'sweep@1.prom']
+    assert 'ansible_run_retries{playbook="sweep",shard="0"}' in (directory / 'sweep@0.prom').read_text()
+    assert summarize_runs(runs)['runs'] == 2
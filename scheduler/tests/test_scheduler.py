@@ -0,0 +1,87 @@
+"""
+Purpose: Tests for systemd unit generation and playbook validation in the scheduler
+Design Pattern: Discovery against the repository's own playbooks, rendering checked per unit
+"""
+
+import shlex
+from pathlib import Path
+
+from scheduler import SystemdServiceManager
+from scheduler_factory import SchedulerFactory, ScheduledPlaybook, playbook_command
+
+PROJECT_PATH = Path(__file__).resolve().parents[2]
+
+
+def make_playbook(schedule, **overrides):
+    values = dict(
+        name='test_playbook',
+        path=str(PROJECT_PATH / 'playbooks' / 'test_playbook.yml'),
+        schedule_config={'enabled': True, 'schedule': schedule},
+        description='Test playbook',
+        schedule=schedule,
+        inventory_groups=['network_devices'],
+        systemd_service_name='test-playbook-monitor',
+        timeout=300,
+        enabled=True,
+    )
+    values.update(overrides)
+    return ScheduledPlaybook(**values)
+
+
+def test_repository_playbooks_compile_to_exact_calendars():
+    factory = SchedulerFactory(str(PROJECT_PATH / 'playbooks'), str(PROJECT_PATH / 'roles'))
+    manager = SystemdServiceManager(str(PROJECT_PATH))
+
+    calendars = {}
+    for playbook in factory.discover_schedulable_playbooks():
+        assert factory.validate_playbook(playbook) == []
+        calendars[playbook.name] = manager._cron_to_systemd_calendar(playbook.schedule)
+
+    # Previously both fell back to "hourly"
+    assert calendars['config_backup'] == ['*-*-* 02:00:00']
+    assert calendars['interface_monitoring'] == ['*-*-* *:00/10:00']
+
+
+def test_timer_renders_one_oncalendar_per_expression():
+    manager = SystemdServiceManager(str(PROJECT_PATH))
+    files = manager.generate_service_files(make_playbook('0 6 1 * mon'), 'inventory/production.yml')
+
+    oncalendar = [line for line in files['timer'].splitlines() if line.startswith('OnCalendar=')]
+    assert oncalendar == ['OnCalendar=*-*-01 06:00:00', 'OnCalendar=Mon *-*-* 06:00:00']
+
+
+def test_service_writes_role_state_to_its_cache_directory():
+    manager = SystemdServiceManager(str(PROJECT_PATH))
+    service = manager.generate_service_files(make_playbook('*/5 * * * *'), 'inventory/production.yml')['service']
+
+    assert 'CacheDirectory=ansible-monitoring' in service.splitlines()
+    assert 'Environment="ANSIBLE_MONITORING_CACHE_DIR=%C/ansible-monitoring"' in service.splitlines()
+
+
+def test_service_runs_playbook_under_its_run_lock():
+    manager = SystemdServiceManager(str(PROJECT_PATH), '/var/log/ansible-monitoring')
+    service = manager.generate_service_files(make_playbook('*/5 * * * *'), 'inventory/production.yml')['service']
+
+    assert 'ExecStart=/usr/bin/flock /var/log/ansible-monitoring/test-playbook-monitor.lock ' \
+           '/usr/bin/ansible-playbook \\' in service.splitlines()
+
+
+def test_service_passes_playbook_args_and_timeout():
+    manager = SystemdServiceManager(str(PROJECT_PATH), '/var/log/ansible-monitoring')
+    playbook = make_playbook('*/5 * * * *', timeout=600,
+                             schedule_config={'enabled': True, 'playbook_args': "-e 'site=lab one' --forks 20"})
+    lines = manager.generate_service_files(playbook, 'inventory/production.yml')['service'].splitlines()
+
+    start = lines.index('ExecStart=/usr/bin/flock /var/log/ansible-monitoring/test-playbook-monitor.lock '
+                        '/usr/bin/ansible-playbook \\')
+    assert shlex.split(lines[start + 1]) == playbook_command(playbook, 'inventory/production.yml', command=())
+    assert shlex.split(lines[start + 1]) == ['-i', 'inventory/production.yml', playbook.path, '-e', 'site=lab one',
+                                             '--forks', '20', '--timeout', '600']
+
+
+def test_validate_playbook_reports_invalid_schedule():
+    factory = SchedulerFactory(str(PROJECT_PATH / 'playbooks'), str(PROJECT_PATH / 'roles'))
+    errors = factory.validate_playbook(make_playbook('*/15 * * *', inventory_groups=[], timeout=0))
+
+    assert len(errors) == 3
+    assert errors[0].startswith('invalid schedule')
@@ -0,0 +1,155 @@
+"""
+Purpose: Tests for sharded playbook execution
+Design Pattern: Hash distribution properties, result merging, and a real sharded localhost run
+"""
+
+import json
+import shutil
+import time
+from pathlib import Path
+
+import pytest
+
+from daemon import WarmAnsibleExecutor
+from scheduler import SystemdServiceManager
+from scheduler_factory import SchedulerFactory
+from sharding import ShardRunner, merge_shard_results, parse_json_callback, resolve_hosts, split_hosts
+from test_scheduler import make_playbook
+
+PROJECT_PATH = Path(__file__).resolve().parents[2]
+
+HOSTS = [f"sw-{index:04d}" for index in range(2000)]
+
+
+def test_split_is_stable_complete_and_balanced():
+    shards = split_hosts(HOSTS, 4)
+
+    assert split_hosts(list(reversed(HOSTS)), 4) == shards
+    assert sorted(host for shard in shards for host in shard) == HOSTS
+    assert all(400 < len(shard) < 600 for shard in shards)
+
+
+def test_adding_a_shard_moves_only_its_share_of_hosts():
+    before = {host: index for index, shard in enumerate(split_hosts(HOSTS, 4)) for host in shard}
+    after = {host: index for index, shard in enumerate(split_hosts(HOSTS, 5)) for host in shard}
+
+    moved = [host for host in HOSTS if before[host] != after[host]]
+    # Every moved host lands on the new shard; roughly 1/5 of the fleet moves
+    assert all(after[host] == 4 for host in moved)
+    assert 300 < len(moved) < 500
+
+
+def test_resolve_hosts_unions_groups():
+    inventory = str(PROJECT_PATH / 'inventory' / 'hosts.yml')
+
+    assert resolve_hosts(inventory, ['core_switches', 'routers']) == [
+        'core-sw-01', 'core-sw-02', 'edge-rtr-01', 'edge-rtr-02']
+
+
+def test_merge_shard_results():
+    results = [
+        {'playbook': 'p', 'shard': 1, 'hosts': ['b', 'c'], 'rc': 2, 'duration': 12.5, 'started': 't',
+         'stats': {'b': {'ok': 3, 'failures': 1}, 'c': {'ok': 4, 'unreachable': 1}}},
+        {'playbook': 'p', 'shard': 0, 'hosts': ['a'], 'rc': 0, 'duration': 8.0, 'started': 't',
+         'stats': {'a': {'ok': 4, 'changed': 1}}},
+    ]
+    summary = merge_shard_results(results)
+
+    assert summary['hosts'] == 3
+    assert summary['rc'] == 2
+    assert summary['duration'] == 12.5
+    assert summary['totals']['ok'] == 11 and summary['totals']['changed'] == 1
+    assert summary['failed_hosts'] == ['b'] and summary['unreachable_hosts'] == ['c']
+    assert [shard['shard'] for shard in summary['per_shard']] == [0, 1]
+
+
+def test_parse_json_callback_ignores_leading_noise():
+    output = 'warning line\n' + json.dumps({'plays': [], 'stats': {'h1': {'ok': 2, 'changed': 1}}})
+
+    assert parse_json_callback(output)['h1']['ok'] == 2
+    assert parse_json_callback('no json here') == {}
+
+
+def test_shards_setting_is_validated():
+    factory = SchedulerFactory(str(PROJECT_PATH / 'playbooks'), str(PROJECT_PATH / 'roles'))
+    playbook = make_playbook('*/5 * * * *', schedule_config={'enabled': True, 'shards': 0})
+
+    assert factory.validate_playbook(playbook) == ['invalid shards: 0']
+
+
+def test_sharded_playbook_renders_template_units():
+    manager = SystemdServiceManager(str(PROJECT_PATH))
+    playbook = make_playbook('*/5 * * * *', schedule_config={'enabled': True, 'shards': 3})
+    files = manager.generate_service_files(playbook, 'inventory/hosts.yml')
+
+    assert '--shard %i' in files['service']
+    assert 'test-playbook-monitor@%i.log' in files['service']
+    assert 'Requires=test-playbook-monitor@%i.service' in files['timer']
+
+
+def write_local_project(tmp_path, count=6):
+    hosts = ''.join(f"        node{index}:\n          ansible_connection: local\n" for index in range(count))
+    (tmp_path / 'hosts.yml').write_text(f"all:\n  children:\n    fleet:\n      hosts:\n{hosts}")
+    playbook_path = tmp_path / 'sweep.yml'
+    playbook_path.write_text(
+        "- hosts: fleet\n  gather_facts: false\n  tasks:\n"
+        "    - debug:\n        msg: \"{{ inventory_hostname }}\"\n")
+    return make_playbook('*/5 * * * *', name='sweep', path=str(playbook_path), inventory_groups=['fleet'],
+                         systemd_service_name='sweep-monitor',
+                         schedule_config={'enabled': True, 'shards': 3})
+
+
+def test_shards_start_with_the_units_playbook_arguments(tmp_path):
+    playbook = write_local_project(tmp_path)
+    playbook.schedule_config['playbook_args'] = "-e 'mode=full sweep'"
+    # Echo each shard's arguments to its stderr, which the shard result keeps
+    runner = ShardRunner(str(tmp_path), 'hosts.yml', str(tmp_path / 'logs'),
+                         command=['sh', '-c', 'printf "%s\\n" "$@" >&2', 'sh'])
+
+    for result in runner.run(playbook):
+        assert result['stderr_tail'].splitlines()[:-2] == [
+            '-i', str(tmp_path / 'hosts.yml'), playbook.path, '-e', 'mode=full sweep', '--timeout', '300']
+        assert result['stderr_tail'].splitlines()[-2] == '--limit'
+
+
+@pytest.mark.skipif(shutil.which('ansible-playbook') is None, reason="ansible-playbook not installed")
+def test_local_shards_run_in_parallel_and_merge(tmp_path):
+    playbook = write_local_project(tmp_path)
+    runner = ShardRunner(str(tmp_path), 'hosts.yml', str(tmp_path / 'logs'))
+
+    results = runner.run(playbook)
+    summary = merge_shard_results(results)
+
+    assert [result['rc'] for result in results] == [0, 0, 0]
+    assert summary['hosts'] == 6
+    assert sorted(host for result in results for host in result['stats']) == [f"node{i}" for i in range(6)]
+    assert summary['totals']['ok'] == 6
+    assert len(runner.load_results(playbook)) == 3
+
+    # A single systemd instance only touches its own hosts
+    only = runner.run(playbook, only_shard=1)
+    assert sorted(only[0]['stats']) == results[1]['hosts']
+
+
+def test_warm_executor_forks_one_child_per_shard(tmp_path, monkeypatch):
+    pytest.importorskip('ansible')
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv('ANSIBLE_HOST_KEY_CHECKING', 'False')
+    monkeypatch.setenv('ANSIBLE_STDOUT_CALLBACK', 'json')
+    playbook = write_local_project(tmp_path)
+
+    executor = WarmAnsibleExecutor(str(tmp_path), 'hosts.yml', str(tmp_path / 'logs'))
+    executor.prepare([playbook])
+    run = executor.launch(playbook)
+    deadline = time.monotonic() + 60
+    while run.poll() is None and time.monotonic() < deadline:
+        time.sleep(0.05)
+
+    assert run.poll() == 0
+    assert len(run.runs) == 3
+    seen = []
+    for shard, hosts in enumerate(split_hosts([f"node{i}" for i in range(6)], 3)):
+        stats = parse_json_callback((tmp_path / 'logs' / f"sweep-monitor@{shard}.log").read_text())
+        assert sorted(stats) == hosts
+        seen.extend(stats)
+    assert sorted(seen) == [f"node{i}" for i in range(6)]
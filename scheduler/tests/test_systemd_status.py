@@ -0,0 +1,149 @@
+"""
+Purpose: Tests for bulk systemd unit status
+Design Pattern: Fake systemctl executable that records its invocations and replays canned properties
+"""
+
+import json
+import stat
+import sys
+from datetime import datetime
+
+from scheduler import MonitoringScheduler, SystemdServiceManager
+from systemd_status import parse_show_output, parse_timestamp, query_status, unit_status
+from test_scheduler import PROJECT_PATH, make_playbook
+
+START = int(datetime(2024, 1, 1, 0, 5, 0).timestamp())
+
+FAKE_SYSTEMCTL = '''#!{python}
+import json, sys
+with open({calls!r}, 'a') as f:
+    f.write(json.dumps(sys.argv[1:]) + "\\n")
+units = json.load(open({units!r}))
+properties = next(a for a in sys.argv if a.startswith('--property=')).split('=', 1)[1].split(',')
+blocks = []
+for unit in [a for a in sys.argv[2:] if not a.startswith('--')]:
+    values = units.get(unit, {{'LoadState': 'not-found', 'ActiveState': 'inactive'}})
+    blocks.append("\\n".join(f"{{p}}={{values.get(p, '')}}" for p in properties))
+print("\\n\\n".join(blocks))
+'''
+
+
+def fake_systemctl(tmp_path, units):
+    (tmp_path / 'units.json').write_text(json.dumps(units))
+    script = tmp_path / 'systemctl'
+    script.write_text(FAKE_SYSTEMCTL.format(python=sys.executable, calls=str(tmp_path / 'calls.log'),
+                                            units=str(tmp_path / 'units.json')))
+    script.chmod(script.stat().st_mode | stat.S_IEXEC)
+    return str(script)
+
+
+def recorded_calls(tmp_path):
+    return [json.loads(line) for line in (tmp_path / 'calls.log').read_text().splitlines()]
+
+
+def finished_service(status='0', code='1', duration=42, memory='52428800'):
+    return {
+        'LoadState': 'loaded', 'ActiveState': 'inactive', 'SubState': 'dead', 'Result': 'success',
+        'ExecMainStartTimestamp': f"@{START}", 'ExecMainExitTimestamp': f"@{START + duration}",
+        'ExecMainStatus': status, 'ExecMainCode': code, 'MemoryPeak': memory,
+    }
+
+
+def active_timer(next_elapse=START + 300):
+    return {'LoadState': 'loaded', 'ActiveState': 'active', 'SubState': 'waiting',
+            'UnitFileState': 'enabled', 'NextElapseUSecRealtime': f"@{next_elapse}",
+            'LastTriggerUSec': f"@{START}"}
+
+
+def test_parse_show_output_and_timestamps():
+    blocks = parse_show_output("Id=a.service\nResult=\n\nId=a.timer\nResult=success\n")
+
+    assert blocks == [{'Id': 'a.service', 'Result': ''}, {'Id': 'a.timer', 'Result': 'success'}]
+    assert parse_timestamp(f"@{START}") == datetime(2024, 1, 1, 0, 5, 0)
+    assert parse_timestamp('Mon 2024-01-01 00:05:00 UTC') == datetime(2024, 1, 1, 0, 5, 0)
+    assert parse_timestamp('n/a') is None and parse_timestamp('') is None
+
+
+def test_all_units_are_queried_in_one_call(tmp_path):
+    systemctl = fake_systemctl(tmp_path, {
+        'uptime-monitor.service': finished_service(),
+        'uptime-monitor.timer': active_timer(),
+        'ports-monitor.service': finished_service(status='9', code='2', memory='[not set]'),
+        'ports-monitor.timer': active_timer(),
+    })
+    statuses = query_status({'uptime': ['uptime-monitor'], 'ports': ['ports-monitor'],
+                             'missing': ['missing-monitor']}, systemctl)
+
+    calls = recorded_calls(tmp_path)
+    assert len(calls) == 1
+    assert calls[0][:2] == ['show', '--timestamp=unix']
+
+    uptime = statuses['uptime']
+    assert uptime['timer_active'] and uptime['timer_enabled'] and not uptime['service_active']
+    assert uptime['last_run'] == datetime(2024, 1, 1, 0, 5, 0)
+    assert uptime['last_exit_code'] == 0
+    assert uptime['duration'] == 42
+    assert uptime['memory_peak'] == 50 * 1024 * 1024
+    assert uptime['next_run'] == datetime(2024, 1, 1, 0, 10, 0)
+
+    assert statuses['ports']['last_exit_code'] == -9  # Killed by SIGKILL
+    assert statuses['ports']['memory_peak'] is None
+    assert statuses['missing']['last_run'] is None and not statuses['missing']['service_loaded']
+
+
+def test_running_service_has_no_exit_code_yet():
+    service = dict(finished_service(), ActiveState='active', ExecMainExitTimestamp='@0')
+    status = unit_status(service, active_timer())
+
+    assert status['service_active']
+    assert status['last_exit_code'] is None and status['duration'] is None
+
+
+def test_sharded_instances_merge_into_one_record(tmp_path):
+    systemctl = fake_systemctl(tmp_path, {
+        'sweep-monitor@0.service': finished_service(duration=30),
+        'sweep-monitor@0.timer': active_timer(START + 300),
+        'sweep-monitor@1.service': finished_service(status='2', duration=55, memory='104857600'),
+        'sweep-monitor@1.timer': active_timer(START + 290),
+    })
+    manager = SystemdServiceManager(str(PROJECT_PATH))
+    manager.systemctl = systemctl
+    playbook = make_playbook('*/5 * * * *', name='sweep', systemd_service_name='sweep-monitor',
+                             schedule_config={'enabled': True, 'shards': 2})
+
+    status = manager.get_services_status({'sweep': manager.unit_names(playbook)})['sweep']
+
+    assert status['instances'] == 2
+    assert status['last_exit_code'] == 2
+    assert status['duration'] == 55
+    assert status['memory_peak'] == 100 * 1024 * 1024
+    assert status['next_run'] == datetime(2024, 1, 1, 0, 9, 50)
+
+
+def test_systemctl_failure_is_reported_per_service(tmp_path):
+    manager = SystemdServiceManager(str(PROJECT_PATH))
+    manager.systemctl = str(tmp_path / 'no-such-systemctl')
+
+    status = manager.get_service_status('uptime-monitor')
+
+    assert 'error' in status
+    assert not status['service_active'] and not status['timer_active']
+
+
+def test_status_json_output(tmp_path, capsys):
+    scheduler = MonitoringScheduler(str(PROJECT_PATH))
+    roles = scheduler.discover_roles()
+    units = {}
+    for role in roles:
+        for name in scheduler.service_manager.unit_names(role):
+            units[f"{name}.service"] = finished_service()
+            units[f"{name}.timer"] = active_timer()
+    scheduler.service_manager.systemctl = fake_systemctl(tmp_path, units)
+
+    scheduler.show_status(json_output=True)
+    document = json.loads(capsys.readouterr().out)
+
+    assert len(recorded_calls(tmp_path)) == 1
+    assert [entry['name'] for entry in document] == [role.name for role in roles]
+    assert all(entry['last_exit_code'] == 0 and entry['duration'] == 42 for entry in document)
+    assert document[0]['next_run'] == datetime(2024, 1, 1, 0, 10, 0).isoformat()
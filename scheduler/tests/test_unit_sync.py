@@ -0,0 +1,141 @@
+"""
+Purpose: Tests for diff-based systemd unit installation
+Design Pattern: Temporary unit directory and a fake systemctl that keeps enable state like systemd
+"""
+
+import json
+import stat
+import sys
+
+from scheduler import SystemdServiceManager
+from test_scheduler import PROJECT_PATH, make_playbook
+from unit_sync import MANAGED_MARKER, is_managed
+
+FAKE_SYSTEMCTL = '''#!{python}
+import json, os, sys
+unit_dir, state_file = {unit_dir!r}, {state!r}
+with open({calls!r}, 'a') as f:
+    f.write(json.dumps(sys.argv[1:]) + "\\n")
+enabled = set(json.load(open(state_file))) if os.path.exists(state_file) else set()
+args = [a for a in sys.argv[1:] if not a.startswith('--')]
+wants = os.path.join(unit_dir, 'timers.target.wants')
+os.makedirs(wants, exist_ok=True)
+if args[0] == 'show':
+    print("\\n\\n".join(f"Id={{u}}\\nActiveState={{'active' if u in enabled else 'inactive'}}\\n"
+                       f"UnitFileState={{'enabled' if u in enabled else 'disabled'}}" for u in args[1:]))
+elif args[0] in ('enable', 'disable'):
+    for unit in args[1:]:
+        link = os.path.join(wants, unit)
+        if args[0] == 'enable':
+            enabled.add(unit)
+            if not os.path.lexists(link):
+                os.symlink(os.path.join(unit_dir, unit), link)
+        else:
+            enabled.discard(unit)
+            if os.path.lexists(link):
+                os.unlink(link)
+json.dump(sorted(enabled), open(state_file, 'w'))
+'''
+
+
+def make_manager(tmp_path):
+    unit_dir = tmp_path / 'system'
+    unit_dir.mkdir()
+    script = tmp_path / 'systemctl'
+    script.write_text(FAKE_SYSTEMCTL.format(python=sys.executable, unit_dir=str(unit_dir),
+                                            state=str(tmp_path / 'enabled.json'),
+                                            calls=str(tmp_path / 'calls.log')))
+    script.chmod(script.stat().st_mode | stat.S_IEXEC)
+
+    manager = SystemdServiceManager(str(PROJECT_PATH), log_path=str(tmp_path / 'logs'))
+    manager.systemd_path = unit_dir
+    manager.systemctl = str(script)
+    return manager, unit_dir
+
+
+def take_calls(tmp_path):
+    """systemctl calls since the last check, excluding read-only show queries"""
+    log = tmp_path / 'calls.log'
+    calls = [json.loads(line) for line in log.read_text().splitlines()] if log.exists() else []
+    log.write_text('')
+    return [call for call in calls if call[0] != 'show']
+
+
+def installed(unit_dir):
+    return sorted(path.name for path in unit_dir.iterdir() if path.is_file())
+
+
+def playbooks(shards=1):
+    return [
+        (make_playbook('*/5 * * * *', name='uptime', systemd_service_name='uptime-monitor'), None),
+        (make_playbook('0 * * * *', name='ports', systemd_service_name='ports-monitor',
+                       schedule_config={'enabled': True, 'shards': shards}), None),
+    ]
+
+
+def test_first_sync_writes_everything_with_batched_systemctl_calls(tmp_path):
+    manager, unit_dir = make_manager(tmp_path)
+
+    plan = manager.sync_units(playbooks(), 'inventory/hosts.yml')
+
+    assert installed(unit_dir) == [
+        'ports-monitor.service', 'ports-monitor.timer', 'uptime-monitor.service', 'uptime-monitor.timer']
+    assert all(is_managed(unit_dir / name) for name in installed(unit_dir))
+    assert [change.action for change in plan.changed] == ['create'] * 4
+    assert take_calls(tmp_path) == [
+        ['daemon-reload'], ['enable', '--now', 'uptime-monitor.timer', 'ports-monitor.timer']]
+
+
+def test_unchanged_project_touches_nothing(tmp_path):
+    manager, unit_dir = make_manager(tmp_path)
+    manager.sync_units(playbooks(), 'inventory/hosts.yml')
+    take_calls(tmp_path)
+    mtimes = {name: (unit_dir / name).stat().st_mtime_ns for name in installed(unit_dir)}
+
+    plan = manager.sync_units(playbooks(), 'inventory/hosts.yml')
+
+    assert plan.empty
+    assert take_calls(tmp_path) == []
+    assert {name: (unit_dir / name).stat().st_mtime_ns for name in installed(unit_dir)} == mtimes
+
+
+def test_changed_schedule_rewrites_one_timer_and_reloads_once(tmp_path, capsys):
+    manager, unit_dir = make_manager(tmp_path)
+    manager.sync_units(playbooks(), 'inventory/hosts.yml')
+    take_calls(tmp_path)
+
+    entries = playbooks()
+    entries[0] = (make_playbook('*/10 * * * *', name='uptime', systemd_service_name='uptime-monitor'), None)
+    plan = manager.sync_units(entries, 'inventory/hosts.yml', show_diff=True)
+
+    assert [(change.path.name, change.action) for change in plan.changed] == [('uptime-monitor.timer', 'update')]
+    assert take_calls(tmp_path) == [['daemon-reload']]
+    diff = capsys.readouterr().out
+    assert '-OnCalendar=*-*-* *:00/5:00' in diff and '+OnCalendar=*-*-* *:00/10:00' in diff
+
+
+def test_dry_run_reports_without_changes(tmp_path):
+    manager, unit_dir = make_manager(tmp_path)
+
+    plan = manager.sync_units(playbooks(), 'inventory/hosts.yml', dry_run=True)
+
+    assert len(plan.changed) == 4 and len(plan.enable) == 2
+    assert installed(unit_dir) == []
+    assert take_calls(tmp_path) == []
+
+
+def test_removed_playbook_and_shrunk_shards_are_pruned(tmp_path):
+    manager, unit_dir = make_manager(tmp_path)
+    (unit_dir / 'hand-written.service').write_text('[Unit]\nDescription=Not ours\n')
+    manager.sync_units(playbooks(shards=3), 'inventory/hosts.yml')
+    assert sorted(link.name for link in (unit_dir / 'timers.target.wants').iterdir()) == [
+        'ports-monitor@0.timer', 'ports-monitor@1.timer', 'ports-monitor@2.timer', 'uptime-monitor.timer']
+    take_calls(tmp_path)
+
+    manager.sync_units(playbooks(shards=2)[1:], 'inventory/hosts.yml')
+
+    assert take_calls(tmp_path) == [
+        ['disable', '--now', 'ports-monitor@2.timer', 'uptime-monitor.timer'], ['daemon-reload']]
+    assert installed(unit_dir) == [
+        'hand-written.service', 'ports-monitor@.service', 'ports-monitor@.timer']
+    assert (unit_dir / 'ports-monitor@.service').read_text().startswith(MANAGED_MARKER)
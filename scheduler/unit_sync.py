@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Purpose: Bring the installed systemd units in line with the rendered ones with minimal work
+Design Pattern: Plan/apply reconciliation - diff desired files against disk, then batch the changes
+Complexity: O(u) file reads for u units; at most three systemctl calls per sync
+
+create-timers used to rewrite every unit file and run daemon-reload, enable and start once
+per playbook. A sync renders every unit first, compares them byte for byte with the unit
+directory, writes only the files that differ (atomically, via rename), removes units the
+scheduler installed for playbooks that no longer exist, and then issues one
+`disable --now` for retired timers, one `daemon-reload` if any file changed and one
+`enable --now` for timers that are not already enabled and running. Re-running create-timers
+on an unchanged project touches nothing.
+
+Units are recognised as scheduler-managed by MANAGED_MARKER on their first line, so units
+installed by hand or by other tools in the same directory are never pruned.
+"""
+
+import difflib
+import os
+import subprocess
+import tempfile
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Set
+
+MANAGED_MARKER = '# Managed by the ansible-monitoring scheduler (create-timers); local edits are overwritten'
+UNIT_SUFFIXES = ('.service', '.timer')
+WANTS_DIR = 'timers.target.wants'
+
+
+@dataclass
+class UnitChange:
+    """One unit file and what the sync does to it"""
+    path: Path
+    action: str  # create, update, remove or unchanged
+    old: str = ''
+    new: str = ''
+
+    def diff(self) -> str:
+        """Unified diff of the change (empty for unchanged files)"""
+        if self.action == 'unchanged':
+            return ''
+        return ''.join(difflib.unified_diff(
+            self.old.splitlines(keepends=True), self.new.splitlines(keepends=True),
+            fromfile=str(self.path) if self.action != 'create' else '/dev/null',
+            tofile=str(self.path) if self.action != 'remove' else '/dev/null'))
+
+
+@dataclass
+class SyncPlan:
+    """Unit file changes plus the timers to enable and disable"""
+    changes: List[UnitChange] = field(default_factory=list)
+    enable: List[str] = field(default_factory=list)
+    disable: List[str] = field(default_factory=list)
+
+    @property
+    def changed(self) -> List[UnitChange]:
+        return [change for change in self.changes if change.action != 'unchanged']
+
+    @property
+    def empty(self) -> bool:
+        return not (self.changed or self.enable or self.disable)
+
+    def describe(self) -> List[str]:
+        """One line per planned action"""
+        lines = [f"{change.action:8} {change.path}" for change in self.changed]
+        lines += [f"{'disable':8} {timer}" for timer in self.disable]
+        lines += [f"{'enable':8} {timer}" for timer in self.enable]
+        return lines
+
+
+def is_managed(path: Path) -> bool:
+    """Whether a unit file was written by the scheduler"""
+    try:
+        with open(path, 'r') as f:
+            return f.readline().rstrip('\n') == MANAGED_MARKER
+    except OSError:
+        return False
+
+
+def _template_file(timer: str) -> str:
+    """Unit file backing a timer name ('x@3.timer' -> 'x@.timer')"""
+    stem, _, suffix = timer.rpartition('.')
+    prefix, at, _ = stem.partition('@')
+    return f"{prefix}@.{suffix}" if at else timer
+
+
+def plan_sync(desired: Dict[str, str], timers: Sequence[str], unit_dir: Path,
+              running_timers: Set[str], prune: bool = True) -> SyncPlan:
+    """
+    Compare rendered units with the unit directory
+
+    Args:
+        desired: Unit file name -> rendered content (MANAGED_MARKER first)
+        timers: Timer units that should be enabled and running (template instances included)
+        unit_dir: systemd unit directory (/etc/systemd/system)
+        running_timers: Timers already enabled and active
+        prune: Remove managed units and enabled instances that are not desired
+
+    Returns:
+        The sync plan; nothing is changed on disk
+    """
+    plan = SyncPlan()
+    for name, content in sorted(desired.items()):
+        path = unit_dir / name
+        try:
+            old = path.read_text()
+        except FileNotFoundError:
+            plan.changes.append(UnitChange(path, 'create', '', content))
+            continue
+        plan.changes.append(UnitChange(path, 'unchanged' if old == content else 'update', old, content))
+
+    if prune:
+        for path in sorted(unit_dir.glob('*')):
+            if path.suffix in UNIT_SUFFIXES and path.name not in desired and is_managed(path):
+                plan.changes.append(UnitChange(path, 'remove', path.read_text(), ''))
+        # Enabled timers whose unit is managed but which are no longer wanted (removed
+        # playbooks, or shard instances beyond a reduced shard count)
+        managed_files = {change.path.name for change in plan.changes}
+        wanted = set(timers)
+        for link in sorted((unit_dir / WANTS_DIR).glob('*.timer')):
+            if link.name not in wanted and _template_file(link.name) in managed_files:
+                plan.disable.append(link.name)
+
+    plan.enable = [timer for timer in timers if timer not in running_timers]
+    return plan
+
+
+def write_atomic(path: Path, content: str):
+    """Replace a file without ever exposing a partially written unit to systemd"""
+    fd, tmp_path = tempfile.mkstemp(dir=str(path.parent), prefix=f".{path.name}.")
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(content)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def apply_sync(plan: SyncPlan, systemctl: str = 'systemctl',
+               run: Optional[Callable[..., subprocess.CompletedProcess]] = None) -> int:
+    """
+    Apply a sync plan
+
+    Args:
+        plan: Plan from plan_sync
+        systemctl: systemctl executable
+        run: subprocess.run replacement (called with check=True)
+
+    Returns:
+        Number of systemctl invocations made
+
+    Raises:
+        subprocess.CalledProcessError: A systemctl call failed
+    """
+    run = run or subprocess.run
+    calls = 0
+    if plan.disable:
+        # Stop retired timers while their unit files still exist
+        run([systemctl, 'disable', '--now'] + plan.disable, check=True)
+        calls += 1
+    for change in plan.changed:
+        if change.action == 'remove':
+            change.path.unlink()
+        else:
+            write_atomic(change.path, change.new)
+    if plan.changed:
+        run([systemctl, 'daemon-reload'], check=True)
+        calls += 1
+    if plan.enable:
+        run([systemctl, 'enable', '--now'] + plan.enable, check=True)
+        calls += 1
+    return calls
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Purpose: Generate a simulated device fleet for offline load tests - inventory, ios_interfaces /
+         ios_l3_interfaces gathered data, running configurations and a mock ServiceNow seed
+Design Pattern: Deterministic generator - every value derives from (seed, host, generation), so a
+                fleet can be regenerated at any size and advanced one polling generation at a time
+Complexity: O(h * i) for h hosts with i interfaces each
+
+Layout of the output directory:
+  inventory.yml       hosts in network_devices -> core_switches / distribution / access_switches and
+                      one site_<n> group per site; every host runs with the local connection and
+                      replays its data (interface_monitoring_gathered_path, config_backup_source_path)
+  gathered/<host>.json  {"interfaces": [...], "l3_interfaces": [...]} in the shape of
+                      cisco.ios.ios_interfaces / ios_l3_interfaces state=gathered
+  configs/<host>.cfg  running configuration (with volatile lines that change every generation)
+  seed.json           sys_user, sys_user_group and one cmdb_ci per host for mock_servicenow.py
+  state/              role storage (interface state, backups, caches) of the simulated runs
+
+Generation 0 is the healthy baseline. Every later generation takes interfaces down
+(--down-rate), makes hosts fail their connectivity check (--unreachable-rate) and changes
+configurations (--config-change-rate) at random, so consecutive runs produce incidents,
+closures and backups at a known rate.
+
+Usage:
+  python3 generate_fleet.py --hosts 1000 --out /tmp/fleet-1000 --servicenow-url http://127.0.0.1:18080
+  python3 generate_fleet.py --hosts 1000 --out /tmp/fleet-1000 --generation 1   # next polling cycle
+"""
+
+import argparse
+import json
+import os
+import random
+
+import yaml
+
+SITE_SIZE = 40           # hosts per site: two distribution switches and access switches
+UNREACHABLE_PORT = 9     # discard port - closed on the control node, so TCP probes fail
+
+
+def _random(seed, *parts):
+    return random.Random(':'.join(str(part) for part in (seed,) + parts))
+
+
+def fleet_hosts(count):
+    """
+    Host names and roles of a fleet of `count` hosts
+
+    Returns:
+        List of {name, role, site, upstream} - one core switch per 500 hosts, then per site two
+        distribution switches (upstream: the core) and access switches (upstream: both dists)
+    """
+    cores = ['sim-core-%02d' % (index + 1) for index in range(max(1, count // 500))]
+    hosts = [{'name': name, 'role': 'core', 'site': None, 'upstream': []} for name in cores[:count]]
+    site = 0
+    while len(hosts) < count:
+        site += 1
+        dists = ['sim-s%04d-dist-%02d' % (site, index + 1) for index in range(2)]
+        core = cores[(site - 1) % len(cores)]
+        members = [{'name': name, 'role': 'distribution', 'site': site, 'upstream': [core]} for name in dists]
+        members += [{'name': 'sim-s%04d-acc-%03d' % (site, index + 1), 'role': 'access', 'site': site, 'upstream': dists}
+                    for index in range(SITE_SIZE - len(dists))]
+        hosts.extend(members[:count - len(hosts)])
+    return hosts
+
+
+def host_failed(args, host, generation):
+    return generation > 0 and _random(args.seed, host['name'], generation, 'uptime').random() < args.unreachable_rate
+
+
+def gathered_interfaces(args, host, generation):
+    """ios_interfaces and ios_l3_interfaces gathered data of one host in one generation"""
+    count = args.interfaces if host['role'] == 'access' else max(4, args.interfaces // 4)
+    interfaces = []
+    for index in range(1, count + 1):
+        name = 'GigabitEthernet1/0/%d' % index
+        down = generation > 0 and _random(args.seed, host['name'], name, generation).random() < args.down_rate
+        interfaces.append({
+            'name': name,
+            'description': 'uplink' if index <= 2 else 'user port %d' % index,
+            'enabled': not down,
+            'mtu': 1500,
+            'speed': '1000',
+            'duplex': 'full',
+        })
+    interfaces.append({'name': 'Vlan1', 'enabled': True, 'mtu': 1500})
+    interfaces.append({'name': 'Loopback0', 'enabled': True, 'description': 'management'})
+    number = fleet_index(host)
+    l3_interfaces = [
+        {'name': 'Loopback0', 'ipv4': [{'address': '10.%d.%d.1/32' % (number // 256 % 256, number % 256)}]},
+        {'name': 'Vlan1', 'ipv4': [{'address': '172.%d.%d.1/24' % (16 + number // 65536 % 16, number // 256 % 256)}]},
+    ]
+    return {'interfaces': interfaces, 'l3_interfaces': l3_interfaces}
+
+
+def fleet_index(host):
+    return int(''.join(character for character in host['name'] if character.isdigit()) or 0)
+
+
+def running_config(args, host, gathered, generation):
+    """Running configuration with volatile header lines and configuration changes per generation"""
+    revision = sum(1 for previous in range(1, generation + 1)
+                   if _random(args.seed, host['name'], previous, 'config').random() < args.config_change_rate)
+    lines = [
+        'Building configuration...',
+        '',
+        'Current configuration : %d bytes' % (4096 + generation),
+        '! Last configuration change at 10:%02d:00 UTC generation %d' % (generation % 60, generation),
+        '!',
+        'hostname %s' % host['name'],
+        '!',
+        'ntp clock-period %d' % (17179000 + _random(args.seed, host['name'], generation, 'ntp').randint(0, 999)),
+        'snmp-server location site-%s rev-%d' % (host['site'] or 'core', revision),
+        '!',
+    ]
+    for interface in gathered['interfaces']:
+        lines.append('interface %s' % interface['name'])
+        if interface.get('description'):
+            lines.append(' description %s' % interface['description'])
+        if not interface.get('enabled', True):
+            lines.append(' shutdown')
+        lines.append('!')
+    lines.append('end')
+    return '\n'.join(lines) + '\n'
+
+
+def inventory(args, hosts, generation, state_path):
+    """Inventory document of the fleet; failing hosts get an unusable Python interpreter"""
+    groups = {'core_switches': {}, 'distribution': {}, 'access_switches': {}}
+    sites = {}
+    for host in hosts:
+        host_vars = {'device_role': host['role']}
+        if host['upstream']:
+            host_vars['device_upstream'] = host['upstream']
+        if host_failed(args, host, generation):
+            # The connectivity check fails like a device that stopped answering
+            host_vars['ansible_python_interpreter'] = '/nonexistent/python3'
+            host_vars['uptime_probe_port'] = UNREACHABLE_PORT
+        group = {'core': 'core_switches', 'distribution': 'distribution', 'access': 'access_switches'}[host['role']]
+        groups[group][host['name']] = host_vars
+        if host['site']:
+            sites.setdefault('site_%04d' % host['site'], {})[host['name']] = None
+
+    cache = os.path.join(state_path, 'cache')
+    group_vars = {
+        'ansible_connection': 'local',
+        'ansible_host': '127.0.0.1',
+        'ansible_network_os': 'simulated',
+        'ansible_python_interpreter': '{{ ansible_playbook_python }}',
+        'interface_monitoring_gathered_path': os.path.join(args.out, 'gathered'),
+        'interface_monitoring_storage_path': os.path.join(state_path, 'interface-monitoring'),
+        'config_backup_source_path': os.path.join(args.out, 'configs'),
+        'config_backup_storage_path': os.path.join(state_path, 'config-backups'),
+        'log_collection_storage_path': os.path.join(state_path, 'device-logs'),
+        'vault_servicenow_host': args.servicenow_url,
+        'vault_servicenow_username': 'admin',
+        'vault_servicenow_password': 'admin',
+        'servicenow_default_caller': 'ansible.automation',
+        'servicenow_ci_cache': {'enabled': True, 'path': os.path.join(cache, 'servicenow_ci_cache.json'),
+                                'ttl': 86400, 'negative_ttl': 3600, 'max_entries': max(10000, len(hosts)),
+                                'page_size': 500},
+        'servicenow_incident_ledger': {'enabled': True, 'path': os.path.join(cache, 'servicenow_incident_ledger.json'),
+                                       'reconcile_interval': 900},
+        'uptime_probe': {'method': 'tcp', 'port': args.probe_port, 'timeout': 1, 'attempts': 1, 'concurrency': 256},
+    }
+    children = dict((name, {'hosts': members}) for name, members in groups.items())
+    children.update((name, {'hosts': members}) for name, members in sorted(sites.items()))
+    return {'all': {'children': {'network_devices': {'vars': group_vars, 'children': children}}}}
+
+
+def seed(hosts):
+    """Mock ServiceNow records the roles look up: callers, groups and one CI per host"""
+    return {
+        'sys_user': [{'user_name': 'ansible.automation'}, {'user_name': 'admin'}],
+        'sys_user_group': [{'name': 'network.operations'}, {'name': 'Network'}],
+        'cmdb_ci': [{'name': host['name'], 'asset_tag': 'SIM-%06d' % index}
+                    for index, host in enumerate(hosts, 1)],
+    }
+
+
+def _write(path, text):
+    directory = os.path.dirname(path)
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    with open(path, 'w') as f:
+        f.write(text)
+
+
+def generate(args):
+    """
+    Write one generation of the fleet below args.out
+
+    Returns:
+        Summary dictionary: hosts, interfaces, down_interfaces, failed_hosts, generation
+    """
+    hosts = fleet_hosts(args.hosts)
+    state_path = os.path.join(args.out, 'state')
+    summary = {'generation': args.generation, 'hosts': len(hosts), 'interfaces': 0,
+               'down_interfaces': 0, 'failed_hosts': 0}
+    for host in hosts:
+        gathered = gathered_interfaces(args, host, args.generation)
+        _write(os.path.join(args.out, 'gathered', host['name'] + '.json'), json.dumps(gathered, separators=(',', ':')))
+        _write(os.path.join(args.out, 'configs', host['name'] + '.cfg'), running_config(args, host, gathered, args.generation))
+        summary['interfaces'] += len(gathered['interfaces'])
+        summary['down_interfaces'] += len([item for item in gathered['interfaces'] if not item['enabled']])
+        summary['failed_hosts'] += 1 if host_failed(args, host, args.generation) else 0
+
+    _write(os.path.join(args.out, 'inventory.yml'),
+           yaml.safe_dump(inventory(args, hosts, args.generation, state_path), default_flow_style=False, sort_keys=False))
+    _write(os.path.join(args.out, 'seed.json'), json.dumps(seed(hosts)))
+    return summary
+
+
+def parser():
+    parser = argparse.ArgumentParser(description="Generate a simulated device fleet for offline load tests")
+    parser.add_argument('--hosts', type=int, default=10, help="Number of devices")
+    parser.add_argument('--out', required=True, help="Output directory")
+    parser.add_argument('--generation', type=int, default=0, help="Polling generation (0: healthy baseline)")
+    parser.add_argument('--interfaces', type=int, default=24, help="Physical interfaces per access switch")
+    parser.add_argument('--down-rate', type=float, default=0.02, help="Probability an interface is down")
+    parser.add_argument('--unreachable-rate', type=float, default=0.01, help="Probability a host fails its connectivity check")
+    parser.add_argument('--config-change-rate', type=float, default=0.05, help="Probability a configuration changes")
+    parser.add_argument('--servicenow-url', default='http://127.0.0.1:18080', help="Mock ServiceNow URL")
+    parser.add_argument('--probe-port', type=int, default=18080,
+                        help="TCP port reachable hosts answer on (the mock ServiceNow port)")
+    parser.add_argument('--seed', default='fleet', help="Random seed")
+    return parser
+
+
+def main():
+    args = parser().parse_args()
+    args.out = os.path.abspath(args.out)
+    print(json.dumps(generate(args)))
+
+
+if __name__ == '__main__':
+    main()
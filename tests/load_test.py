@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Purpose: Offline load test of the monitoring roles - simulated fleets of any size against the mock
+         ServiceNow, reporting wall time, ServiceNow API calls and peak memory per role and run
+Design Pattern: Test driver - generate_fleet.py builds the fleet, mock_servicenow.py runs in-process
+                (with optional latency, rate limit and failure injection) and every role run is an
+                ansible-playbook subprocess measured from the outside
+Complexity: O(s * g * r) playbook runs for s fleet sizes, g generations and r roles
+
+For every fleet size the driver generates generation 0 (healthy baseline), then advances the
+fleet one generation per run so interfaces go down, hosts fail and configurations change.
+Each role run reports:
+  seconds        wall time of ansible-playbook
+  api_calls      mock ServiceNow requests by endpoint (table:<table>:<method>, batch, attachment)
+                 plus throttled (429) and injected failures
+  peak_rss_mb    peak resident memory of the ansible-playbook process tree (sampled from /proc)
+  slowest_tasks  from the run_metrics callback (callback_plugins/run_metrics.py)
+
+Usage:
+  python3 load_test.py --hosts 10
+  python3 load_test.py --hosts 10 1000 10000 --roles device_uptime interface_monitoring --forks 50
+  python3 load_test.py --hosts 1000 --latency 0.2 --rate-limit 25 --fail-rate 0.01 --json report.json
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import generate_fleet
+import mock_servicenow
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(TESTS_DIR)
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE')
+
+
+class ProcessTreeSampler(threading.Thread):
+    """Sample the resident memory of a process and its descendants until stopped"""
+
+    def __init__(self, pid, interval=0.1):
+        super(ProcessTreeSampler, self).__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.peak_total = 0
+        self.peak_process = 0
+        self.stopped = threading.Event()
+
+    @staticmethod
+    def _children():
+        children = {}
+        for entry in os.listdir('/proc'):
+            if not entry.isdigit():
+                continue
+            try:
+                with open('/proc/%s/stat' % entry) as f:
+                    # The command name may contain spaces; fields after it are fixed
+                    ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+            except (IOError, OSError, IndexError, ValueError):
+                continue
+            children.setdefault(ppid, []).append(int(entry))
+        return children
+
+    @staticmethod
+    def _rss(pid):
+        try:
+            with open('/proc/%d/statm' % pid) as f:
+                return int(f.read().split()[1]) * PAGE_SIZE
+        except (IOError, OSError, IndexError, ValueError):
+            return 0
+
+    def sample(self):
+        children = self._children()
+        pending, sizes = [self.pid], []
+        while pending:
+            pid = pending.pop()
+            sizes.append(self._rss(pid))
+            pending.extend(children.get(pid, []))
+        self.peak_total = max(self.peak_total, sum(sizes))
+        self.peak_process = max([self.peak_process] + sizes)
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.sample()
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+def start_mock(args, seed):
+    faults = mock_servicenow.Faults(args.latency, args.latency_jitter, args.rate_limit, args.rate_burst,
+                                    args.fail_rate, args.fail_status, args.fail_path, random_seed(args))
+    instance = mock_servicenow.MockServiceNow('admin', 'admin', faults)
+    instance.seed(seed)
+    server = mock_servicenow.create_server('127.0.0.1', 0, instance)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def random_seed(args):
+    return sum(ord(character) for character in args.seed)
+
+
+def last_metrics(metrics_dir):
+    """Last run_metrics document of the load playbook, if the callback wrote one"""
+    try:
+        with open(os.path.join(metrics_dir, 'load_roles.jsonl')) as f:
+            lines = f.read().splitlines()
+        return json.loads(lines[-1]) if lines else {}
+    except (IOError, OSError, ValueError):
+        return {}
+
+
+def run_role(args, fleet_dir, role, log):
+    """One ansible-playbook run of a role against the fleet; returns its measurements"""
+    metrics_dir = os.path.join(fleet_dir, 'metrics')
+    env = dict(os.environ,
+               ANSIBLE_CONFIG=os.path.join(TESTS_DIR, 'ansible.cfg'),
+               ANSIBLE_CALLBACK_PLUGINS=os.path.join(REPO_DIR, 'callback_plugins'),
+               ANSIBLE_CALLBACKS_ENABLED='run_metrics',
+               ANSIBLE_RUN_METRICS_DIR=metrics_dir,
+               ANSIBLE_HOST_KEY_CHECKING='False',
+               ANSIBLE_RETRY_FILES_ENABLED='False')
+    command = ['ansible-playbook', '-i', os.path.join(fleet_dir, 'inventory.yml'),
+               os.path.join(TESTS_DIR, 'load_roles.yml'), '-f', str(args.forks), '-e', 'load_role=%s' % role]
+    for extra in args.extra_vars:
+        command += ['-e', extra]
+
+    started = time.time()
+    process = subprocess.Popen(command, cwd=TESTS_DIR, env=env, stdout=log, stderr=subprocess.STDOUT,
+                               stdin=subprocess.DEVNULL)
+    sampler = ProcessTreeSampler(process.pid)
+    sampler.start()
+    returncode = process.wait()
+    sampler.stop()
+    seconds = time.time() - started
+
+    metrics = last_metrics(metrics_dir)
+    tasks = sorted(metrics.get('tasks', {}).items(), key=lambda item: -item[1][1])
+    return {
+        'seconds': round(seconds, 2),
+        'returncode': returncode,
+        'peak_rss_mb': round(sampler.peak_total / 1048576.0, 1),
+        'max_process_rss_mb': round(sampler.peak_process / 1048576.0, 1),
+        'failed_hosts': metrics.get('hosts', {}).get('failed'),
+        'slowest_tasks': dict((name, round(values[1], 2)) for name, values in tasks[:args.top_tasks]),
+    }
+
+
+def api_delta(before, after):
+    delta = {}
+    for key, count in after.items():
+        if key != 'connections' and count - before.get(key, 0):
+            delta[key] = count - before.get(key, 0)
+    return delta
+
+
+def run_scale(args, hosts):
+    """All generations and roles for one fleet size"""
+    fleet_dir = os.path.join(args.workdir, 'fleet-%d' % hosts)
+    fleet_args = generate_fleet.parser().parse_args(['--out', fleet_dir, '--hosts', str(hosts)])
+    for name in ('interfaces', 'down_rate', 'unreachable_rate', 'config_change_rate', 'seed'):
+        setattr(fleet_args, name, getattr(args, name))
+    fleet_args.out = os.path.abspath(fleet_dir)
+
+    server = start_mock(args, generate_fleet.seed(generate_fleet.fleet_hosts(hosts)))
+    port = server.server_address[1]
+    fleet_args.servicenow_url = 'http://127.0.0.1:%d' % port
+    fleet_args.probe_port = port
+
+    results = []
+    try:
+        with open(os.path.join(args.workdir, 'fleet-%d.log' % hosts), 'w') as log:
+            for generation in range(args.generations):
+                fleet_args.generation = generation
+                fleet = generate_fleet.generate(fleet_args)
+                for role in args.roles:
+                    before = dict(server.instance.request_counts)
+                    log.write('\n=== %d hosts, generation %d, %s ===\n' % (hosts, generation, role))
+                    log.flush()
+                    result = run_role(args, fleet_dir, role, log)
+                    result.update(hosts=hosts, generation=generation, role=role,
+                                  down_interfaces=fleet['down_interfaces'], simulated_failures=fleet['failed_hosts'],
+                                  api_calls=api_delta(before, dict(server.instance.request_counts)))
+                    results.append(result)
+                    report_line(result)
+    finally:
+        server.shutdown()
+        server.server_close()
+    return results
+
+
+def report_line(result):
+    calls = result['api_calls']
+    print('%6d hosts  gen %d  %-22s %8.2fs  %6d API calls (%d throttled, %d injected)  peak RSS %7.1f MB%s' % (
+        result['hosts'], result['generation'], result['role'], result['seconds'],
+        sum(count for key, count in calls.items() if key not in ('throttled', 'injected_failures')),
+        calls.get('throttled', 0), calls.get('injected_failures', 0), result['peak_rss_mb'],
+        '  rc=%d' % result['returncode'] if result['returncode'] else ''))
+    sys.stdout.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline load test of the monitoring roles against a simulated fleet")
+    parser.add_argument('--hosts', type=int, nargs='+', default=[10], help="Fleet sizes, e.g. 10 1000 10000")
+    parser.add_argument('--roles', nargs='+', default=['device_uptime', 'interface_monitoring', 'config_backup'])
+    parser.add_argument('--generations', type=int, default=2, help="Runs per role (generation 0 is the baseline)")
+    parser.add_argument('--forks', type=int, default=20)
+    parser.add_argument('--workdir', default='/tmp/ansible-load-test', help="Fleets, state and logs")
+    parser.add_argument('--json', help="Write all results to this file")
+    parser.add_argument('--top-tasks', type=int, default=5, help="Slowest tasks reported per run")
+    parser.add_argument('-e', '--extra-vars', action='append', default=[], help="Passed to ansible-playbook")
+    fleet = parser.add_argument_group('fleet (see generate_fleet.py)')
+    fleet.add_argument('--interfaces', type=int, default=24)
+    fleet.add_argument('--down-rate', type=float, default=0.02)
+    fleet.add_argument('--unreachable-rate', type=float, default=0.01)
+    fleet.add_argument('--config-change-rate', type=float, default=0.05)
+    fleet.add_argument('--seed', default='fleet')
+    mock = parser.add_argument_group('mock ServiceNow (see mock_servicenow.py)')
+    mock.add_argument('--latency', type=float, default=0.0)
+    mock.add_argument('--latency-jitter', type=float, default=0.0)
+    mock.add_argument('--rate-limit', type=float, default=0.0)
+    mock.add_argument('--rate-burst', type=int)
+    mock.add_argument('--fail-rate', type=float, default=0.0)
+    mock.add_argument('--fail-status', type=int, default=503)
+    mock.add_argument('--fail-path', default='')
+    args = parser.parse_args()
+
+    args.workdir = os.path.abspath(args.workdir)
+    if not os.path.isdir(args.workdir):
+        os.makedirs(args.workdir)
+
+    results = []
+    for hosts in args.hosts:
+        results.extend(run_scale(args, hosts))
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'arguments': vars(args), 'results': results}, f, indent=1, sort_keys=True)
+    sys.exit(1 if any(result['returncode'] not in (0, 2) for result in results) else 0)
+
+
+if __name__ == '__main__':
+    main()
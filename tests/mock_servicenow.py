@@ -0,0 +1,482 @@
+#!/usr/bin/env python3
+"""
+Purpose: Local mock of the ServiceNow Table and Batch REST APIs for offline tests
+Design Pattern: In-memory repository behind a threaded stdlib HTTP server
+Complexity: O(n) per table query where n is the number of records in the table
+
+Implements enough of the ServiceNow REST surface for the servicenow_itsm role plugins:
+  GET/POST          /api/now/table/<table>
+  GET/PATCH/PUT/DELETE /api/now/table/<table>/<sys_id>
+  POST              /api/now/v1/batch
+  POST              /api/now/attachment/file
+  GET               /mock/stats   (request and connection counters for test assertions)
+
+Load-test behaviour (all off by default):
+  --latency / --latency-jitter   seconds added to every API request (uniform jitter)
+  --latency-path                 regular expression limiting the latency to some paths
+  --rate-limit / --rate-burst    token bucket of requests per second; excess requests get
+                                 429 with Retry-After, as an instance's rate limit rules do
+  --fail-rate / --fail-status    fraction of API requests answered with an injected error
+  --fail-path                    regular expression limiting injected errors to some paths
+  --fail-after                   process the request before answering with the injected error
+                                 (a response lost after the write, e.g. a 502 from a proxy)
+
+Usage:
+  python3 mock_servicenow.py --port 18080
+  python3 mock_servicenow.py --port 18080 --seed seed.json   # {"sys_user": [{"user_name": "admin"}]}
+  python3 mock_servicenow.py --port 18080 --latency 0.15 --rate-limit 50 --fail-rate 0.02
+"""
+
+import argparse
+import base64
+import hashlib
+import json
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+# Number prefixes for task-type tables
+NUMBER_PREFIXES = {
+    'incident': 'INC',
+    'problem': 'PRB',
+    'change_request': 'CHG',
+}
+
+QUERY_TERM = re.compile(r'^([a-z0-9_.]+?)(NOT IN|NOT LIKE|ISNOTEMPTY|ISEMPTY|STARTSWITH|LIKE|IN|!=|>=|<=|=|>|<)(.*)$')
+
+
+class Faults:
+    """
+    Latency, rate limit and error injection applied to every API request
+    Thread-safe; the token bucket refills continuously at rate_limit requests per second
+    """
+
+    def __init__(self, latency: float = 0.0, latency_jitter: float = 0.0, rate_limit: float = 0.0,
+                 rate_burst: Optional[int] = None, fail_rate: float = 0.0, fail_status: int = 503,
+                 fail_path: str = '', seed: Optional[int] = None, fail_after: bool = False,
+                 latency_path: str = ''):
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.latency_path = re.compile(latency_path) if latency_path else None
+        self.rate_limit = rate_limit
+        self.rate_burst = rate_burst if rate_burst is not None else max(1, int(rate_limit))
+        self.fail_rate = fail_rate
+        self.fail_status = fail_status
+        self.fail_path = re.compile(fail_path) if fail_path else None
+        self.fail_after = fail_after
+        self.random = random.Random(seed)
+        self.tokens = float(self.rate_burst)
+        self.refilled_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def delay(self, path: str = '') -> float:
+        if self.latency_path and not self.latency_path.search(path):
+            return 0.0
+        with self.lock:
+            jitter = self.random.uniform(-self.latency_jitter, self.latency_jitter) if self.latency_jitter else 0.0
+        return max(0.0, self.latency + jitter)
+
+    def throttle(self) -> Optional[float]:
+        """Take a token; returns the Retry-After seconds when the bucket is empty"""
+        if self.rate_limit <= 0:
+            return None
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.rate_burst, self.tokens + (now - self.refilled_at) * self.rate_limit)
+            self.refilled_at = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return None
+            return (1 - self.tokens) / self.rate_limit
+
+    def inject(self, path: str) -> Optional[int]:
+        """Status code of an injected failure for this request, if any"""
+        if self.fail_rate <= 0 or (self.fail_path and not self.fail_path.search(path)):
+            return None
+        with self.lock:
+            return self.fail_status if self.random.random() < self.fail_rate else None
+
+
+class MockServiceNow:
+    """
+    In-memory ServiceNow instance
+    Thread-safe store of tables with request counters for assertions
+    """
+
+    def __init__(self, username: str = 'admin', password: str = 'admin', faults: Optional[Faults] = None):
+        self.username = username
+        self.password = password
+        self.faults = faults or Faults()
+        self.tables: Dict[str, Dict[str, Dict]] = {}
+        self.counters: Dict[str, int] = {}
+        self.request_counts: Dict[str, int] = {}
+        self.lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # Records
+    # ------------------------------------------------------------------
+    def seed(self, data: Dict[str, List[Dict]]):
+        """Load initial records, e.g. {"sys_user": [{"user_name": "admin"}]}"""
+        for table, records in data.items():
+            for record in records:
+                self.create(table, record)
+
+    def create(self, table: str, fields: Dict) -> Dict:
+        with self.lock:
+            now = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+            record = {
+                'sys_id': fields.get('sys_id') or uuid.uuid4().hex,
+                'sys_created_on': now,
+                'sys_updated_on': now,
+            }
+            if table in NUMBER_PREFIXES:
+                self.counters[table] = self.counters.get(table, 10000) + 1
+                record['number'] = f"{NUMBER_PREFIXES[table]}{self.counters[table]:07d}"
+                record['state'] = '1'
+            record.update({key: _as_field(value) for key, value in fields.items() if key != 'sys_id'})
+            self.tables.setdefault(table, {})[record['sys_id']] = record
+            return dict(record)
+
+    def get(self, table: str, sys_id: str) -> Optional[Dict]:
+        with self.lock:
+            record = self.tables.get(table, {}).get(sys_id)
+            return dict(record) if record else None
+
+    def update(self, table: str, sys_id: str, fields: Dict) -> Optional[Dict]:
+        with self.lock:
+            record = self.tables.get(table, {}).get(sys_id)
+            if record is None:
+                return None
+            record.update({key: _as_field(value) for key, value in fields.items() if key != 'sys_id'})
+            record['sys_updated_on'] = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+            return dict(record)
+
+    def delete(self, table: str, sys_id: str) -> bool:
+        with self.lock:
+            return self.tables.get(table, {}).pop(sys_id, None) is not None
+
+    def query(self, table: str, sysparm_query: str = '', limit: Optional[int] = None,
+              offset: int = 0) -> List[Dict]:
+        with self.lock:
+            records = [dict(r) for r in self.tables.get(table, {}).values()
+                       if _matches(r, sysparm_query)]
+        records.sort(key=lambda r: r.get('sys_created_on', ''))
+        if limit is not None:
+            return records[offset:offset + limit]
+        return records[offset:]
+
+    def count_request(self, key: str):
+        with self.lock:
+            self.request_counts[key] = self.request_counts.get(key, 0) + 1
+
+
+def _as_field(value) -> str:
+    """ServiceNow returns every field as a string"""
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if value is None:
+        return ''
+    return str(value)
+
+
+def _matches(record: Dict, sysparm_query: str) -> bool:
+    """Evaluate an encoded query with ^ (AND) and ^OR conditions"""
+    if not sysparm_query:
+        return True
+
+    for and_term in sysparm_query.split('^'):
+        if not and_term or and_term.startswith('ORDERBY'):
+            continue
+        alternatives = and_term.split('^OR') if '^OR' in and_term else [and_term]
+        if not any(_matches_term(record, term) for term in alternatives):
+            return False
+    return True
+
+
+def _matches_term(record: Dict, term: str) -> bool:
+    if term.startswith('OR'):
+        term = term[2:]
+    match = QUERY_TERM.match(term)
+    if not match:
+        return True
+
+    field, operator, value = match.groups()
+    actual = record.get(field, '')
+    if operator == '=':
+        return actual == value
+    if operator == '!=':
+        return actual != value
+    if operator == 'IN':
+        return actual in value.split(',')
+    if operator == 'NOT IN':
+        return actual not in value.split(',')
+    if operator == 'LIKE':
+        return value in actual
+    if operator == 'NOT LIKE':
+        return value not in actual
+    if operator == 'STARTSWITH':
+        return actual.startswith(value)
+    if operator == 'ISEMPTY':
+        return actual == ''
+    if operator == 'ISNOTEMPTY':
+        return actual != ''
+    try:
+        return {'>': float(actual) > float(value), '<': float(actual) < float(value),
+                '>=': float(actual) >= float(value), '<=': float(actual) <= float(value)}[operator]
+    except ValueError:
+        return False
+
+
+def _select_fields(record: Dict, fields: Optional[str]) -> Dict:
+    if not fields:
+        return record
+    wanted = [f.strip() for f in fields.split(',') if f.strip()]
+    return {key: record.get(key, '') for key in wanted}
+
+
+class ServiceNowRequestHandler(BaseHTTPRequestHandler):
+    """HTTP front end for MockServiceNow (set as server.instance)"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        # One handler per TCP connection - lets tests assert keep-alive reuse
+        self.instance.count_request('connections')
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    # ------------------------------------------------------------------
+    # Plumbing
+    # ------------------------------------------------------------------
+    @property
+    def instance(self) -> MockServiceNow:
+        return self.server.instance
+
+    def _authorized(self) -> bool:
+        expected = base64.b64encode(f"{self.instance.username}:{self.instance.password}".encode()).decode()
+        return self.headers.get('Authorization', '') == f"Basic {expected}"
+
+    def _read_body(self) -> bytes:
+        length = int(self.headers.get('Content-Length') or 0)
+        return self.rfile.read(length) if length else b''
+
+    def _send_json(self, status: int, payload: Dict, headers: Optional[Dict[str, str]] = None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _dispatch(self, method: str):
+        if not self._authorized():
+            self._send_json(401, {'error': {'message': 'User Not Authenticated'}, 'status': 'failure'})
+            return
+
+        url = urlsplit(self.path)
+        body = self._read_body()
+        if url.path.startswith('/api/'):
+            faults = self.instance.faults
+            retry_after = faults.throttle()
+            if retry_after is not None:
+                self.instance.count_request('throttled')
+                self._send_json(429, {'error': {'message': 'Too Many Requests', 'detail': 'Rate limit exceeded'},
+                                      'status': 'failure'}, {'Retry-After': str(max(1, int(retry_after + 0.999)))})
+                return
+            delay = faults.delay(url.path)
+            if delay:
+                time.sleep(delay)
+            injected = faults.inject(url.path)
+            if injected is not None:
+                self.instance.count_request('injected_failures')
+                if faults.fail_after:
+                    self.route(method, url.path, parse_qs(url.query), body)
+                self._send_json(injected, {'error': {'message': 'Injected failure', 'detail': 'mock_servicenow --fail-rate'},
+                                           'status': 'failure'})
+                return
+
+        status, payload = self.route(method, url.path, parse_qs(url.query), body)
+        self._send_json(status, payload)
+
+    def do_GET(self):
+        self._dispatch('GET')
+
+    def do_POST(self):
+        self._dispatch('POST')
+
+    def do_PATCH(self):
+        self._dispatch('PATCH')
+
+    def do_PUT(self):
+        self._dispatch('PUT')
+
+    def do_DELETE(self):
+        self._dispatch('DELETE')
+
+    # ------------------------------------------------------------------
+    # Routing
+    # ------------------------------------------------------------------
+    def route(self, method: str, path: str, params: Dict[str, List[str]], body: bytes) -> Tuple[int, Dict]:
+        """Route a request to the table or batch handler (also used for batch sub-requests)"""
+        if path == '/mock/stats' and method == 'GET':
+            with self.instance.lock:
+                return 200, {'request_counts': dict(self.instance.request_counts)}
+
+        if path == '/api/now/v1/batch' and method == 'POST':
+            self.instance.count_request('batch')
+            return self.handle_batch(body)
+
+        if path == '/api/now/attachment/file' and method == 'POST':
+            self.instance.count_request('attachment:POST')
+            return self.handle_attachment(params, body)
+
+        match = re.match(r'^/api/now/(?:v\d+/)?table/([a-z0-9_]+)(?:/([0-9a-f]+))?$', path)
+        if match:
+            table, sys_id = match.groups()
+            self.instance.count_request(f"table:{table}:{method}")
+            return self.handle_table(method, table, sys_id, params, body)
+
+        return 404, {'error': {'message': f'No handler for {method} {path}'}, 'status': 'failure'}
+
+    def handle_table(self, method: str, table: str, sys_id: Optional[str],
+                     params: Dict[str, List[str]], body: bytes) -> Tuple[int, Dict]:
+        fields = params.get('sysparm_fields', [None])[0]
+
+        if method == 'GET' and sys_id is None:
+            limit = params.get('sysparm_limit', [None])[0]
+            offset = int(params.get('sysparm_offset', ['0'])[0])
+            records = self.instance.query(
+                table, params.get('sysparm_query', [''])[0],
+                int(limit) if limit else None, offset
+            )
+            return 200, {'result': [_select_fields(r, fields) for r in records]}
+
+        if method == 'POST' and sys_id is None:
+            record = self.instance.create(table, json.loads(body or b'{}'))
+            return 201, {'result': _select_fields(record, fields)}
+
+        if sys_id is None:
+            return 405, {'error': {'message': 'Method not allowed'}, 'status': 'failure'}
+
+        if method == 'GET':
+            record = self.instance.get(table, sys_id)
+        elif method in ('PATCH', 'PUT'):
+            record = self.instance.update(table, sys_id, json.loads(body or b'{}'))
+        elif method == 'DELETE':
+            return (204, {}) if self.instance.delete(table, sys_id) else (404, {'error': {'message': 'No Record found'}})
+        else:
+            return 405, {'error': {'message': 'Method not allowed'}, 'status': 'failure'}
+
+        if record is None:
+            return 404, {'error': {'message': 'No Record found'}, 'status': 'failure'}
+        return 200, {'result': _select_fields(record, fields)}
+
+    def handle_attachment(self, params: Dict[str, List[str]], body: bytes) -> Tuple[int, Dict]:
+        table_name = params.get('table_name', [''])[0]
+        table_sys_id = params.get('table_sys_id', [''])[0]
+        if not table_name or not table_sys_id or not params.get('file_name'):
+            return 400, {'error': {'message': 'table_name, table_sys_id and file_name are required'}}
+        if self.instance.get(table_name, table_sys_id) is None:
+            return 404, {'error': {'message': 'Invalid table or record'}, 'status': 'failure'}
+
+        record = self.instance.create('sys_attachment', {
+            'table_name': table_name,
+            'table_sys_id': table_sys_id,
+            'file_name': params['file_name'][0],
+            'content_type': self.headers.get('Content-Type', ''),
+            'size_bytes': len(body),
+            'hash': hashlib.sha256(body).hexdigest(),
+        })
+        return 201, {'result': record}
+
+    def handle_batch(self, body: bytes) -> Tuple[int, Dict]:
+        try:
+            batch = json.loads(body)
+        except ValueError:
+            return 400, {'error': {'message': 'Invalid batch payload'}}
+
+        serviced = []
+        for request in batch.get('rest_requests', []):
+            url = urlsplit(request.get('url', ''))
+            sub_body = base64.b64decode(request['body']) if request.get('body') else b''
+            status, payload = self.route(request.get('method', 'GET').upper(), url.path,
+                                         parse_qs(url.query), sub_body)
+            serviced.append({
+                'id': request.get('id'),
+                'status_code': status,
+                'status_text': 'OK' if status < 400 else 'Error',
+                'headers': [{'name': 'Content-Type', 'value': 'application/json'}],
+                'body': base64.b64encode(json.dumps(payload).encode()).decode(),
+                'execution_time': 0,
+            })
+
+        return 200, {
+            'batch_request_id': batch.get('batch_request_id'),
+            'serviced_requests': serviced,
+            'unserviced_requests': [],
+        }
+
+
+def create_server(host: str = '127.0.0.1', port: int = 18080, instance: Optional[MockServiceNow] = None,
+                  verbose: bool = False) -> ThreadingHTTPServer:
+    """Create (but do not start) a mock ServiceNow HTTP server"""
+    server = ThreadingHTTPServer((host, port), ServiceNowRequestHandler)
+    server.daemon_threads = True
+    server.instance = instance or MockServiceNow()
+    server.verbose = verbose
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock ServiceNow REST API for offline tests")
+    parser.add_argument('--host', default='127.0.0.1', help="Bind address")
+    parser.add_argument('--port', type=int, default=18080, help="Listen port")
+    parser.add_argument('--username', default='admin', help="Basic auth username")
+    parser.add_argument('--password', default='admin', help="Basic auth password")
+    parser.add_argument('--seed', help="JSON file of {table: [records]} to preload")
+    parser.add_argument('--verbose', action='store_true', help="Log every request")
+    parser.add_argument('--latency', type=float, default=0.0, help="Seconds added to every API request")
+    parser.add_argument('--latency-jitter', type=float, default=0.0, help="Uniform +/- jitter of the latency")
+    parser.add_argument('--latency-path', default='', help="Regular expression of paths the latency applies to")
+    parser.add_argument('--rate-limit', type=float, default=0.0, help="API requests per second before 429 (0: unlimited)")
+    parser.add_argument('--rate-burst', type=int, help="Token bucket size (default: one second of requests)")
+    parser.add_argument('--fail-rate', type=float, default=0.0, help="Fraction of API requests answered with an error")
+    parser.add_argument('--fail-status', type=int, default=503, help="Status code of injected errors")
+    parser.add_argument('--fail-path', default='', help="Regular expression of paths errors are injected into")
+    parser.add_argument('--fail-after', action='store_true',
+                        help="Process requests before answering with the injected error")
+    parser.add_argument('--random-seed', type=int, help="Seed for jitter and error injection")
+    args = parser.parse_args()
+
+    faults = Faults(args.latency, args.latency_jitter, args.rate_limit, args.rate_burst,
+                    args.fail_rate, args.fail_status, args.fail_path, args.random_seed, args.fail_after,
+                    args.latency_path)
+    instance = MockServiceNow(args.username, args.password, faults)
+    if args.seed:
+        with open(args.seed, 'r') as f:
+            instance.seed(json.load(f))
+
+    server = create_server(args.host, args.port, instance, args.verbose)
+    print(f"Mock ServiceNow listening on http://{args.host}:{args.port}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()